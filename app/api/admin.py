@@ -1,21 +1,41 @@
 from __future__ import annotations
 
+import json
 import uuid
-from fastapi import APIRouter, Depends
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 
-from app.core.deps import get_db, require_admin
+from app.core.cache import plan_cache
+from app.core.config import settings
+from app.core.deps import get_db, get_redis, get_sessionmaker, require_admin
+from app.core.heavy_hitters import heavy_hitters
 from app.core.logging import get_logger
+from app.core.usage import read_usage_redis
 from app.db import crud
 from app.db.models import (
+    Tenant,
     Plan,
     ApiKey,
     ResourcePolicy,
     PlanAlgorithm,
     SubjectType,
 )
-from app.rl.schemas import TenantCreate, PlanCreate, ApiKeyCreate, ResourcePolicyCreate
+from app.rl.inspect import decode_cursor, scan_tenant_state
+from app.rl.policy_index import policy_index
+from app.rl.reset import reset_jobs
+from app.rl.schemas import (
+    TenantCreate,
+    PlanCreate,
+    ApiKeyCreate,
+    ResourcePolicyCreate,
+    StateResetRequest,
+)
 
 router = APIRouter(prefix="/v1/admin")
 log = get_logger("api.admin")
@@ -27,9 +47,14 @@ async def create_tenant(
     db: AsyncSession = Depends(get_db),
     _: str = Depends(require_admin),
 ):
-    t = await crud.create_tenant(db, payload.name)
+    t = await crud.create_tenant(db, payload.name, timezone=payload.timezone)
     log.bind(tenant=str(t.id)).info("admin.create_tenant")
-    return {"id": str(t.id), "name": t.name, "created_at": str(t.created_at)}
+    return {
+        "id": str(t.id),
+        "name": t.name,
+        "timezone": t.timezone,
+        "created_at": str(t.created_at),
+    }
 
 
 @router.post("/plans")
@@ -51,6 +76,12 @@ async def create_plan(
         concurrency_limit=payload.concurrency_limit,
         cost_per_call=payload.cost_per_call,
         burst_factor=payload.burst_factor,
+        adaptive=payload.adaptive,
+        adaptive_min_limit=payload.adaptive_min_limit,
+        adaptive_max_limit=payload.adaptive_max_limit,
+        adaptive_latency_ms=payload.adaptive_latency_ms,
+        quota_period=payload.quota_period,
+        quota_timezone=payload.quota_timezone,
     )
     log.bind(plan=str(p.id), tenant=str(p.tenant_id), alg=p.algorithm.value).info(
         "admin.create_plan"
@@ -60,6 +91,8 @@ async def create_plan(
         "tenant_id": str(p.tenant_id),
         "name": p.name,
         "algorithm": p.algorithm.value,
+        "quota_period": p.quota_period,
+        "quota_timezone": p.quota_timezone,
         "created_at": str(p.created_at),
     }
 
@@ -133,3 +166,374 @@ async def tenant_summary(
         "keys": keys_count or 0,
         "policies": policies_count or 0,
     }
+
+
+@router.get("/tenants/{tenant_id}/usage")
+async def tenant_usage(
+    tenant_id: uuid.UUID,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    resource: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    redis=Depends(get_redis),
+    _: str = Depends(require_admin),
+):
+    # Flushed rollups only: the newest few seconds are still buffered in the
+    # workers (USAGE_FLUSH_INTERVAL_SEC)
+    until = until or datetime.now(timezone.utc)
+    since = since or until - timedelta(hours=1)
+    if until.tzinfo is None:
+        until = until.replace(tzinfo=timezone.utc)
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if since >= until:
+        raise HTTPException(status_code=422, detail="since must be before until")
+    if until - since > timedelta(days=settings.USAGE_QUERY_MAX_DAYS):
+        raise HTTPException(status_code=422, detail="Time range too large")
+
+    if settings.USAGE_SINK == "redis":
+        rows = await read_usage_redis(redis, tenant_id, since, until, resource)
+    else:
+        rows = [
+            {
+                "minute": r.minute,
+                "resource": r.resource,
+                "outcome": r.outcome,
+                "requests": r.requests,
+                "cost": r.cost,
+            }
+            for r in await crud.get_usage(db, tenant_id, since, until, resource)
+        ]
+    totals = {o: {"requests": 0, "cost": 0} for o in ("allowed", "blocked")}
+    for r in rows:
+        t = totals.setdefault(r["outcome"], {"requests": 0, "cost": 0})
+        t["requests"] += r["requests"]
+        t["cost"] += r["cost"]
+        m = r["minute"]
+        # SQLite hands back naive datetimes; rollups are always UTC
+        m = m.replace(tzinfo=timezone.utc) if m.tzinfo is None else m
+        r["minute"] = m.astimezone(timezone.utc).isoformat()
+    log.bind(tenant=str(tenant_id), rows=len(rows)).info("admin.tenant_usage")
+    return {
+        "tenant_id": str(tenant_id),
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "totals": totals,
+        "rows": rows,
+    }
+
+
+@router.get("/tenants/{tenant_id}/top-subjects")
+async def tenant_top_subjects(
+    tenant_id: uuid.UUID,
+    resource: Optional[str] = None,
+    k: int = Query(10, ge=1, le=100),
+    redis=Depends(get_redis),
+    _: str = Depends(require_admin),
+):
+    # Approximate: merged Space-Saving summaries over the current and the
+    # previous HEAVY_HITTERS_WINDOW_SEC window, plus this worker's unsynced
+    # deltas
+    subjects = await heavy_hitters.top(redis, str(tenant_id), k, resource=resource)
+    log.bind(tenant=str(tenant_id), k=k).info("admin.tenant_top_subjects")
+    return {
+        "tenant_id": str(tenant_id),
+        "resource": resource,
+        "window_sec": settings.HEAVY_HITTERS_WINDOW_SEC,
+        "subjects": subjects,
+    }
+
+
+@router.get("/tenants/{tenant_id}/state")
+async def tenant_state(
+    tenant_id: uuid.UUID,
+    cursor: Optional[str] = None,
+    subject: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=10_000),
+    redis=Depends(get_redis),
+    _: str = Depends(require_admin),
+):
+    # NDJSON page of live limiter state; pass the final line's cursor back to
+    # continue. Bounded per call so a walk never competes with checks.
+    tid = str(tenant_id)
+    try:
+        start = decode_cursor(tid, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    async def stream():
+        async for item in scan_tenant_state(redis, tid, start, subject, limit):
+            if item.get("done"):
+                log.bind(
+                    tenant=tid, scanned=item["scanned"], returned=item["returned"]
+                ).info("admin.tenant_state")
+            yield json.dumps(item) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.post("/tenants/{tenant_id}/reset", status_code=202)
+async def reset_tenant_state(
+    tenant_id: uuid.UUID,
+    payload: StateResetRequest = StateResetRequest(),
+    redis=Depends(get_redis),
+    _: str = Depends(require_admin),
+):
+    # Background job; poll GET /reset-jobs/{id} for progress
+    return await reset_jobs.submit(
+        redis, str(tenant_id), resource=payload.resource, subject=payload.subject
+    )
+
+
+@router.get("/reset-jobs/{job_id}")
+async def get_reset_job(
+    job_id: str,
+    redis=Depends(get_redis),
+    _: str = Depends(require_admin),
+):
+    job = await reset_jobs.get(redis, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.delete("/reset-jobs/{job_id}", status_code=202)
+async def cancel_reset_job(
+    job_id: str,
+    redis=Depends(get_redis),
+    _: str = Depends(require_admin),
+):
+    job = await reset_jobs.cancel(redis, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    log.bind(job=job_id).info("admin.cancel_reset")
+    return job
+
+
+# Bulk provisioning: JSON array or NDJSON in, NDJSON out. All rows of a call
+# are inserted in one transaction as chunked multi-row INSERTs; result lines
+# stream back per chunk and the last line says whether the batch committed.
+# Lines before a "committed": false trailer describe rows that were rolled
+# back; raw API keys are held back until the commit so none is ever shown
+# for a key that does not exist.
+
+
+async def _read_items(
+    request: Request, model: type[BaseModel], build: Callable[[BaseModel], dict]
+) -> list[dict]:
+    body = await request.body()
+    ctype = request.headers.get("content-type", "")
+    try:
+        if "ndjson" in ctype or "jsonl" in ctype:
+            raw = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            raw = json.loads(body or b"[]")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Malformed JSON body")
+    if not isinstance(raw, list):
+        raise HTTPException(status_code=422, detail="Expected a JSON array")
+    if len(raw) > settings.BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail="Too many items")
+    items = []
+    for i, obj in enumerate(raw):
+        try:
+            items.append(build(model.model_validate(obj)))
+        except (ValidationError, ValueError) as e:
+            errors = (
+                e.errors(include_url=False, include_context=False)
+                if isinstance(e, ValidationError)
+                else str(e)
+            )
+            raise HTTPException(status_code=422, detail={"index": i, "errors": errors})
+    return items
+
+
+def _bulk_error(e: Exception) -> dict:
+    # Never the message: it carries the SQL and its bound parameters
+    out = {"error": type(e).__name__}
+    orig = getattr(e, "orig", None)
+    for err in (orig, getattr(orig, "__cause__", None)):
+        # asyncpg errors carry constraint_name, psycopg ones diag.constraint_name
+        name = getattr(err, "constraint_name", None) or getattr(
+            getattr(err, "diag", None), "constraint_name", None
+        )
+        if name:
+            out["constraint"] = name
+            break
+    return out
+
+
+def _bulk_response(
+    session_factory,
+    model,
+    rows: list[dict],
+    present: Callable[[dict], dict],
+    event: str,
+    on_commit: Optional[Callable[[list[dict]], None]] = None,
+    hold_until_commit: bool = False,
+) -> StreamingResponse:
+    async def stream():
+        count = 0
+        held: list[str] = []
+        try:
+            async with session_factory() as db, db.begin():
+                async for chunk in crud.insert_chunked(
+                    db, model, rows, settings.BULK_CHUNK_SIZE
+                ):
+                    count += len(chunk)
+                    lines = "".join(json.dumps(present(r)) + "\n" for r in chunk)
+                    if hold_until_commit:
+                        held.append(lines)
+                    else:
+                        yield lines
+        except Exception as e:
+            log.bind(error=repr(e), inserted=count).warning(f"{event}.rollback")
+            yield json.dumps(
+                {"done": True, "committed": False, "count": 0, **_bulk_error(e)}
+            ) + "\n"
+            return
+        if on_commit is not None:
+            on_commit(rows)
+        log.bind(count=count).info(event)
+        if held:
+            yield "".join(held)
+        yield json.dumps({"done": True, "committed": True, "count": count}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.post("/bulk/tenants")
+async def bulk_create_tenants(
+    request: Request,
+    session_factory=Depends(get_sessionmaker),
+    _: str = Depends(require_admin),
+):
+    rows = await _read_items(
+        request,
+        TenantCreate,
+        lambda p: {"id": uuid.uuid4(), "name": p.name, "timezone": p.timezone},
+    )
+    return _bulk_response(
+        session_factory,
+        Tenant,
+        rows,
+        lambda r: {"id": str(r["id"]), "name": r["name"]},
+        "admin.bulk_tenants",
+    )
+
+
+@router.post("/bulk/plans")
+async def bulk_create_plans(
+    request: Request,
+    session_factory=Depends(get_sessionmaker),
+    _: str = Depends(require_admin),
+):
+    def build(p: PlanCreate) -> dict:
+        row = p.model_dump()
+        row["id"] = uuid.uuid4()
+        row["algorithm"] = PlanAlgorithm(p.algorithm)
+        return row
+
+    rows = await _read_items(request, PlanCreate, build)
+    # period_quota plans follow their tenant's calendar, as with create_plan;
+    # one lookup for every tenant in the batch
+    unzoned = [
+        r
+        for r in rows
+        if r["algorithm"] == PlanAlgorithm.period_quota and r["quota_timezone"] is None
+    ]
+    if unzoned:
+        async with session_factory() as db:
+            zones = await crud.get_tenant_timezones(
+                db, {r["tenant_id"] for r in unzoned}
+            )
+        for r in unzoned:
+            r["quota_timezone"] = zones.get(str(r["tenant_id"]), "UTC")
+    return _bulk_response(
+        session_factory,
+        Plan,
+        rows,
+        lambda r: {
+            "id": str(r["id"]),
+            "tenant_id": str(r["tenant_id"]),
+            "name": r["name"],
+            "algorithm": r["algorithm"].value,
+        },
+        "admin.bulk_plans",
+    )
+
+
+@router.post("/bulk/keys")
+async def bulk_create_keys(
+    request: Request,
+    session_factory=Depends(get_sessionmaker),
+    _: str = Depends(require_admin),
+):
+    raw_keys: dict[str, str] = {}
+
+    def build(p: ApiKeyCreate) -> dict:
+        raw, key_hash = crud.new_api_key()
+        raw_keys[key_hash] = raw
+        return {
+            "id": uuid.uuid4(),
+            "tenant_id": p.tenant_id,
+            "name": p.name,
+            "key_hash": key_hash,
+            "active": True,
+        }
+
+    rows = await _read_items(request, ApiKeyCreate, build)
+    return _bulk_response(
+        session_factory,
+        ApiKey,
+        rows,
+        lambda r: {
+            "tenant_id": str(r["tenant_id"]),
+            "name": r["name"],
+            "key": raw_keys[r["key_hash"]],
+            "key_hash": r["key_hash"],
+        },
+        "admin.bulk_keys",
+        hold_until_commit=True,
+    )
+
+
+def _invalidate_policies(rows: list[dict]) -> None:
+    # Once per batch: drop the tries and cached plan resolutions of every
+    # tenant touched, instead of patching them row by row.
+    tenants = {str(r["tenant_id"]) for r in rows}
+    for tid in tenants:
+        policy_index.invalidate(tid)
+    plan_cache.pop_where(lambda k: k[0] in tenants)
+
+
+@router.post("/bulk/policies")
+async def bulk_create_policies(
+    request: Request,
+    session_factory=Depends(get_sessionmaker),
+    _: str = Depends(require_admin),
+):
+    def build(p: ResourcePolicyCreate) -> dict:
+        return {
+            "id": uuid.uuid4(),
+            "tenant_id": p.tenant_id,
+            "resource": p.resource,
+            "subject_type": SubjectType(p.subject_type),
+            "plan_id": p.plan_id,
+        }
+
+    rows = await _read_items(request, ResourcePolicyCreate, build)
+    return _bulk_response(
+        session_factory,
+        ResourcePolicy,
+        rows,
+        lambda r: {
+            "id": str(r["id"]),
+            "tenant_id": str(r["tenant_id"]),
+            "resource": r["resource"],
+            "subject_type": r["subject_type"].value,
+            "plan_id": str(r["plan_id"]),
+        },
+        "admin.bulk_policies",
+        on_commit=_invalidate_policies,
+    )
@@ -1,16 +1,38 @@
-from fastapi import APIRouter, Depends, Response, Request
+import asyncio
+import time
+from typing import List, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.deps import get_redis, get_db, get_engine
+from app.core.cache import quota_cache
+from app.core.deps import get_redis, get_read_redis, get_lazy_db, get_engine
 from app.rl.engine import DecisionEngine
-from app.rl.schemas import CheckRequestV2, CheckDecision
-from app.observability.metrics import RL_ALLOWED, RL_BLOCKED, REQUESTS_TOTAL
+from app.rl.schemas import (
+    AcquireCancel,
+    AcquireDecision,
+    AcquireRequest,
+    CheckRequestV2,
+    CheckDecision,
+    FeedbackRequest,
+    FeedbackResult,
+    QuotaBatch,
+    QuotaState,
+)
+from app.observability.metrics import (
+    ADAPTIVE_FEEDBACK,
+    RL_ALLOWED,
+    RL_BLOCKED,
+    REQUESTS_TOTAL,
+)
 from app.core.logging import get_logger
 from app.core.config import settings
+from app.core.warmup import state as warmup_state
 from app.core.security import (
     get_api_key_from_header,
     hash_api_key,
-    verify_api_key as verify_api_key_db,
+    verify_api_key_and_plan,
 )
 from app.db.models import SubjectType
 
@@ -25,18 +47,30 @@ async def health():
     return {"status": "ok", "version": settings.APP_VERSION}
 
 
+@router.get("/ready")
+async def ready(response: Response):
+    # Readiness: 503 until this worker's warm-up has completed
+    if not warmup_state.ready:
+        response.status_code = 503
+        return {"status": "warming_up", "error": warmup_state.last_error}
+    return {"status": "ready", "warmup_ms": round(warmup_state.duration_ms or 0, 1)}
+
+
 @router.post("/check", response_model=CheckDecision)
 async def check_rate_limit(
     payload: CheckRequestV2,
     response: Response,
     request: Request,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_lazy_db),
     redis=Depends(get_redis),
     engine: DecisionEngine = Depends(get_engine),
 ):
     raw_key = get_api_key_from_header(request)
     key_hash = hash_api_key(raw_key, settings.APIKEY_HASH_SALT)
-    api_key_row = await verify_api_key_db(db, redis, key_hash)
+    # On a cold cache this one query also fetches the exact-match plan
+    api_key_row, _ = await verify_api_key_and_plan(
+        db, redis, key_hash, payload.resource, SubjectType.api_key
+    )
 
     plan = await engine.resolve_plan(
         db=db,
@@ -73,3 +107,243 @@ async def check_rate_limit(
         remaining=decision.remaining,
     ).info("check")
     return decision
+
+
+async def _peek_quota(
+    request: Request,
+    db: AsyncSession,
+    redis,
+    engine: DecisionEngine,
+    pairs: list[tuple[str, str]],
+    plan_id: Optional[UUID] = None,
+) -> list[dict]:
+    raw_key = get_api_key_from_header(request)
+    key_hash = hash_api_key(raw_key, settings.APIKEY_HASH_SALT)
+    api_key_row, _ = await verify_api_key_and_plan(
+        db, redis, key_hash, pairs[0][1], SubjectType.api_key
+    )
+    tenant_id = api_key_row.tenant_id
+    now_ms = int(time.time() * 1000)
+    out: list = [None] * len(pairs)
+    specs, pending = [], []
+    for i, (subject, resource) in enumerate(pairs):
+        cache_key = (str(tenant_id), subject, resource, str(plan_id or ""))
+        cached = quota_cache.get(cache_key)
+        if cached is not None:
+            out[i] = cached
+            continue
+        try:
+            plan = await engine.resolve_plan(
+                db=db,
+                tenant_id=tenant_id,
+                resource=resource,
+                subject_type=SubjectType.api_key,
+                explicit_plan_id=plan_id,
+            )
+        except LookupError:
+            raise HTTPException(status_code=404, detail=f"No plan for {resource}")
+        specs.append(
+            engine.quota_spec(
+                tenant_id=tenant_id,
+                subject=subject,
+                resource=resource,
+                plan=plan,
+                now_ms=now_ms,
+            )
+        )
+        pending.append((i, cache_key, subject, resource))
+    if specs:
+        states = await engine.backend.peek_many(specs, now_ms, redis=redis)
+        for (i, cache_key, subject, resource), state in zip(pending, states):
+            out[i] = {"resource": resource, "subject": subject, **state}
+            if settings.QUOTA_CACHE_MS > 0:
+                quota_cache.set(cache_key, out[i])
+    return out
+
+
+@router.get("/quota", response_model=QuotaState)
+async def get_quota(
+    request: Request,
+    resource: str,
+    subject: str,
+    plan_id: Optional[UUID] = None,
+    db: AsyncSession = Depends(get_lazy_db),
+    redis=Depends(get_read_redis),
+    engine: DecisionEngine = Depends(get_engine),
+):
+    # Non-consuming: read-only commands against the read client
+    (state,) = await _peek_quota(
+        request, db, redis, engine, [(subject, resource)], plan_id
+    )
+    REQUESTS_TOTAL.labels(route="/v1/quota", outcome="success").inc()
+    return state
+
+
+@router.get("/quota/batch", response_model=QuotaBatch)
+async def get_quota_batch(
+    request: Request,
+    resource: List[str] = Query(...),
+    subject: List[str] = Query(...),
+    db: AsyncSession = Depends(get_lazy_db),
+    redis=Depends(get_read_redis),
+    engine: DecisionEngine = Depends(get_engine),
+):
+    # One subject applies to every resource; otherwise pairs are positional
+    if len(subject) == 1:
+        subject = subject * len(resource)
+    if len(subject) != len(resource):
+        raise HTTPException(
+            status_code=422, detail="subject must be given once or once per resource"
+        )
+    if len(resource) > settings.QUOTA_MAX_BATCH:
+        raise HTTPException(status_code=413, detail="Too many items")
+    items = await _peek_quota(request, db, redis, engine, list(zip(subject, resource)))
+    REQUESTS_TOTAL.labels(route="/v1/quota/batch", outcome="success").inc()
+    return {"items": items}
+
+
+async def _disconnected(request: Request) -> None:
+    # The body has been read, so the next message is the disconnect
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _wait_for_slot(request: Request, wait_ms: int) -> bool:
+    """Sleep until the reserved slot; False if the client went away first."""
+    gone = asyncio.ensure_future(_disconnected(request))
+    try:
+        done, _ = await asyncio.wait({gone}, timeout=wait_ms / 1000)
+        return not done
+    finally:
+        gone.cancel()
+
+
+async def _resolve_for_key(request, db, redis, engine, resource, plan_id):
+    raw_key = get_api_key_from_header(request)
+    key_hash = hash_api_key(raw_key, settings.APIKEY_HASH_SALT)
+    api_key_row, _ = await verify_api_key_and_plan(
+        db, redis, key_hash, resource, SubjectType.api_key
+    )
+    try:
+        plan = await engine.resolve_plan(
+            db=db,
+            tenant_id=api_key_row.tenant_id,
+            resource=resource,
+            subject_type=SubjectType.api_key,
+            explicit_plan_id=plan_id,
+        )
+    except LookupError:
+        raise HTTPException(status_code=404, detail=f"No plan for {resource}")
+    return api_key_row.tenant_id, plan
+
+
+@router.post("/acquire", response_model=AcquireDecision)
+async def acquire_permit(
+    payload: AcquireRequest,
+    response: Response,
+    request: Request,
+    db: AsyncSession = Depends(get_lazy_db),
+    redis=Depends(get_redis),
+    engine: DecisionEngine = Depends(get_engine),
+):
+    tenant_id, plan = await _resolve_for_key(
+        request, db, redis, engine, payload.resource, payload.plan_id
+    )
+    # No pooled connection is held through the wait
+    await db.close()
+    args = dict(tenant_id=tenant_id, subject=payload.subject, resource=payload.resource)
+    try:
+        decision = await engine.acquire(
+            **args,
+            cost=payload.cost,
+            plan=plan,
+            max_wait_ms=min(payload.max_wait_ms, settings.ACQUIRE_MAX_WAIT_MS),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if decision.reservation_id is not None and payload.wait:
+        arrived = False
+        try:
+            arrived = await _wait_for_slot(request, decision.wait_ms)
+        finally:
+            if not arrived:
+                # Nobody will use the permit: hand the tokens back
+                await asyncio.shield(
+                    engine.cancel_reservation(
+                        **args, plan=plan, reservation_id=decision.reservation_id
+                    )
+                )
+        if not arrived:
+            return Response(status_code=499)
+        decision = decision.model_copy(update={"reservation_id": None})
+
+    for k, v in decision.headers.items():
+        response.headers[k] = v
+    outcome = "allowed" if decision.allowed else "blocked"
+    REQUESTS_TOTAL.labels(route="/v1/acquire", outcome=outcome).inc()
+    if not decision.allowed:
+        response.status_code = 429
+    return decision
+
+
+@router.post("/acquire/cancel")
+async def cancel_permit(
+    payload: AcquireCancel,
+    request: Request,
+    db: AsyncSession = Depends(get_lazy_db),
+    redis=Depends(get_redis),
+    engine: DecisionEngine = Depends(get_engine),
+):
+    tenant_id, plan = await _resolve_for_key(
+        request, db, redis, engine, payload.resource, payload.plan_id
+    )
+    try:
+        cancelled = await engine.cancel_reservation(
+            tenant_id=tenant_id,
+            subject=payload.subject,
+            resource=payload.resource,
+            plan=plan,
+            reservation_id=payload.reservation_id,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"cancelled": cancelled}
+
+
+@router.post("/feedback", response_model=FeedbackResult)
+async def post_feedback(
+    payload: FeedbackRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_lazy_db),
+    redis=Depends(get_redis),
+    engine: DecisionEngine = Depends(get_engine),
+):
+    tenant_id, plan = await _resolve_for_key(
+        request, db, redis, engine, payload.resource, payload.plan_id
+    )
+    if not getattr(plan, "adaptive", False):
+        raise HTTPException(status_code=400, detail="Plan is not adaptive")
+    threshold = plan.adaptive_latency_ms
+    congested = payload.errors > 0 or (
+        threshold is not None
+        and payload.latency_ms is not None
+        and payload.latency_ms > threshold
+    )
+    limit, decreased = await engine.feedback(
+        tenant_id=tenant_id,
+        resource=payload.resource,
+        plan=plan,
+        congested=congested,
+        count=payload.count,
+    )
+    signal = "decrease" if decreased else "congested" if congested else "healthy"
+    ADAPTIVE_FEEDBACK.labels(signal=signal).inc()
+    REQUESTS_TOTAL.labels(route="/v1/feedback", outcome="success").inc()
+    log.bind(resource=payload.resource, limit=limit, signal=signal).info("feedback")
+    return {
+        "resource": payload.resource,
+        "limit": int(limit),
+        "congested": congested,
+        "decreased": decreased,
+    }
@@ -0,0 +1,208 @@
+"""Multiplexed check channel: ``/v1/check/ws``.
+
+One authenticated connection carries many concurrent checks. Frames are
+arrays, MessagePack-encoded on the ``limitforge.msgpack`` subprotocol
+(binary frames) or JSON on ``limitforge.json`` (text frames, the default):
+
+    request   [id, resource, subject, cost?, plan_id?]
+    decision  [id, 200|429, allowed, remaining, limit, reset_at, retry_after_ms]
+    error     [id, status, detail]
+
+Decisions are sent as they complete, so responses can arrive out of order;
+clients match them by ``id``. At most ``WS_MAX_IN_FLIGHT`` checks run per
+connection; past that the server stops reading, and TCP backpressure
+reaches the client.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, WebSocket
+from starlette.websockets import WebSocketDisconnect
+
+from app.core.config import settings
+from app.core.deps import get_engine, get_redis, get_sessionmaker
+from app.core.logging import get_logger
+from app.core.security import hash_api_key, verify_api_key_and_plan
+from app.db.models import SubjectType
+from app.db.session import LazySession
+from app.observability.metrics import (
+    DB_SESSIONS_PER_CHECK,
+    REQUESTS_TOTAL,
+    RL_ALLOWED,
+    RL_BLOCKED,
+)
+from app.rl.engine import DecisionEngine
+
+try:  # optional: JSON frames work without it
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+router = APIRouter()
+log = get_logger("api.ws")
+
+MSGPACK = "limitforge.msgpack"
+JSON = "limitforge.json"
+
+
+def pick_subprotocol(offered: list[str]) -> Optional[str]:
+    if MSGPACK in offered and msgpack is not None:
+        return MSGPACK
+    if JSON in offered:
+        return JSON
+    return None
+
+
+def parse_frame(frame: Any) -> tuple:
+    """``[id, resource, subject, cost?, plan_id?]`` -> validated tuple."""
+    if not isinstance(frame, list) or not 3 <= len(frame) <= 5:
+        raise ValueError("bad_frame")
+    rid, resource, subject = frame[:3]
+    cost = frame[3] if len(frame) > 3 and frame[3] is not None else 1
+    plan_id = frame[4] if len(frame) > 4 else None
+    if (
+        not isinstance(rid, int)
+        or not isinstance(resource, str)
+        or not isinstance(subject, str)
+        or not isinstance(cost, int)
+        or cost < 1
+        or (plan_id is not None and not isinstance(plan_id, str))
+    ):
+        raise ValueError("bad_frame")
+    return rid, resource, subject, cost, uuid.UUID(plan_id) if plan_id else None
+
+
+async def _authenticate(sessionmaker, redis, key_hash: str):
+    async with sessionmaker() as db:
+        api_key_row, _ = await verify_api_key_and_plan(db, redis, key_hash)
+    return api_key_row
+
+
+@router.websocket("/check/ws")
+async def check_ws(
+    websocket: WebSocket,
+    redis=Depends(get_redis),
+    engine: DecisionEngine = Depends(get_engine),
+    sessionmaker=Depends(get_sessionmaker),
+):
+    raw_key = websocket.headers.get("X-API-Key")
+    if not raw_key:
+        await websocket.close(code=1008, reason="Missing X-API-Key")
+        return
+    key_hash = hash_api_key(raw_key, settings.APIKEY_HASH_SALT)
+    try:
+        api_key_row = await _authenticate(sessionmaker, redis, key_hash)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=str(e.detail))
+        return
+
+    subprotocol = pick_subprotocol(websocket.scope.get("subprotocols") or [])
+    binary = subprotocol == MSGPACK
+    await websocket.accept(subprotocol=subprotocol)
+    tenant_id = api_key_row.tenant_id
+    slots = asyncio.Semaphore(settings.WS_MAX_IN_FLIGHT)
+    send_lock = asyncio.Lock()
+    tasks: set[asyncio.Task] = set()
+    # Revocations reach open connections once the key cache entry expires
+    reauth_at = time.monotonic() + settings.API_KEY_CACHE_TTL_SEC
+    log.bind(tenant=str(tenant_id), subprotocol=subprotocol).info("ws.open")
+
+    async def send(frame: list) -> None:
+        async with send_lock:
+            if binary:
+                await websocket.send_bytes(msgpack.packb(frame))
+            else:
+                await websocket.send_text(json.dumps(frame, separators=(",", ":")))
+
+    async def handle(rid, resource, subject, cost, plan_id) -> None:
+        try:
+            # Only opens a session if the plan is not cached
+            async with LazySession(sessionmaker) as db:
+                plan = await engine.resolve_plan(
+                    db=db,
+                    tenant_id=tenant_id,
+                    resource=resource,
+                    subject_type=SubjectType.api_key,
+                    explicit_plan_id=plan_id,
+                )
+            DB_SESSIONS_PER_CHECK.labels(route="/v1/check/ws").observe(int(db.opened))
+            decision = await engine.check(
+                tenant_id=tenant_id,
+                subject=subject,
+                resource=resource,
+                cost=cost,
+                plan=plan,
+            )
+            outcome = "allowed" if decision.allowed else "blocked"
+            (RL_ALLOWED if decision.allowed else RL_BLOCKED).inc()
+            REQUESTS_TOTAL.labels(route="/v1/check/ws", outcome=outcome).inc()
+            await send(
+                [
+                    rid,
+                    200 if decision.allowed else 429,
+                    int(decision.allowed),
+                    decision.remaining,
+                    decision.limit,
+                    decision.reset_at,
+                    decision.retry_after_ms,
+                ]
+            )
+        except LookupError:
+            await send([rid, 404, "plan_not_found"])
+        except Exception as e:
+            log.bind(error=repr(e)).warning("ws.check_failed")
+            REQUESTS_TOTAL.labels(route="/v1/check/ws", outcome="error").inc()
+            try:
+                await send([rid, 500, "internal_error"])
+            except Exception:
+                pass
+        finally:
+            slots.release()
+
+    try:
+        while True:
+            # Flow control: no new frame is read until a slot frees up
+            await slots.acquire()
+            msg = await websocket.receive()
+            if msg["type"] == "websocket.disconnect":
+                break
+            data = msg.get("bytes") if msg.get("bytes") is not None else msg.get("text")
+            if data is None or len(data) > settings.WS_MAX_FRAME_BYTES:
+                slots.release()
+                await websocket.close(code=1009, reason="frame too large")
+                break
+            if time.monotonic() >= reauth_at:
+                try:
+                    await _authenticate(sessionmaker, redis, key_hash)
+                except HTTPException as e:
+                    slots.release()
+                    await websocket.close(code=1008, reason=str(e.detail))
+                    break
+                reauth_at = time.monotonic() + settings.API_KEY_CACHE_TTL_SEC
+            frame = None
+            try:
+                frame = msgpack.unpackb(data) if binary else json.loads(data)
+                args = parse_frame(frame)
+            except Exception:
+                slots.release()
+                rid = frame[0] if isinstance(frame, list) and frame else None
+                await send([rid if isinstance(rid, int) else None, 400, "bad_frame"])
+                continue
+            task = asyncio.create_task(handle(*args))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Nobody is left to read the answers of checks still in flight
+        for task in list(tasks):
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        log.bind(tenant=str(tenant_id)).info("ws.close")
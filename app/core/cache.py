@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from app.core.config import settings
+
+
+class LocalCache:
+    """Per-process TTL cache with LRU eviction for hot-path lookups."""
+
+    def __init__(self, max_items: int, ttl_sec: float):
+        self.max_items = max_items
+        self.ttl_sec = ttl_sec
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_sec: Optional[float] = None) -> None:
+        ttl = self.ttl_sec if ttl_sec is None else ttl_sec
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_items:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def pop_where(self, predicate) -> int:
+        # O(n); meant for once-per-batch invalidation, not the hot path
+        doomed = [k for k in self._data if predicate(k)]
+        for k in doomed:
+            del self._data[k]
+        return len(doomed)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def plan_cache_key(tenant_id, resource: str, subject_type) -> tuple:
+    st = getattr(subject_type, "value", subject_type)
+    return (str(tenant_id), resource, str(st))
+
+
+# key_hash -> ApiKey (detached row)
+api_key_cache = LocalCache(
+    settings.LOCAL_CACHE_MAX_ITEMS, settings.API_KEY_CACHE_TTL_SEC
+)
+# (tenant_id, resource, subject_type) or ("id", plan_id) -> Plan (detached row)
+plan_cache = LocalCache(settings.LOCAL_CACHE_MAX_ITEMS, settings.LOCAL_CACHE_TTL_SEC)
+# (tenant_id, subject, resource, plan_id) -> quota peek result (dict)
+quota_cache = LocalCache(
+    settings.LOCAL_CACHE_MAX_ITEMS, settings.QUOTA_CACHE_MS / 1000.0
+)
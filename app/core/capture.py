@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import struct
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.observability.metrics import CAPTURE_FILES, CAPTURE_RECORDS
+from app.rl.trace import MAGIC, TraceRecord, encode, read_binary
+
+log = get_logger("core.capture")
+
+PREFIX = "capture-"
+SUFFIX = ".lft"
+
+
+def parse_tenants(spec: str) -> dict[str, Optional[float]]:
+    # "<tenant>,<tenant>=0.5" -> {tenant: None (the sample rate), tenant: 0.5}
+    tenants: dict[str, Optional[float]] = {}
+    for part in spec.split(","):
+        tenant, sep, rate = part.strip().partition("=")
+        if not tenant:
+            continue
+        tenants[tenant] = float(rate) if sep else None
+    return tenants
+
+
+class TrafficCapture:
+    """Sampled binary log of check decisions (app.rl.trace records).
+
+    ``record`` runs on the check path: a sampling draw and, for sampled
+    checks, one fixed-width record appended to an in-process list of at most
+    ``max_queue`` records (overflow is dropped and counted). A background
+    task swaps the list out and writes it from a worker thread, so the event
+    loop never waits on the disk. Files roll over at ``max_file_bytes``; the
+    oldest beyond ``max_files`` in the directory are deleted.
+
+    With ``tenants`` set only those tenants are captured, each at its own
+    rate or ``sample_rate``.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        sample_rate: float,
+        tenants: Optional[dict[str, Optional[float]]] = None,
+        max_file_bytes: int = 64 << 20,
+        max_files: int = 16,
+        max_queue: int = 65_536,
+        interval_sec: float = 1.0,
+        enabled: bool = True,
+    ):
+        self.directory = Path(directory)
+        self.sample_rate = sample_rate
+        self.tenants = tenants or {}
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.max_queue = max_queue
+        self.interval_sec = interval_sec
+        self.enabled = enabled
+        self._queue: list[bytes] = []
+        # Open capture file; used from worker threads, one flush at a time
+        self._file = None
+        self._seq = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def record(
+        self,
+        tenant_id: str,
+        resource: str,
+        subject: str,
+        cost: int,
+        allowed: bool,
+        now_ms: int,
+    ) -> None:
+        if not self.enabled:
+            return
+        rate = self.sample_rate
+        if self.tenants:
+            if tenant_id not in self.tenants:
+                return
+            rate = self.tenants[tenant_id]
+            if rate is None:
+                rate = self.sample_rate
+        if rate < 1.0 and random.random() >= rate:
+            return
+        if len(self._queue) >= self.max_queue:
+            CAPTURE_RECORDS.labels(outcome="dropped").inc()
+            return
+        try:
+            rec = encode(
+                TraceRecord(now_ms, tenant_id, resource, subject, cost, allowed)
+            )
+        except (ValueError, struct.error):
+            # Tenant ids that are not UUIDs, and costs outside u32, have no
+            # binary form
+            CAPTURE_RECORDS.labels(outcome="dropped").inc()
+            return
+        self._queue.append(rec)
+        if self._wake is not None and len(self._queue) >= self.max_queue // 2:
+            self._wake.set()
+
+    def _open(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Names sort by creation time across worker processes
+        self._seq += 1
+        name = (
+            f"{PREFIX}{int(time.time() * 1000):013d}-{os.getpid()}-"
+            f"{self._seq:06d}{SUFFIX}"
+        )
+        f = open(self.directory / name, "xb")
+        f.write(MAGIC)
+        CAPTURE_FILES.inc()
+        files = capture_files(self.directory)
+        for old in files[: max(0, len(files) - self.max_files)]:
+            try:
+                old.unlink()
+            except FileNotFoundError:
+                pass
+        return f
+
+    def _write(self, batch: list[bytes]) -> None:
+        if self._file is None:
+            self._file = self._open()
+        self._file.write(b"".join(batch))
+        self._file.flush()
+        if self._file.tell() >= self.max_file_bytes:
+            self._close()
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    async def flush(self) -> int:
+        if not self._queue:
+            return 0
+        batch, self._queue = self._queue, []
+        try:
+            await asyncio.to_thread(self._write, batch)
+        except OSError as e:
+            # A sample, not a ledger: the batch is not retried
+            CAPTURE_RECORDS.labels(outcome="failed").inc(len(batch))
+            log.bind(error=repr(e), records=len(batch)).warning("capture.write_failed")
+            await asyncio.to_thread(self._close)
+            return 0
+        CAPTURE_RECORDS.labels(outcome="written").inc(len(batch))
+        return len(batch)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval_sec)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+            if self._stopping:
+                await asyncio.to_thread(self._close)
+                return
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout_sec: float = 10.0) -> None:
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(self._task, timeout_sec)
+        except asyncio.TimeoutError:
+            log.bind(records=len(self._queue)).warning("capture.flush_timeout")
+        self._task = None
+        self._wake = None
+
+
+def capture_files(directory) -> list[Path]:
+    # Oldest first
+    return sorted(Path(directory).glob(f"{PREFIX}*{SUFFIX}"))
+
+
+def read_captures(
+    paths: Iterable, resources: Optional[dict[int, str]] = None
+) -> Iterator[TraceRecord]:
+    """Records of capture files, and of every capture file in directories,
+    oldest file first."""
+    for path in paths:
+        path = Path(path)
+        files = capture_files(path) if path.is_dir() else [path]
+        for file in files:
+            with open(file, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f"{file}: not a capture file")
+                yield from read_binary(f, resources)
+
+
+traffic_capture = TrafficCapture(
+    settings.CAPTURE_DIR,
+    settings.CAPTURE_SAMPLE_RATE,
+    tenants=parse_tenants(settings.CAPTURE_TENANTS),
+    max_file_bytes=settings.CAPTURE_MAX_FILE_MB << 20,
+    max_files=settings.CAPTURE_MAX_FILES,
+    max_queue=settings.CAPTURE_MAX_QUEUE,
+    interval_sec=settings.CAPTURE_FLUSH_INTERVAL_SEC,
+    enabled=settings.CAPTURE_ENABLED,
+)
@@ -11,7 +11,8 @@ from app.core.security import (
     hash_api_key,
     verify_api_key as _verify_api_key,
 )
-from app.db.session import AsyncSessionLocal
+from app.db.session import AsyncSessionLocal, LazySession
+from app.observability.metrics import DB_SESSIONS_PER_CHECK
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.rl.engine import DecisionEngine
 from app.db import crud
@@ -26,11 +27,40 @@ async def get_redis() -> Redis:
     return _redis_client()
 
 
+@lru_cache()
+def _redis_read_client() -> Redis:
+    if not settings.REDIS_READ_URL:
+        return _redis_client()
+    return Redis.from_url(settings.REDIS_READ_URL, decode_responses=True)
+
+
+async def get_read_redis() -> Redis:
+    # Read-only traffic (quota peeks); a replica when REDIS_READ_URL is set
+    return _redis_read_client()
+
+
 async def get_db() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
 
 
+def get_sessionmaker():
+    # For handlers that manage their own session lifetime (e.g. streaming)
+    return AsyncSessionLocal
+
+
+async def get_lazy_db(
+    request: Request, session_factory=Depends(get_sessionmaker)
+) -> LazySession:
+    # Opens a session only if the auth or plan caches miss
+    db = LazySession(session_factory)
+    try:
+        yield db
+    finally:
+        DB_SESSIONS_PER_CHECK.labels(route=request.url.path).observe(int(db.opened))
+        await db.close()
+
+
 def get_settings_dep():
     return get_settings()
 
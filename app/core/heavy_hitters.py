@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+log = get_logger("core.heavy_hitters")
+
+
+class SpaceSaving:
+    """Space-Saving top-k summary over a fixed number of counters.
+
+    Each monitored item keeps ``[count, error, blocked]``; ``count`` never
+    underestimates and overestimates by at most ``error``. When full, a new
+    item takes over the smallest counter, found through a min-heap with lazy
+    updates: O(log capacity) amortised per add.
+    """
+
+    __slots__ = ("capacity", "counters", "_heap")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counters: dict[str, list[int]] = {}
+        # One (count, item) per counter. Increments leave it alone, so its
+        # counts only lag; an entry is refreshed when it reaches the top.
+        self._heap: list[tuple[int, str]] = []
+
+    def add(self, item: str, blocked: bool, n: int = 1) -> None:
+        c = self.counters.get(item)
+        if c is not None:
+            c[0] += n
+            c[2] += n if blocked else 0
+            return
+        if len(self.counters) < self.capacity:
+            self.counters[item] = [n, 0, n if blocked else 0]
+            heapq.heappush(self._heap, (n, item))
+            return
+        heap = self._heap
+        while True:
+            seen, victim = heap[0]
+            floor = self.counters[victim][0]
+            if seen == floor:
+                break
+            heapq.heapreplace(heap, (floor, victim))
+        del self.counters[victim]
+        self.counters[item] = [floor + n, floor, n if blocked else 0]
+        heapq.heapreplace(heap, (floor + n, item))
+
+    def top(self, k: int) -> list[tuple[str, int, int, int]]:
+        items = sorted(self.counters.items(), key=lambda kv: kv[1][0], reverse=True)
+        return [(s, c[0], c[1], c[2]) for s, c in items[:k]]
+
+    def __len__(self) -> int:
+        return len(self.counters)
+
+
+def hh_window(now: Optional[float] = None, window_sec: Optional[int] = None) -> int:
+    return int(now if now is not None else time.time()) // (
+        window_sec or settings.HEAVY_HITTERS_WINDOW_SEC
+    )
+
+
+def hh_key(tenant_id: str, resource: str, window: int, blocked: bool = False) -> str:
+    kind = "hhb" if blocked else "hh"
+    return f"lf:{kind}:{tenant_id}:{window}:{resource}"
+
+
+def hh_resources_key(tenant_id: str, window: int) -> str:
+    return f"lf:hhr:{tenant_id}:{window}"
+
+
+class HeavyHitters:
+    """Per (tenant, resource) Space-Saving sketches, merged through Redis.
+
+    Sketches hold the deltas since the last sync. Every ``sync_sec`` they are
+    added into per-window Redis ZSETs (requests and blocked, trimmed to
+    ``2 * capacity`` members) and reset; reads merge the current and the
+    previous window. At most ``max_sketches`` (tenant, resource) pairs are
+    tracked, least recently used first out.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        max_sketches: int,
+        sync_sec: float,
+        window_sec: int,
+        enabled: bool = True,
+    ):
+        self.capacity = capacity
+        self.max_sketches = max_sketches
+        self.sync_sec = sync_sec
+        self.window_sec = window_sec
+        self.enabled = enabled
+        self._sketches: OrderedDict[tuple[str, str], SpaceSaving] = OrderedDict()
+        self._redis = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, tenant_id: str, resource: str, subject: str, allowed: bool):
+        if not self.enabled:
+            return
+        key = (tenant_id, resource)
+        sk = self._sketches.get(key)
+        if sk is None:
+            sk = self._sketches[key] = SpaceSaving(self.capacity)
+            if len(self._sketches) > self.max_sketches:
+                self._sketches.popitem(last=False)
+        else:
+            self._sketches.move_to_end(key)
+        sk.add(subject, not allowed)
+
+    def local(self, tenant_id: str) -> dict[str, SpaceSaving]:
+        return {r: sk for (t, r), sk in self._sketches.items() if t == tenant_id}
+
+    async def sync(self, redis=None) -> int:
+        redis = redis or self._redis
+        if redis is None or not self._sketches:
+            return 0
+        sketches, self._sketches = self._sketches, OrderedDict()
+        window = hh_window(window_sec=self.window_sec)
+        ttl = self.window_sec * 2 + int(self.sync_sec) + 1
+        keep = self.capacity * 2
+        pipe = redis.pipeline(transaction=False)
+        for (tid, resource), sk in sketches.items():
+            total, blocked = hh_key(tid, resource, window), hh_key(
+                tid, resource, window, blocked=True
+            )
+            for subject, (n, _err, b) in sk.counters.items():
+                pipe.zincrby(total, n, subject)
+                if b:
+                    pipe.zincrby(blocked, b, subject)
+            for key in (total, blocked):
+                # Mergeable summary: sum, then keep only the heaviest members
+                pipe.zremrangebyrank(key, 0, -(keep + 1))
+                pipe.expire(key, ttl)
+            pipe.sadd(hh_resources_key(tid, window), resource)
+            pipe.expire(hh_resources_key(tid, window), ttl)
+        try:
+            await pipe.execute()
+        except Exception as e:
+            log.bind(error=repr(e)).warning("heavy_hitters.sync_failed")
+            # Keep the deltas; newer increments recorded meanwhile win the
+            # slots. Requeued sketches go back to the front, in their old
+            # order, so the trim below evicts them first
+            for key, sk in reversed(sketches.items()):
+                cur = self._sketches.get(key)
+                if cur is None:
+                    self._sketches[key] = sk
+                    self._sketches.move_to_end(key, last=False)
+                else:
+                    for subject, (n, _err, b) in sk.counters.items():
+                        if n > b:
+                            cur.add(subject, False, n - b)
+                        if b:
+                            cur.add(subject, True, b)
+            while len(self._sketches) > self.max_sketches:
+                self._sketches.popitem(last=False)
+            return 0
+        return len(sketches)
+
+    async def top(
+        self,
+        redis,
+        tenant_id: str,
+        k: int,
+        resource: Optional[str] = None,
+        now: Optional[float] = None,
+    ) -> list[dict]:
+        window = hh_window(now, self.window_sec)
+        windows = (window - 1, window)
+        if resource is not None:
+            resources = {resource}
+        else:
+            pipe = redis.pipeline(transaction=False)
+            for w in windows:
+                pipe.smembers(hh_resources_key(tenant_id, w))
+            resources = set().union(*(await pipe.execute()))
+            resources |= set(self.local(tenant_id))
+
+        pipe = redis.pipeline(transaction=False)
+        for r in sorted(resources):
+            for w in windows:
+                pipe.zrange(hh_key(tenant_id, r, w), 0, -1, withscores=True)
+                pipe.zrange(hh_key(tenant_id, r, w, True), 0, -1, withscores=True)
+        results = await pipe.execute()
+
+        # subject -> [requests, blocked], summed over resources and windows
+        merged: dict[str, list[int]] = {}
+        for i in range(0, len(results), 2):
+            for subject, score in results[i]:
+                merged.setdefault(subject, [0, 0])[0] += int(score)
+            for subject, score in results[i + 1]:
+                merged.setdefault(subject, [0, 0])[1] += int(score)
+        for r, sk in self.local(tenant_id).items():
+            if r not in resources:
+                continue
+            for subject, (n, _err, b) in sk.counters.items():
+                m = merged.setdefault(subject, [0, 0])
+                m[0] += n
+                m[1] += b
+
+        ranked = sorted(merged.items(), key=lambda kv: kv[1][0], reverse=True)[:k]
+        return [
+            {
+                "subject": subject,
+                "requests": n,
+                "blocked": min(b, n),
+                "block_ratio": round(min(b, n) / n, 4) if n else 0.0,
+            }
+            for subject, (n, b) in ranked
+        ]
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.sync_sec)
+            except asyncio.TimeoutError:
+                pass
+            await self.sync()
+            if self._wake.is_set():
+                return
+
+    async def start(self, redis) -> None:
+        self._redis = redis
+        if self.enabled:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout_sec: float = 5.0) -> None:
+        # Wake the loop for a final sync rather than cancelling it mid-write
+        if self._task is None:
+            return
+        self._wake.set()
+        try:
+            await asyncio.wait_for(self._task, timeout_sec)
+        except asyncio.TimeoutError:
+            log.warning("heavy_hitters.sync_timeout")
+        self._task = None
+        self._wake = None
+
+
+heavy_hitters = HeavyHitters(
+    settings.HEAVY_HITTERS_CAPACITY,
+    settings.HEAVY_HITTERS_MAX_SKETCHES,
+    settings.HEAVY_HITTERS_SYNC_SEC,
+    settings.HEAVY_HITTERS_WINDOW_SEC,
+    enabled=settings.HEAVY_HITTERS_ENABLED,
+)
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import asyncio
+import uuid
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.db import crud
+from app.observability.metrics import (
+    PERIOD_COUNTS_DROPPED,
+    PERIOD_COUNTS_FAILURES,
+    PERIOD_COUNTS_FLUSHED,
+    PERIOD_COUNTS_RELOADED,
+)
+
+log = get_logger("core.period_counts")
+
+# (tenant_id, resource, subject, period label)
+Ident = tuple[str, str, str, str]
+
+
+class DbPeriodStore:
+    """period_counts: deltas are added with chunked upserts; loads are one
+    SELECT per batch of counters."""
+
+    def __init__(self, session_factory, chunk_size: Optional[int] = None):
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size or settings.USAGE_FLUSH_CHUNK_SIZE
+
+    async def write(self, batch: dict[Ident, int]) -> None:
+        rows = [
+            {
+                "tenant_id": uuid.UUID(tid),
+                "resource": resource,
+                "subject": subject,
+                "period": period,
+                "used": used,
+            }
+            for (tid, resource, subject, period), used in batch.items()
+        ]
+        async with self.session_factory() as db, db.begin():
+            await crud.add_period_counts(db, rows, self.chunk_size)
+
+    async def load(self, idents: list[Ident]) -> dict[Ident, int]:
+        async with self.session_factory() as db:
+            return await crud.get_period_counts(
+                db, [(uuid.UUID(t), r, s, p) for t, r, s, p in idents]
+            )
+
+
+class PeriodCounts:
+    """Durability for period_quota counters, kept off the check path.
+
+    ``record`` adds an allowed debit to an in-process batch and ``reload``
+    notes a counter that has not had its stored count added; both are dict
+    operations. A background task first loads the stored counts of noted
+    counters and seeds them through the backend that created them, then
+    writes the batch as deltas. Loading before writing means a debit is
+    never both in the stored count and already in the counter it seeds.
+
+    Until its reload lands, a rebuilt counter undercounts by what was used
+    earlier in the period; that is the price of not reading the database
+    while checking. ``max_keys`` bounds both the batch and the reloads.
+    """
+
+    def __init__(self, max_keys: int, interval_sec: float, enabled: bool = True):
+        self.max_keys = max_keys
+        self.interval_sec = interval_sec
+        self.enabled = enabled
+        self._pending: dict[Ident, int] = {}
+        # Redis key -> (ident, backend)
+        self._reloads: dict[str, tuple[Ident, object]] = {}
+        self._store = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(self, ident: Ident, cost: int) -> None:
+        if not self.enabled:
+            return
+        if ident in self._pending:
+            self._pending[ident] += cost
+        elif len(self._pending) < self.max_keys:
+            self._pending[ident] = cost
+            if self._wake is not None and len(self._pending) >= self.max_keys // 2:
+                self._wake.set()
+        else:
+            PERIOD_COUNTS_DROPPED.inc(cost)
+
+    def reload(self, ident: Ident, key: str, backend) -> None:
+        # Every check of the counter asks until the seed lands; one load each
+        if not self.enabled or key in self._reloads:
+            return
+        if len(self._reloads) >= self.max_keys:
+            PERIOD_COUNTS_DROPPED.inc()
+            return
+        self._reloads[key] = (ident, backend)
+        if self._wake is not None:
+            self._wake.set()
+
+    def _requeue(self, batch: dict[Ident, int]) -> None:
+        dropped = 0
+        for ident, used in batch.items():
+            if ident in self._pending:
+                self._pending[ident] += used
+            elif len(self._pending) < self.max_keys:
+                self._pending[ident] = used
+            else:
+                dropped += used
+        if dropped:
+            PERIOD_COUNTS_DROPPED.inc(dropped)
+
+    async def _load(self, store) -> int:
+        reloads, self._reloads = self._reloads, {}
+        try:
+            counts = await store.load(list({i for i, _ in reloads.values()}))
+            for key, (ident, backend) in reloads.items():
+                await backend.seed_period(key, counts.get(ident, 0))
+        except Exception as e:
+            PERIOD_COUNTS_FAILURES.labels(op="load").inc()
+            log.bind(error=repr(e), keys=len(reloads)).warning(
+                "period_counts.load_failed"
+            )
+            # Seeding is once per counter, so retrying the whole set is safe
+            for key, item in reloads.items():
+                self._reloads.setdefault(key, item)
+            return 0
+        PERIOD_COUNTS_RELOADED.inc(len(reloads))
+        return len(reloads)
+
+    async def flush(self, store=None) -> int:
+        store = store or self._store
+        if store is None:
+            return 0
+        if self._reloads:
+            await self._load(store)
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        try:
+            await store.write(batch)
+        except Exception as e:
+            PERIOD_COUNTS_FAILURES.labels(op="write").inc()
+            log.bind(error=repr(e), rows=len(batch)).warning(
+                "period_counts.flush_failed"
+            )
+            self._requeue(batch)
+            return 0
+        PERIOD_COUNTS_FLUSHED.inc(len(batch))
+        return len(batch)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval_sec)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+            if self._stopping:
+                return
+
+    async def start(self, store) -> None:
+        self._store = store
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout_sec: float = 10.0) -> None:
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(self._task, timeout_sec)
+        except asyncio.TimeoutError:
+            log.bind(rows=len(self._pending)).warning("period_counts.flush_timeout")
+        self._task = None
+        self._wake = None
+
+
+period_counts = PeriodCounts(
+    settings.PERIOD_QUOTA_MAX_KEYS, settings.PERIOD_QUOTA_FLUSH_INTERVAL_SEC
+)
@@ -3,11 +3,12 @@ import hmac
 from typing import Optional
 
 from fastapi import Header, HTTPException, Request
-from sqlalchemy import select
+from sqlalchemy import and_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import api_key_cache, plan_cache, plan_cache_key
 from app.core.config import settings
-from app.db.models import ApiKey
+from app.db.models import ApiKey, Plan, ResourcePolicy, SubjectType
 
 
 def hash_api_key(raw: str, salt: str) -> str:
@@ -29,25 +30,68 @@ def get_api_key_from_header(request: Request) -> str:
 
 
 async def verify_api_key(db: AsyncSession, redis, key_hash: str) -> ApiKey:
-    # Redis cache check
-    cache_key = f"api_key:{key_hash}"
-    cached = await redis.get(cache_key)
-    if cached == "1":
-        # Fast path; trust cached validity (active & not revoked)
+    obj, _ = await verify_api_key_and_plan(db, redis, key_hash)
+    return obj
+
+
+async def verify_api_key_and_plan(
+    db: AsyncSession,
+    redis,
+    key_hash: str,
+    resource: Optional[str] = None,
+    subject_type: Optional[SubjectType] = None,
+) -> tuple[ApiKey, Optional[Plan]]:
+    """Validate a key and, on a cache miss, fetch the exact-match plan with it.
+
+    One indexed round trip returns the key row joined to the plan of the
+    newest policy for ``resource`` in the key's tenant, so a cold check costs a single
+    query. The plan is cached for ``DecisionEngine.resolve_plan``; wildcard
+    policies are left to the engine's trie lookup.
+    """
+    # Process-local cache (filled by warm-up and prior validations)
+    local = api_key_cache.get(key_hash)
+    if local is not None:
+        return local, None
+
+    plan: Optional[Plan] = None
+    if resource is None:
         res = await db.execute(select(ApiKey).where(ApiKey.key_hash == key_hash))
-        obj = res.scalar_one_or_none()
-        if obj is not None and obj.active and obj.revoked_at is None:
-            return obj
+        obj: Optional[ApiKey] = res.scalar_one_or_none()
+    else:
+        st = subject_type or SubjectType.api_key
+        res = await db.execute(
+            select(ApiKey, Plan)
+            .outerjoin(
+                ResourcePolicy,
+                and_(
+                    ResourcePolicy.tenant_id == ApiKey.tenant_id,
+                    ResourcePolicy.resource == resource,
+                    ResourcePolicy.subject_type == st,
+                ),
+            )
+            .outerjoin(
+                Plan,
+                and_(
+                    Plan.id == ResourcePolicy.plan_id,
+                    Plan.tenant_id == ApiKey.tenant_id,
+                ),
+            )
+            .where(ApiKey.key_hash == key_hash)
+            # Newest policy wins, as in the engine's trie (policy_index)
+            .order_by(ResourcePolicy.created_at.desc().nulls_last())
+            .limit(1)
+        )
+        row = res.first()
+        obj, plan = (row[0], row[1]) if row is not None else (None, None)
 
-    # DB validation
-    res = await db.execute(select(ApiKey).where(ApiKey.key_hash == key_hash))
-    obj: Optional[ApiKey] = res.scalar_one_or_none()
     if obj is None or not obj.active or obj.revoked_at is not None:
         raise HTTPException(status_code=403, detail="Invalid API key")
 
-    # cache positive validation
-    await redis.setex(cache_key, 60, "1")
-    return obj
+    api_key_cache.set(key_hash, obj)
+    if plan is not None:
+        plan_cache.set(plan_cache_key(obj.tenant_id, resource, st), plan)
+        plan_cache.set(("id", str(plan.id)), plan)
+    return obj, plan
 
 
 async def verify_admin(authorization: str | None = Header(None)) -> str:
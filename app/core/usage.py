@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.db import crud
+from app.observability.metrics import (
+    USAGE_DROPPED,
+    USAGE_FLUSH_FAILURES,
+    USAGE_ROWS_FLUSHED,
+)
+
+log = get_logger("core.usage")
+
+# (tenant_id, resource, outcome, epoch_minute) -> [requests, cost]
+Batch = dict[tuple[str, str, str, int], list[int]]
+
+
+def _minute_dt(minute: int) -> datetime:
+    return datetime.fromtimestamp(minute * 60, tz=timezone.utc)
+
+
+class DbUsageSink:
+    """Adds a batch onto usage_minutes with chunked multi-row upserts."""
+
+    def __init__(self, session_factory, chunk_size: Optional[int] = None):
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size or settings.USAGE_FLUSH_CHUNK_SIZE
+
+    async def write(self, batch: Batch) -> None:
+        rows = [
+            {
+                "tenant_id": uuid.UUID(tid),
+                "minute": _minute_dt(minute),
+                "resource": resource,
+                "outcome": outcome,
+                "requests": n,
+                "cost": cost,
+            }
+            for (tid, resource, outcome, minute), (n, cost) in batch.items()
+        ]
+        async with self.session_factory() as db, db.begin():
+            await crud.upsert_usage(db, rows, self.chunk_size)
+
+
+def usage_redis_key(tenant_id: str, day: int) -> str:
+    return f"lf:usage:{tenant_id}:{day}"
+
+
+class RedisUsageSink:
+    """One hash per tenant and UTC day; fields are
+    ``n|c:{epoch_minute}:{outcome}:{resource}`` incremented with HINCRBY."""
+
+    def __init__(self, redis, ttl_sec: Optional[int] = None):
+        self.redis = redis
+        self.ttl_sec = ttl_sec or settings.USAGE_REDIS_TTL_SEC
+
+    async def write(self, batch: Batch) -> None:
+        pipe = self.redis.pipeline(transaction=False)
+        keys = set()
+        for (tid, resource, outcome, minute), (n, cost) in batch.items():
+            key = usage_redis_key(tid, minute // 1440)
+            keys.add(key)
+            pipe.hincrby(key, f"n:{minute}:{outcome}:{resource}", n)
+            pipe.hincrby(key, f"c:{minute}:{outcome}:{resource}", cost)
+        for key in keys:
+            pipe.expire(key, self.ttl_sec)
+        await pipe.execute()
+
+
+async def read_usage_redis(
+    redis,
+    tenant_id,
+    since: datetime,
+    until: datetime,
+    resource: Optional[str] = None,
+) -> list[dict]:
+    lo, hi = int(since.timestamp()) // 60, int(until.timestamp()) // 60
+    pipe = redis.pipeline(transaction=False)
+    for day in range(lo // 1440, hi // 1440 + 1):
+        pipe.hgetall(usage_redis_key(str(tenant_id), day))
+    rows: dict[tuple[int, str, str], dict] = {}
+    for fields in await pipe.execute():
+        for field, value in (fields or {}).items():
+            kind, minute, outcome, res = field.split(":", 3)
+            minute = int(minute)
+            if not lo <= minute < hi or (resource is not None and res != resource):
+                continue
+            row = rows.setdefault(
+                (minute, res, outcome),
+                {
+                    "minute": _minute_dt(minute),
+                    "resource": res,
+                    "outcome": outcome,
+                    "requests": 0,
+                    "cost": 0,
+                },
+            )
+            row["requests" if kind == "n" else "cost"] += int(value)
+    return [rows[k] for k in sorted(rows)]
+
+
+def make_usage_sink(kind: str, redis, session_factory):
+    if kind == "db":
+        return DbUsageSink(session_factory)
+    if kind == "redis":
+        return RedisUsageSink(redis)
+    return None
+
+
+class UsageAggregator:
+    """In-process usage rollup fed by DecisionEngine.check.
+
+    ``record`` only touches a dict, so checks do no accounting I/O; a
+    background task swaps the dict out and hands it to the sink every
+    ``interval_sec`` (sooner when half full). At most ``max_keys`` distinct
+    rows are held: once full, increments for new rows are dropped and
+    counted in ``usage_dropped_total`` rather than growing without bound.
+    """
+
+    def __init__(self, max_keys: int, interval_sec: float, enabled: bool = True):
+        self.max_keys = max_keys
+        self.interval_sec = interval_sec
+        self.enabled = enabled
+        self._pending: Batch = {}
+        self._sink = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(self, tenant_id: str, resource: str, allowed: bool, cost: int) -> None:
+        if not self.enabled:
+            return
+        key = (
+            tenant_id,
+            resource,
+            "allowed" if allowed else "blocked",
+            int(time.time()) // 60,
+        )
+        slot = self._pending.get(key)
+        if slot is not None:
+            slot[0] += 1
+            slot[1] += cost
+            return
+        if len(self._pending) >= self.max_keys:
+            USAGE_DROPPED.inc()
+            return
+        self._pending[key] = [1, cost]
+        if self._wake is not None and len(self._pending) >= self.max_keys // 2:
+            self._wake.set()
+
+    def drain(self) -> Batch:
+        batch, self._pending = self._pending, {}
+        return batch
+
+    def _requeue(self, batch: Batch) -> None:
+        # A failed batch goes back in front of newer increments, within the
+        # same bound as everything else
+        dropped = 0
+        for key, (n, cost) in batch.items():
+            slot = self._pending.get(key)
+            if slot is not None:
+                slot[0] += n
+                slot[1] += cost
+            elif len(self._pending) < self.max_keys:
+                self._pending[key] = [n, cost]
+            else:
+                dropped += n
+        if dropped:
+            USAGE_DROPPED.inc(dropped)
+
+    async def flush(self, sink=None) -> int:
+        sink = sink or self._sink
+        if sink is None or not self._pending:
+            return 0
+        batch = self.drain()
+        try:
+            await sink.write(batch)
+        except Exception as e:
+            USAGE_FLUSH_FAILURES.inc()
+            log.bind(error=repr(e), rows=len(batch)).warning("usage.flush_failed")
+            self._requeue(batch)
+            return 0
+        USAGE_ROWS_FLUSHED.inc(len(batch))
+        return len(batch)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval_sec)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+            if self._stopping:
+                return
+
+    async def start(self, sink) -> None:
+        self._sink = sink
+        self.enabled = sink is not None
+        if sink is None:
+            self._pending.clear()
+            return
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout_sec: float = 10.0) -> None:
+        # Let the loop run one last flush instead of cancelling it mid-write
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(self._task, timeout_sec)
+        except asyncio.TimeoutError:
+            log.bind(rows=len(self._pending)).warning("usage.flush_timeout")
+        self._task = None
+        self._wake = None
+
+
+usage_aggregator = UsageAggregator(
+    settings.USAGE_MAX_KEYS,
+    settings.USAGE_FLUSH_INTERVAL_SEC,
+    enabled=settings.USAGE_SINK != "off",
+)
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import select, text
+
+from app.core.cache import api_key_cache, plan_cache
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.db.models import ApiKey, Plan, ResourcePolicy
+from app.observability.metrics import WARMUP_DURATION_MS
+from app.rl.policy_index import policy_index
+from app.rl.strategies import (
+    fixed_window,
+    sliding_window,
+    token_bucket,
+    token_bucket_packed,
+)
+
+log = get_logger("core.warmup")
+
+
+@dataclass
+class WarmupState:
+    ready: bool = False
+    duration_ms: Optional[float] = None
+    last_error: Optional[str] = None
+
+
+state = WarmupState()
+_retry_task: Optional[asyncio.Task] = None
+
+
+async def _preload_scripts(redis) -> None:
+    # fakeredis has no script cache; the strategies EVAL there anyway
+    if "fakeredis" in type(redis).__module__:
+        return
+    for mod in (token_bucket, token_bucket_packed, fixed_window, sliding_window):
+        await redis.script_load(mod._get_script_text())
+
+
+async def _prefetch(db) -> tuple[int, int]:
+    res = await db.execute(
+        select(ApiKey)
+        .where(ApiKey.active.is_(True), ApiKey.revoked_at.is_(None))
+        .order_by(ApiKey.created_at.desc())
+        .limit(settings.WARMUP_HOT_KEYS)
+    )
+    keys = res.scalars().all()
+    for ak in keys:
+        api_key_cache.set(ak.key_hash, ak)
+
+    tenant_ids = {ak.tenant_id for ak in keys}
+    if not tenant_ids:
+        return len(keys), 0
+    res = await db.execute(
+        select(
+            ResourcePolicy.tenant_id,
+            ResourcePolicy.resource,
+            ResourcePolicy.subject_type,
+            ResourcePolicy.created_at,
+            Plan,
+        )
+        .join(Plan, ResourcePolicy.plan_id == Plan.id)
+        .where(ResourcePolicy.tenant_id.in_(tenant_ids))
+        .order_by(Plan.created_at.desc())
+        .limit(settings.WARMUP_HOT_PLANS + 1)
+    )
+    rows = res.all()
+    # A trie built from a truncated policy list would hide policies, so only
+    # install tries when every policy of the hot tenants fit in the budget.
+    complete = len(rows) <= settings.WARMUP_HOT_PLANS
+    rows_by_tenant: dict = {}
+    plans = {}
+    for tenant_id, resource, subject_type, created_at, plan in rows:
+        rows_by_tenant.setdefault(tenant_id, []).append(
+            (resource, subject_type, plan.id, created_at)
+        )
+        plans[str(plan.id)] = plan
+    for tenant_id, tenant_rows in rows_by_tenant.items():
+        if complete:
+            policy_index.install(tenant_id, policy_index.build(tenant_rows))
+    for plan_id, plan in plans.items():
+        plan_cache.set(("id", plan_id), plan)
+    return len(keys), len(plans)
+
+
+async def warm_up(redis, session_factory) -> float:
+    """Open pools, load scripts and prefetch hot rows, then mark ready."""
+    start = time.perf_counter()
+    await redis.ping()
+    await _preload_scripts(redis)
+    async with session_factory() as db:
+        await db.execute(text("SELECT 1"))
+        keys, plans = await _prefetch(db)
+    dur_ms = (time.perf_counter() - start) * 1000.0
+    state.ready = True
+    state.duration_ms = dur_ms
+    state.last_error = None
+    WARMUP_DURATION_MS.set(dur_ms)
+    log.bind(duration_ms=round(dur_ms, 1), keys=keys, plans=plans).info("warmup.done")
+    return dur_ms
+
+
+async def _retry_forever(redis, session_factory) -> None:
+    while not state.ready:
+        await asyncio.sleep(settings.WARMUP_RETRY_SEC)
+        try:
+            await asyncio.wait_for(
+                warm_up(redis, session_factory), settings.WARMUP_TIMEOUT_SEC
+            )
+        except Exception as e:
+            state.last_error = repr(e)
+
+
+async def start_warmup(redis, session_factory) -> None:
+    # Runs inside the lifespan startup, so the worker accepts no traffic until
+    # this returns. A failed warm-up keeps retrying in the background and
+    # /v1/ready stays 503 until it succeeds.
+    global _retry_task
+    try:
+        await asyncio.wait_for(
+            warm_up(redis, session_factory), settings.WARMUP_TIMEOUT_SEC
+        )
+    except Exception as e:
+        state.last_error = repr(e)
+        log.bind(error=state.last_error).warning("warmup.failed")
+        _retry_task = asyncio.create_task(_retry_forever(redis, session_factory))
+
+
+async def stop_warmup() -> None:
+    if _retry_task is not None and not _retry_task.done():
+        _retry_task.cancel()
@@ -1,18 +1,30 @@
 from __future__ import annotations
 
 import secrets
-from typing import Optional
+from datetime import datetime
+from typing import AsyncIterator, Optional
 
-from sqlalchemy import select
+from sqlalchemy import func, insert, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import plan_cache
 from app.core.config import settings
 from app.core.security import hash_api_key
-from .models import Tenant, Plan, ApiKey, ResourcePolicy, PlanAlgorithm, SubjectType
-
-
-async def create_tenant(db: AsyncSession, name: str) -> Tenant:
-    tenant = Tenant(name=name)
+from app.rl.policy_index import policy_index
+from .models import (
+    Tenant,
+    Plan,
+    ApiKey,
+    ResourcePolicy,
+    PlanAlgorithm,
+    SubjectType,
+    UsageMinute,
+    PeriodCount,
+)
+
+
+async def create_tenant(db: AsyncSession, name: str, timezone: str = "UTC") -> Tenant:
+    tenant = Tenant(name=name, timezone=timezone)
     db.add(tenant)
     await db.commit()
     await db.refresh(tenant)
@@ -32,7 +44,17 @@ async def create_plan(
     concurrency_limit: Optional[int] = None,
     cost_per_call: int = 1,
     burst_factor: float = 1.0,
+    adaptive: bool = False,
+    adaptive_min_limit: Optional[int] = None,
+    adaptive_max_limit: Optional[int] = None,
+    adaptive_latency_ms: Optional[int] = None,
+    quota_period: Optional[str] = None,
+    quota_timezone: Optional[str] = None,
 ) -> Plan:
+    if algorithm == PlanAlgorithm.period_quota and quota_timezone is None:
+        # Periods follow the tenant's calendar unless the plan overrides it
+        tenant = await db.get(Tenant, tenant_id)
+        quota_timezone = tenant.timezone if tenant is not None else "UTC"
     plan = Plan(
         tenant_id=tenant_id,
         name=name,
@@ -44,6 +66,12 @@ async def create_plan(
         concurrency_limit=concurrency_limit,
         cost_per_call=cost_per_call,
         burst_factor=burst_factor,
+        adaptive=adaptive,
+        adaptive_min_limit=adaptive_min_limit,
+        adaptive_max_limit=adaptive_max_limit,
+        adaptive_latency_ms=adaptive_latency_ms,
+        quota_period=quota_period,
+        quota_timezone=quota_timezone,
     )
     db.add(plan)
     await db.commit()
@@ -51,9 +79,13 @@ async def create_plan(
     return plan
 
 
-async def create_api_key(db: AsyncSession, tenant_id, name: str) -> tuple[str, str]:
+def new_api_key() -> tuple[str, str]:
     raw = secrets.token_urlsafe(32)
-    key_hash = hash_api_key(raw, settings.APIKEY_HASH_SALT)
+    return raw, hash_api_key(raw, settings.APIKEY_HASH_SALT)
+
+
+async def create_api_key(db: AsyncSession, tenant_id, name: str) -> tuple[str, str]:
+    raw, key_hash = new_api_key()
     ak = ApiKey(tenant_id=tenant_id, name=name, key_hash=key_hash, active=True)
     db.add(ak)
     await db.commit()
@@ -77,6 +109,10 @@ async def create_resource_policy(
     db.add(rp)
     await db.commit()
     await db.refresh(rp)
+    policy_index.add(tenant_id, resource, subject_type, plan_id, rp.created_at)
+    # Resolutions cached from the old trie may now pick a different plan
+    tid = str(tenant_id)
+    plan_cache.pop_where(lambda k: k[0] == tid)
     return rp
 
 
@@ -86,19 +122,13 @@ async def get_plan_for(
     resource: str,
     subject_type: SubjectType,
 ) -> Optional[Plan]:
-    q = (
-        select(Plan)
-        .join(ResourcePolicy, ResourcePolicy.plan_id == Plan.id)
-        .where(
-            Plan.tenant_id == tenant_id,
-            ResourcePolicy.tenant_id == tenant_id,
-            ResourcePolicy.resource == resource,
-            ResourcePolicy.subject_type == subject_type,
-        )
-        .order_by(Plan.created_at.desc())
-    )
-    res = await db.execute(q)
-    return res.scalars().first()
+    # Exact and wildcard policies ("GET:/orders/*", "*:/admin/**") resolve
+    # through the tenant's compiled trie; most specific match wins.
+    trie = await policy_index.for_tenant(db, tenant_id)
+    plan_id = trie.match(resource, subject_type.value)
+    if plan_id is None:
+        return None
+    return await get_plan_by_id(db, plan_id)
 
 
 async def get_api_key_by_hash(db: AsyncSession, key_hash: str) -> Optional[ApiKey]:
@@ -109,3 +139,109 @@ async def get_api_key_by_hash(db: AsyncSession, key_hash: str) -> Optional[ApiKe
 async def get_plan_by_id(db: AsyncSession, plan_id) -> Optional[Plan]:
     res = await db.execute(select(Plan).where(Plan.id == plan_id))
     return res.scalar_one_or_none()
+
+
+async def get_tenant_timezones(db: AsyncSession, tenant_ids) -> dict[str, str]:
+    # Keyed by str(tenant_id): GUID columns read back as str outside PostgreSQL
+    res = await db.execute(
+        select(Tenant.id, Tenant.timezone).where(Tenant.id.in_(list(tenant_ids)))
+    )
+    return {str(tid): tz for tid, tz in res.all()}
+
+
+async def insert_chunked(
+    db: AsyncSession, model, rows: list[dict], chunk_size: int
+) -> AsyncIterator[list[dict]]:
+    # One multi-row INSERT per chunk; the caller owns the transaction
+    for i in range(0, len(rows), chunk_size):
+        chunk = rows[i : i + chunk_size]
+        await db.execute(insert(model).values(chunk))
+        yield chunk
+
+
+def _dialect_insert(db: AsyncSession):
+    name = db.bind.dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise NotImplementedError(f"usage upsert not supported on {name}")
+    return dialect_insert
+
+
+async def upsert_usage(db: AsyncSession, rows: list[dict], chunk_size: int) -> None:
+    # Multi-row INSERT .. ON CONFLICT DO UPDATE adding onto existing minutes;
+    # rows within one call must have distinct keys. Caller commits.
+    dialect_insert = _dialect_insert(db)
+    for i in range(0, len(rows), chunk_size):
+        stmt = dialect_insert(UsageMinute).values(rows[i : i + chunk_size])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["tenant_id", "minute", "resource", "outcome"],
+            set_={
+                "requests": UsageMinute.requests + stmt.excluded.requests,
+                "cost": UsageMinute.cost + stmt.excluded.cost,
+            },
+        )
+        await db.execute(stmt)
+
+
+async def add_period_counts(
+    db: AsyncSession, rows: list[dict], chunk_size: int
+) -> None:
+    # Same shape as upsert_usage: deltas are added onto the stored counts
+    dialect_insert = _dialect_insert(db)
+    for i in range(0, len(rows), chunk_size):
+        stmt = dialect_insert(PeriodCount).values(rows[i : i + chunk_size])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["tenant_id", "resource", "subject", "period"],
+            set_={
+                "used": PeriodCount.used + stmt.excluded.used,
+                "updated_at": func.now(),
+            },
+        )
+        await db.execute(stmt)
+
+
+async def get_period_counts(db: AsyncSession, idents: list[tuple]) -> dict[tuple, int]:
+    """Stored counts for ``(tenant_id, resource, subject, period)`` tuples;
+    absent ones are omitted."""
+    if not idents:
+        return {}
+    res = await db.execute(
+        select(
+            PeriodCount.tenant_id,
+            PeriodCount.resource,
+            PeriodCount.subject,
+            PeriodCount.period,
+            PeriodCount.used,
+        ).where(
+            tuple_(
+                PeriodCount.tenant_id,
+                PeriodCount.resource,
+                PeriodCount.subject,
+                PeriodCount.period,
+            ).in_(idents)
+        )
+    )
+    return {(str(t), r, s, p): int(used) for t, r, s, p, used in res.all()}
+
+
+async def get_usage(
+    db: AsyncSession,
+    tenant_id,
+    since: datetime,
+    until: datetime,
+    resource: Optional[str] = None,
+) -> list[UsageMinute]:
+    q = select(UsageMinute).where(
+        UsageMinute.tenant_id == tenant_id,
+        UsageMinute.minute >= since,
+        UsageMinute.minute < until,
+    )
+    if resource is not None:
+        q = q.where(UsageMinute.resource == resource)
+    res = await db.execute(
+        q.order_by(UsageMinute.minute, UsageMinute.resource, UsageMinute.outcome)
+    )
+    return list(res.scalars().all())
@@ -0,0 +1,32 @@
+"""
+lookup indexes for the check path
+
+Revision ID: 0002_lookup_indexes
+Revises: 0001_init
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0002_lookup_indexes"
+down_revision = "0001_init"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # api_keys(key_hash) is already uniquely indexed by 0001_init
+    op.create_index(
+        "ix_resource_policies_lookup",
+        "resource_policies",
+        ["tenant_id", "resource", "subject_type"],
+    )
+    op.create_index("ix_plans_tenant_id", "plans", ["tenant_id"])
+    op.create_index("ix_api_keys_tenant_id", "api_keys", ["tenant_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_api_keys_tenant_id", table_name="api_keys")
+    op.drop_index("ix_plans_tenant_id", table_name="plans")
+    op.drop_index("ix_resource_policies_lookup", table_name="resource_policies")
@@ -0,0 +1,34 @@
+"""
+per-minute usage rollups for billing
+
+Revision ID: 0003_usage_minutes
+Revises: 0002_lookup_indexes
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0003_usage_minutes"
+down_revision = "0002_lookup_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "usage_minutes",
+        sa.Column("tenant_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("minute", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("resource", sa.String(length=300), nullable=False),
+        sa.Column("outcome", sa.String(length=16), nullable=False),
+        sa.Column("requests", sa.BigInteger(), nullable=False),
+        sa.Column("cost", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("tenant_id", "minute", "resource", "outcome"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("usage_minutes")
@@ -0,0 +1,35 @@
+"""
+adaptive (AIMD) plan bounds
+
+Revision ID: 0004_adaptive_plans
+Revises: 0003_usage_minutes
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0004_adaptive_plans"
+down_revision = "0003_usage_minutes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "plans",
+        sa.Column("adaptive", sa.Boolean(), nullable=False, server_default="false"),
+    )
+    op.add_column("plans", sa.Column("adaptive_min_limit", sa.Integer(), nullable=True))
+    op.add_column("plans", sa.Column("adaptive_max_limit", sa.Integer(), nullable=True))
+    op.add_column(
+        "plans", sa.Column("adaptive_latency_ms", sa.Integer(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("plans", "adaptive_latency_ms")
+    op.drop_column("plans", "adaptive_max_limit")
+    op.drop_column("plans", "adaptive_min_limit")
+    op.drop_column("plans", "adaptive")
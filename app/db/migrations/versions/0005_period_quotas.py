@@ -0,0 +1,58 @@
+"""
+daily / monthly period quotas with durable counts
+
+Revision ID: 0005_period_quotas
+Revises: 0004_adaptive_plans
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0005_period_quotas"
+down_revision = "0004_adaptive_plans"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # ALTER TYPE .. ADD VALUE cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE plan_algorithm ADD VALUE IF NOT EXISTS 'period_quota'")
+    op.add_column(
+        "tenants",
+        sa.Column(
+            "timezone", sa.String(length=64), nullable=False, server_default="UTC"
+        ),
+    )
+    op.add_column(
+        "plans", sa.Column("quota_period", sa.String(length=8), nullable=True)
+    )
+    op.add_column(
+        "plans", sa.Column("quota_timezone", sa.String(length=64), nullable=True)
+    )
+    op.create_table(
+        "period_counts",
+        sa.Column("tenant_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("resource", sa.String(length=300), nullable=False),
+        sa.Column("subject", sa.String(length=300), nullable=False),
+        sa.Column("period", sa.String(length=10), nullable=False),
+        sa.Column("used", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.PrimaryKeyConstraint("tenant_id", "resource", "subject", "period"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("period_counts")
+    op.drop_column("plans", "quota_timezone")
+    op.drop_column("plans", "quota_period")
+    op.drop_column("tenants", "timezone")
+    # Postgres cannot drop an enum value; period_quota stays in plan_algorithm
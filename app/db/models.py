@@ -11,6 +11,9 @@ from sqlalchemy import (
     ForeignKey,
     Integer,
     Float,
+    Index,
+    BigInteger,
+    PrimaryKeyConstraint,
 )
 from sqlalchemy.sql import func
 from sqlalchemy.types import TypeDecorator
@@ -43,6 +46,7 @@ class PlanAlgorithm(str, Enum):
     fixed_window = "fixed_window"
     sliding_window = "sliding_window"
     concurrency = "concurrency"
+    period_quota = "period_quota"
 
 
 class SubjectType(str, Enum):
@@ -57,6 +61,10 @@ class Tenant(Base):
         "id", GUID(), primary_key=True, default=uuid.uuid4
     )
     name: Mapped[str] = mapped_column(String(200), unique=True, nullable=False)
+    # IANA name; calendar periods of the tenant's quotas follow it
+    timezone: Mapped[str] = mapped_column(
+        String(64), nullable=False, server_default="UTC", default="UTC"
+    )
     created_at: Mapped[DateTime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
@@ -68,6 +76,7 @@ class Tenant(Base):
 
 class Plan(Base):
     __tablename__ = "plans"
+    __table_args__ = (Index("ix_plans_tenant_id", "tenant_id"),)
     id: Mapped[uuid.UUID] = mapped_column(GUID(), primary_key=True, default=uuid.uuid4)
     tenant_id: Mapped[uuid.UUID] = mapped_column(
         GUID(), ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False
@@ -87,6 +96,17 @@ class Plan(Base):
     burst_factor: Mapped[float] = mapped_column(
         Float, nullable=False, server_default="1.0"
     )
+    # AIMD-managed limit between the bounds, driven by /v1/feedback
+    adaptive: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, server_default="false", default=False
+    )
+    adaptive_min_limit: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    adaptive_max_limit: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    adaptive_latency_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # period_quota plans: limit_per_window units per "day" or "month",
+    # calendar-aligned in quota_timezone (the tenant's when the plan was made)
+    quota_period: Mapped[str | None] = mapped_column(String(8), nullable=True)
+    quota_timezone: Mapped[str | None] = mapped_column(String(64), nullable=True)
     created_at: Mapped[DateTime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
@@ -97,6 +117,7 @@ class Plan(Base):
 
 class ApiKey(Base):
     __tablename__ = "api_keys"
+    __table_args__ = (Index("ix_api_keys_tenant_id", "tenant_id"),)
     id: Mapped[uuid.UUID] = mapped_column(GUID(), primary_key=True, default=uuid.uuid4)
     tenant_id: Mapped[uuid.UUID] = mapped_column(
         GUID(), ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False
@@ -118,6 +139,10 @@ class ApiKey(Base):
 
 class ResourcePolicy(Base):
     __tablename__ = "resource_policies"
+    __table_args__ = (
+        # Exact policy lookup joined from api_keys on the check path
+        Index("ix_resource_policies_lookup", "tenant_id", "resource", "subject_type"),
+    )
     id: Mapped[uuid.UUID] = mapped_column(GUID(), primary_key=True, default=uuid.uuid4)
     tenant_id: Mapped[uuid.UUID] = mapped_column(
         GUID(), ForeignKey("tenants.id", ondelete="CASCADE"), nullable=False
@@ -135,3 +160,44 @@ class ResourcePolicy(Base):
 
     tenant: Mapped[Tenant] = relationship(back_populates="policies")
     plan: Mapped[Plan] = relationship(back_populates="policies")
+
+
+class UsageMinute(Base):
+    """Billed decisions per tenant, resource, outcome and minute."""
+
+    __tablename__ = "usage_minutes"
+    __table_args__ = (
+        # Tenant + time range first: that is how usage is queried
+        PrimaryKeyConstraint("tenant_id", "minute", "resource", "outcome"),
+    )
+    # No FK: billing history outlives the tenant, and a deleted tenant must
+    # not make a whole flush batch fail
+    tenant_id: Mapped[uuid.UUID] = mapped_column(GUID(), nullable=False)
+    minute: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False)
+    resource: Mapped[str] = mapped_column(String(300), nullable=False)
+    outcome: Mapped[str] = mapped_column(String(16), nullable=False)
+    requests: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    cost: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+class PeriodCount(Base):
+    """Units used by a subject of a period_quota plan in one period.
+
+    Written behind from the Redis counters and read back when a counter has
+    to be rebuilt, e.g. after Redis lost it.
+    """
+
+    __tablename__ = "period_counts"
+    __table_args__ = (
+        PrimaryKeyConstraint("tenant_id", "resource", "subject", "period"),
+    )
+    # No FK, as for usage_minutes
+    tenant_id: Mapped[uuid.UUID] = mapped_column(GUID(), nullable=False)
+    resource: Mapped[str] = mapped_column(String(300), nullable=False)
+    subject: Mapped[str] = mapped_column(String(300), nullable=False)
+    # Period label on the tenant's calendar: "2026-10-19" or "2026-10"
+    period: Mapped[str] = mapped_column(String(10), nullable=False)
+    used: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    updated_at: Mapped[DateTime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
@@ -1,3 +1,4 @@
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
@@ -9,12 +10,75 @@ def _to_async_dsn(dsn: str) -> str:
     return dsn
 
 
+def _engine_kwargs(dsn: str, s=settings) -> dict:
+    url = make_url(dsn)
+    if url.get_backend_name() == "sqlite":
+        return {}
+    kwargs = {
+        "pool_size": s.DB_POOL_SIZE,
+        "max_overflow": s.DB_MAX_OVERFLOW,
+        "pool_timeout": s.DB_POOL_TIMEOUT_SEC,
+        "pool_recycle": s.DB_POOL_RECYCLE_SEC,
+        "pool_pre_ping": s.DB_POOL_PRE_PING,
+    }
+    if url.get_driver_name() == "asyncpg":
+        # SQLAlchemy keeps its own prepared-statement LRU per connection on
+        # top of asyncpg's; size both from one knob.
+        kwargs["connect_args"] = {"statement_cache_size": s.DB_STATEMENT_CACHE_SIZE}
+    return kwargs
+
+
+def _engine_url(dsn: str, s=settings):
+    url = make_url(dsn)
+    if url.get_driver_name() == "asyncpg":
+        url = url.update_query_dict(
+            {"prepared_statement_cache_size": str(s.DB_STATEMENT_CACHE_SIZE)}
+        )
+    return url
+
+
 DATABASE_URL = _to_async_dsn(settings.POSTGRES_DSN)
 
-engine = create_async_engine(DATABASE_URL, echo=False, future=True)
+engine = create_async_engine(
+    _engine_url(DATABASE_URL), echo=False, future=True, **_engine_kwargs(DATABASE_URL)
+)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
+class LazySession:
+    """Stands in for an ``AsyncSession`` that is only created on first use.
+
+    Hot paths whose auth and plan lookups are usually cached take one of
+    these instead of a session, so a fully cached request never builds a
+    session or checks out a pooled connection. Any session attribute opens
+    it; ``opened`` says whether that happened.
+    """
+
+    def __init__(self, session_factory):
+        self._factory = session_factory
+        self._session: AsyncSession | None = None
+
+    @property
+    def opened(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name):
+        # Only reached for names not defined here, i.e. the session's API
+        if self._session is None:
+            self._session = self._factory()
+        return getattr(self._session, name)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+    async def __aenter__(self) -> "LazySession":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
 async def get_db() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
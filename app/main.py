@@ -3,11 +3,20 @@ from fastapi.responses import FileResponse, HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
-from prometheus_client import make_asgi_app
-
 from app.core.config import settings
+from app.core.capture import traffic_capture
+from app.core.deps import _redis_client
+from app.core.heavy_hitters import heavy_hitters
+from app.core.period_counts import DbPeriodStore, period_counts
+from app.core.usage import make_usage_sink, usage_aggregator
+from app.core.warmup import start_warmup, stop_warmup
+from app.db.session import AsyncSessionLocal
 from app.api.v1 import router as api_v1
 from app.api.admin import router as admin_router
+from app.api.ws import router as ws_router
+from app.rl.replication import peer_clients, replicator
+from app.rl.reset import reset_jobs
+from app.observability.metrics import make_metrics_app
 from app.observability.tracing import setup_tracing, instrument_fastapi
 from app.core.logging import setup_logging, get_logger
 
@@ -29,10 +38,11 @@ async def index(request: Request):
 
 # API
 app.include_router(api_v1, prefix="/v1")
+app.include_router(ws_router, prefix="/v1")
 app.include_router(admin_router)
 
 # Metrics
-metrics_app = make_asgi_app()
+metrics_app = make_metrics_app()
 app.mount("/metrics", metrics_app)
 
 
@@ -44,6 +54,15 @@ async def on_startup():
     # Tracing instrumentation if enabled
     setup_tracing()
     instrument_fastapi(app)
+    # Open pools, load Lua and prefetch hot plans/keys before taking traffic
+    await start_warmup(_redis_client(), AsyncSessionLocal)
+    await usage_aggregator.start(
+        make_usage_sink(settings.USAGE_SINK, _redis_client(), AsyncSessionLocal)
+    )
+    await heavy_hitters.start(_redis_client())
+    await period_counts.start(DbPeriodStore(AsyncSessionLocal))
+    await replicator.start(_redis_client(), peer_clients(settings.REPLICATION_PEERS))
+    await traffic_capture.start()
 
 
 # CORS (dev friendly) — register at init time
@@ -59,4 +78,13 @@ if settings.APP_ENV == "dev":
 
 @app.on_event("shutdown")
 async def on_shutdown():
+    await stop_warmup()
+    # Flush buffered usage before the worker goes away
+    await usage_aggregator.stop()
+    await period_counts.stop()
+    await replicator.stop()
+    await traffic_capture.stop()
+    await heavy_hitters.stop()
+    # Running resets are marked cancelled; resubmit to finish them
+    await reset_jobs.shutdown()
     log.info("shutdown")
@@ -1,6 +1,19 @@
 from __future__ import annotations
 
-from prometheus_client import Counter, Histogram, Gauge
+import asyncio
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    make_asgi_app,
+)
+from prometheus_client import multiprocess
+
+from app.observability.multiproc import MULTIPROC_DIR, cleanup_dead_workers
 
 # Legacy counters (kept for compatibility)
 RL_ALLOWED = Counter("rl_allowed_total", "Allowed rate limit decisions")
@@ -21,9 +34,98 @@ DECISION_LATENCY_MS = Histogram(
 REDIS_POOL_IN_USE = Gauge(
     "redis_pool_in_use",
     "Approximate number of Redis pool connections in use",
+    # Sum over live workers only; a dead worker's pool no longer exists
+    multiprocess_mode="livesum",
 )
 
 
+WARMUP_DURATION_MS = Gauge(
+    "warmup_duration_ms",
+    "Time the worker spent warming up before reporting ready",
+    multiprocess_mode="livemax",
+)
+
+USAGE_ROWS_FLUSHED = Counter(
+    "usage_rows_flushed_total",
+    "Usage rollup rows written to the usage sink",
+)
+USAGE_DROPPED = Counter(
+    "usage_dropped_total",
+    "Usage increments dropped because the aggregator was full",
+)
+USAGE_FLUSH_FAILURES = Counter(
+    "usage_flush_failures_total",
+    "Usage flushes that failed and were retried",
+)
+PERIOD_COUNTS_FLUSHED = Counter(
+    "period_counts_flushed_total",
+    "Period quota count deltas written to the database",
+)
+PERIOD_COUNTS_DROPPED = Counter(
+    "period_counts_dropped_total",
+    "Period quota units or reloads dropped because the writer was full",
+)
+PERIOD_COUNTS_FAILURES = Counter(
+    "period_counts_failures_total",
+    "Period quota writes or reloads that failed and were retried",
+    labelnames=("op",),
+)
+PERIOD_COUNTS_RELOADED = Counter(
+    "period_counts_reloaded_total",
+    "Period quota counters rebuilt from the database",
+)
+DB_SESSIONS_PER_CHECK = Histogram(
+    "db_sessions_per_check",
+    "DB sessions opened per check (0 when auth and plan were cached)",
+    labelnames=("route",),
+    buckets=(0, 1, 2),
+)
+HOT_KEY_CHECKS = Counter(
+    "hot_key_checks_total",
+    "Checks served from a hot key's sub-keys",
+    labelnames=("spilled",),
+)
+ACQUIRE_RESULTS = Counter(
+    "acquire_results_total",
+    "/v1/acquire outcomes",
+    labelnames=("outcome",),
+)
+ACQUIRE_WAIT_MS = Histogram(
+    "acquire_wait_ms",
+    "Delay until the reserved slot of queued /v1/acquire requests",
+    buckets=(1, 5, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000),
+)
+ADAPTIVE_FEEDBACK = Counter(
+    "adaptive_feedback_total",
+    "Feedback reports applied to adaptive plan limits",
+    labelnames=("signal",),
+)
+
+REPLICATION_SLOTS = Counter(
+    "replication_slots_total",
+    "CRDT slots published to this region's stream or merged from a peer",
+    labelnames=("direction",),
+)
+REPLICATION_LAG_MS = Gauge(
+    "replication_lag_ms",
+    "Age of the newest peer stream entry merged, per peer region",
+    labelnames=("peer",),
+    multiprocess_mode="livemax",
+)
+REPLICATION_FAILURES = Counter(
+    "replication_failures_total",
+    "Replication publishes or peer reads that failed, and slot updates dropped",
+    labelnames=("op",),
+)
+
+CAPTURE_RECORDS = Counter(
+    "capture_records_total",
+    "Sampled check records written to capture files, dropped or lost to errors",
+    labelnames=("outcome",),
+)
+CAPTURE_FILES = Counter("capture_files_total", "Capture files opened")
+
+
 def update_redis_pool_gauge(redis_client) -> None:
     try:
         pool = getattr(redis_client, "connection_pool", None)
@@ -43,3 +145,35 @@ def update_redis_pool_gauge(redis_client) -> None:
     except Exception:
         # Optional metric; ignore failures
         pass
+
+
+def multiprocess_registry(path: str | None = None) -> CollectorRegistry:
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=path or MULTIPROC_DIR)
+    return registry
+
+
+def make_metrics_app():
+    if not MULTIPROC_DIR:
+        return make_asgi_app()
+
+    registry = multiprocess_registry()
+
+    def _render() -> bytes:
+        cleanup_dead_workers()
+        return generate_latest(registry)
+
+    async def metrics_app(scope, receive, send):
+        # Merging every worker's mmap files is O(files x series); keep it off
+        # the event loop so a scrape never stalls in-flight checks.
+        output = await asyncio.to_thread(_render)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", CONTENT_TYPE_LATEST.encode("utf-8"))],
+            }
+        )
+        await send({"type": "http.response.body", "body": output})
+
+    return metrics_app
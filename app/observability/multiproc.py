@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import glob
+import os
+import re
+
+from prometheus_client import multiprocess
+
+# prometheus_client picks its value backend (process-local vs mmap files) at
+# import time from this variable, so it must be exported before the process
+# starts, e.g. by the launcher that forks the workers. This module defines no
+# metrics itself so a supervisor can manage the directory without creating
+# files of its own.
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+_DB_FILE_PID = re.compile(r"_(\d+)\.db$")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def cleanup_dead_workers(path: str | None = None) -> list[int]:
+    """Drop live-gauge files left behind by workers that have exited.
+
+    Counter and histogram files of dead workers are kept on purpose: their
+    totals must stay in the aggregate or the scraped counters would go
+    backwards.
+    """
+    path = path or MULTIPROC_DIR
+    if not path:
+        return []
+    pids = set()
+    for f in glob.glob(os.path.join(path, "*.db")):
+        m = _DB_FILE_PID.search(f)
+        if m:
+            pids.add(int(m.group(1)))
+    dead = sorted(pid for pid in pids if not _pid_alive(pid))
+    for pid in dead:
+        multiprocess.mark_process_dead(pid, path)
+    return dead
+
+
+def reset_multiproc_dir(path: str | None = None) -> None:
+    # Called once by the supervisor before forking so a restart does not
+    # inherit totals from a previous deployment.
+    path = path or MULTIPROC_DIR
+    if not path:
+        return
+    os.makedirs(path, exist_ok=True)
+    for f in glob.glob(os.path.join(path, "*.db")):
+        os.remove(f)
@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+from typing import Optional, Protocol
+
+from app.rl.quota import QuotaSpec, peek_many
+from app.rl.schemas import CheckDecision
+from app.rl.strategies import (
+    acquire,
+    adaptive,
+    concurrency,
+    crdt,
+    fixed_window,
+    period_quota,
+    sliding_window,
+    token_bucket,
+    token_bucket_packed,
+)
+
+
+class LimiterBackend(Protocol):
+    """Where limiter state lives. ``DecisionEngine`` builds the key and
+    splits the limit (hot-key shards); a backend applies one algorithm to
+    one key atomically and returns the decision.
+
+    ``adaptive_key`` names the AIMD limit of an adaptive plan; when it holds
+    a value, that replaces the configured limit within the same atomic
+    operation. ``adapt`` moves it on feedback."""
+
+    async def token_bucket(
+        self,
+        key: str,
+        *,
+        capacity: int,
+        refill_rate_per_sec: float,
+        cost: int,
+        now_ms: int,
+        adaptive_key: Optional[str] = None,
+    ) -> CheckDecision: ...
+
+    async def fixed_window(
+        self,
+        key: str,
+        *,
+        limit: int,
+        window_sec: int,
+        cost: int,
+        now_ms: int,
+        adaptive_key: Optional[str] = None,
+    ) -> CheckDecision: ...
+
+    async def sliding_window(
+        self,
+        key: str,
+        *,
+        limit: int,
+        window_sec: int,
+        cost: int,
+        now_ms: int,
+        adaptive_key: Optional[str] = None,
+    ) -> CheckDecision: ...
+
+    async def concurrency(
+        self, key: str, *, limit: int, ttl_sec: int, cost: int, now_ms: int
+    ) -> CheckDecision: ...
+
+    async def period_quota(
+        self, key: str, *, limit: int, cost: int, end_ms: int, now_ms: int
+    ) -> tuple[CheckDecision, bool]: ...
+
+    async def seed_period(self, key: str, count: int) -> bool: ...
+
+    async def peek_many(
+        self, specs: list[QuotaSpec], now_ms: int, redis=None
+    ) -> list[dict]: ...
+
+    async def adapt(
+        self,
+        key: str,
+        *,
+        base: int,
+        min_limit: int,
+        max_limit: int,
+        congested: bool,
+        count: int,
+        step: float,
+        factor: float,
+        cooldown_ms: int,
+        ttl_sec: int,
+        now_ms: int,
+    ) -> tuple[float, bool]: ...
+
+    async def reserve(
+        self,
+        key: str,
+        queue_key: str,
+        *,
+        capacity: int,
+        refill_rate_per_sec: float,
+        cost: int,
+        max_wait_ms: int,
+        max_queue: int,
+        reservation_id: str,
+        now_ms: int,
+        adaptive_key: Optional[str] = None,
+    ) -> acquire.Reservation: ...
+
+    async def cancel_reservation(
+        self, key: str, queue_key: str, *, member: str, now_ms: int
+    ) -> bool: ...
+
+
+class RedisBackend:
+    """The Lua/strategy modules against a Redis client (the default)."""
+
+    replicated = False
+
+    def __init__(self, redis, packed: bool = False):
+        self.redis = redis
+        # KEY_ENCODING=compact keeps token buckets as one packed string
+        self.packed = packed
+        self._tb = token_bucket_packed if packed else token_bucket
+
+    async def token_bucket(
+        self, key, *, capacity, refill_rate_per_sec, cost, now_ms, adaptive_key=None
+    ) -> CheckDecision:
+        return await self._tb.check(
+            self.redis,
+            key,
+            capacity=capacity,
+            refill_rate_per_sec=refill_rate_per_sec,
+            cost=cost,
+            now_ms=now_ms,
+            adaptive_key=adaptive_key,
+        )
+
+    async def fixed_window(
+        self, key, *, limit, window_sec, cost, now_ms, adaptive_key=None
+    ) -> CheckDecision:
+        return await fixed_window.check(
+            self.redis,
+            key,
+            limit=limit,
+            window_sec=window_sec,
+            cost=cost,
+            now_ms=now_ms,
+            adaptive_key=adaptive_key,
+        )
+
+    async def sliding_window(
+        self, key, *, limit, window_sec, cost, now_ms, adaptive_key=None
+    ) -> CheckDecision:
+        return await sliding_window.check(
+            self.redis,
+            key,
+            limit=limit,
+            window_sec=window_sec,
+            cost=cost,
+            now_ms=now_ms,
+            adaptive_key=adaptive_key,
+        )
+
+    async def concurrency(self, key, *, limit, ttl_sec, cost, now_ms) -> CheckDecision:
+        # Slots are tracked by Redis TTLs, so the caller's clock is unused
+        return await concurrency.acquire(
+            self.redis, key, limit=limit, ttl_sec=ttl_sec, cost=cost
+        )
+
+    async def period_quota(
+        self, key, *, limit, cost, end_ms, now_ms
+    ) -> tuple[CheckDecision, bool]:
+        return await period_quota.check(
+            self.redis, key, limit=limit, cost=cost, end_ms=end_ms, now_ms=now_ms
+        )
+
+    async def seed_period(self, key, count) -> bool:
+        return await period_quota.seed(self.redis, key, count)
+
+    async def peek_many(self, specs, now_ms, redis=None) -> list[dict]:
+        # ``redis`` may be a read replica client
+        return await peek_many(
+            redis if redis is not None else self.redis, specs, now_ms
+        )
+
+    async def adapt(self, key, **kw) -> tuple[float, bool]:
+        return await adaptive.update(self.redis, key, **kw)
+
+    async def reserve(self, key, queue_key, **kw) -> acquire.Reservation:
+        return await acquire.reserve(
+            self.redis, key, queue_key, packed=self.packed, **kw
+        )
+
+    async def cancel_reservation(self, key, queue_key, *, member, now_ms) -> bool:
+        return await acquire.cancel(
+            self.redis,
+            key,
+            queue_key,
+            member=member,
+            packed=self.packed,
+            now_ms=now_ms,
+        )
+
+
+class ReplicatedBackend(RedisBackend):
+    """REPLICATION_MODE=crdt: fixed windows and token buckets keep a slot
+    per region and decide on the merged view; every changed slot is handed
+    to ``replicator`` for the peer regions. The other algorithms, and
+    /v1/acquire reservations, stay region-local."""
+
+    replicated = True
+
+    def __init__(self, redis, region: str, replicator):
+        # Slots are hash fields, so token buckets are never packed
+        super().__init__(redis, packed=False)
+        self.region = region
+        self.replicator = replicator
+
+    async def token_bucket(
+        self, key, *, capacity, refill_rate_per_sec, cost, now_ms, adaptive_key=None
+    ) -> CheckDecision:
+        decision, slot = await crdt.token_bucket(
+            self.redis,
+            key,
+            region=self.region,
+            capacity=capacity,
+            refill_rate_per_sec=refill_rate_per_sec,
+            cost=cost,
+            now_ms=now_ms,
+            adaptive_key=adaptive_key,
+        )
+        if slot.delta:
+            self.replicator.record(key, slot)
+        return decision
+
+    async def fixed_window(
+        self, key, *, limit, window_sec, cost, now_ms, adaptive_key=None
+    ) -> CheckDecision:
+        decision, slot = await crdt.fixed_window(
+            self.redis,
+            key,
+            region=self.region,
+            limit=limit,
+            window_sec=window_sec,
+            cost=cost,
+            now_ms=now_ms,
+            adaptive_key=adaptive_key,
+        )
+        self.replicator.record(key, slot)
+        return decision
+
+
+def make_backend(settings, redis) -> LimiterBackend:
+    if settings.LIMITER_BACKEND == "memory":
+        from app.rl.memory_backend import memory_backend
+
+        # One store per process, shared by every engine
+        return memory_backend
+    if settings.REPLICATION_MODE == "crdt":
+        from app.rl.replication import replicator
+
+        return ReplicatedBackend(redis, settings.REPLICATION_REGION, replicator)
+    return RedisBackend(redis, packed=settings.KEY_ENCODING == "compact")
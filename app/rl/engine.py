@@ -1,27 +1,56 @@
 from __future__ import annotations
 
+import math
+import secrets
 import time
-from typing import Any, Dict, Tuple, Optional, Callable
+from typing import Any, Callable, Dict, Tuple, Optional
 
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import plan_cache, plan_cache_key
+from app.core.capture import traffic_capture
 from app.core.config import settings as global_settings
-from app.db.models import Plan, PlanAlgorithm, SubjectType
-from app.rl.schemas import CheckDecision
+from app.core.logging import get_logger
+from app.core.heavy_hitters import heavy_hitters as global_heavy_hitters
+from app.core.period_counts import period_counts as global_period_counts
+from app.core.usage import usage_aggregator
+from app.rl.backend import LimiterBackend, make_backend
+from app.rl.executor import PlanExecutor, compile_plan
+from app.rl.quota import QuotaSpec
+from app.rl.hot_keys import hot_keys as global_hot_keys, shard_key, split_limit
+from app.db.models import Plan, SubjectType
+from app.rl.schemas import AcquireDecision, CheckDecision
 from app.rl.keys import (
+    rl_key_reservations,
     rl_key_token_bucket,
     rl_key_fixed_window,
     rl_key_sliding,
     rl_key_conc,
+    rl_key_compact,
+)
+from app.rl.strategies import (
+    acquire as acquire_strategy,
+    token_bucket,
+    fixed_window,
+    sliding_window,
+    concurrency,
 )
-from app.rl.strategies import token_bucket, fixed_window, sliding_window, concurrency
 from app.observability.metrics import (
+    ACQUIRE_RESULTS,
+    ACQUIRE_WAIT_MS,
     DECISION_LATENCY_MS,
+    HOT_KEY_CHECKS,
     REQUESTS_TOTAL,
     update_redis_pool_gauge,
 )
 
+log = get_logger("rl.engine")
+
+
+def wall_clock_ms() -> int:
+    return int(time.time() * 1000)
+
 
 class RateLimiter:
     def __init__(self, redis: Redis):
@@ -59,27 +88,43 @@ class RateLimiter:
 
 
 class DecisionEngine:
-    def __init__(self, redis: Redis, settings, crud_module):
+    def __init__(
+        self,
+        redis: Redis,
+        settings,
+        crud_module,
+        usage=None,
+        heavy_hitters=None,
+        hot_keys=None,
+        backend: Optional[LimiterBackend] = None,
+        period_counts=None,
+        clock: Optional[Callable[[], int]] = None,
+        capture=None,
+    ):
         self.redis = redis
         self.settings = settings
         self.crud = crud_module
-        self._map: dict[str, Callable[..., CheckDecision]] = {
-            "token_bucket": lambda redis, key, *, capacity, refill_rate_per_sec, cost=1: token_bucket.check(
-                redis,
-                key,
-                capacity=capacity,
-                refill_rate_per_sec=refill_rate_per_sec,
-                cost=cost,
-            ),
-            "fixed_window": lambda redis, key, *, limit, window_sec, cost=1: fixed_window.check(
-                redis, key, limit=limit, window_sec=window_sec, cost=cost
-            ),
-            "sliding_window": lambda redis, key, *, limit, window_sec, cost=1: sliding_window.check(
-                redis, key, limit=limit, window_sec=window_sec, cost=cost
-            ),
-            "concurrency": lambda redis, key, *, limit, ttl_sec, cost=1: concurrency.acquire(
-                redis, key, limit=limit, ttl_sec=ttl_sec, cost=cost
-            ),
+        self.usage = usage if usage is not None else usage_aggregator
+        self.compact_keys = settings.KEY_ENCODING == "compact"
+        self.heavy_hitters = (
+            heavy_hitters if heavy_hitters is not None else global_heavy_hitters
+        )
+        self.hot_keys = hot_keys if hot_keys is not None else global_hot_keys
+        self.backend = backend if backend is not None else make_backend(settings, redis)
+        self.period_counts = (
+            period_counts if period_counts is not None else global_period_counts
+        )
+        # Epoch ms every decision is made at; trace replay passes a virtual one
+        self.clock = clock or wall_clock_ms
+        self.capture = capture if capture is not None else traffic_capture
+        # Metric children bound once instead of a labels() lookup per check
+        self._outcomes = {
+            True: REQUESTS_TOTAL.labels(route="engine.check", outcome="allowed"),
+            False: REQUESTS_TOTAL.labels(route="engine.check", outcome="blocked"),
+        }
+        self._hot_key_checks = {
+            True: HOT_KEY_CHECKS.labels(spilled="true"),
+            False: HOT_KEY_CHECKS.labels(spilled="false"),
         }
 
     async def resolve_plan(
@@ -90,6 +135,20 @@ class DecisionEngine:
         subject_type: SubjectType | str,
         explicit_plan_id=None,
     ) -> Plan:
+        if explicit_plan_id is not None:
+            cache_key = ("id", str(explicit_plan_id))
+        else:
+            # normalize subject type
+            st = (
+                subject_type.value
+                if isinstance(subject_type, SubjectType)
+                else str(subject_type)
+            )
+            cache_key = plan_cache_key(tenant_id, resource, st)
+        cached = plan_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         if explicit_plan_id is not None:
             # require crud helper, fallback to direct select if not present
             if hasattr(self.crud, "get_plan_by_id"):
@@ -103,18 +162,13 @@ class DecisionEngine:
                 )
                 plan = res.scalar_one_or_none()
         else:
-            # normalize subject type
-            st = (
-                subject_type.value
-                if isinstance(subject_type, SubjectType)
-                else str(subject_type)
-            )
             plan = await self.crud.get_plan_for(
                 db, tenant_id, resource, SubjectType(st)
             )
 
         if not plan:
             raise LookupError("plan_not_found")
+        plan_cache.set(cache_key, plan)
         return plan
 
     def build_key(
@@ -129,11 +183,13 @@ class DecisionEngine:
     ) -> str:
         alg = algorithm if isinstance(algorithm, str) else str(algorithm)
         tid = str(tenant_id)
+        if self.compact_keys:
+            return self._build_compact_key(tid, subject, resource, alg, plan, now_ms)
         if alg == "token_bucket":
             return rl_key_token_bucket(tid, subject, resource)
         if alg == "fixed_window":
             if now_ms is None:
-                now_ms = int(time.time() * 1000)
+                now_ms = self.clock()
             window_sec = plan.window_seconds if plan and plan.window_seconds else 60  # type: ignore[attr-defined]
             window_start = (now_ms // 1000 // window_sec) * window_sec
             return rl_key_fixed_window(tid, subject, resource, int(window_start))
@@ -143,6 +199,127 @@ class DecisionEngine:
             return rl_key_conc(tid, subject, resource)
         return rl_key_token_bucket(tid, subject, resource)
 
+    def _build_compact_key(self, tid, subject, resource, alg, plan, now_ms) -> str:
+        if alg not in ("fixed_window", "sliding_window", "concurrency"):
+            alg = "token_bucket"
+        window_start = None
+        if alg == "fixed_window":
+            if now_ms is None:
+                now_ms = self.clock()
+            window_sec = plan.window_seconds if plan and plan.window_seconds else 60  # type: ignore[attr-defined]
+            window_start = (now_ms // 1000 // window_sec) * window_sec
+        return rl_key_compact(alg, tid, subject, resource, window_start)
+
+    def executor(self, plan: Plan) -> PlanExecutor:
+        return compile_plan(plan, self.compact_keys)
+
+    async def _debit(
+        self,
+        ex: PlanExecutor,
+        key: str,
+        ident: tuple,
+        cost: int,
+        now_ms: int,
+    ) -> CheckDecision:
+        """Debit ``cost`` from the key, or from one sub-key of it with a 1/N
+        share of the plan's limit when the key is hot.
+
+        A sub-key that denies spills once onto the next one, so a request is
+        only refused when two sub-keys are out of budget. The reported limit
+        is the plan's; remaining is the sub-key's scaled by N.
+        """
+        total = ex.limit
+        epoch = ex.epoch(now_ms)
+        shards, shard = self.hot_keys.route(ident, epoch=epoch)
+        shards = min(shards, max(1, total))
+        if shards == 1:
+            return await ex.debit(self.backend, key, total, 1, cost, now_ms)
+        shard %= shards
+        rotate = epoch or 0
+        decision = await ex.debit(
+            self.backend,
+            shard_key(key, shard),
+            split_limit(total, shards, shard, rotate),
+            shards,
+            cost,
+            now_ms,
+        )
+        spilled = False
+        if not decision.allowed:
+            nxt = (shard + 1) % shards
+            other = await ex.debit(
+                self.backend,
+                shard_key(key, nxt),
+                split_limit(total, shards, nxt, rotate),
+                shards,
+                cost,
+                now_ms,
+            )
+            if other.allowed:
+                decision, spilled = other, True
+        self._hot_key_checks[spilled].inc()
+        remaining = min(total, decision.remaining * shards)
+        headers = {
+            **decision.headers,
+            "X-RateLimit-Limit": str(total),
+            "X-RateLimit-Remaining": str(remaining),
+        }
+        return decision.model_copy(
+            update={"limit": total, "remaining": remaining, "headers": headers}
+        )
+
+    async def _debit_period(
+        self, ex: PlanExecutor, key: str, ident: tuple, cost: int, now_ms: int
+    ) -> CheckDecision:
+        # The counter is Redis' alone while checking: what it allows is
+        # queued for the database, and a counter that Redis had lost (or
+        # never had) gets the stored count added in the background
+        decision, loaded = await ex.debit_period(self.backend, key, cost, now_ms)
+        ident = (*ident, ex.current(now_ms).label)
+        if not loaded:
+            self.period_counts.reload(ident, key, self.backend)
+        if decision.allowed:
+            self.period_counts.record(ident, cost)
+        return decision
+
+    def quota_spec(
+        self,
+        *,
+        tenant_id,
+        subject: str,
+        resource: str,
+        plan: Plan,
+        now_ms: int,
+    ) -> QuotaSpec:
+        """Keys and limits ``check`` would debit right now, for read-only peeks."""
+        ex = self.executor(plan)
+        tid = str(tenant_id)
+        key = ex.key(tid, subject, resource, now_ms)
+        spec = QuotaSpec(
+            algorithm=ex.algorithm,
+            limit=ex.limit,
+            keys=[(key, ex.limit)],
+            window_sec=ex.window_sec,
+            refill_rate_per_sec=getattr(ex, "refill_rate_per_sec", 0.0),
+            packed=ex.algorithm == "token_bucket"
+            and getattr(self.backend, "packed", self.compact_keys),
+            slots=ex.algorithm == "fixed_window"
+            and getattr(self.backend, "replicated", False),
+            adaptive_key=ex.adaptive_key(tid, resource),
+        )
+        if ex.durable:
+            spec.period_end_ms = ex.current(now_ms).end_ms
+        if ex.shardable:
+            epoch = ex.epoch(now_ms)
+            ident = (tid, subject, resource, ex.algorithm)
+            shards = min(self.hot_keys.layout(ident, epoch=epoch), max(1, ex.limit))
+            if shards > 1:
+                spec.keys = [
+                    (shard_key(key, i), split_limit(ex.limit, shards, i, epoch or 0))
+                    for i in range(shards)
+                ]
+        return spec
+
     async def check(
         self,
         *,
@@ -152,83 +329,179 @@ class DecisionEngine:
         cost: int,
         plan: Plan,
     ) -> CheckDecision:
-        alg = (
-            plan.algorithm.value
-            if isinstance(plan.algorithm, PlanAlgorithm)
-            else str(plan.algorithm)
-        )
-        key = self.build_key(
-            tenant_id=str(tenant_id),
-            subject=subject,
-            resource=resource,
-            algorithm=alg,
-            plan=plan,
-        )
+        ex = self.executor(plan)
+        tid = str(tenant_id)
+        cost = int(cost)
+        now_ms = self.clock()
+        key = ex.key(tid, subject, resource, now_ms)
+        decision = None
         start = time.perf_counter()
         try:
-            if alg == "token_bucket":
-                capacity = plan.bucket_capacity or (plan.limit_per_window or 0)
-                refill = plan.refill_rate_per_sec or 0.0
-                decision = await self._map[alg](
-                    self.redis,
-                    key,
-                    capacity=int(capacity),
-                    refill_rate_per_sec=float(refill),
-                    cost=int(cost),
-                )
-            elif alg == "fixed_window":
-                limit = plan.limit_per_window or (plan.bucket_capacity or 0)
-                window_sec = plan.window_seconds or 60
-                decision = await self._map[alg](
-                    self.redis,
-                    key,
-                    limit=int(limit),
-                    window_sec=int(window_sec),
-                    cost=int(cost),
+            if ex.shardable:
+                decision = await self._debit(
+                    ex, key, (tid, subject, resource, ex.algorithm), cost, now_ms
                 )
-            elif alg == "sliding_window":
-                limit = plan.limit_per_window or (plan.bucket_capacity or 0)
-                window_sec = plan.window_seconds or 60
-                decision = await self._map[alg](
-                    self.redis,
-                    key,
-                    limit=int(limit),
-                    window_sec=int(window_sec),
-                    cost=int(cost),
-                )
-            elif alg == "concurrency":
-                limit = plan.concurrency_limit or 1
-                ttl_sec = plan.window_seconds or 60
-                decision = await self._map[alg](
-                    self.redis,
-                    key,
-                    limit=int(limit),
-                    ttl_sec=int(ttl_sec),
-                    cost=int(cost),
+            elif ex.durable:
+                decision = await self._debit_period(
+                    ex, key, (tid, resource, subject), cost, now_ms
                 )
             else:
-                capacity = plan.bucket_capacity or (plan.limit_per_window or 0)
-                refill = plan.refill_rate_per_sec or 0.0
-                decision = await self._map["token_bucket"](
-                    self.redis,
+                decision = await ex.debit(
+                    self.backend,
                     key,
-                    capacity=int(capacity),
-                    refill_rate_per_sec=float(refill),
-                    cost=int(cost),
+                    ex.limit,
+                    1,
+                    cost,
+                    now_ms,
+                    ex.adaptive_key(tid, resource),
                 )
             return decision
         finally:
-            dur_ms = (time.perf_counter() - start) * 1000.0
-            DECISION_LATENCY_MS.observe(dur_ms)
-            (
-                REQUESTS_TOTAL.labels(route="engine.check", outcome="allowed").inc()
-                if "decision" in locals() and decision.allowed
-                else REQUESTS_TOTAL.labels(
-                    route="engine.check", outcome="blocked"
-                ).inc()
-            )
+            DECISION_LATENCY_MS.observe((time.perf_counter() - start) * 1000.0)
+            allowed = decision is not None and decision.allowed
+            self._outcomes[allowed].inc()
+            if decision is not None:
+                self._observe(tid, resource, subject, cost, allowed, now_ms)
             update_redis_pool_gauge(self.redis)
 
+    def _observe(
+        self, tid, resource, subject, cost, allowed, now_ms, capture=True
+    ) -> None:
+        # The limiter has already debited: bookkeeping that fails must not
+        # turn the decision into an error
+        try:
+            self.usage.record(tid, resource, allowed, cost)
+            self.heavy_hitters.record(tid, resource, subject, allowed)
+            if capture:
+                self.capture.record(tid, resource, subject, cost, allowed, now_ms)
+        except Exception as e:
+            log.bind(error=repr(e)).warning("engine.observe_failed")
+
+    def _reservation_keys(self, ex: PlanExecutor, tid, subject, resource, now_ms):
+        if ex.algorithm != "token_bucket":
+            raise ValueError("acquire needs a token_bucket plan")
+        return (
+            ex.key(tid, subject, resource, now_ms),
+            rl_key_reservations(tid, subject, resource, self.compact_keys),
+        )
+
+    async def acquire(
+        self,
+        *,
+        tenant_id,
+        subject: str,
+        resource: str,
+        cost: int,
+        plan: Plan,
+        max_wait_ms: int,
+    ) -> AcquireDecision:
+        """Take ``cost`` tokens now, or reserve the earliest slot at most
+        ``max_wait_ms`` away by putting the bucket into debt.
+
+        Reservations debit the plain bucket key, never hot-key sub-keys.
+        """
+        ex = self.executor(plan)
+        tid = str(tenant_id)
+        cost = int(cost)
+        now_ms = self.clock()
+        key, queue_key = self._reservation_keys(ex, tid, subject, resource, now_ms)
+        reservation_id = secrets.token_hex(8)
+        res = await self.backend.reserve(
+            key,
+            queue_key,
+            capacity=ex.limit,
+            refill_rate_per_sec=ex.refill_rate_per_sec,
+            cost=cost,
+            max_wait_ms=int(max_wait_ms),
+            max_queue=self.settings.ACQUIRE_MAX_QUEUE,
+            reservation_id=reservation_id,
+            now_ms=now_ms,
+            adaptive_key=ex.adaptive_key(tid, resource),
+        )
+        allowed = res.status in (acquire_strategy.GRANTED, acquire_strategy.QUEUED)
+        queued = res.status == acquire_strategy.QUEUED
+        outcome = {
+            acquire_strategy.GRANTED: "granted",
+            acquire_strategy.QUEUED: "queued",
+            acquire_strategy.TOO_LATE: "too_late",
+            acquire_strategy.QUEUE_FULL: "queue_full",
+        }[res.status]
+        ACQUIRE_RESULTS.labels(outcome=outcome).inc()
+        if queued:
+            ACQUIRE_WAIT_MS.observe(res.wait_ms)
+        self._outcomes[allowed].inc()
+        self._observe(tid, resource, subject, cost, allowed, now_ms, capture=False)
+
+        retry_after_ms = 0 if allowed else res.wait_ms
+        reset_at = math.ceil((now_ms + res.wait_ms) / 1000)
+        return AcquireDecision(
+            allowed=allowed,
+            remaining=res.remaining,
+            limit=res.limit,
+            reset_at=reset_at,
+            retry_after_ms=retry_after_ms,
+            algorithm="token_bucket",
+            headers={
+                "X-RateLimit-Limit": str(res.limit),
+                "X-RateLimit-Remaining": str(res.remaining),
+                "X-RateLimit-Reset": str(reset_at),
+                "Retry-After": str(math.ceil(retry_after_ms / 1000)),
+            },
+            wait_ms=res.wait_ms if queued else 0,
+            slot_at_ms=now_ms + (res.wait_ms if queued else 0),
+            queue_depth=res.depth,
+            reservation_id=f"{reservation_id}:{cost}" if queued else None,
+        )
+
+    async def cancel_reservation(
+        self, *, tenant_id, subject: str, resource: str, plan: Plan, reservation_id
+    ) -> bool:
+        """Give back a reservation whose slot has not come yet."""
+        ex = self.executor(plan)
+        tid = str(tenant_id)
+        now_ms = self.clock()
+        key, queue_key = self._reservation_keys(ex, tid, subject, resource, now_ms)
+        cancelled = await self.backend.cancel_reservation(
+            key, queue_key, member=reservation_id, now_ms=now_ms
+        )
+        if cancelled:
+            ACQUIRE_RESULTS.labels(outcome="cancelled").inc()
+        return cancelled
+
+    async def feedback(
+        self,
+        *,
+        tenant_id,
+        resource: str,
+        plan: Plan,
+        congested: bool,
+        count: int = 1,
+    ) -> tuple[float, bool]:
+        """Move an adaptive plan's limit for ``resource``: additive increase
+        for healthy requests, multiplicative decrease when congested.
+
+        Returns the new limit and whether this report cut it.
+        """
+        ex = self.executor(plan)
+        key = ex.adaptive_key(str(tenant_id), resource)
+        if key is None:
+            raise ValueError("plan is not adaptive")
+        lo, hi = ex.bounds
+        s = self.settings
+        return await self.backend.adapt(
+            key,
+            base=min(max(ex.limit, lo), hi),
+            min_limit=lo,
+            max_limit=hi,
+            congested=congested,
+            count=count,
+            step=s.ADAPTIVE_INCREASE_STEP,
+            factor=s.ADAPTIVE_DECREASE_FACTOR,
+            cooldown_ms=s.ADAPTIVE_COOLDOWN_MS,
+            ttl_sec=s.ADAPTIVE_STATE_TTL_SEC,
+            now_ms=self.clock(),
+        )
+
     @staticmethod
     def headers(decision: CheckDecision) -> dict[str, str]:
         return decision.headers
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+from typing import Awaitable, Optional
+
+from app.db.models import PlanAlgorithm
+from app.rl.keys import (
+    rl_key_adaptive,
+    rl_key_compact,
+    rl_key_conc,
+    rl_key_fixed_window,
+    rl_key_period_quota,
+    rl_key_sliding,
+    rl_key_token_bucket,
+)
+from app.rl.schemas import CheckDecision
+from app.rl.strategies.period_quota import Period, period_bounds
+
+# Attribute the compiled executor is kept under on a (cached) plan object
+_ATTR = "_lf_executor"
+
+
+class PlanExecutor:
+    """One plan's algorithm with its parameters resolved and coerced once.
+
+    Built by ``compile_plan`` and never mutated afterwards. ``key`` and
+    ``debit`` are the only per-check work; subclasses bind the backend call
+    for their algorithm, so there is no dispatch on the algorithm name.
+
+    ``bounds`` is ``(min, max)`` for adaptive plans, else None. ``durable``
+    executors keep counts that outlive Redis; the engine debits them with
+    ``debit_period`` and persists what they allow.
+    """
+
+    __slots__ = ("limit", "window_sec", "compact", "shardable", "bounds")
+
+    algorithm = "token_bucket"
+    durable = False
+
+    def __init__(self, plan, compact: bool):
+        self.window_sec = int(plan.window_seconds or 60)
+        self.limit = self._limit(plan)
+        self.compact = compact
+        # Hot-key sharding splits token_bucket / fixed_window limits only
+        self.shardable = False
+        self.bounds = None
+        if getattr(plan, "adaptive", False):
+            hi = int(plan.adaptive_max_limit or self.limit or 1)
+            self.bounds = (min(int(plan.adaptive_min_limit or 1), hi), hi)
+
+    @staticmethod
+    def _limit(plan) -> int:
+        return int(plan.limit_per_window or (plan.bucket_capacity or 0))
+
+    def key(self, tenant_id: str, subject: str, resource: str, now_ms: int) -> str:
+        raise NotImplementedError
+
+    def epoch(self, now_ms: int) -> Optional[int]:
+        # Window a key belongs to, for windowed algorithms
+        return None
+
+    def adaptive_key(self, tenant_id: str, resource: str) -> Optional[str]:
+        if self.bounds is None:
+            return None
+        return rl_key_adaptive(tenant_id, resource, self.compact)
+
+    def debit(
+        self,
+        backend,
+        key: str,
+        share: int,
+        shards: int,
+        cost: int,
+        now_ms: int,
+        adaptive_key: Optional[str] = None,
+    ) -> Awaitable[CheckDecision]:
+        raise NotImplementedError
+
+
+class TokenBucketExecutor(PlanExecutor):
+    __slots__ = ("refill_rate_per_sec",)
+
+    def __init__(self, plan, compact: bool):
+        super().__init__(plan, compact)
+        self.refill_rate_per_sec = float(plan.refill_rate_per_sec or 0.0)
+        # A shard's 1/N share cannot follow a limit that moves
+        self.shardable = self.bounds is None
+
+    @staticmethod
+    def _limit(plan) -> int:
+        return int(plan.bucket_capacity or (plan.limit_per_window or 0))
+
+    def key(self, tenant_id, subject, resource, now_ms):
+        if self.compact:
+            return rl_key_compact("token_bucket", tenant_id, subject, resource)
+        return rl_key_token_bucket(tenant_id, subject, resource)
+
+    def debit(self, backend, key, share, shards, cost, now_ms, adaptive_key=None):
+        return backend.token_bucket(
+            key,
+            capacity=share,
+            refill_rate_per_sec=self.refill_rate_per_sec / shards,
+            cost=cost,
+            now_ms=now_ms,
+            adaptive_key=adaptive_key,
+        )
+
+
+class FixedWindowExecutor(PlanExecutor):
+    __slots__ = ()
+
+    algorithm = "fixed_window"
+
+    def __init__(self, plan, compact: bool):
+        super().__init__(plan, compact)
+        self.shardable = self.bounds is None
+
+    def epoch(self, now_ms):
+        return now_ms // 1000 // self.window_sec
+
+    def key(self, tenant_id, subject, resource, now_ms):
+        window_start = self.epoch(now_ms) * self.window_sec
+        if self.compact:
+            return rl_key_compact(
+                "fixed_window", tenant_id, subject, resource, window_start
+            )
+        return rl_key_fixed_window(tenant_id, subject, resource, window_start)
+
+    def debit(self, backend, key, share, shards, cost, now_ms, adaptive_key=None):
+        return backend.fixed_window(
+            key,
+            limit=share,
+            window_sec=self.window_sec,
+            cost=cost,
+            now_ms=now_ms,
+            adaptive_key=adaptive_key,
+        )
+
+
+class SlidingWindowExecutor(PlanExecutor):
+    __slots__ = ()
+
+    algorithm = "sliding_window"
+
+    def key(self, tenant_id, subject, resource, now_ms):
+        if self.compact:
+            return rl_key_compact("sliding_window", tenant_id, subject, resource)
+        return rl_key_sliding(tenant_id, subject, resource)
+
+    def debit(self, backend, key, share, shards, cost, now_ms, adaptive_key=None):
+        return backend.sliding_window(
+            key,
+            limit=share,
+            window_sec=self.window_sec,
+            cost=cost,
+            now_ms=now_ms,
+            adaptive_key=adaptive_key,
+        )
+
+
+class ConcurrencyExecutor(PlanExecutor):
+    __slots__ = ()
+
+    algorithm = "concurrency"
+
+    def __init__(self, plan, compact: bool):
+        super().__init__(plan, compact)
+        # Slots are released by the caller; there is no rate to adapt
+        self.bounds = None
+
+    @staticmethod
+    def _limit(plan) -> int:
+        return int(plan.concurrency_limit or 1)
+
+    def key(self, tenant_id, subject, resource, now_ms):
+        if self.compact:
+            return rl_key_compact("concurrency", tenant_id, subject, resource)
+        return rl_key_conc(tenant_id, subject, resource)
+
+    def debit(self, backend, key, share, shards, cost, now_ms, adaptive_key=None):
+        # window_seconds doubles as the slot TTL
+        return backend.concurrency(
+            key, limit=share, ttl_sec=self.window_sec, cost=cost, now_ms=now_ms
+        )
+
+
+class PeriodQuotaExecutor(PlanExecutor):
+    __slots__ = ("period", "timezone")
+
+    algorithm = "period_quota"
+    durable = True
+
+    def __init__(self, plan, compact: bool):
+        super().__init__(plan, compact)
+        self.period = plan.quota_period or "day"
+        self.timezone = plan.quota_timezone or "UTC"
+        # A budget over days is not a rate to adapt
+        self.bounds = None
+
+    def current(self, now_ms: int) -> Period:
+        return period_bounds(self.period, self.timezone, now_ms)
+
+    def epoch(self, now_ms):
+        return self.current(now_ms).start_ms // 1000
+
+    def key(self, tenant_id, subject, resource, now_ms):
+        return rl_key_period_quota(
+            tenant_id, subject, resource, self.current(now_ms).label, self.compact
+        )
+
+    def debit_period(self, backend, key, cost, now_ms):
+        # (decision, whether the counter holds its stored count yet)
+        return backend.period_quota(
+            key,
+            limit=self.limit,
+            cost=cost,
+            end_ms=self.current(now_ms).end_ms,
+            now_ms=now_ms,
+        )
+
+    async def debit(self, backend, key, share, shards, cost, now_ms, adaptive_key=None):
+        decision, _loaded = await self.debit_period(backend, key, cost, now_ms)
+        return decision
+
+
+_EXECUTORS = {
+    "token_bucket": TokenBucketExecutor,
+    "fixed_window": FixedWindowExecutor,
+    "sliding_window": SlidingWindowExecutor,
+    "concurrency": ConcurrencyExecutor,
+    "period_quota": PeriodQuotaExecutor,
+}
+
+
+def compile_plan(plan, compact: bool) -> PlanExecutor:
+    """The plan's executor, built on first use and kept on the plan object.
+
+    Plans live in ``plan_cache``, so the executor is cached (and dropped on
+    invalidation) together with its plan. Unknown algorithms fall back to a
+    token bucket, as they always have.
+    """
+    ex = getattr(plan, _ATTR, None)
+    if ex is not None and ex.compact == compact:
+        return ex
+    alg = (
+        plan.algorithm.value
+        if isinstance(plan.algorithm, PlanAlgorithm)
+        else str(plan.algorithm)
+    )
+    ex = _EXECUTORS.get(alg, TokenBucketExecutor)(plan, compact)
+    try:
+        setattr(plan, _ATTR, ex)
+    except AttributeError:
+        pass
+    return ex
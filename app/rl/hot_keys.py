@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import random
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+log = get_logger("rl.hot_keys")
+
+# Sub-keys of a sharded limiter key: "<key>#<shard>". "#" never occurs in a
+# request path or in the base62 parts of compact keys.
+SHARD_SEP = "#"
+
+
+def shard_key(key: str, shard: int) -> str:
+    return f"{key}{SHARD_SEP}{shard}"
+
+
+def split_shard(key: str) -> tuple[str, Optional[int]]:
+    base, sep, shard = key.rpartition(SHARD_SEP)
+    if sep and shard.isdigit():
+        return base, int(shard)
+    return key, None
+
+
+def split_limit(total: int, shards: int, shard: int, rotate: int = 0) -> int:
+    # Shares sum exactly to ``total``; the ``total % shards`` leftover units
+    # go to ``shards`` starting at ``rotate``
+    base, extra = divmod(total, shards)
+    return base + (1 if (shard - rotate) % shards < extra else 0)
+
+
+class _Entry:
+    __slots__ = ("start", "count", "hot_until", "rr", "epoch", "epoch_shards")
+
+    def __init__(self, now: float, shards: int):
+        self.start = now
+        self.count = 0
+        self.hot_until = 0.0
+        self.rr = random.randrange(shards)
+        self.epoch: Optional[int] = None
+        self.epoch_shards = 1
+
+
+class HotKeys:
+    """Per-process hot key detection and round-robin sub-key routing.
+
+    A key seen more than ``threshold_per_sec`` times within one second by
+    this worker is hot for the next ``hold_sec``; every hit while hot
+    extends that. Hot keys are routed round-robin over ``shards`` sub-keys
+    (starting from a random offset per worker). Callers with windowed state
+    pass ``epoch`` so the shard count only changes at a window boundary. At
+    most ``max_tracked`` keys are tracked, least recently seen first out.
+    """
+
+    def __init__(
+        self,
+        threshold_per_sec: int,
+        shards: int,
+        hold_sec: float,
+        max_tracked: int,
+        enabled: bool = True,
+    ):
+        self.threshold_per_sec = threshold_per_sec
+        self.shards = max(1, shards)
+        self.hold_sec = hold_sec
+        self.max_tracked = max_tracked
+        self.enabled = enabled and self.shards > 1
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_hot(self, ident: tuple, now: Optional[float] = None) -> bool:
+        e = self._entries.get(ident)
+        return e is not None and e.hot_until > (
+            now if now is not None else time.monotonic()
+        )
+
+    def layout(
+        self, ident: tuple, now: Optional[float] = None, epoch: Optional[int] = None
+    ) -> int:
+        # Shard count ``route`` is currently using, without recording a hit
+        if not self.enabled:
+            return 1
+        e = self._entries.get(ident)
+        if e is None:
+            return 1
+        if epoch is not None and e.epoch == epoch:
+            return e.epoch_shards
+        now = now if now is not None else time.monotonic()
+        return self.shards if e.hot_until > now else 1
+
+    def route(
+        self, ident: tuple, now: Optional[float] = None, epoch: Optional[int] = None
+    ) -> tuple[int, int]:
+        """Record a hit on ``ident``; return ``(shards, shard)`` to debit.
+
+        ``(1, 0)`` means "use the key as is".
+        """
+        if not self.enabled:
+            return 1, 0
+        now = now if now is not None else time.monotonic()
+        e = self._entries.get(ident)
+        if e is None:
+            e = self._entries[ident] = _Entry(now, self.shards)
+            if len(self._entries) > self.max_tracked:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(ident)
+        if now - e.start >= 1.0:
+            e.start, e.count = now, 0
+        e.count += 1
+        if e.count > self.threshold_per_sec:
+            if e.hot_until <= now:
+                log.bind(key=":".join(map(str, ident))).info("hot_keys.detected")
+            e.hot_until = now + self.hold_sec
+        n = self.shards if e.hot_until > now else 1
+        if epoch is not None:
+            # Windowed state: keep one layout for the whole window
+            if e.epoch != epoch:
+                e.epoch, e.epoch_shards = epoch, n
+            n = e.epoch_shards
+        if n == 1:
+            return 1, 0
+        e.rr = (e.rr + 1) % n
+        return n, e.rr
+
+
+hot_keys = HotKeys(
+    settings.HOT_KEY_THRESHOLD_PER_SEC,
+    settings.HOT_KEY_SHARDS,
+    settings.HOT_KEY_HOLD_SEC,
+    settings.HOT_KEY_MAX_TRACKED,
+    enabled=settings.HOT_KEY_SHARDING,
+)
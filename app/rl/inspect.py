@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import base64
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from app.core.config import settings
+from app.rl.hot_keys import split_shard
+from app.rl.keys import COMPACT_TAGS, tenant_token, unb62
+from app.rl.strategies.sliding_window import SUM_MEMBER, decode_sum
+from app.rl.strategies.token_bucket_packed import MICRO, unpack
+
+ALGORITHMS = {
+    "tb": "token_bucket",
+    "fw": "fixed_window",
+    "sw": "sliding_window",
+    "cc": "concurrency",
+    **{tag: alg for alg, tag in COMPACT_TAGS.items()},
+}
+
+# Resources look like "GET:/orders" or "*:/admin/**"; subjects may contain
+# ":" too ("user:1"), so split at the first segment that starts a resource.
+_RESOURCE_RE = re.compile(r"^(?P<subject>.*?):(?P<resource>[A-Z*]+:/.*)$")
+_GLOB_SPECIAL = re.compile(r"([*?\[\]\\])")
+
+
+def encode_cursor(tenant_id: str, cursor: int) -> str:
+    raw = json.dumps({"t": tenant_id, "c": cursor}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(tenant_id: str, token: Optional[str]) -> int:
+    if not token:
+        return 0
+    try:
+        pad = "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(token + pad))
+        cursor = int(data["c"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("invalid cursor")
+    # A cursor is only meaningful for the tenant it was issued for
+    if data.get("t") != tenant_id or cursor < 0:
+        raise ValueError("invalid cursor")
+    return cursor
+
+
+def match_pattern(tenant_id: str, subject: Optional[str] = None) -> str:
+    tenant = tenant_token(tenant_id)
+    if subject is None:
+        return f"lf:*:{tenant}:*"
+    escaped = _GLOB_SPECIAL.sub(r"\\\1", subject)
+    return f"lf:*:{tenant}:{escaped}:*"
+
+
+def parse_key(key: str) -> Optional[dict[str, Any]]:
+    parts = key.split(":", 3)
+    if len(parts) < 4 or parts[1] not in ALGORITHMS:
+        return None
+    alg = parts[1]
+    # Sub-key of a sharded hot key: "<key>#<shard>"
+    rest, shard = split_shard(parts[3])
+    item: dict[str, Any] = {"key": key, "algorithm": ALGORITHMS[alg]}
+    if shard is not None:
+        item["shard"] = shard
+    if alg in COMPACT_TAGS.values():
+        # "<subject>:<resource digest>[:<base62 window>]"; the resource
+        # string itself is not recoverable from the digest
+        item["encoding"] = "compact"
+        if alg == "f":
+            rest, _, window = rest.rpartition(":")
+            item["window_start"] = unb62(window) if window.isalnum() else None
+        subject, _, digest = rest.rpartition(":")
+        item["subject"] = subject or None
+        item["resource"] = None
+        item["resource_id"] = digest
+        return item
+    item["encoding"] = "plain"
+    if alg == "fw":
+        rest, _, window = rest.rpartition(":")
+        item["window_start"] = int(window) if window.isdigit() else None
+    m = _RESOURCE_RE.match(rest)
+    item["subject"] = m.group("subject") if m else None
+    item["resource"] = m.group("resource") if m else None
+    return item
+
+
+def _queue_reads(pipe, item: dict) -> None:
+    key, alg = item["key"], item["algorithm"]
+    if alg == "token_bucket" and item["encoding"] == "plain":
+        pipe.hmget(key, "tokens", "ts")
+    elif alg == "sliding_window":
+        pipe.zcard(key)
+        pipe.zscore(key, SUM_MEMBER)
+        pipe.zrangebyscore(key, 0, "+inf", start=0, num=1, withscores=True)
+    elif alg == "fixed_window" and settings.REPLICATION_MODE == "crdt":
+        # Per-region counts (see crdt_fixed_window.lua)
+        pipe.hgetall(key)
+    else:
+        pipe.get(key)
+    pipe.pttl(key)
+
+
+def _decode(item: dict, results: Iterator) -> Optional[dict]:
+    alg = item["algorithm"]
+    if alg == "token_bucket" and item["encoding"] == "compact":
+        packed, ttl = next(results), next(results)
+        micro, ts = unpack(packed) if packed else (None, None)
+        state = {
+            "tokens": micro / MICRO if micro is not None else None,
+            "updated_ms": ts,
+        }
+    elif alg == "token_bucket":
+        (tokens, ts), ttl = next(results), next(results)
+        state = {
+            "tokens": float(tokens) if tokens is not None else None,
+            "updated_ms": int(float(ts)) if ts is not None else None,
+        }
+    elif alg == "sliding_window":
+        count, total, first, ttl = (next(results) for _ in range(4))
+        state = {
+            "events": int(count) - (total is not None),
+            "cost_sum": decode_sum(total) if total is not None else None,
+            "oldest_ms": int(first[0][1]) if first else None,
+        }
+    elif alg == "fixed_window" and settings.REPLICATION_MODE == "crdt":
+        regions, ttl = next(results), next(results)
+        counts = {region: int(v) for region, v in regions.items()}
+        state = {"count": sum(counts.values()), "regions": counts}
+    else:
+        value, ttl = next(results), next(results)
+        n = int(value) if value is not None else None
+        state = {"count": n} if alg == "fixed_window" else {"in_flight": n}
+    ttl = int(ttl)
+    if ttl == -2:
+        # Expired between SCAN and the read
+        return None
+    item["state"] = state
+    item["ttl_ms"] = ttl if ttl >= 0 else None
+    return item
+
+
+async def scan_tenant_state(
+    redis,
+    tenant_id: str,
+    cursor: int = 0,
+    subject: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> AsyncIterator[dict]:
+    """Walk a tenant's limiter keys with SCAN and yield decoded states.
+
+    Work per call is bounded by INSPECT_MAX_SCAN_CALLS SCAN round trips of
+    COUNT INSPECT_SCAN_COUNT, INSPECT_TIME_BUDGET_MS, and ``limit`` items
+    (checked between batches, so a call may overshoot by one batch). The
+    last item yielded is ``{"done": True, "cursor": ...}``; ``cursor`` is
+    None once the keyspace has been fully walked.
+    """
+    limit = limit or settings.INSPECT_MAX_ITEMS
+    pattern = match_pattern(tenant_id, subject)
+    deadline = time.perf_counter() + settings.INSPECT_TIME_BUDGET_MS / 1000.0
+    scanned = returned = 0
+    for _ in range(settings.INSPECT_MAX_SCAN_CALLS):
+        cursor, keys = await redis.scan(
+            cursor, match=pattern, count=settings.INSPECT_SCAN_COUNT
+        )
+        items = [it for it in map(parse_key, keys) if it is not None]
+        scanned += len(keys)
+        if items:
+            pipe = redis.pipeline(transaction=False)
+            for it in items:
+                _queue_reads(pipe, it)
+            results = iter(await pipe.execute())
+            for it in items:
+                decoded = _decode(it, results)
+                if decoded is None:
+                    continue
+                returned += 1
+                yield decoded
+        if cursor == 0 or returned >= limit or time.perf_counter() >= deadline:
+            break
+    yield {
+        "done": True,
+        "cursor": encode_cursor(tenant_id, cursor) if cursor else None,
+        "scanned": scanned,
+        "returned": returned,
+    }
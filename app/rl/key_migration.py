@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from app.core.logging import get_logger
+from app.rl.hot_keys import shard_key
+from app.rl.inspect import parse_key
+from app.rl.keys import rl_key_compact
+from app.rl.strategies.token_bucket_packed import MICRO, pack
+
+log = get_logger("rl.key_migration")
+
+
+@dataclass
+class MigrationReport:
+    scanned: int = 0
+    migrated: int = 0
+    skipped: int = 0
+    deleted: int = 0
+
+
+def compact_key_for(item: dict, tenant: str) -> str:
+    key = rl_key_compact(
+        item["algorithm"],
+        tenant,
+        item["subject"],
+        item["resource"],
+        item.get("window_start"),
+    )
+    return key if item.get("shard") is None else shard_key(key, item["shard"])
+
+
+async def migrate_to_compact(
+    redis, scan_count: int = 1000, delete_old: bool = False
+) -> MigrationReport:
+    """Copy live plain-encoded limiter state to compact keys.
+
+    Token buckets are repacked ("<micro_tokens>:<ts_ms>"); other state is
+    copied verbatim with DUMP/RESTORE. TTLs carry over. Keys whose subject
+    and resource cannot be told apart are skipped and left to expire. Run it
+    right after switching KEY_ENCODING so buckets do not refill on switch.
+    """
+    report = MigrationReport()
+    cursor = 0
+    while True:
+        cursor, keys = await redis.scan(cursor, match="lf:??:*", count=scan_count)
+        items = []
+        for key in keys:
+            item = parse_key(key)
+            if item is None or item["encoding"] != "plain":
+                continue
+            report.scanned += 1
+            if item["subject"] is None:
+                report.skipped += 1
+                continue
+            items.append(item)
+
+        if items:
+            pipe = redis.pipeline(transaction=False)
+            for it in items:
+                if it["algorithm"] == "token_bucket":
+                    pipe.hmget(it["key"], "tokens", "ts")
+                else:
+                    pipe.dump(it["key"])
+                pipe.pttl(it["key"])
+            reads = iter(await pipe.execute())
+
+            pipe = redis.pipeline(transaction=False)
+            moved = []
+            for it in items:
+                value, ttl = next(reads), int(next(reads))
+                if ttl == -2 or value is None or value == [None, None]:
+                    continue
+                new_key = compact_key_for(it, it["key"].split(":", 3)[2])
+                if it["algorithm"] == "token_bucket":
+                    tokens, ts = value
+                    packed = pack(round(float(tokens) * MICRO), int(float(ts)))
+                    pipe.set(new_key, packed, px=ttl if ttl > 0 else None)
+                else:
+                    pipe.restore(new_key, max(ttl, 0), value, replace=True)
+                moved.append(it["key"])
+            if moved:
+                await pipe.execute()
+                report.migrated += len(moved)
+                if delete_old:
+                    pipe = redis.pipeline(transaction=False)
+                    for key in moved:
+                        pipe.unlink(key)
+                    await pipe.execute()
+                    report.deleted += len(moved)
+        if cursor == 0:
+            break
+    log.bind(**report.__dict__).info("key_migration.done")
+    return report
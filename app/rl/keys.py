@@ -1,3 +1,10 @@
+import hashlib
+import uuid
+from functools import lru_cache
+
+from app.core.config import settings
+
+
 def bucket_key(namespace: str, subject: str, name: str) -> str:
     return f"rl:{namespace}:{subject}:{name}"
 
@@ -27,3 +34,111 @@ def rl_key_sliding(tenant_id: str, subject: str, resource: str) -> str:
 
 def rl_key_conc(tenant_id: str, subject: str, resource: str) -> str:
     return f"lf:cc:{tenant_id}:{subject}:{resource}"
+
+
+# AIMD limit of an adaptive plan; one per tenant + resource, shared by
+# every subject
+def rl_key_adaptive(tenant_id: str, resource: str, compact: bool = False) -> str:
+    if compact:
+        return f"lf:a:{compact_tenant(tenant_id)}:{compact_resource(resource)}"
+    return f"lf:al:{tenant_id}:{resource}"
+
+
+# Pending /v1/acquire reservations against a token bucket (ZSET scored by
+# slot time); never listed or reset as limiter state
+def rl_key_reservations(
+    tenant_id: str, subject: str, resource: str, compact: bool = False
+) -> str:
+    if compact:
+        return (
+            f"lf:q:{compact_tenant(tenant_id)}:{subject}:{compact_resource(resource)}"
+        )
+    return f"lf:rq:{tenant_id}:{subject}:{resource}"
+
+
+# Daily / monthly quota counter, one per period. The count is durable in the
+# database (period_counts), so this is not listed or reset as limiter state
+def rl_key_period_quota(
+    tenant_id: str, subject: str, resource: str, period: str, compact: bool = False
+) -> str:
+    if compact:
+        return (
+            f"lf:p:{compact_tenant(tenant_id)}:{subject}:"
+            f"{compact_resource(resource)}:{period}"
+        )
+    return f"lf:pq:{tenant_id}:{subject}:{resource}:{period}"
+
+
+# Compact encoding (KEY_ENCODING=compact): one-letter algorithm tags, base62
+# tenant ids (22 chars instead of 36) and a 64-bit base62 digest in place of
+# the resource string, e.g. "lf:t:1vCEzgUNk0fZ3kJm0BxR2a:user:1:5mcvAsYcjB2".
+_B62 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+COMPACT_TAGS = {
+    "token_bucket": "t",
+    "fixed_window": "f",
+    "sliding_window": "s",
+    "concurrency": "c",
+}
+
+
+def b62(n: int) -> str:
+    if n == 0:
+        return "0"
+    out = []
+    while n:
+        n, r = divmod(n, 62)
+        out.append(_B62[r])
+    return "".join(reversed(out))
+
+
+def unb62(s: str) -> int:
+    n = 0
+    for ch in s:
+        n = n * 62 + _B62.index(ch)
+    return n
+
+
+@lru_cache(maxsize=65536)
+def compact_tenant(tenant_id: str) -> str:
+    try:
+        return b62(uuid.UUID(str(tenant_id)).int)
+    except ValueError:
+        return str(tenant_id)
+
+
+def resource_id(resource: str) -> int:
+    # 64-bit digest naming a resource in compact keys and binary traces
+    digest = hashlib.blake2b(resource.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+@lru_cache(maxsize=65536)
+def compact_resource(resource: str) -> str:
+    return b62(resource_id(resource))
+
+
+def rl_key_compact(
+    algorithm: str,
+    tenant_id: str,
+    subject: str,
+    resource: str,
+    window_epoch: int | None = None,
+) -> str:
+    key = (
+        f"lf:{COMPACT_TAGS[algorithm]}:{compact_tenant(tenant_id)}:{subject}:"
+        f"{compact_resource(resource)}"
+    )
+    return key if window_epoch is None else f"{key}:{b62(window_epoch)}"
+
+
+def tenant_token(tenant_id, encoding: str | None = None) -> str:
+    # How the tenant appears in limiter keys under the active encoding
+    if (encoding or settings.KEY_ENCODING) == "compact":
+        return compact_tenant(str(tenant_id))
+    return str(tenant_id)
+
+
+def resource_token(resource: str, encoding: str | None = None) -> str:
+    if (encoding or settings.KEY_ENCODING) == "compact":
+        return compact_resource(resource)
+    return resource
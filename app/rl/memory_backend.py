@@ -0,0 +1,485 @@
+"""In-process limiter state (LIMITER_BACKEND=memory).
+
+For single-node deployments and fast deterministic tests: no network round
+trip, and nothing survives a restart or is shared between processes. Keys
+hash onto ``shards`` independent dicts, each with its own lock and timing
+wheel, so threads working on different keys rarely contend. An operation
+never awaits while holding its shard lock, which makes it as atomic as the
+Lua scripts it mirrors; decisions match the Redis backend's for the same
+``now_ms``.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from collections import deque
+from typing import Hashable, Optional
+
+from app.core.config import settings
+from app.rl.quota import QuotaSpec, with_effective_limit
+from app.rl.schemas import CheckDecision
+from app.rl.strategies import acquire, adaptive, period_quota
+from app.rl.strategies.token_bucket_packed import MICRO
+
+
+class _Entry:
+    # value: micro-tokens (token bucket), counter (fixed window, concurrency,
+    #        period quota), cost sum of the log (sliding window) or AIMD
+    #        limit (adaptive)
+    # aux:   last refill ms (token bucket), deque of (ms, cost) (sliding),
+    #        last cut ms (adaptive), {member: slot ms} (reservations) or
+    #        whether the stored count was added (period quota)
+    __slots__ = ("value", "aux", "deadline")
+
+    def __init__(self, value, aux, deadline: int):
+        self.value = value
+        self.aux = aux
+        self.deadline = deadline
+
+
+class TimingWheel:
+    """Keys bucketed by the tick their deadline falls in.
+
+    ``advance`` hands back the keys of every bucket whose tick has fully
+    passed, visiting each bucket at most once per call. The wheel only
+    remembers keys, not deadlines: a key can sit in a stale bucket after its
+    deadline moved, or come due a turn early when its deadline is more than
+    ``slots`` ticks out, so callers re-check the real deadline.
+    """
+
+    def __init__(self, slots: int, tick_ms: int):
+        self.slots = max(1, slots)
+        self.tick_ms = max(1, tick_ms)
+        self._buckets: list[set] = [set() for _ in range(self.slots)]
+        self._done: Optional[int] = None  # last tick fully processed
+
+    def schedule(self, key: Hashable, deadline_ms: int) -> None:
+        self._buckets[(deadline_ms // self.tick_ms) % self.slots].add(key)
+
+    def advance(self, now_ms: int) -> list:
+        tick = now_ms // self.tick_ms
+        if self._done is None:
+            self._done = tick - 1
+            return []
+        due: list = []
+        for t in range(self._done + 1, min(tick, self._done + 1 + self.slots)):
+            bucket = self._buckets[t % self.slots]
+            if bucket:
+                due.extend(bucket)
+                bucket.clear()
+        self._done = max(self._done, tick - 1)
+        return due
+
+
+class _Shard:
+    __slots__ = ("lock", "entries", "wheel")
+
+    def __init__(self, slots: int, tick_ms: int):
+        self.lock = threading.Lock()
+        self.entries: dict[str, _Entry] = {}
+        self.wheel = TimingWheel(slots, tick_ms)
+
+
+def _decision(
+    algorithm: str,
+    allowed: bool,
+    remaining: int,
+    limit: int,
+    reset_at: int,
+    retry_after_ms: int,
+) -> CheckDecision:
+    return CheckDecision(
+        allowed=allowed,
+        remaining=remaining,
+        limit=limit,
+        reset_at=reset_at,
+        retry_after_ms=retry_after_ms,
+        algorithm=algorithm,
+        headers={
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(reset_at),
+            "Retry-After": str(math.ceil(retry_after_ms / 1000)),
+        },
+    )
+
+
+class MemoryBackend:
+    def __init__(
+        self,
+        shards: Optional[int] = None,
+        wheel_slots: Optional[int] = None,
+        tick_ms: Optional[int] = None,
+    ):
+        n = max(1, shards or settings.MEMORY_BACKEND_SHARDS)
+        slots = wheel_slots or settings.MEMORY_BACKEND_WHEEL_SLOTS
+        tick = tick_ms or settings.MEMORY_BACKEND_TICK_MS
+        self._shards = [_Shard(slots, tick) for _ in range(n)]
+
+    def __len__(self) -> int:
+        return sum(len(s.entries) for s in self._shards)
+
+    def clear(self) -> None:
+        for s in self._shards:
+            with s.lock:
+                s.entries.clear()
+
+    def _shard(self, key: str) -> _Shard:
+        return self._shards[hash(key) % len(self._shards)]
+
+    @staticmethod
+    def _expire(shard: _Shard, now_ms: int) -> None:
+        for key in shard.wheel.advance(now_ms):
+            e = shard.entries.get(key)
+            if e is None:
+                continue
+            if e.deadline <= now_ms:
+                del shard.entries[key]
+            else:
+                shard.wheel.schedule(key, e.deadline)
+
+    @staticmethod
+    def _get(shard: _Shard, key: str, now_ms: int) -> Optional[_Entry]:
+        e = shard.entries.get(key)
+        if e is not None and e.deadline <= now_ms:
+            # Due but not swept yet
+            del shard.entries[key]
+            return None
+        return e
+
+    @staticmethod
+    def _put(shard: _Shard, key: str, e: Optional[_Entry], value, aux, deadline):
+        if e is None:
+            shard.entries[key] = _Entry(value, aux, deadline)
+            shard.wheel.schedule(key, deadline)
+            return
+        tick = shard.wheel.tick_ms
+        if e.deadline // tick != deadline // tick:
+            shard.wheel.schedule(key, deadline)
+        e.value, e.aux, e.deadline = value, aux, deadline
+
+    def _open(self, key: str, now_ms: int) -> tuple[_Shard, Optional[_Entry]]:
+        # Caller holds shard.lock
+        shard = self._shard(key)
+        self._expire(shard, now_ms)
+        return shard, self._get(shard, key, now_ms)
+
+    def _effective(self, key: Optional[str], now_ms: int) -> Optional[int]:
+        # Read under its own shard lock, before the limiter key's is taken
+        if key is None:
+            return None
+        with self._shard(key).lock:
+            e = self._get(self._shard(key), key, now_ms)
+            return max(1, math.floor(e.value)) if e is not None else None
+
+    async def adapt(
+        self,
+        key,
+        *,
+        base,
+        min_limit,
+        max_limit,
+        congested,
+        count,
+        step,
+        factor,
+        cooldown_ms,
+        ttl_sec,
+        now_ms,
+    ) -> tuple[float, bool]:
+        with self._shard(key).lock:
+            shard, e = self._open(key, now_ms)
+            limit, cut_ms, cut = adaptive.next_limit(
+                e.value if e is not None else float(base),
+                e.aux if e is not None else 0,
+                min_limit=min_limit,
+                max_limit=max_limit,
+                congested=congested,
+                count=count,
+                step=step,
+                factor=factor,
+                cooldown_ms=cooldown_ms,
+                now_ms=now_ms,
+            )
+            self._put(shard, key, e, limit, cut_ms, now_ms + ttl_sec * 1000)
+        return limit, cut
+
+    async def token_bucket(
+        self, key, *, capacity, refill_rate_per_sec, cost, now_ms, adaptive_key=None
+    ) -> CheckDecision:
+        capacity, refill_rate_per_sec = adaptive.scaled(
+            capacity, refill_rate_per_sec, self._effective(adaptive_key, now_ms)
+        )
+        # Same integer micro-token arithmetic as token_bucket_packed.lua
+        cap_micro, cost_micro = capacity * MICRO, cost * MICRO
+        with self._shard(key).lock:
+            shard, e = self._open(key, now_ms)
+            micro, ts = (e.value, e.aux) if e is not None else (cap_micro, now_ms)
+            elapsed_ms = max(0, now_ms - ts)
+            if refill_rate_per_sec > 0:
+                micro = min(
+                    cap_micro,
+                    micro + math.floor(elapsed_ms * refill_rate_per_sec * 1000),
+                )
+            else:
+                micro = min(cap_micro, micro)
+            allowed = micro >= cost_micro
+            if allowed:
+                micro -= cost_micro
+            ttl_sec = (
+                math.ceil(max(capacity, capacity - micro / MICRO) / refill_rate_per_sec)
+                + 5
+                if refill_rate_per_sec > 0
+                else 3600
+            )
+            self._put(shard, key, e, micro, now_ms, now_ms + ttl_sec * 1000)
+        retry_after_ms = 0
+        if not allowed and refill_rate_per_sec > 0:
+            retry_after_ms = math.ceil(
+                (cost_micro - micro) / (refill_rate_per_sec * 1000)
+            )
+        return _decision(
+            "token_bucket",
+            allowed,
+            max(0, micro // MICRO),
+            int(capacity),
+            math.ceil((now_ms + retry_after_ms) / 1000),
+            retry_after_ms,
+        )
+
+    async def reserve(
+        self,
+        key,
+        queue_key,
+        *,
+        capacity,
+        refill_rate_per_sec,
+        cost,
+        max_wait_ms,
+        max_queue,
+        reservation_id,
+        now_ms,
+        adaptive_key=None,
+    ) -> acquire.Reservation:
+        capacity, refill_rate_per_sec = adaptive.scaled(
+            capacity, refill_rate_per_sec, self._effective(adaptive_key, now_ms)
+        )
+        cap_micro, cost_micro = capacity * MICRO, cost * MICRO
+        with self._shard(key).lock:
+            shard, e = self._open(key, now_ms)
+            micro, ts = (e.value, e.aux) if e is not None else (cap_micro, now_ms)
+            elapsed_ms = max(0, now_ms - ts)
+            if refill_rate_per_sec > 0:
+                micro = min(
+                    cap_micro,
+                    micro + math.floor(elapsed_ms * refill_rate_per_sec * 1000),
+                )
+            else:
+                micro = min(cap_micro, micro)
+            # A queue lives in its bucket's shard, so one lock covers both
+            q = self._get(shard, queue_key, now_ms)
+            slots = {m: s for m, s in q.aux.items() if s > now_ms} if q else {}
+            status, wait_ms = acquire.schedule(
+                micro,
+                cap_micro,
+                cost_micro,
+                refill_rate_per_sec,
+                max_wait_ms,
+                len(slots),
+                max_queue,
+            )
+            if status in (acquire.GRANTED, acquire.QUEUED):
+                micro -= cost_micro
+                ttl_sec = acquire.debt_ttl_sec(capacity, micro, refill_rate_per_sec)
+                self._put(shard, key, e, micro, now_ms, now_ms + ttl_sec * 1000)
+                if status == acquire.QUEUED:
+                    slots[f"{reservation_id}:{cost}"] = now_ms + wait_ms
+            if slots:
+                deadline = max(slots.values()) + 1000
+                self._put(shard, queue_key, q, None, slots, deadline)
+            elif q is not None:
+                del shard.entries[queue_key]
+        return acquire.Reservation(
+            status, max(0, micro // MICRO), capacity, wait_ms, len(slots)
+        )
+
+    async def cancel_reservation(self, key, queue_key, *, member, now_ms) -> bool:
+        with self._shard(key).lock:
+            shard, e = self._open(key, now_ms)
+            q = self._get(shard, queue_key, now_ms)
+            slot = q.aux.get(member) if q is not None else None
+            if slot is None or slot <= now_ms:
+                return False
+            del q.aux[member]
+            if e is not None:
+                e.value += int(member.rpartition(":")[2]) * MICRO
+        return True
+
+    async def fixed_window(
+        self, key, *, limit, window_sec, cost, now_ms, adaptive_key=None
+    ) -> CheckDecision:
+        limit = self._effective(adaptive_key, now_ms) or limit
+        with self._shard(key).lock:
+            shard, e = self._open(key, now_ms)
+            # Counts denied requests too, like INCRBY in fixed_window.lua
+            counter = (e.value if e is not None else 0) + cost
+            deadline = e.deadline if e is not None else now_ms + window_sec * 1000
+            self._put(shard, key, e, counter, None, deadline)
+        reset_at = now_ms // 1000 // window_sec * window_sec + window_sec
+        return _decision(
+            "fixed_window",
+            counter <= limit,
+            max(0, limit - counter),
+            limit,
+            reset_at,
+            max(0, reset_at * 1000 - now_ms),
+        )
+
+    async def sliding_window(
+        self, key, *, limit, window_sec, cost, now_ms, adaptive_key=None
+    ) -> CheckDecision:
+        limit = self._effective(adaptive_key, now_ms) or limit
+        window_ms = window_sec * 1000
+        min_score = now_ms - window_ms
+        with self._shard(key).lock:
+            shard, e = self._open(key, now_ms)
+            total, log = (e.value, e.aux) if e is not None else (0, deque())
+            while log and log[0][0] <= min_score:
+                total -= log.popleft()[1]
+            allowed = total + cost <= limit
+            if allowed:
+                total += cost
+                # Keep the log ordered if the wall clock steps back
+                log.append((max(now_ms, log[-1][0]) if log else now_ms, cost))
+            self._put(shard, key, e, total, log, now_ms + window_ms + 1000)
+            earliest = log[0][0] if log else now_ms
+        retry_after_ms = 0
+        if not allowed and log:
+            retry_after_ms = max(0, earliest + window_ms - now_ms)
+        return _decision(
+            "sliding_window",
+            allowed,
+            max(0, limit - total),
+            limit,
+            math.ceil((earliest + window_ms) / 1000),
+            retry_after_ms,
+        )
+
+    async def concurrency(self, key, *, limit, ttl_sec, cost, now_ms) -> CheckDecision:
+        with self._shard(key).lock:
+            shard, e = self._open(key, now_ms)
+            current = (e.value if e is not None else 0) + cost
+            deadline = e.deadline if e is not None else now_ms + ttl_sec * 1000
+            allowed = current <= limit
+            self._put(
+                shard, key, e, current if allowed else current - cost, None, deadline
+            )
+        # Whole seconds left, rounded like Redis TTL
+        ttl = max(0, (deadline - now_ms + 500) // 1000)
+        now_s = now_ms // 1000
+        if allowed:
+            return _decision(
+                "concurrency", True, max(0, limit - current), limit, now_s + ttl, 0
+            )
+        return _decision("concurrency", False, 0, limit, now_s + ttl, ttl * 1000)
+
+    async def period_quota(
+        self, key, *, limit, cost, end_ms, now_ms
+    ) -> tuple[CheckDecision, bool]:
+        with self._shard(key).lock:
+            shard, e = self._open(key, now_ms)
+            used, loaded = (e.value, e.aux) if e is not None else (0, False)
+            allowed = used + cost <= limit
+            if allowed:
+                used += cost
+            self._put(
+                shard, key, e, used, loaded, end_ms + period_quota.EXPIRE_GRACE_MS
+            )
+        decision = period_quota.decision(
+            allowed, max(0, limit - used), limit, end_ms, now_ms
+        )
+        return decision, loaded
+
+    async def seed_period(self, key, count) -> bool:
+        with self._shard(key).lock:
+            e = self._shard(key).entries.get(key)
+            if e is None or e.aux:
+                return False
+            e.value += count
+            e.aux = True
+        return True
+
+    def _peek(self, spec: QuotaSpec, now_ms: int) -> tuple[int, int]:
+        entries = []
+        for key, share in spec.keys:
+            with self._shard(key).lock:
+                e = self._get(self._shard(key), key, now_ms)
+                if e is not None and spec.algorithm == "sliding_window":
+                    e = _Entry(e.value, list(e.aux), e.deadline)
+                entries.append((e, share))
+        alg = spec.algorithm
+        if alg == "token_bucket":
+            refill = spec.refill_rate_per_sec / max(1, len(spec.keys))
+            tokens = 0.0
+            for e, share in entries:
+                if e is None:
+                    tokens += share
+                    continue
+                elapsed = max(0, now_ms - e.aux) / 1000.0
+                tokens += min(float(share), e.value / MICRO + elapsed * refill)
+            reset_ms = now_ms
+            missing = spec.limit - tokens
+            if missing > 0 and spec.refill_rate_per_sec > 0:
+                reset_ms += missing / spec.refill_rate_per_sec * 1000.0
+            return max(0, int(tokens)), math.ceil(reset_ms / 1000)
+        if alg == "fixed_window":
+            remaining = sum(
+                max(0, share - (e.value if e is not None else 0))
+                for e, share in entries
+            )
+            window_start = now_ms // 1000 // spec.window_sec * spec.window_sec
+            return remaining, window_start + spec.window_sec
+        if alg == "period_quota":
+            used = sum(e.value for e, _share in entries if e is not None)
+            return max(0, spec.limit - used), math.ceil(spec.period_end_ms / 1000)
+        if alg == "sliding_window":
+            min_score = now_ms - spec.window_sec * 1000
+            used, reset_ms = 0, now_ms
+            for e, _share in entries:
+                live = [
+                    (ms, c)
+                    for ms, c in (e.aux if e is not None else ())
+                    if ms > min_score
+                ]
+                used += sum(c for _ms, c in live)
+                if live:
+                    reset_ms = live[0][0] + spec.window_sec * 1000
+            return max(0, spec.limit - used), math.ceil(reset_ms / 1000)
+        in_flight, reset_ms = 0, now_ms
+        for e, _share in entries:
+            if e is not None:
+                in_flight += e.value
+                reset_ms = max(reset_ms, e.deadline)
+        return max(0, spec.limit - in_flight), math.ceil(reset_ms / 1000)
+
+    async def peek_many(self, specs, now_ms, redis=None) -> list[dict]:
+        # ``redis`` (a read replica for the Redis backend) is not used here
+        out = []
+        for spec in specs:
+            spec = with_effective_limit(
+                spec, self._effective(spec.adaptive_key, now_ms)
+            )
+            remaining, reset_at = self._peek(spec, now_ms)
+            out.append(
+                {
+                    "algorithm": spec.algorithm,
+                    "limit": spec.limit,
+                    "remaining": min(spec.limit, remaining),
+                    "reset_at": reset_at,
+                }
+            )
+        return out
+
+
+memory_backend = MemoryBackend()
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import re
+import time
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import ResourcePolicy, SubjectType
+
+# Resources are split into words and the separators between them, e.g.
+# "GET:/orders/1" -> ["GET", ":", "", "/", "orders", "/", "1"].
+# In a policy, a word of "*" matches exactly one word and a word of "**"
+# matches one or more tokens (words and separators) to the end or up to the
+# next literal; anything else is literal.
+_SPLIT = re.compile(r"([:/])")
+STAR = "*"
+DSTAR = "**"
+
+
+def tokenize(resource: str) -> list[str]:
+    return _SPLIT.split(resource)
+
+
+def is_pattern(resource: str) -> bool:
+    return any(t in (STAR, DSTAR) for t in tokenize(resource)[::2])
+
+
+class _Node:
+    __slots__ = ("children", "star", "dstar", "plans")
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        self.star: Optional[_Node] = None
+        self.dstar: Optional[_Node] = None
+        # subject_type -> (created_at, plan_id); newest policy wins
+        self.plans: dict[str, tuple[Any, Any]] = {}
+
+
+class PolicyTrie:
+    """Policies of one tenant compiled into a token trie.
+
+    Lookup walks the trie once per token, preferring a literal child over
+    ``*`` over ``**`` at every step, so the first complete match is the most
+    specific policy (longest literal prefix wins). Cost is O(path length),
+    times the number of ``**`` levels on the matching path.
+    """
+
+    def __init__(self):
+        self.root = _Node()
+        self.size = 0
+
+    def add(self, resource: str, subject_type: str, plan_id, created_at=None) -> None:
+        node = self.root
+        for i, tok in enumerate(tokenize(resource)):
+            word = i % 2 == 0
+            if word and tok == STAR:
+                node.star = node.star or _Node()
+                node = node.star
+            elif word and tok == DSTAR:
+                node.dstar = node.dstar or _Node()
+                node = node.dstar
+            else:
+                node = node.children.setdefault(tok, _Node())
+        prev = node.plans.get(subject_type)
+        if prev is None or _newer(created_at, prev[0]):
+            if prev is None:
+                self.size += 1
+            node.plans[subject_type] = (created_at, plan_id)
+
+    def match(self, resource: str, subject_type: str):
+        hit = self._match(self.root, tokenize(resource), 0, subject_type)
+        return hit[1] if hit else None
+
+    def _match(self, node: _Node, tokens: list[str], i: int, st: str):
+        if i == len(tokens):
+            return node.plans.get(st)
+        child = node.children.get(tokens[i])
+        if child is not None:
+            hit = self._match(child, tokens, i + 1, st)
+            if hit:
+                return hit
+        if i % 2 == 0 and node.star is not None:
+            hit = self._match(node.star, tokens, i + 1, st)
+            if hit:
+                return hit
+        if node.dstar is not None:
+            # Consume as few tokens as possible so later literals get a say
+            for j in range(i + 1, len(tokens) + 1):
+                hit = self._match(node.dstar, tokens, j, st)
+                if hit:
+                    return hit
+        return None
+
+
+def _newer(a, b) -> bool:
+    if b is None:
+        return True
+    if a is None:
+        return False
+    return a > b
+
+
+class PolicyIndex:
+    """Per-tenant tries, loaded lazily and kept current incrementally.
+
+    Policies created through this process are inserted in place; policies
+    created elsewhere become visible when the tenant's trie is reloaded after
+    ``POLICY_INDEX_TTL_SEC``.
+    """
+
+    def __init__(self, ttl_sec: float):
+        self.ttl_sec = ttl_sec
+        self._tries: dict[str, tuple[float, PolicyTrie]] = {}
+
+    @staticmethod
+    def build(rows: Iterable[tuple]) -> PolicyTrie:
+        trie = PolicyTrie()
+        for resource, subject_type, plan_id, created_at in rows:
+            trie.add(resource, _st(subject_type), plan_id, created_at)
+        return trie
+
+    async def for_tenant(self, db: AsyncSession, tenant_id) -> PolicyTrie:
+        tid = str(tenant_id)
+        entry = self._tries.get(tid)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        res = await db.execute(
+            select(
+                ResourcePolicy.resource,
+                ResourcePolicy.subject_type,
+                ResourcePolicy.plan_id,
+                ResourcePolicy.created_at,
+            ).where(ResourcePolicy.tenant_id == tenant_id)
+        )
+        return self.install(tenant_id, self.build(res.all()))
+
+    def install(self, tenant_id, trie: PolicyTrie) -> PolicyTrie:
+        self._tries[str(tenant_id)] = (time.monotonic() + self.ttl_sec, trie)
+        return trie
+
+    def add(self, tenant_id, resource: str, subject_type, plan_id, created_at) -> None:
+        entry = self._tries.get(str(tenant_id))
+        if entry is not None:
+            entry[1].add(resource, _st(subject_type), plan_id, created_at)
+
+    def invalidate(self, tenant_id=None) -> None:
+        if tenant_id is None:
+            self._tries.clear()
+        else:
+            self._tries.pop(str(tenant_id), None)
+
+
+def _st(subject_type) -> str:
+    return (
+        subject_type.value
+        if isinstance(subject_type, SubjectType)
+        else str(subject_type)
+    )
+
+
+policy_index = PolicyIndex(settings.POLICY_INDEX_TTL_SEC)
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field, replace
+from typing import Iterator, Optional
+
+from app.rl.strategies import adaptive
+from app.rl.strategies.sliding_window import SUM_MEMBER, cost_of, decode_sum
+from app.rl.strategies.token_bucket_packed import MICRO, unpack
+
+
+@dataclass
+class QuotaSpec:
+    """What to read for one (subject, resource) and how to interpret it.
+
+    ``keys`` pairs each Redis key with its share of ``limit``: a single
+    ``(key, limit)`` normally, one entry per sub-key for a sharded hot key.
+    """
+
+    algorithm: str
+    limit: int
+    keys: list[tuple[str, int]] = field(default_factory=list)
+    window_sec: int = 60
+    refill_rate_per_sec: float = 0.0
+    packed: bool = False
+    # period_quota: when the current period ends
+    period_end_ms: int = 0
+    # REPLICATION_MODE=crdt: fixed windows are hashes of per-region counts
+    slots: bool = False
+    # Adaptive plans: the AIMD limit that checks use in place of ``limit``
+    adaptive_key: Optional[str] = None
+
+
+def with_effective_limit(spec: QuotaSpec, effective: Optional[int]) -> QuotaSpec:
+    """``spec`` with an adaptive plan's current limit, the refill rate scaled
+    with it, as checks apply it. Adaptive plans are never sharded."""
+    if effective is None:
+        return spec
+    limit, refill = adaptive.scaled(spec.limit, spec.refill_rate_per_sec, effective)
+    return replace(
+        spec,
+        limit=limit,
+        keys=[(key, limit) for key, _share in spec.keys],
+        refill_rate_per_sec=refill,
+    )
+
+
+def _queue_reads(pipe, spec: QuotaSpec, now_ms: int) -> None:
+    # Plain read commands only, so the pipeline can be served by a replica
+    if spec.adaptive_key is not None:
+        pipe.hget(spec.adaptive_key, "limit")
+    for key, _share in spec.keys:
+        if spec.algorithm == "token_bucket" and not spec.packed:
+            pipe.hmget(key, "tokens", "ts")
+        elif spec.algorithm == "sliding_window":
+            min_score = now_ms - spec.window_sec * 1000
+            pipe.zscore(key, SUM_MEMBER)
+            # Entries the next write would trim (the stored sum still has them)
+            pipe.zrangebyscore(key, 0, min_score)
+            pipe.zcount(key, f"({min_score}", "+inf")
+            pipe.zrangebyscore(
+                key, f"({min_score}", "+inf", start=0, num=1, withscores=True
+            )
+        elif spec.algorithm == "concurrency":
+            pipe.get(key)
+            pipe.pttl(key)
+        elif spec.algorithm == "period_quota":
+            pipe.hget(key, "n")
+        elif spec.slots:
+            pipe.hvals(key)
+        else:
+            pipe.get(key)
+
+
+def _token_bucket(spec: QuotaSpec, results: Iterator, now_ms: int) -> tuple:
+    refill = spec.refill_rate_per_sec / max(1, len(spec.keys))
+    tokens = 0.0
+    for _key, share in spec.keys:
+        if spec.packed:
+            packed = next(results)
+            micro, ts = unpack(packed) if packed else (None, None)
+            t = micro / MICRO if micro is not None else None
+        else:
+            t, ts = next(results)
+            t = float(t) if t is not None else None
+            ts = int(float(ts)) if ts is not None else None
+        if t is None:
+            tokens += share
+            continue
+        elapsed = max(0, now_ms - ts) / 1000.0
+        tokens += min(float(share), t + elapsed * refill)
+    missing = spec.limit - tokens
+    reset_ms = now_ms
+    if missing > 0 and spec.refill_rate_per_sec > 0:
+        reset_ms += missing / spec.refill_rate_per_sec * 1000.0
+    # Below zero while /v1/acquire reservations are outstanding
+    return max(0, int(tokens)), math.ceil(reset_ms / 1000)
+
+
+def _fixed_window(spec: QuotaSpec, results: Iterator, now_ms: int) -> tuple:
+    remaining = 0
+    for _key, share in spec.keys:
+        count = next(results)
+        if spec.slots:
+            count = sum(int(v) for v in count)
+        remaining += max(0, share - int(count or 0))
+    window_start = now_ms // 1000 // spec.window_sec * spec.window_sec
+    return remaining, window_start + spec.window_sec
+
+
+def _sliding_window(spec: QuotaSpec, results: Iterator, now_ms: int) -> tuple:
+    used, reset_ms = 0, now_ms
+    for _key, _share in spec.keys:
+        total, expired, live, first = (next(results) for _ in range(4))
+        if total is not None:
+            used += decode_sum(total) - sum(cost_of(m) for m in expired)
+        else:
+            # Legacy log without a running sum: one unit per entry
+            used += int(live)
+        if first:
+            reset_ms = int(first[0][1]) + spec.window_sec * 1000
+    return max(0, spec.limit - used), math.ceil(reset_ms / 1000)
+
+
+def _concurrency(spec: QuotaSpec, results: Iterator, now_ms: int) -> tuple:
+    in_flight, reset_ms = 0, now_ms
+    for _key, _share in spec.keys:
+        value, ttl = next(results), int(next(results))
+        in_flight += int(value or 0)
+        if ttl > 0:
+            reset_ms = max(reset_ms, now_ms + ttl)
+    return max(0, spec.limit - in_flight), math.ceil(reset_ms / 1000)
+
+
+def _period_quota(spec: QuotaSpec, results: Iterator, now_ms: int) -> tuple:
+    used = sum(int(next(results) or 0) for _key, _share in spec.keys)
+    return max(0, spec.limit - used), math.ceil(spec.period_end_ms / 1000)
+
+
+_COMPUTE = {
+    "token_bucket": _token_bucket,
+    "fixed_window": _fixed_window,
+    "sliding_window": _sliding_window,
+    "concurrency": _concurrency,
+    "period_quota": _period_quota,
+}
+
+
+async def peek_many(redis, specs: list[QuotaSpec], now_ms: int) -> list[dict]:
+    """Remaining quota for each spec from one read-only pipeline.
+
+    Nothing is consumed or written, so ``redis`` may be a replica. Adaptive
+    plans report their current limit, read in the same pipeline. For a
+    token bucket ``reset_at`` is when it would be full again; for the
+    window algorithms it is when the current usage ages out.
+    """
+    pipe = redis.pipeline(transaction=False)
+    for spec in specs:
+        _queue_reads(pipe, spec, now_ms)
+    results = iter(await pipe.execute())
+    out = []
+    for spec in specs:
+        if spec.adaptive_key is not None:
+            spec = with_effective_limit(spec, adaptive.parse_limit(next(results)))
+        remaining, reset_at = _COMPUTE[spec.algorithm](spec, results, now_ms)
+        out.append(
+            {
+                "algorithm": spec.algorithm,
+                "limit": spec.limit,
+                "remaining": min(spec.limit, remaining),
+                "reset_at": reset_at,
+            }
+        )
+    return out
@@ -0,0 +1,218 @@
+"""Offline replay of recorded traffic (app.rl.trace) through DecisionEngine.
+
+The engine reads the time from a ``VirtualClock`` set to each record's
+timestamp, so a day of traffic replays as fast as the backend answers and
+the same trace, plans and backend always give the same decisions. Usage
+accounting, heavy hitters, hot-key sharding, period-count persistence and
+traffic capture are off: they run on wall-clock time or write outside the
+limiter state.
+"""
+
+from __future__ import annotations
+
+import time
+from array import array
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from app.core.capture import TrafficCapture
+from app.core.config import settings
+from app.core.heavy_hitters import HeavyHitters
+from app.core.period_counts import PeriodCounts
+from app.core.usage import UsageAggregator
+from app.db.models import Plan, PlanAlgorithm
+from app.rl.engine import DecisionEngine
+from app.rl.hot_keys import HotKeys
+from app.rl.trace import TraceRecord, resource_names
+
+# Plan columns a replay plan spec may set
+PLAN_FIELDS = {
+    "algorithm",
+    "limit_per_window",
+    "window_seconds",
+    "bucket_capacity",
+    "refill_rate_per_sec",
+    "concurrency_limit",
+    "quota_period",
+    "quota_timezone",
+}
+
+
+class VirtualClock:
+    """Epoch ms for ``DecisionEngine(clock=...)``; only moves forward."""
+
+    def __init__(self, now_ms: int = 0):
+        self.now_ms = now_ms
+
+    def __call__(self) -> int:
+        return self.now_ms
+
+    def advance_to(self, ts_ms: int) -> bool:
+        # False for a record older than the clock, which is replayed at the
+        # clock's time
+        if ts_ms < self.now_ms:
+            return False
+        self.now_ms = ts_ms
+        return True
+
+
+class PlanTable:
+    """Which plan each resource is checked against.
+
+    Built from a spec such as::
+
+        {"plans": {"free": {"algorithm": "token_bucket",
+                            "bucket_capacity": 10, "refill_rate_per_sec": 1}},
+         "routes": {"GET:/search": "free", "*": "free"}}
+
+    ``"*"`` catches every other resource; without it they are not checked.
+    """
+
+    def __init__(self, plans: dict[str, Plan], routes: dict[str, str]):
+        for resource, name in routes.items():
+            if name not in plans:
+                raise ValueError(f"route {resource!r}: unknown plan {name!r}")
+        self.plans = plans
+        self.routes = routes
+
+    @classmethod
+    def from_spec(cls, spec: dict) -> "PlanTable":
+        plans = {}
+        for name, fields in spec.get("plans", {}).items():
+            unknown = set(fields) - PLAN_FIELDS
+            if unknown:
+                raise ValueError(f"plan {name!r}: unknown fields {sorted(unknown)}")
+            if "algorithm" not in fields:
+                raise ValueError(f"plan {name!r}: algorithm is required")
+            plans[name] = Plan(
+                name=name,
+                **{**fields, "algorithm": PlanAlgorithm(fields["algorithm"])},
+            )
+        return cls(plans, dict(spec.get("routes", {})))
+
+    def resolve(self, resource: str) -> Optional[tuple[str, Plan]]:
+        name = self.routes.get(resource) or self.routes.get("*")
+        return None if name is None else (name, self.plans[name])
+
+    def resources(self) -> dict[int, str]:
+        # Resource id -> name, to decode binary traces
+        return resource_names(r for r in self.routes if r != "*")
+
+
+@dataclass
+class PlanStats:
+    allowed: int = 0
+    denied: int = 0
+    # Decisions unlike the one recorded in the trace
+    changed: int = 0
+
+    @property
+    def allow_rate(self) -> float:
+        total = self.allowed + self.denied
+        return self.allowed / total if total else 0.0
+
+
+@dataclass
+class ReplayReport:
+    plans: dict[str, PlanStats] = field(default_factory=dict)
+    decisions: int = 0
+    # Records with no plan, and records older than the one before them
+    unrouted: int = 0
+    reordered: int = 0
+    elapsed_sec: float = 0.0
+    first_ms: Optional[int] = None
+    last_ms: Optional[int] = None
+    latencies_ms: array = field(default_factory=lambda: array("d"))
+
+    @property
+    def decisions_per_sec(self) -> float:
+        return self.decisions / self.elapsed_sec if self.elapsed_sec else 0.0
+
+    def latency_ms(self, q: float) -> float:
+        if not self.latencies_ms:
+            return 0.0
+        ordered = sorted(self.latencies_ms)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def lines(self) -> list[str]:
+        span = (self.last_ms - self.first_ms) / 1000 if self.decisions else 0.0
+        out = [
+            f"decisions={self.decisions} unrouted={self.unrouted} "
+            f"reordered={self.reordered} trace_span={span:.1f}s",
+            f"elapsed={self.elapsed_sec:.3f}s "
+            f"rate={self.decisions_per_sec:.0f} decisions/s "
+            f"p50={self.latency_ms(0.5) * 1000:.1f}us "
+            f"p99={self.latency_ms(0.99) * 1000:.1f}us "
+            f"max={self.latency_ms(1.0) * 1000:.1f}us",
+        ]
+        for name, st in sorted(self.plans.items()):
+            out.append(
+                f"plan {name:16s} allowed={st.allowed} denied={st.denied} "
+                f"allow_rate={st.allow_rate:.4f} changed={st.changed}"
+            )
+        return out
+
+
+def replay_engine(backend, clock: VirtualClock, redis=None) -> DecisionEngine:
+    return DecisionEngine(
+        redis,
+        settings,
+        None,
+        usage=UsageAggregator(1, 1.0, enabled=False),
+        heavy_hitters=HeavyHitters(1, 1, 1.0, 60, enabled=False),
+        hot_keys=HotKeys(1, 1, 1.0, 1, enabled=False),
+        backend=backend,
+        period_counts=PeriodCounts(1, 1.0, enabled=False),
+        clock=clock,
+        capture=TrafficCapture("", 0.0, enabled=False),
+    )
+
+
+async def replay(
+    engine: DecisionEngine,
+    records: Iterable[TraceRecord],
+    table: PlanTable,
+    clock: VirtualClock,
+    offset_ms: int = 0,
+) -> ReplayReport:
+    """Check every record, in order, at its own (virtual) time.
+
+    ``offset_ms`` shifts every timestamp, e.g. by whole days so that a Redis
+    backend does not expire keys whose absolute deadlines lie in the past.
+    """
+    report = ReplayReport()
+    latencies = report.latencies_ms
+    perf = time.perf_counter
+    start = perf()
+    for rec in records:
+        route = table.resolve(rec.resource)
+        if route is None:
+            report.unrouted += 1
+            continue
+        name, plan = route
+        if not clock.advance_to(rec.ts_ms + offset_ms):
+            report.reordered += 1
+        t0 = perf()
+        decision = await engine.check(
+            tenant_id=rec.tenant,
+            subject=rec.subject,
+            resource=rec.resource,
+            cost=rec.cost,
+            plan=plan,
+        )
+        latencies.append((perf() - t0) * 1000.0)
+        st = report.plans.get(name)
+        if st is None:
+            st = report.plans[name] = PlanStats()
+        if decision.allowed:
+            st.allowed += 1
+        else:
+            st.denied += 1
+        if rec.allowed is not None and rec.allowed != decision.allowed:
+            st.changed += 1
+        if report.first_ms is None:
+            report.first_ms = rec.ts_ms
+        report.last_ms = rec.ts_ms
+        report.decisions += 1
+    report.elapsed_sec = perf() - start
+    return report
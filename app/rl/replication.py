@@ -0,0 +1,248 @@
+"""Active-active replication of limiter state between regions.
+
+Each region runs its own Redis. With REPLICATION_MODE=crdt, fixed windows
+and token buckets hold one slot per region (see app.rl.strategies.crdt)
+and checks decide on the sum of the slots. ``Replicator`` carries the
+slots between regions:
+
+- ``record`` keeps the newest value of every slot this region changed
+  (a dict write, no I/O on the check path);
+- every REPLICATION_INTERVAL_MS the changed slots go out as one entry on
+  this region's stream, ``lf:repl:{region}``, in its own Redis;
+- every peer's stream is read from the peer's Redis and its entries are
+  merged into the local keys once they are REPLICATION_LAG_MS old.
+
+Every worker publishes what it recorded, but only one worker per region
+pulls: the one holding the lease ``lf:repl:lease:{region}`` in the local
+Redis. The id of the last entry merged from each peer is kept next to it
+in ``lf:repl:cursor:{region}``, so a worker taking over the lease, or a
+restarted region, carries on where the last one stopped.
+
+Slots only grow, and merging keeps the larger value, so entries may be
+applied late, twice or out of order. A global limit is only exceeded by
+what the regions admit within one replication delay.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+import uuid
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.observability.metrics import (
+    REPLICATION_FAILURES,
+    REPLICATION_LAG_MS,
+    REPLICATION_SLOTS,
+)
+from app.rl.strategies.crdt import Slot, merge_many
+
+log = get_logger("rl.replication")
+
+
+def stream_key(region: str) -> str:
+    return f"lf:repl:{region}"
+
+
+def cursor_key(region: str) -> str:
+    return f"lf:repl:cursor:{region}"
+
+
+def lease_key(region: str) -> str:
+    return f"lf:repl:lease:{region}"
+
+
+def parse_peers(spec: str) -> dict[str, str]:
+    # "us=redis://us:6379/0,ap=redis://ap:6379/0" -> {"us": ..., "ap": ...}
+    peers = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        region, sep, url = part.partition("=")
+        if not sep or not region.strip() or not url.strip():
+            raise ValueError(f"invalid replication peer {part!r}")
+        peers[region.strip()] = url.strip()
+    return peers
+
+
+def peer_clients(spec: str) -> dict:
+    from redis.asyncio import Redis
+
+    return {
+        region: Redis.from_url(url, decode_responses=True)
+        for region, url in parse_peers(spec).items()
+    }
+
+
+def encode(slots: dict[str, Slot]) -> str:
+    return json.dumps([[key, *slot] for key, slot in slots.items()])
+
+
+def decode(data: str) -> list[tuple[str, Slot]]:
+    return [(item[0], Slot(*item[1:])) for item in json.loads(data)]
+
+
+class Replicator:
+    def __init__(
+        self,
+        region: str,
+        interval_ms: int,
+        lag_ms: int = 0,
+        max_keys: int = 50_000,
+        maxlen: int = 100_000,
+        enabled: bool = True,
+    ):
+        self.region = region
+        self.interval_ms = interval_ms
+        self.lag_ms = lag_ms
+        self.max_keys = max_keys
+        self.maxlen = maxlen
+        self.enabled = enabled
+        # Outlives a few missed rounds before another worker takes over
+        self.lease_ms = max(3 * interval_ms, 1000)
+        self._dirty: dict[str, Slot] = {}
+        self._token = uuid.uuid4().hex
+        self._redis = None
+        self._peers: dict = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._dirty)
+
+    def record(self, key: str, slot: Slot) -> None:
+        prev = self._dirty.get(key)
+        if prev is not None:
+            if prev.gen == slot.gen:
+                slot = slot._replace(delta=prev.delta + slot.delta)
+        elif len(self._dirty) >= self.max_keys:
+            # Dropped here, the key's next change still carries the total
+            REPLICATION_FAILURES.labels(op="dropped").inc()
+            return
+        self._dirty[key] = slot
+
+    async def publish(self, redis) -> int:
+        if not self._dirty:
+            return 0
+        batch, self._dirty = self._dirty, {}
+        try:
+            await redis.xadd(
+                stream_key(self.region),
+                {"d": encode(batch)},
+                maxlen=self.maxlen,
+                approximate=True,
+            )
+        except Exception as e:
+            REPLICATION_FAILURES.labels(op="publish").inc()
+            log.bind(error=repr(e), slots=len(batch)).warning(
+                "replication.publish_failed"
+            )
+            # Newer values recorded meanwhile win; deltas add up
+            for key, slot in batch.items():
+                cur = self._dirty.get(key)
+                if cur is None:
+                    if len(self._dirty) < self.max_keys:
+                        self._dirty[key] = slot
+                elif cur.gen == slot.gen:
+                    self._dirty[key] = cur._replace(delta=cur.delta + slot.delta)
+            return 0
+        REPLICATION_SLOTS.labels(direction="out").inc(len(batch))
+        return len(batch)
+
+    async def pull(self, redis, peer: str, client, now_ms: Optional[int] = None) -> int:
+        """Merge the peer's entries that are at least ``lag_ms`` old; returns
+        the number of slots merged."""
+        if now_ms is None:
+            now_ms = int(time.time() * 1000)
+        cursor = await redis.hget(cursor_key(self.region), peer) or "0-0"
+        res = await client.xread({stream_key(peer): cursor}, count=100)
+        merged = 0
+        newest_id = newest_ms = None
+        for _stream, entries in res or []:
+            for entry_id, fields in entries:
+                entry_ms = int(entry_id.split("-")[0])
+                if entry_ms > now_ms - self.lag_ms:
+                    break
+                slots = decode(fields["d"])
+                await merge_many(redis, peer, slots, now_ms)
+                merged += len(slots)
+                newest_id, newest_ms = entry_id, entry_ms
+        if newest_id is not None:
+            await redis.hset(cursor_key(self.region), peer, newest_id)
+            REPLICATION_LAG_MS.labels(peer=peer).set(now_ms - newest_ms)
+        return merged
+
+    async def hold_lease(self, redis) -> bool:
+        """Take or renew this region's pull lease; True if this worker has it."""
+        key = lease_key(self.region)
+        if await redis.set(key, self._token, nx=True, px=self.lease_ms):
+            return True
+        if await redis.get(key) != self._token:
+            return False
+        # Not atomic with the get, but at worst two workers pull for one
+        # round, and merging the same entries twice changes nothing
+        await redis.pexpire(key, self.lease_ms)
+        return True
+
+    async def sync(self) -> None:
+        await self.publish(self._redis)
+        if not self._peers:
+            return
+        try:
+            if not await self.hold_lease(self._redis):
+                return
+        except Exception as e:
+            REPLICATION_FAILURES.labels(op="lease").inc()
+            log.bind(error=repr(e)).warning("replication.lease_failed")
+            return
+        for peer, client in self._peers.items():
+            try:
+                merged = await self.pull(self._redis, peer, client)
+            except Exception as e:
+                REPLICATION_FAILURES.labels(op="pull").inc()
+                log.bind(error=repr(e), peer=peer).warning("replication.pull_failed")
+                continue
+            if merged:
+                REPLICATION_SLOTS.labels(direction="in").inc(merged)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+            await self.sync()
+            if self._wake.is_set():
+                return
+
+    async def start(self, redis, peers: dict) -> None:
+        self._redis = redis
+        self._peers = {p: c for p, c in peers.items() if p != self.region}
+        if self.enabled:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout_sec: float = 5.0) -> None:
+        # One last publish so peers see what this region admitted
+        if self._task is None:
+            return
+        self._wake.set()
+        try:
+            await asyncio.wait_for(self._task, timeout_sec)
+        except asyncio.TimeoutError:
+            log.warning("replication.stop_timeout")
+        self._task = None
+        self._wake = None
+
+
+replicator = Replicator(
+    settings.REPLICATION_REGION,
+    settings.REPLICATION_INTERVAL_MS,
+    lag_ms=settings.REPLICATION_LAG_MS,
+    max_keys=settings.REPLICATION_MAX_KEYS,
+    maxlen=settings.REPLICATION_STREAM_MAXLEN,
+    enabled=settings.REPLICATION_MODE == "crdt",
+)
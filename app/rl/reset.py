@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.rl.hot_keys import split_shard
+from app.rl.inspect import ALGORITHMS, match_pattern
+from app.rl.keys import COMPACT_TAGS, compact_resource, tenant_token
+
+log = get_logger("rl.reset")
+
+
+def reset_job_key(job_id: str) -> str:
+    return f"lf:reset:{job_id}"
+
+
+def key_matches(
+    key: str, tenant_id: str, resource: Optional[str], subject: Optional[str]
+) -> bool:
+    # Limiter state only: usage rollups and sketches under the same tenant
+    # are not reset. Exact subject/resource matching on top of the glob.
+    parts = key.split(":", 3)
+    if (
+        len(parts) < 4
+        or parts[1] not in ALGORITHMS
+        or parts[2] != tenant_token(tenant_id)
+    ):
+        return False
+    rest = split_shard(parts[3])[0]
+    if subject is not None and not rest.startswith(subject + ":"):
+        return False
+    if resource is not None:
+        compact = parts[1] in COMPACT_TAGS.values()
+        if parts[1] in ("fw", "f"):
+            rest = rest.rpartition(":")[0]
+        if not rest.endswith(
+            ":" + (compact_resource(resource) if compact else resource)
+        ):
+            return False
+    return True
+
+
+def _scan_targets(redis) -> list:
+    # RedisCluster: SCAN is per node, so walk every primary; standalone: one
+    get_primaries = getattr(redis, "get_primaries", None)
+    if callable(get_primaries):
+        return list(get_primaries())
+    return [None]
+
+
+async def _scan(redis, node, cursor: int, pattern: str, count: int):
+    if node is None:
+        return await redis.scan(cursor, match=pattern, count=count)
+    return await redis.scan(cursor, match=pattern, count=count, target_nodes=node)
+
+
+class ResetJobs:
+    """Background SCAN + UNLINK jobs, with progress kept in Redis.
+
+    Job state lives in the ``lf:reset:{id}`` hash so any worker can report
+    on or cancel a job; the worker that accepted it does the deleting.
+    """
+
+    def __init__(self):
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    async def submit(
+        self,
+        redis,
+        tenant_id: str,
+        resource: Optional[str] = None,
+        subject: Optional[str] = None,
+    ) -> dict:
+        job_id = uuid.uuid4().hex
+        key = reset_job_key(job_id)
+        await redis.hset(
+            key,
+            mapping={
+                "status": "running",
+                "tenant_id": tenant_id,
+                "resource": resource or "",
+                "subject": subject or "",
+                "scanned": 0,
+                "deleted": 0,
+                "created_at": time.time(),
+            },
+        )
+        await redis.expire(key, settings.RESET_JOB_TTL_SEC)
+        task = asyncio.create_task(
+            self._run(redis, job_id, tenant_id, resource, subject)
+        )
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _t: self._tasks.pop(job_id, None))
+        log.bind(job=job_id, tenant=tenant_id).info("reset.submitted")
+        return await self.get(redis, job_id)
+
+    async def get(self, redis, job_id: str) -> Optional[dict]:
+        data = await redis.hgetall(reset_job_key(job_id))
+        if not data:
+            return None
+        job = {"id": job_id, **data}
+        for f in ("scanned", "deleted"):
+            job[f] = int(job.get(f, 0))
+        for f in ("created_at", "finished_at"):
+            job[f] = float(job[f]) if job.get(f) else None
+        for f in ("resource", "subject"):
+            job[f] = job.get(f) or None
+        job["cancel_requested"] = job.pop("cancel", None) == "1"
+        return job
+
+    async def cancel(self, redis, job_id: str) -> Optional[dict]:
+        key = reset_job_key(job_id)
+        if not await redis.exists(key):
+            return None
+        await redis.hset(key, "cancel", 1)
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+        return await self.get(redis, job_id)
+
+    async def _run_node(self, redis, node, job_id, tenant_id, resource, subject, rate):
+        key = reset_job_key(job_id)
+        pattern = match_pattern(tenant_id, subject)
+        chunk_size = settings.RESET_CHUNK_SIZE
+        cursor, pending = 0, []
+
+        async def unlink(batch: list[str], scanned: int) -> None:
+            start = time.perf_counter()
+            if batch:
+                pipe = redis.pipeline(transaction=False)
+                for k in batch:
+                    # Single-key UNLINKs: valid across cluster slots, and
+                    # freeing memory happens off the Redis main thread
+                    pipe.unlink(k)
+                await pipe.execute()
+            pipe = redis.pipeline(transaction=False)
+            pipe.hincrby(key, "scanned", scanned)
+            pipe.hincrby(key, "deleted", len(batch))
+            pipe.hget(key, "cancel")
+            *_, cancel = await pipe.execute()
+            if cancel == "1":
+                raise asyncio.CancelledError()
+            # Pace to RESET_MAX_KEYS_PER_SEC (split across nodes)
+            wait = len(batch) / rate - (time.perf_counter() - start)
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        while True:
+            cursor, keys = await _scan(
+                redis, node, cursor, pattern, settings.RESET_SCAN_COUNT
+            )
+            scanned = len(keys)
+            pending.extend(
+                k for k in keys if key_matches(k, tenant_id, resource, subject)
+            )
+            while len(pending) >= chunk_size:
+                batch, pending = pending[:chunk_size], pending[chunk_size:]
+                await unlink(batch, scanned)
+                scanned = 0
+            if cursor == 0:
+                await unlink(pending, scanned)
+                return
+            if scanned:
+                await unlink([], scanned)
+
+    async def _run(self, redis, job_id, tenant_id, resource, subject) -> None:
+        key = reset_job_key(job_id)
+        nodes = _scan_targets(redis)
+        rate = max(1.0, settings.RESET_MAX_KEYS_PER_SEC / len(nodes))
+        status, error = "done", None
+        tasks = [
+            asyncio.create_task(
+                self._run_node(redis, node, job_id, tenant_id, resource, subject, rate)
+            )
+            for node in nodes
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            status = "cancelled"
+        except Exception as e:
+            status, error = "failed", repr(e)
+        finally:
+            # One node failing or seeing the cancel flag stops the others
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        mapping = {"status": status, "finished_at": time.time()}
+        if error:
+            mapping["error"] = error
+        try:
+            await redis.hset(key, mapping=mapping)
+        except Exception:
+            pass
+        log.bind(job=job_id, tenant=tenant_id, status=status, error=error).info(
+            "reset.finished"
+        )
+
+    async def shutdown(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+reset_jobs = ResetJobs()
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Literal, Optional
 from uuid import UUID
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 
 # Existing MVP request/response kept for compatibility
@@ -39,9 +40,81 @@ class CheckDecision(BaseModel):
     headers: Dict[str, str] = Field(default_factory=dict)
 
 
+# Wait-for-permit (token_bucket plans). With wait=true the server holds the
+# request until the reserved slot; with wait=false it answers at once with
+# the slot, and the client sleeps wait_ms or cancels the reservation.
+class AcquireRequest(BaseModel):
+    resource: str
+    subject: str
+    cost: int = Field(default=1, ge=1)
+    max_wait_ms: int = Field(default=0, ge=0)
+    wait: bool = True
+    plan_id: Optional[UUID] = None
+
+
+class AcquireDecision(CheckDecision):
+    wait_ms: int = 0
+    slot_at_ms: int = 0
+    queue_depth: int = 0
+    # Set when a reservation is left for the client to wait out
+    reservation_id: Optional[str] = None
+
+
+class AcquireCancel(BaseModel):
+    resource: str
+    subject: str
+    reservation_id: str
+    plan_id: Optional[UUID] = None
+
+
+class QuotaState(BaseModel):
+    resource: str
+    subject: str
+    algorithm: str
+    limit: int
+    remaining: int
+    reset_at: int
+
+
+class QuotaBatch(BaseModel):
+    items: List[QuotaState]
+
+
+# Health signals from a protected service, for adaptive plans. One report
+# may summarise many requests; any error or a latency above the plan's
+# adaptive_latency_ms marks it congested.
+class FeedbackRequest(BaseModel):
+    resource: str
+    count: int = Field(default=1, ge=1)
+    errors: int = Field(default=0, ge=0)
+    latency_ms: Optional[float] = Field(default=None, ge=0)
+    plan_id: Optional[UUID] = None
+
+
+class FeedbackResult(BaseModel):
+    resource: str
+    limit: int
+    congested: bool
+    decreased: bool
+
+
 # Admin DTOs
+def _timezone(value: Optional[str]) -> Optional[str]:
+    if value is not None:
+        try:
+            ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"unknown timezone {value!r}")
+    return value
+
+
 class TenantCreate(BaseModel):
     name: str
+    # IANA name, e.g. "Europe/Athens"; day/month quotas roll over at its
+    # local midnight
+    timezone: str = "UTC"
+
+    _check_timezone = field_validator("timezone")(_timezone)
 
 
 class PlanCreate(BaseModel):
@@ -55,6 +128,17 @@ class PlanCreate(BaseModel):
     concurrency_limit: Optional[int] = None
     cost_per_call: int = 1
     burst_factor: float = 1.0
+    # Adaptive mode: the limit moves between the bounds on /v1/feedback
+    adaptive: bool = False
+    adaptive_min_limit: Optional[int] = Field(default=None, ge=1)
+    adaptive_max_limit: Optional[int] = Field(default=None, ge=1)
+    adaptive_latency_ms: Optional[int] = Field(default=None, ge=1)
+    # period_quota plans: limit_per_window per calendar day or month, in
+    # quota_timezone (defaults to the tenant's timezone)
+    quota_period: Optional[Literal["day", "month"]] = None
+    quota_timezone: Optional[str] = None
+
+    _check_timezone = field_validator("quota_timezone")(_timezone)
 
 
 class ApiKeyCreate(BaseModel):
@@ -67,3 +151,8 @@ class ResourcePolicyCreate(BaseModel):
     resource: str
     subject_type: str
     plan_id: UUID
+
+
+class StateResetRequest(BaseModel):
+    resource: Optional[str] = None
+    subject: Optional[str] = None
@@ -0,0 +1,109 @@
+-- Token bucket reservation for /v1/acquire (GCRA-style debt scheduling)
+-- KEYS[1] = bucket key (hash, or packed "<micro>:<ts>" when ARGV[8] == 1)
+-- KEYS[2] = reservation queue (ZSET "<id>:<cost>" scored by slot ms)
+-- KEYS[3] = adaptive limit key (optional, see adaptive.lua)
+-- ARGV = [capacity, refill_rate_per_sec, now_ms, cost, max_wait_ms,
+--         max_queue, id, packed]
+--
+-- A request the bucket cannot cover yet is admitted by letting the bucket
+-- go into debt: its slot is when refill pays the debt back, so later
+-- reservations queue behind it in order. /v1/check requests see the debt
+-- and are denied until then. The queue only bounds how many reservations
+-- are pending per key and lets one be refunded (acquire_cancel.lua).
+--
+-- Returns {status, remaining, capacity, wait_ms, depth}; status is
+-- 1 granted now, 2 reserved for now + wait_ms, 0 slot beyond max_wait_ms
+-- (wait_ms is then the retry hint), -1 queue full.
+
+local key = KEYS[1]
+local qkey = KEYS[2]
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local now_ms = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local max_wait_ms = tonumber(ARGV[5])
+local max_queue = tonumber(ARGV[6])
+local id = ARGV[7]
+local packed = ARGV[8] == '1'
+
+if KEYS[3] then
+  local eff = tonumber(redis.call('HGET', KEYS[3], 'limit'))
+  if eff and capacity > 0 then
+    eff = math.max(1, math.floor(eff))
+    refill = refill * eff / capacity
+    capacity = eff
+  end
+end
+
+local cap_micro = capacity * 1000000
+local cost_micro = cost * 1000000
+local micro = cap_micro
+local ts = now_ms
+if packed then
+  local v = redis.call('GET', key)
+  if v then
+    local sep = string.find(v, ':', 1, true)
+    micro = tonumber(string.sub(v, 1, sep - 1))
+    ts = tonumber(string.sub(v, sep + 1))
+  end
+else
+  local data = redis.call('HMGET', key, 'tokens', 'ts')
+  if data[1] then micro = math.floor(tonumber(data[1]) * 1000000 + 0.5) end
+  if data[2] then ts = tonumber(data[2]) end
+end
+
+local elapsed_ms = now_ms - ts
+if elapsed_ms < 0 then elapsed_ms = 0 end
+if refill > 0 then
+  micro = math.min(cap_micro, micro + math.floor(elapsed_ms * refill * 1000))
+else
+  micro = math.min(cap_micro, micro)
+end
+
+-- Reservations whose slot has come are spent
+redis.call('ZREMRANGEBYSCORE', qkey, '-inf', now_ms)
+local depth = redis.call('ZCARD', qkey)
+
+local status = 1
+local wait_ms = 0
+if micro < cost_micro then
+  if refill <= 0 then
+    -- Never refills: no slot to reserve
+    status = 0
+  else
+    wait_ms = math.ceil((cost_micro - micro) / (refill * 1000))
+    if wait_ms > max_wait_ms then
+      status = 0
+    elseif depth >= max_queue then
+      status = -1
+    else
+      status = 2
+    end
+  end
+end
+
+if status == 1 or status == 2 then
+  micro = micro - cost_micro
+  -- Kept until the debt is repaid and the bucket full again
+  local ttl_sec = 3600
+  if refill > 0 then
+    ttl_sec = math.ceil((cap_micro - micro) / (refill * 1000000)) + 5
+  end
+  if packed then
+    redis.call('SET', key, string.format('%d:%d', micro, now_ms), 'EX', ttl_sec)
+  else
+    redis.call('HSET', key, 'tokens', micro / 1000000, 'ts', now_ms)
+    redis.call('EXPIRE', key, ttl_sec)
+  end
+  if status == 2 then
+    redis.call('ZADD', qkey, now_ms + wait_ms, id .. ':' .. cost)
+    depth = depth + 1
+    if redis.call('PTTL', qkey) < wait_ms + 1000 then
+      redis.call('PEXPIRE', qkey, wait_ms + 1000)
+    end
+  end
+end
+
+local remaining = math.floor(micro / 1000000)
+if remaining < 0 then remaining = 0 end
+return { status, remaining, capacity, wait_ms, depth }
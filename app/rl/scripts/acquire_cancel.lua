@@ -0,0 +1,33 @@
+-- Refund a pending /v1/acquire reservation
+-- KEYS[1] = bucket key, KEYS[2] = reservation queue
+-- ARGV = [now_ms, member, packed]
+--
+-- Only a reservation whose slot is still ahead is refunded; once the slot
+-- has come the permit counts as used. Returns 1 if refunded, else 0.
+
+local key = KEYS[1]
+local qkey = KEYS[2]
+local now_ms = tonumber(ARGV[1])
+local member = ARGV[2]
+local packed = ARGV[3] == '1'
+
+local slot = tonumber(redis.call('ZSCORE', qkey, member))
+if not slot or slot <= now_ms then
+  return 0
+end
+redis.call('ZREM', qkey, member)
+local cost = tonumber(string.match(member, ':(%d+)$'))
+
+-- Adding the cost back to the stored state, without refilling first,
+-- leaves the bucket as if the reservation had never been made
+if packed then
+  local v = redis.call('GET', key)
+  if v then
+    local sep = string.find(v, ':', 1, true)
+    local micro = tonumber(string.sub(v, 1, sep - 1)) + cost * 1000000
+    redis.call('SET', key, string.format('%d:%s', micro, string.sub(v, sep + 1)), 'KEEPTTL')
+  end
+elseif redis.call('EXISTS', key) == 1 then
+  redis.call('HINCRBYFLOAT', key, 'tokens', cost)
+end
+return 1
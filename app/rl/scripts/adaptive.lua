@@ -0,0 +1,45 @@
+-- AIMD limit of an adaptive plan
+-- KEYS[1] = limit key (hash: limit, cut_ms)
+-- ARGV = [base, min, max, congested, count, step, factor, cooldown_ms,
+--         now_ms, ttl_sec]
+--
+-- A healthy report covering `count` requests adds step * count / limit, so
+-- the limit grows by about `step` per limit's worth of requests. A
+-- congested report multiplies it by `factor`, at most once per cooldown:
+-- one incident seen by many requests only cuts once. The limit is kept as
+-- a float so small increases accumulate; strategies floor it.
+
+local key = KEYS[1]
+local base = tonumber(ARGV[1])
+local lo = tonumber(ARGV[2])
+local hi = tonumber(ARGV[3])
+local congested = tonumber(ARGV[4]) == 1
+local count = tonumber(ARGV[5])
+local step = tonumber(ARGV[6])
+local factor = tonumber(ARGV[7])
+local cooldown_ms = tonumber(ARGV[8])
+local now_ms = tonumber(ARGV[9])
+local ttl_sec = tonumber(ARGV[10])
+
+local data = redis.call('HMGET', key, 'limit', 'cut_ms')
+local limit = tonumber(data[1]) or base
+local cut_ms = tonumber(data[2]) or 0
+
+local cut = 0
+if congested then
+  if now_ms - cut_ms >= cooldown_ms then
+    limit = limit * factor
+    cut_ms = now_ms
+    cut = 1
+  end
+else
+  limit = limit + step * count / math.max(limit, 1)
+end
+if limit < lo then limit = lo end
+if limit > hi then limit = hi end
+
+redis.call('HSET', key, 'limit', tostring(limit), 'cut_ms', cut_ms)
+redis.call('EXPIRE', key, ttl_sec)
+
+-- Floats would be truncated in the reply, so the limit goes back as a string
+return { tostring(limit), cut }
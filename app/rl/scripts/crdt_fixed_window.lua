@@ -0,0 +1,41 @@
+-- Fixed window as a G-counter (REPLICATION_MODE=crdt)
+-- KEYS[1] = counter hash, one field per region: {region = count}
+-- KEYS[2] = adaptive limit key (optional, see adaptive.lua)
+-- ARGV = [limit, window_sec, now_ms, cost, region]
+-- Only this region's field is written here; crdt_merge.lua applies the
+-- peers'. The decision is on the sum of every region's field.
+
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window_sec = tonumber(ARGV[2])
+local now_ms = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local region = ARGV[5]
+
+if KEYS[2] then
+  local eff = tonumber(redis.call('HGET', KEYS[2], 'limit'))
+  if eff then limit = math.max(1, math.floor(eff)) end
+end
+
+local window_start = math.floor(math.floor(now_ms / 1000) / window_sec) * window_sec
+local reset_at = window_start + window_sec
+
+-- Counts denied requests too, like fixed_window.lua
+local own = redis.call('HINCRBY', key, region, cost)
+if redis.call('PTTL', key) < 0 then
+  redis.call('PEXPIREAT', key, reset_at * 1000)
+end
+
+local counter = 0
+for _, v in ipairs(redis.call('HVALS', key)) do
+  counter = counter + tonumber(v)
+end
+
+local allowed = 0
+if counter <= limit then allowed = 1 end
+local remaining = limit - counter
+if remaining < 0 then remaining = 0 end
+local retry_after_ms = (reset_at * 1000) - now_ms
+if retry_after_ms < 0 then retry_after_ms = 0 end
+
+return { allowed, remaining, limit, reset_at, retry_after_ms, own }
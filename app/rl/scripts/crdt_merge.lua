@@ -0,0 +1,62 @@
+-- Apply one peer region's slot from the replication stream
+-- KEYS[1] = replicated key (crdt_fixed_window.lua / crdt_token_bucket.lua)
+-- ARGV = [alg ('fw' | 'tb'), region, value, gen, delta, limit, rate,
+--         expire_at_ms, now_ms]
+-- Slots only grow within a generation, so merging is a per-slot max:
+-- replays and duplicates change nothing. Returns the units applied.
+
+local key = KEYS[1]
+local region = ARGV[2]
+local value = tonumber(ARGV[3])
+local gen = tonumber(ARGV[4])
+local delta = tonumber(ARGV[5])
+local limit = tonumber(ARGV[6])
+local rate = tonumber(ARGV[7])
+local expire_at_ms = tonumber(ARGV[8])
+local now_ms = tonumber(ARGV[9])
+
+-- The peer's state has expired: its window is over, or its bucket refilled
+if expire_at_ms <= now_ms then return 0 end
+
+if ARGV[1] == 'fw' then
+  local cur = tonumber(redis.call('HGET', key, region)) or 0
+  if value <= cur then return 0 end
+  redis.call('HSET', key, region, value)
+  if redis.call('PTTL', key) < 0 then
+    redis.call('PEXPIREAT', key, expire_at_ms)
+  end
+  return value - cur
+end
+
+local cfield = 'c:' .. region
+local gfield = 'g:' .. region
+local data = redis.call('HMGET', key, 'tokens', 'ts', cfield, gfield)
+local cur = tonumber(data[3])
+local cur_gen = tonumber(data[4])
+local applied
+if cur_gen ~= nil and gen < cur_gen then
+  return 0
+elseif cur_gen == gen then
+  if value <= cur then return 0 end
+  applied = value - cur
+else
+  -- A slot not seen before (or restarted by the peer): only what it
+  -- consumed since its previous publish, earlier use has refilled here
+  applied = math.min(delta, value)
+end
+
+local tokens = tonumber(data[1])
+if tokens == nil then
+  tokens = limit
+  redis.call('HSET', key, 'ts', now_ms)
+end
+tokens = tokens - applied
+redis.call('HSET', key, 'tokens', tokens, cfield, value, gfield, gen)
+local ttl_sec = 3600
+if rate > 0 then
+  ttl_sec = math.ceil(math.max(limit, limit - tokens) / rate) + 5
+end
+if redis.call('TTL', key) < ttl_sec then
+  redis.call('EXPIRE', key, ttl_sec)
+end
+return applied
@@ -0,0 +1,60 @@
+-- Token bucket with per-region consumption slots (REPLICATION_MODE=crdt)
+-- KEYS[1] = bucket hash {tokens, ts, c:<region> = units consumed here,
+--           g:<region> = ms this region's slot started}
+-- KEYS[2] = adaptive limit key (optional, see adaptive.lua)
+-- ARGV = [capacity, refill_rate_per_sec, now_ms, cost, region]
+-- tokens already has every merged peer consumption taken off
+-- (crdt_merge.lua), so the decision is on the merged view.
+
+local key = KEYS[1]
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local now_ms = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local cfield = 'c:' .. ARGV[5]
+local gfield = 'g:' .. ARGV[5]
+
+if KEYS[2] then
+  local eff = tonumber(redis.call('HGET', KEYS[2], 'limit'))
+  if eff and capacity > 0 then
+    eff = math.max(1, math.floor(eff))
+    refill = refill * eff / capacity
+    capacity = eff
+  end
+end
+
+local data = redis.call('HMGET', key, 'tokens', 'ts', cfield, gfield)
+local tokens = tonumber(data[1])
+local ts = tonumber(data[2])
+local own = tonumber(data[3]) or 0
+local gen = tonumber(data[4])
+if tokens == nil then tokens = capacity end
+if ts == nil then ts = now_ms end
+if gen == nil then gen = now_ms end
+
+local elapsed_ms = now_ms - ts
+if elapsed_ms < 0 then elapsed_ms = 0 end
+if refill > 0 then
+  tokens = math.min(capacity, tokens + elapsed_ms / 1000.0 * refill)
+else
+  tokens = math.min(capacity, tokens)
+end
+
+local allowed = 0
+local retry_after_ms = 0
+if tokens >= cost then
+  allowed = 1
+  tokens = tokens - cost
+  own = own + cost
+elseif refill > 0 then
+  retry_after_ms = math.floor((cost - tokens) / refill * 1000.0 + 0.5)
+end
+
+redis.call('HSET', key, 'tokens', tokens, 'ts', now_ms, cfield, own, gfield, gen)
+local ttl_sec = 3600
+if refill > 0 then
+  ttl_sec = math.ceil(math.max(capacity, capacity - tokens) / refill) + 5
+end
+redis.call('EXPIRE', key, ttl_sec)
+
+return { allowed, math.max(0, math.floor(tokens)), capacity, retry_after_ms, own, gen }
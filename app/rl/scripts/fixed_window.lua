@@ -1,5 +1,6 @@
 -- Fixed Window Counter
 -- KEYS[1] = counter key
+-- KEYS[2] = adaptive limit key (optional, see adaptive.lua)
 -- ARGV = [limit, window_sec, now_ms, cost?]
 
 local key = KEYS[1]
@@ -9,6 +10,11 @@ local now_ms = tonumber(ARGV[3])
 local cost = tonumber(ARGV[4])
 if cost == nil then cost = 1 end
 
+if KEYS[2] then
+  local eff = tonumber(redis.call('HGET', KEYS[2], 'limit'))
+  if eff then limit = math.max(1, math.floor(eff)) end
+end
+
 -- Compute current window start (seconds)
 local now_sec = math.floor(now_ms / 1000)
 local window_start = math.floor(now_sec / window_sec) * window_sec
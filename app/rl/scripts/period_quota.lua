@@ -0,0 +1,29 @@
+-- Calendar-period quota (day / month in the tenant's timezone)
+-- KEYS[1] = counter hash: n = units used this period, h = 1 once the count
+--           persisted in the database has been added (period_quota_seed.lua)
+-- ARGV = [limit, cost, expire_at_ms]
+-- Denied requests are not counted: a long quota is a budget, not a rate.
+
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local expire_at_ms = tonumber(ARGV[3])
+
+local state = redis.call('HMGET', key, 'n', 'h')
+local used = tonumber(state[1])
+local hydrated = tonumber(state[2]) or 0
+if used == nil then
+  used = 0
+  redis.call('HSET', key, 'n', 0, 'h', 0)
+  redis.call('PEXPIREAT', key, expire_at_ms)
+end
+
+local allowed = 0
+if used + cost <= limit then
+  used = redis.call('HINCRBY', key, 'n', cost)
+  allowed = 1
+end
+local remaining = limit - used
+if remaining < 0 then remaining = 0 end
+
+return { allowed, remaining, limit, hydrated }
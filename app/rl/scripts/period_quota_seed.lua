@@ -0,0 +1,11 @@
+-- Add the persisted count to a counter created since the last load
+-- KEYS[1] = counter hash (see period_quota.lua)
+-- ARGV = [persisted count]
+-- Once per counter: a missing or already seeded key is left alone.
+
+if redis.call('HGET', KEYS[1], 'h') ~= '0' then
+  return 0
+end
+redis.call('HINCRBY', KEYS[1], 'n', tonumber(ARGV[1]))
+redis.call('HSET', KEYS[1], 'h', 1)
+return 1
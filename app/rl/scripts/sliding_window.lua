@@ -0,0 +1,73 @@
+-- Sliding Window Log with weighted entries
+-- KEYS[1] = log key (ZSET)
+-- KEYS[2] = adaptive limit key (optional, see adaptive.lua)
+-- ARGV = [limit, window_ms, now_ms, cost, nonce]
+--
+-- One member per admitted request, "<now_ms>:<cost>:<nonce>", scored by
+-- time. Member "#" keeps the running cost sum as score -(sum + 1), below
+-- every timestamp, so totals never need an O(cost) or O(n) pass.
+
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window_ms = tonumber(ARGV[2])
+local now_ms = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local nonce = ARGV[5]
+local min_score = now_ms - window_ms
+
+if KEYS[2] then
+  local eff = tonumber(redis.call('HGET', KEYS[2], 'limit'))
+  if eff then limit = math.max(1, math.floor(eff)) end
+end
+
+local function cost_of(member)
+  local c = string.match(member, '^%d+:(%d+):')
+  if c then return tonumber(c) end
+  -- Legacy "evt:<ms>" members are one unit each
+  return 1
+end
+
+local sum
+local s = redis.call('ZSCORE', key, '#')
+if s then
+  sum = -tonumber(s) - 1
+else
+  -- First touch of a legacy log: derive the sum once
+  sum = 0
+  for _, m in ipairs(redis.call('ZRANGEBYSCORE', key, 0, '+inf')) do
+    sum = sum + cost_of(m)
+  end
+end
+
+-- Expire old entries; work is bounded by admitted requests, not by cost
+local expired = redis.call('ZRANGEBYSCORE', key, 0, min_score)
+if #expired > 0 then
+  for _, m in ipairs(expired) do
+    sum = sum - cost_of(m)
+  end
+  redis.call('ZREMRANGEBYSCORE', key, 0, min_score)
+end
+if sum < 0 then sum = 0 end
+
+local allowed = 0
+if sum + cost <= limit then
+  allowed = 1
+  sum = sum + cost
+  redis.call('ZADD', key, now_ms, string.format('%d:%d:%s', now_ms, cost, nonce))
+end
+redis.call('ZADD', key, -(sum + 1), '#')
+redis.call('PEXPIRE', key, window_ms + 1000)
+
+local earliest = now_ms
+local retry_after_ms = 0
+local first = redis.call('ZRANGEBYSCORE', key, 0, '+inf', 'WITHSCORES', 'LIMIT', 0, 1)
+if #first > 0 then
+  earliest = tonumber(first[2])
+  if allowed == 0 then
+    retry_after_ms = math.max(0, earliest + window_ms - now_ms)
+  end
+end
+
+local remaining = limit - sum
+if remaining < 0 then remaining = 0 end
+return { allowed, remaining, limit, earliest, retry_after_ms }
@@ -1,5 +1,6 @@
 -- Atomic Token Bucket using Redis hash
 -- KEYS[1] = bucket key
+-- KEYS[2] = adaptive limit key (optional, see adaptive.lua)
 -- ARGV = [capacity, refill_rate_per_sec, now_ms, cost]
 
 local key = KEYS[1]
@@ -8,6 +9,16 @@ local refill = tonumber(ARGV[2])
 local now_ms = tonumber(ARGV[3])
 local cost = tonumber(ARGV[4])
 
+-- Adaptive plans: the AIMD limit replaces capacity, refill scales with it
+if KEYS[2] then
+  local eff = tonumber(redis.call('HGET', KEYS[2], 'limit'))
+  if eff and capacity > 0 then
+    eff = math.max(1, math.floor(eff))
+    refill = refill * eff / capacity
+    capacity = eff
+  end
+end
+
 -- Read current state
 local data = redis.call('HMGET', key, 'tokens', 'ts')
 local tokens = tonumber(data[1])
@@ -49,15 +60,16 @@ end
 -- Persist state
 redis.call('HMSET', key, 'tokens', new_tokens, 'ts', now_ms)
 
--- TTL: approx time to refill full capacity plus buffer
+-- TTL: approx time to refill full capacity plus buffer (longer while
+-- /v1/acquire reservations keep the bucket in debt)
 local ttl_sec
 if refill and refill > 0 then
-  ttl_sec = math.ceil(capacity / refill) + 5
+  ttl_sec = math.ceil(math.max(capacity, capacity - new_tokens) / refill) + 5
 else
   ttl_sec = 3600
 end
 redis.call('EXPIRE', key, ttl_sec)
 
 -- Return: [allowed, tokens_remaining, capacity, retry_after_ms]
-local remaining = math.floor(new_tokens)
+local remaining = math.max(0, math.floor(new_tokens))
 return { allowed, remaining, capacity, retry_after_ms }
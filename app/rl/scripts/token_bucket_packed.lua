@@ -0,0 +1,62 @@
+-- Token Bucket with packed state: one string "<micro_tokens>:<ts_ms>"
+-- KEYS[1] = bucket key
+-- KEYS[2] = adaptive limit key (optional, see adaptive.lua)
+-- ARGV = [capacity, refill_rate_per_sec, now_ms, cost]
+
+local key = KEYS[1]
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local now_ms = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+
+if KEYS[2] then
+  local eff = tonumber(redis.call('HGET', KEYS[2], 'limit'))
+  if eff and capacity > 0 then
+    eff = math.max(1, math.floor(eff))
+    refill = refill * eff / capacity
+    capacity = eff
+  end
+end
+
+local cap_micro = capacity * 1000000
+local cost_micro = cost * 1000000
+local micro = cap_micro
+local ts = now_ms
+
+local packed = redis.call('GET', key)
+if packed then
+  local sep = string.find(packed, ':', 1, true)
+  micro = tonumber(string.sub(packed, 1, sep - 1))
+  ts = tonumber(string.sub(packed, sep + 1))
+end
+
+-- Refill: refill tokens/s == refill micro-tokens/ms * 1000
+local elapsed_ms = now_ms - ts
+if elapsed_ms < 0 then elapsed_ms = 0 end
+if refill and refill > 0 then
+  micro = math.min(cap_micro, micro + math.floor(elapsed_ms * refill * 1000))
+else
+  micro = math.min(cap_micro, micro)
+end
+
+local allowed = 0
+if micro >= cost_micro then
+  allowed = 1
+  micro = micro - cost_micro
+end
+
+local retry_after_ms = 0
+if allowed == 0 and refill and refill > 0 then
+  retry_after_ms = math.ceil((cost_micro - micro) / (refill * 1000))
+end
+
+local ttl_sec
+if refill and refill > 0 then
+  -- Longer while /v1/acquire reservations keep the bucket in debt
+  ttl_sec = math.ceil(math.max(capacity, capacity - micro / 1000000) / refill) + 5
+else
+  ttl_sec = 3600
+end
+redis.call('SET', key, string.format('%d:%d', micro, now_ms), 'EX', ttl_sec)
+
+return { allowed, math.max(0, math.floor(micro / 1000000)), capacity, retry_after_ms }
@@ -0,0 +1,212 @@
+import math
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from redis.asyncio import Redis
+
+from app.rl.strategies import adaptive
+from app.rl.strategies.token_bucket_packed import MICRO, pack, unpack
+
+# Reservations against a token bucket for /v1/acquire (see acquire.lua).
+# The bucket key is shared with /v1/check, in either state encoding.
+
+GRANTED, QUEUED, TOO_LATE, QUEUE_FULL = 1, 2, 0, -1
+
+_SCRIPTS: dict = {}
+_SCRIPT_TEXTS: dict = {}
+
+
+class Reservation(NamedTuple):
+    status: int
+    remaining: int
+    limit: int
+    # Until the slot (QUEUED), or the retry hint (TOO_LATE)
+    wait_ms: int
+    depth: int
+
+
+def _get_script_text(name: str) -> str:
+    if name not in _SCRIPT_TEXTS:
+        path = Path(__file__).resolve().parent.parent / "scripts" / f"{name}.lua"
+        _SCRIPT_TEXTS[name] = path.read_text(encoding="utf-8")
+    return _SCRIPT_TEXTS[name]
+
+
+async def _eval_script(redis: Redis, name: str, keys: list[str], args: list):
+    script_text = _get_script_text(name)
+    reg = getattr(redis, "register_script", None)
+    if callable(reg):
+        if name not in _SCRIPTS:
+            _SCRIPTS[name] = reg(script_text)
+        return await _SCRIPTS[name](keys=keys, args=args, client=redis)
+    return await redis.eval(script_text, len(keys), *keys, *args)
+
+
+def schedule(
+    micro: int,
+    cap_micro: int,
+    cost_micro: int,
+    refill_rate_per_sec: float,
+    max_wait_ms: int,
+    depth: int,
+    max_queue: int,
+) -> tuple[int, int]:
+    """(status, wait_ms) for a refilled bucket at ``micro``; the same
+    decision as acquire.lua."""
+    if micro >= cost_micro:
+        return GRANTED, 0
+    if refill_rate_per_sec <= 0:
+        return TOO_LATE, 0
+    wait_ms = math.ceil((cost_micro - micro) / (refill_rate_per_sec * 1000))
+    if wait_ms > max_wait_ms:
+        return TOO_LATE, wait_ms
+    if depth >= max_queue:
+        return QUEUE_FULL, wait_ms
+    return QUEUED, wait_ms
+
+
+def debt_ttl_sec(capacity: int, micro: int, refill_rate_per_sec: float) -> int:
+    # Until the debt is repaid and the bucket is full again
+    if refill_rate_per_sec <= 0:
+        return 3600
+    return math.ceil((capacity * MICRO - micro) / (refill_rate_per_sec * MICRO)) + 5
+
+
+async def _reserve_python(
+    redis,
+    key,
+    queue_key,
+    capacity,
+    refill,
+    cost,
+    max_wait_ms,
+    max_queue,
+    member,
+    packed,
+    now_ms,
+) -> Reservation:
+    # Non-atomic mirror of acquire.lua for fakeredis
+    cap_micro, cost_micro = capacity * MICRO, cost * MICRO
+    micro, ts = cap_micro, now_ms
+    if packed:
+        raw = await redis.get(key)
+        if raw:
+            micro, ts = unpack(raw)
+    else:
+        tokens, raw_ts = await redis.hmget(key, "tokens", "ts")
+        if tokens is not None:
+            micro = math.floor(float(tokens) * MICRO + 0.5)
+        if raw_ts is not None:
+            ts = int(float(raw_ts))
+    elapsed_ms = max(0, now_ms - ts)
+    if refill > 0:
+        micro = min(cap_micro, micro + math.floor(elapsed_ms * refill * 1000))
+    else:
+        micro = min(cap_micro, micro)
+    await redis.zremrangebyscore(queue_key, "-inf", now_ms)
+    depth = await redis.zcard(queue_key)
+    status, wait_ms = schedule(
+        micro, cap_micro, cost_micro, refill, max_wait_ms, depth, max_queue
+    )
+    if status in (GRANTED, QUEUED):
+        micro -= cost_micro
+        ttl_sec = debt_ttl_sec(capacity, micro, refill)
+        if packed:
+            await redis.set(key, pack(micro, now_ms), ex=ttl_sec)
+        else:
+            await redis.hset(key, mapping={"tokens": micro / MICRO, "ts": now_ms})
+            await redis.expire(key, ttl_sec)
+        if status == QUEUED:
+            await redis.zadd(queue_key, {member: now_ms + wait_ms})
+            depth += 1
+            if await redis.pttl(queue_key) < wait_ms + 1000:
+                await redis.pexpire(queue_key, wait_ms + 1000)
+    return Reservation(status, max(0, micro // MICRO), capacity, wait_ms, depth)
+
+
+async def reserve(
+    redis: Redis,
+    key: str,
+    queue_key: str,
+    *,
+    capacity: int,
+    refill_rate_per_sec: float,
+    cost: int,
+    max_wait_ms: int,
+    max_queue: int,
+    reservation_id: str,
+    packed: bool,
+    now_ms: int | None = None,
+    adaptive_key: Optional[str] = None,
+) -> Reservation:
+    if now_ms is None:
+        now_ms = int(time.time() * 1000)
+    if "fakeredis" in type(redis).__module__:
+        capacity, refill_rate_per_sec = adaptive.scaled(
+            capacity,
+            refill_rate_per_sec,
+            await adaptive.read_limit(redis, adaptive_key),
+        )
+        return await _reserve_python(
+            redis,
+            key,
+            queue_key,
+            capacity,
+            refill_rate_per_sec,
+            cost,
+            max_wait_ms,
+            max_queue,
+            f"{reservation_id}:{cost}",
+            packed,
+            now_ms,
+        )
+    keys = [key, queue_key] if adaptive_key is None else [key, queue_key, adaptive_key]
+    res = await _eval_script(
+        redis,
+        "acquire",
+        keys=keys,
+        args=[
+            capacity,
+            refill_rate_per_sec,
+            now_ms,
+            cost,
+            max_wait_ms,
+            max_queue,
+            reservation_id,
+            int(packed),
+        ],
+    )
+    return Reservation(*(int(v) for v in res))
+
+
+async def cancel(
+    redis: Redis,
+    key: str,
+    queue_key: str,
+    *,
+    member: str,
+    packed: bool,
+    now_ms: int | None = None,
+) -> bool:
+    """Refund a reservation whose slot has not come yet."""
+    if now_ms is None:
+        now_ms = int(time.time() * 1000)
+    if "fakeredis" not in type(redis).__module__:
+        res = await _eval_script(
+            redis, "acquire_cancel", [key, queue_key], [now_ms, member, int(packed)]
+        )
+        return int(res) == 1
+    slot = await redis.zscore(queue_key, member)
+    if slot is None or slot <= now_ms:
+        return False
+    await redis.zrem(queue_key, member)
+    cost = int(member.rpartition(":")[2])
+    if packed:
+        raw = await redis.get(key)
+        if raw:
+            micro, ts = unpack(raw)
+            await redis.set(key, pack(micro + cost * MICRO, ts), keepttl=True)
+    elif await redis.exists(key):
+        await redis.hincrbyfloat(key, "tokens", cost)
+    return True
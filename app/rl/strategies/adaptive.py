@@ -0,0 +1,132 @@
+import math
+import time
+from pathlib import Path
+from typing import Optional
+
+from redis.asyncio import Redis
+
+# AIMD limit of an adaptive plan: a hash {limit, cut_ms} that the token
+# bucket and window scripts read as their KEYS[2] (see adaptive.lua)
+
+_SCRIPT = None
+_SCRIPT_TEXT = None
+
+
+def _get_script_text() -> str:
+    global _SCRIPT_TEXT
+    if _SCRIPT_TEXT is None:
+        path = Path(__file__).resolve().parent.parent / "scripts" / "adaptive.lua"
+        _SCRIPT_TEXT = path.read_text(encoding="utf-8")
+    return _SCRIPT_TEXT
+
+
+async def _eval_script(redis: Redis, keys: list[str], args: list):
+    script_text = _get_script_text()
+    reg = getattr(redis, "register_script", None)
+    if callable(reg):
+        global _SCRIPT
+        if _SCRIPT is None:
+            _SCRIPT = reg(script_text)
+        return await _SCRIPT(keys=keys, args=args, client=redis)
+    return await redis.eval(script_text, len(keys), *keys, *args)
+
+
+def next_limit(
+    limit: float,
+    cut_ms: int,
+    *,
+    min_limit: int,
+    max_limit: int,
+    congested: bool,
+    count: int,
+    step: float,
+    factor: float,
+    cooldown_ms: int,
+    now_ms: int,
+) -> tuple[float, int, bool]:
+    # Same arithmetic as adaptive.lua: (limit, cut_ms, cut)
+    cut = False
+    if congested:
+        if now_ms - cut_ms >= cooldown_ms:
+            limit, cut_ms, cut = limit * factor, now_ms, True
+    else:
+        limit += step * count / max(limit, 1)
+    return min(max(limit, min_limit), max_limit), cut_ms, cut
+
+
+def scaled(
+    limit: int, refill_rate_per_sec: float, effective: Optional[int]
+) -> tuple[int, float]:
+    """``limit`` replaced by the effective one, the refill rate scaled with it
+    (mirrors the KEYS[2] block of the strategy scripts)."""
+    if effective is None or limit <= 0:
+        return limit, refill_rate_per_sec
+    return effective, refill_rate_per_sec * effective / limit
+
+
+def parse_limit(raw) -> Optional[int]:
+    # The stored limit is a float; checks use its whole part, at least 1
+    return max(1, math.floor(float(raw))) if raw is not None else None
+
+
+async def read_limit(redis: Redis, key: Optional[str]) -> Optional[int]:
+    # For the fakeredis paths; the scripts read KEYS[2] themselves
+    if key is None:
+        return None
+    return parse_limit(await redis.hget(key, "limit"))
+
+
+async def update(
+    redis: Redis,
+    key: str,
+    *,
+    base: int,
+    min_limit: int,
+    max_limit: int,
+    congested: bool,
+    count: int,
+    step: float,
+    factor: float,
+    cooldown_ms: int,
+    ttl_sec: int,
+    now_ms: int | None = None,
+) -> tuple[float, bool]:
+    """Apply one feedback report; returns the new limit and whether it was
+    cut."""
+    if now_ms is None:
+        now_ms = int(time.time() * 1000)
+    if "fakeredis" in type(redis).__module__:
+        # Non-atomic mirror of adaptive.lua
+        limit, cut_ms = await redis.hmget(key, "limit", "cut_ms")
+        limit, cut_ms, cut = next_limit(
+            float(limit) if limit is not None else float(base),
+            int(cut_ms) if cut_ms is not None else 0,
+            min_limit=min_limit,
+            max_limit=max_limit,
+            congested=congested,
+            count=count,
+            step=step,
+            factor=factor,
+            cooldown_ms=cooldown_ms,
+            now_ms=now_ms,
+        )
+        await redis.hset(key, mapping={"limit": repr(limit), "cut_ms": cut_ms})
+        await redis.expire(key, ttl_sec)
+        return limit, cut
+    res = await _eval_script(
+        redis,
+        keys=[key],
+        args=[
+            base,
+            min_limit,
+            max_limit,
+            int(congested),
+            count,
+            step,
+            factor,
+            cooldown_ms,
+            now_ms,
+            ttl_sec,
+        ],
+    )
+    return float(res[0]), int(res[1]) == 1
@@ -0,0 +1,257 @@
+import math
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from redis.asyncio import Redis
+
+from app.rl.schemas import CheckDecision
+from app.rl.strategies import adaptive
+
+# Replicated fixed windows and token buckets (REPLICATION_MODE=crdt). Each
+# region only ever grows its own slot of a key; app.rl.replication ships
+# slots to the peer regions, which merge them with crdt_merge.lua.
+
+_SCRIPTS: dict = {}
+_SCRIPT_TEXTS: dict = {}
+
+
+class Slot(NamedTuple):
+    # "fw" or "tb"
+    alg: str
+    # Units counted (fw) or consumed (tb) by the region in this key
+    value: int
+    # When the region's token bucket slot started (0 for fixed windows)
+    gen: int
+    # Growth since the slot was last published; a peer that has not seen
+    # the slot before applies only this much of a token bucket's value
+    delta: int
+    limit: int
+    rate: float
+    expire_at_ms: int
+
+
+def _get_script_text(name: str) -> str:
+    if name not in _SCRIPT_TEXTS:
+        path = Path(__file__).resolve().parent.parent / "scripts" / f"{name}.lua"
+        _SCRIPT_TEXTS[name] = path.read_text(encoding="utf-8")
+    return _SCRIPT_TEXTS[name]
+
+
+def _script(redis: Redis, name: str):
+    if name not in _SCRIPTS:
+        _SCRIPTS[name] = redis.register_script(_get_script_text(name))
+    return _SCRIPTS[name]
+
+
+def _headers(limit: int, remaining: int, reset_at: int, retry_after_ms: int):
+    return {
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Reset": str(reset_at),
+        "Retry-After": str(math.ceil(retry_after_ms / 1000)),
+    }
+
+
+async def fixed_window(
+    redis: Redis,
+    key: str,
+    *,
+    region: str,
+    limit: int,
+    window_sec: int,
+    cost: int,
+    now_ms: int,
+    adaptive_key: Optional[str] = None,
+) -> tuple[CheckDecision, Slot]:
+    window_start = now_ms // 1000 // window_sec * window_sec
+    reset_at = window_start + window_sec
+    if "fakeredis" in type(redis).__module__:
+        # Non-atomic mirror of crdt_fixed_window.lua
+        limit = await adaptive.read_limit(redis, adaptive_key) or limit
+        own = await redis.hincrby(key, region, cost)
+        if await redis.pttl(key) < 0:
+            await redis.pexpireat(key, reset_at * 1000)
+        counter = sum(int(v) for v in await redis.hvals(key))
+        res = [
+            int(counter <= limit),
+            max(0, limit - counter),
+            limit,
+            reset_at,
+            max(0, reset_at * 1000 - now_ms),
+            own,
+        ]
+    else:
+        keys = [key] if adaptive_key is None else [key, adaptive_key]
+        res = await _script(redis, "crdt_fixed_window")(
+            keys=keys, args=[limit, window_sec, now_ms, cost, region], client=redis
+        )
+    allowed, remaining, lim, reset_at, retry_after_ms, own = (int(v) for v in res)
+    decision = CheckDecision(
+        allowed=allowed == 1,
+        remaining=remaining,
+        limit=lim,
+        reset_at=reset_at,
+        retry_after_ms=retry_after_ms,
+        algorithm="fixed_window",
+        headers=_headers(lim, remaining, reset_at, retry_after_ms),
+    )
+    return decision, Slot("fw", own, 0, cost, lim, 0.0, reset_at * 1000)
+
+
+async def token_bucket(
+    redis: Redis,
+    key: str,
+    *,
+    region: str,
+    capacity: int,
+    refill_rate_per_sec: float,
+    cost: int,
+    now_ms: int,
+    adaptive_key: Optional[str] = None,
+) -> tuple[CheckDecision, Slot]:
+    if "fakeredis" in type(redis).__module__:
+        # Non-atomic mirror of crdt_token_bucket.lua
+        capacity, refill_rate_per_sec = adaptive.scaled(
+            capacity,
+            refill_rate_per_sec,
+            await adaptive.read_limit(redis, adaptive_key),
+        )
+        res = await _token_bucket_python(
+            redis, key, region, capacity, refill_rate_per_sec, cost, now_ms
+        )
+    else:
+        keys = [key] if adaptive_key is None else [key, adaptive_key]
+        res = await _script(redis, "crdt_token_bucket")(
+            keys=keys,
+            args=[capacity, refill_rate_per_sec, now_ms, cost, region],
+            client=redis,
+        )
+    allowed, remaining, cap, retry_after_ms, own, gen = (int(v) for v in res)
+    reset_at = math.ceil((now_ms + retry_after_ms) / 1000)
+    decision = CheckDecision(
+        allowed=allowed == 1,
+        remaining=remaining,
+        limit=cap,
+        reset_at=reset_at,
+        retry_after_ms=retry_after_ms,
+        algorithm="token_bucket",
+        headers=_headers(cap, remaining, reset_at, retry_after_ms),
+    )
+    # Consumption older than a full refill no longer matters to a peer
+    full_ms = (
+        math.ceil(cap / refill_rate_per_sec * 1000) if refill_rate_per_sec > 0 else 0
+    )
+    slot = Slot(
+        "tb",
+        own,
+        gen,
+        cost if allowed else 0,
+        cap,
+        refill_rate_per_sec,
+        now_ms + (full_ms or 3_600_000),
+    )
+    return decision, slot
+
+
+async def _token_bucket_python(redis, key, region, capacity, refill, cost, now_ms):
+    cfield, gfield = f"c:{region}", f"g:{region}"
+    tokens, ts, own, gen = await redis.hmget(key, "tokens", "ts", cfield, gfield)
+    tokens = float(tokens) if tokens is not None else float(capacity)
+    ts = int(float(ts)) if ts is not None else now_ms
+    own = int(own or 0)
+    gen = int(gen) if gen is not None else now_ms
+    elapsed_ms = max(0, now_ms - ts)
+    if refill > 0:
+        tokens = min(capacity, tokens + elapsed_ms / 1000.0 * refill)
+    else:
+        tokens = min(capacity, tokens)
+    allowed, retry_after_ms = tokens >= cost, 0
+    if allowed:
+        tokens -= cost
+        own += cost
+    elif refill > 0:
+        retry_after_ms = int((cost - tokens) / refill * 1000.0 + 0.5)
+    await redis.hset(
+        key, mapping={"tokens": tokens, "ts": now_ms, cfield: own, gfield: gen}
+    )
+    ttl_sec = (
+        math.ceil(max(capacity, capacity - tokens) / refill) + 5 if refill > 0 else 3600
+    )
+    await redis.expire(key, ttl_sec)
+    return [
+        int(allowed),
+        max(0, math.floor(tokens)),
+        capacity,
+        retry_after_ms,
+        own,
+        gen,
+    ]
+
+
+async def _merge_python(redis, key, region, slot: Slot, now_ms) -> int:
+    # Non-atomic mirror of crdt_merge.lua
+    if slot.expire_at_ms <= now_ms:
+        return 0
+    if slot.alg == "fw":
+        cur = int(await redis.hget(key, region) or 0)
+        if slot.value <= cur:
+            return 0
+        await redis.hset(key, region, slot.value)
+        if await redis.pttl(key) < 0:
+            await redis.pexpireat(key, slot.expire_at_ms)
+        return slot.value - cur
+    cfield, gfield = f"c:{region}", f"g:{region}"
+    tokens, _ts, cur, cur_gen = await redis.hmget(key, "tokens", "ts", cfield, gfield)
+    if cur_gen is not None and slot.gen < int(cur_gen):
+        return 0
+    if cur_gen is not None and slot.gen == int(cur_gen):
+        if slot.value <= int(cur):
+            return 0
+        applied = slot.value - int(cur)
+    else:
+        applied = min(slot.delta, slot.value)
+    if tokens is None:
+        tokens = slot.limit
+        await redis.hset(key, "ts", now_ms)
+    tokens = float(tokens) - applied
+    await redis.hset(
+        key, mapping={"tokens": tokens, cfield: slot.value, gfield: slot.gen}
+    )
+    ttl_sec = (
+        math.ceil(max(slot.limit, slot.limit - tokens) / slot.rate) + 5
+        if slot.rate > 0
+        else 3600
+    )
+    if await redis.ttl(key) < ttl_sec:
+        await redis.expire(key, ttl_sec)
+    return applied
+
+
+async def merge_many(
+    redis: Redis, region: str, slots: list[tuple[str, Slot]], now_ms: int
+) -> int:
+    """Merge a peer region's slots into the local keys; returns the units
+    applied. One pipeline of EVALSHAs."""
+    if not slots:
+        return 0
+    if "fakeredis" in type(redis).__module__:
+        return sum([await _merge_python(redis, k, region, s, now_ms) for k, s in slots])
+    script = _script(redis, "crdt_merge")
+    pipe = redis.pipeline(transaction=False)
+    for key, s in slots:
+        await script(
+            keys=[key],
+            args=[
+                s.alg,
+                region,
+                s.value,
+                s.gen,
+                s.delta,
+                s.limit,
+                s.rate,
+                s.expire_at_ms,
+                now_ms,
+            ],
+            client=pipe,
+        )
+    return sum(int(v) for v in await pipe.execute())
@@ -5,7 +5,9 @@ from typing import Dict, Any, Tuple
 from redis.asyncio import Redis
 from app.rl.keys import window_key
 from app.rl.schemas import CheckDecision
+from app.rl.strategies import adaptive
 
+_SCRIPT = None
 _SCRIPT_TEXT = None
 
 
@@ -23,8 +25,11 @@ async def _eval_script(redis: Redis, keys: list[str], args: list):
         return await redis.eval(script_text, len(keys), *keys, *args)
     reg = getattr(redis, "register_script", None)
     if callable(reg):
-        script = reg(script_text)
-        return await script(keys=keys, args=args)
+        global _SCRIPT
+        if _SCRIPT is None:
+            # Cached like token_bucket's; client is bound per call
+            _SCRIPT = reg(script_text)
+        return await _SCRIPT(keys=keys, args=args, client=redis)
     load = getattr(redis, "script_load", None)
     evalsha = getattr(redis, "evalsha", None)
     if callable(load) and callable(evalsha):
@@ -41,10 +46,12 @@ async def check(
     window_sec: int,
     cost: int = 1,
     now_ms: int | None = None,
+    adaptive_key: str | None = None,
 ) -> CheckDecision:
     if now_ms is None:
         now_ms = int(time.time() * 1000)
     if "fakeredis" in type(redis).__module__:
+        limit = await adaptive.read_limit(redis, adaptive_key) or limit
         now_sec = now_ms // 1000
         window_start = (now_sec // window_sec) * window_sec
         exists = await redis.exists(key)
@@ -70,7 +77,8 @@ async def check(
             algorithm="fixed_window",
             headers=headers,
         )
-    res = await _eval_script(redis, keys=[key], args=[limit, window_sec, now_ms, cost])
+    keys = [key] if adaptive_key is None else [key, adaptive_key]
+    res = await _eval_script(redis, keys=keys, args=[limit, window_sec, now_ms, cost])
     # res: [allowed, remaining, limit, reset_at, retry_after_ms]
     allowed = int(res[0]) == 1
     remaining = int(res[1])
@@ -0,0 +1,148 @@
+import math
+from datetime import date, datetime, time as dtime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple
+from zoneinfo import ZoneInfo
+
+from redis.asyncio import Redis
+
+from app.rl.schemas import CheckDecision
+
+# Daily / monthly quotas counted in Redis (period_quota.lua) and written
+# behind to the database by app.core.period_counts. A counter outlives its
+# period by EXPIRE_GRACE_MS so nodes with a skewed clock still find it.
+
+PERIODS = ("day", "month")
+EXPIRE_GRACE_MS = 3_600_000
+
+_SCRIPTS: dict = {}
+_SCRIPT_TEXTS: dict = {}
+
+
+class Period(NamedTuple):
+    # "2026-10-19" or "2026-10", on the tenant's local calendar
+    label: str
+    start_ms: int
+    end_ms: int
+
+
+@lru_cache(maxsize=1024)
+def zone(tz: str) -> ZoneInfo:
+    return ZoneInfo(tz)
+
+
+def _midnight_ms(d: date, tz: ZoneInfo) -> int:
+    return int(datetime.combine(d, dtime.min, tzinfo=tz).timestamp() * 1000)
+
+
+def _compute(period: str, tz: str, now_ms: int) -> Period:
+    z = zone(tz)
+    day = datetime.fromtimestamp(now_ms / 1000, z).date()
+    if period == "month":
+        first = day.replace(day=1)
+        nxt = (first + timedelta(days=32)).replace(day=1)
+        label = first.strftime("%Y-%m")
+    else:
+        first, nxt = day, day + timedelta(days=1)
+        label = first.isoformat()
+    # Local midnights, so a period is 23 or 25 hours long across DST changes
+    return Period(label, _midnight_ms(first, z), _midnight_ms(nxt, z))
+
+
+# (period, tz) -> the period last computed; checks only redo the calendar
+# math once it has ended
+_CURRENT: dict[tuple[str, str], Period] = {}
+
+
+def period_bounds(period: str, tz: str, now_ms: int) -> Period:
+    cur = _CURRENT.get((period, tz))
+    if cur is not None and cur.start_ms <= now_ms < cur.end_ms:
+        return cur
+    cur = _compute(period, tz, now_ms)
+    _CURRENT[(period, tz)] = cur
+    return cur
+
+
+def _get_script_text(name: str) -> str:
+    if name not in _SCRIPT_TEXTS:
+        path = Path(__file__).resolve().parent.parent / "scripts" / f"{name}.lua"
+        _SCRIPT_TEXTS[name] = path.read_text(encoding="utf-8")
+    return _SCRIPT_TEXTS[name]
+
+
+async def _eval_script(redis: Redis, name: str, keys: list[str], args: list):
+    script_text = _get_script_text(name)
+    reg = getattr(redis, "register_script", None)
+    if callable(reg):
+        if name not in _SCRIPTS:
+            _SCRIPTS[name] = reg(script_text)
+        return await _SCRIPTS[name](keys=keys, args=args, client=redis)
+    return await redis.eval(script_text, len(keys), *keys, *args)
+
+
+def decision(
+    allowed: bool, remaining: int, limit: int, end_ms: int, now_ms: int
+) -> CheckDecision:
+    reset_at = math.ceil(end_ms / 1000)
+    # Denied until the next period starts
+    retry_after_ms = 0 if allowed else max(0, end_ms - now_ms)
+    return CheckDecision(
+        allowed=allowed,
+        remaining=remaining,
+        limit=limit,
+        reset_at=reset_at,
+        retry_after_ms=retry_after_ms,
+        algorithm="period_quota",
+        headers={
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(reset_at),
+            "Retry-After": str(math.ceil(retry_after_ms / 1000)),
+        },
+    )
+
+
+async def check(
+    redis: Redis,
+    key: str,
+    *,
+    limit: int,
+    cost: int,
+    end_ms: int,
+    now_ms: int,
+) -> tuple[CheckDecision, bool]:
+    """Debit ``cost`` from the period's counter.
+
+    Returns the decision and whether the counter has had its persisted
+    count added; False means the caller should schedule that load.
+    """
+    expire_at_ms = end_ms + EXPIRE_GRACE_MS
+    if "fakeredis" in type(redis).__module__:
+        # Non-atomic mirror of period_quota.lua
+        used, hydrated = await redis.hmget(key, "n", "h")
+        if used is None:
+            await redis.hset(key, mapping={"n": 0, "h": 0})
+            await redis.pexpireat(key, expire_at_ms)
+        used, hydrated = int(used or 0), int(hydrated or 0)
+        allowed = used + cost <= limit
+        if allowed:
+            used = await redis.hincrby(key, "n", cost)
+        res = [int(allowed), max(0, limit - used), limit, hydrated]
+    else:
+        res = await _eval_script(
+            redis, "period_quota", [key], [limit, cost, expire_at_ms]
+        )
+    allowed, remaining, lim, hydrated = (int(v) for v in res)
+    return decision(allowed == 1, remaining, lim, end_ms, now_ms), hydrated == 1
+
+
+async def seed(redis: Redis, key: str, count: int) -> bool:
+    """Add the persisted ``count`` to a counter that has not had it yet."""
+    if "fakeredis" not in type(redis).__module__:
+        return int(await _eval_script(redis, "period_quota_seed", [key], [count])) == 1
+    if await redis.hget(key, "h") != "0":
+        return False
+    await redis.hincrby(key, "n", count)
+    await redis.hset(key, "h", 1)
+    return True
@@ -1,9 +1,81 @@
 import time
 import math
+import re
+import secrets
+from pathlib import Path
 from typing import Dict, Any, Tuple
 from redis.asyncio import Redis
 from app.rl.keys import bucket_key
 from app.rl.schemas import CheckDecision
+from app.rl.strategies import adaptive
+
+# Weighted log: one ZSET member "<now_ms>:<cost>:<nonce>" per admitted
+# request plus a "#" member holding the cost sum as score -(sum + 1).
+SUM_MEMBER = "#"
+_COST_RE = re.compile(r"^\d+:(\d+):")
+_SCRIPT = None
+_SCRIPT_TEXT = None
+
+
+def _get_script_text() -> str:
+    global _SCRIPT_TEXT
+    if _SCRIPT_TEXT is None:
+        path = Path(__file__).resolve().parent.parent / "scripts" / "sliding_window.lua"
+        _SCRIPT_TEXT = path.read_text(encoding="utf-8")
+    return _SCRIPT_TEXT
+
+
+async def _eval_script(redis: Redis, keys: list[str], args: list):
+    script_text = _get_script_text()
+    reg = getattr(redis, "register_script", None)
+    if callable(reg):
+        global _SCRIPT
+        if _SCRIPT is None:
+            # Cached like token_bucket's; client is bound per call
+            _SCRIPT = reg(script_text)
+        return await _SCRIPT(keys=keys, args=args, client=redis)
+    return await redis.eval(script_text, len(keys), *keys, *args)
+
+
+def cost_of(member: str) -> int:
+    m = _COST_RE.match(member)
+    # Legacy "evt:<ms>" members are one unit each
+    return int(m.group(1)) if m else 1
+
+
+def decode_sum(score) -> int:
+    return int(-float(score)) - 1
+
+
+async def _check_python(
+    redis: Redis, key: str, limit: int, window_ms: int, cost: int, now_ms: int, nonce
+):
+    # Non-atomic mirror of sliding_window.lua for fakeredis
+    min_score = now_ms - window_ms
+    s = await redis.zscore(key, SUM_MEMBER)
+    if s is not None:
+        total = decode_sum(s)
+    else:
+        members = await redis.zrangebyscore(key, 0, "+inf")
+        total = sum(cost_of(m) for m in members)
+    expired = await redis.zrangebyscore(key, 0, min_score)
+    if expired:
+        total -= sum(cost_of(m) for m in expired)
+        await redis.zremrangebyscore(key, 0, min_score)
+    total = max(0, total)
+    allowed = total + cost <= limit
+    if allowed:
+        total += cost
+        await redis.zadd(key, {f"{now_ms}:{cost}:{nonce}": now_ms})
+    await redis.zadd(key, {SUM_MEMBER: -(total + 1)})
+    await redis.pexpire(key, window_ms + 1000)
+    first = await redis.zrangebyscore(key, 0, "+inf", start=0, num=1, withscores=True)
+    earliest, retry_after_ms = now_ms, 0
+    if first:
+        earliest = int(first[0][1])
+        if not allowed:
+            retry_after_ms = max(0, earliest + window_ms - now_ms)
+    return [int(allowed), max(0, limit - total), limit, earliest, retry_after_ms]
 
 
 async def check(
@@ -14,40 +86,26 @@ async def check(
     window_sec: int,
     cost: int = 1,
     now_ms: int | None = None,
+    adaptive_key: str | None = None,
 ) -> CheckDecision:
     if now_ms is None:
         now_ms = int(time.time() * 1000)
-    min_score = now_ms - window_sec * 1000
-
-    await redis.zremrangebyscore(key, 0, min_score)
-    count = await redis.zcard(key)
-    allowed = (count + cost) <= limit
-
-    retry_after_ms = 0
-    earliest_ms = None
-    if not allowed:
-        first = await redis.zrange(key, 0, 0, withscores=True)
-        if first:
-            earliest_ms = int(first[0][1])
-            retry_after_ms = max(0, (earliest_ms + window_sec * 1000) - now_ms)
-
-    if allowed:
-        pipe = redis.pipeline()
-        for i in range(cost):
-            score = now_ms + i
-            pipe.zadd(key, {f"evt:{score}": score})
-        pipe.pexpire(key, window_sec * 1000 + 1000)
-        await pipe.execute()
-
-    used = count + (cost if allowed else 0)
-    remaining = max(0, limit - used)
-    # reset_at based on earliest event in the window after mutation
-    if earliest_ms is None:
-        # fetch earliest after write
-        first_after = await redis.zrange(key, 0, 0, withscores=True)
-        if first_after:
-            earliest_ms = int(first_after[0][1])
-    reset_at_s = math.ceil(((earliest_ms or now_ms) + window_sec * 1000) / 1000)
+    window_ms = window_sec * 1000
+    nonce = secrets.token_hex(6)
+    if "fakeredis" in type(redis).__module__:
+        limit = await adaptive.read_limit(redis, adaptive_key) or limit
+        res = await _check_python(redis, key, limit, window_ms, cost, now_ms, nonce)
+    else:
+        keys = [key] if adaptive_key is None else [key, adaptive_key]
+        res = await _eval_script(
+            redis, keys=keys, args=[limit, window_ms, now_ms, cost, nonce]
+        )
+    # res: [allowed, remaining, limit, earliest_ms, retry_after_ms]
+    allowed = int(res[0]) == 1
+    remaining = int(res[1])
+    limit = int(res[2])
+    retry_after_ms = int(res[4])
+    reset_at_s = math.ceil((int(res[3]) + window_ms) / 1000)
 
     headers = {
         "X-RateLimit-Limit": str(limit),
@@ -5,6 +5,7 @@ from typing import Dict, Any, Tuple
 from redis.asyncio import Redis
 from app.rl.keys import bucket_key
 from app.rl.schemas import CheckDecision
+from app.rl.strategies import adaptive
 
 _SCRIPT = None
 _SCRIPT_TEXT = None
@@ -26,8 +27,12 @@ async def _eval_script(redis: Redis, keys: list[str], args: list):
     # Prefer register_script if available
     reg = getattr(redis, "register_script", None)
     if callable(reg):
-        script = reg(script_text)
-        return await script(keys=keys, args=args)
+        global _SCRIPT
+        if _SCRIPT is None:
+            # Registered once per process; the SHA is computed here and
+            # EVALSHA runs on whichever client is passed per call
+            _SCRIPT = reg(script_text)
+        return await _SCRIPT(keys=keys, args=args, client=redis)
     # Fallback to evalsha if supported
     load = getattr(redis, "script_load", None)
     evalsha = getattr(redis, "evalsha", None)
@@ -46,11 +51,17 @@ async def check(
     refill_rate_per_sec: float,
     cost: int = 1,
     now_ms: int | None = None,
+    adaptive_key: str | None = None,
 ) -> CheckDecision:
     if now_ms is None:
         now_ms = int(time.time() * 1000)
     # Fallback pure-Python path for fakeredis (no Lua support)
     if "fakeredis" in type(redis).__module__:
+        capacity, refill_rate_per_sec = adaptive.scaled(
+            capacity,
+            refill_rate_per_sec,
+            await adaptive.read_limit(redis, adaptive_key),
+        )
         data = await redis.hgetall(key)
         tokens = float(data.get("tokens", capacity) if data else capacity)
         ts = int(data.get("ts", now_ms) if data else now_ms)
@@ -65,13 +76,13 @@ async def check(
             retry_after_ms = int((missing / refill_rate_per_sec) * 1000.0 + 0.5)
         await redis.hset(key, mapping={"tokens": tokens, "ts": now_ms})
         ttl_sec = (
-            int((capacity / refill_rate_per_sec) + 5)
+            math.ceil(max(capacity, capacity - tokens) / refill_rate_per_sec) + 5
             if refill_rate_per_sec > 0
             else 3600
         )
         await redis.expire(key, ttl_sec)
         limit = int(capacity)
-        remaining = int(tokens)
+        remaining = max(0, math.floor(tokens))
         reset_at_s = math.ceil((now_ms + retry_after_ms) / 1000)
         headers = {
             "X-RateLimit-Limit": str(limit),
@@ -89,8 +100,9 @@ async def check(
             headers=headers,
         )
 
+    keys = [key] if adaptive_key is None else [key, adaptive_key]
     res = await _eval_script(
-        redis, keys=[key], args=[capacity, refill_rate_per_sec, now_ms, cost]
+        redis, keys=keys, args=[capacity, refill_rate_per_sec, now_ms, cost]
     )
     # res: [allowed, remaining, capacity, retry_after_ms]
     allowed = int(res[0]) == 1
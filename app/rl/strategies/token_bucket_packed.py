@@ -0,0 +1,121 @@
+import time
+import math
+from pathlib import Path
+from redis.asyncio import Redis
+from app.rl.schemas import CheckDecision
+from app.rl.strategies import adaptive
+
+# Token bucket whose state is a single string "<micro_tokens>:<ts_ms>"
+# instead of a two-field hash of float strings (KEY_ENCODING=compact).
+
+_SCRIPT = None
+_SCRIPT_TEXT = None
+MICRO = 1_000_000
+
+
+def _get_script_text() -> str:
+    global _SCRIPT_TEXT
+    if _SCRIPT_TEXT is None:
+        path = (
+            Path(__file__).resolve().parent.parent
+            / "scripts"
+            / "token_bucket_packed.lua"
+        )
+        _SCRIPT_TEXT = path.read_text(encoding="utf-8")
+    return _SCRIPT_TEXT
+
+
+async def _eval_script(redis: Redis, keys: list[str], args: list):
+    script_text = _get_script_text()
+    if "fakeredis" in type(redis).__module__:
+        return await redis.eval(script_text, len(keys), *keys, *args)
+    reg = getattr(redis, "register_script", None)
+    if callable(reg):
+        global _SCRIPT
+        if _SCRIPT is None:
+            # Cached like token_bucket's; client is bound per call
+            _SCRIPT = reg(script_text)
+        return await _SCRIPT(keys=keys, args=args, client=redis)
+    return await redis.eval(script_text, len(keys), *keys, *args)
+
+
+def pack(micro_tokens: int, ts_ms: int) -> str:
+    return f"{micro_tokens}:{ts_ms}"
+
+
+def unpack(packed: str) -> tuple[int, int]:
+    micro, _, ts = packed.partition(":")
+    return int(micro), int(ts)
+
+
+def _decision(allowed, remaining, limit, retry_after_ms, now_ms) -> CheckDecision:
+    reset_at_s = math.ceil((now_ms + retry_after_ms) / 1000)
+    return CheckDecision(
+        allowed=allowed,
+        remaining=remaining,
+        limit=limit,
+        reset_at=reset_at_s,
+        retry_after_ms=retry_after_ms,
+        algorithm="token_bucket",
+        headers={
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(reset_at_s),
+            "Retry-After": str(math.ceil(retry_after_ms / 1000)),
+        },
+    )
+
+
+async def check(
+    redis: Redis,
+    key: str,
+    *,
+    capacity: int,
+    refill_rate_per_sec: float,
+    cost: int = 1,
+    now_ms: int | None = None,
+    adaptive_key: str | None = None,
+) -> CheckDecision:
+    if now_ms is None:
+        now_ms = int(time.time() * 1000)
+    # Pure-Python path for fakeredis; same integer arithmetic as the script
+    if "fakeredis" in type(redis).__module__:
+        capacity, refill_rate_per_sec = adaptive.scaled(
+            capacity,
+            refill_rate_per_sec,
+            await adaptive.read_limit(redis, adaptive_key),
+        )
+        cap_micro, cost_micro = capacity * MICRO, cost * MICRO
+        packed = await redis.get(key)
+        micro, ts = unpack(packed) if packed else (cap_micro, now_ms)
+        elapsed_ms = max(0, now_ms - ts)
+        if refill_rate_per_sec > 0:
+            micro = min(
+                cap_micro, micro + math.floor(elapsed_ms * refill_rate_per_sec * 1000)
+            )
+        else:
+            micro = min(cap_micro, micro)
+        allowed = micro >= cost_micro
+        if allowed:
+            micro -= cost_micro
+        retry_after_ms = 0
+        if not allowed and refill_rate_per_sec > 0:
+            retry_after_ms = math.ceil(
+                (cost_micro - micro) / (refill_rate_per_sec * 1000)
+            )
+        ttl_sec = (
+            math.ceil(max(capacity, capacity - micro / MICRO) / refill_rate_per_sec) + 5
+            if refill_rate_per_sec > 0
+            else 3600
+        )
+        await redis.set(key, pack(micro, now_ms), ex=ttl_sec)
+        return _decision(
+            allowed, max(0, micro // MICRO), int(capacity), retry_after_ms, now_ms
+        )
+
+    keys = [key] if adaptive_key is None else [key, adaptive_key]
+    res = await _eval_script(
+        redis, keys=keys, args=[capacity, refill_rate_per_sec, now_ms, cost]
+    )
+    # res: [allowed, tokens_remaining, capacity, retry_after_ms]
+    return _decision(int(res[0]) == 1, int(res[1]), int(res[2]), int(res[3]), now_ms)
@@ -0,0 +1,141 @@
+"""Recorded check traffic, one record per check.
+
+Two encodings, told apart by the first bytes of the file:
+
+- JSONL, one object per line::
+
+    {"ts_ms": 1760870000000, "tenant": "<uuid>", "resource": "GET:/a",
+     "subject": "user:1", "cost": 1}
+
+  with an optional ``"allowed"`` for the decision taken at the time.
+- binary: ``MAGIC`` and then fixed-width little-endian records (``RECORD``):
+  ts_ms i64, tenant UUID 16 bytes, resource id u64 (``keys.resource_id``),
+  subject hash u64, cost u32, decision u8 (``DENIED``, ``ALLOWED`` or
+  ``UNKNOWN``).
+
+Binary records keep only digests of the resource and subject. Readers map
+resource ids back through the resources they know about (the plan routes,
+for a replay); others decode as ``#<base62 id>``, the resource's compact
+key token. Subjects decode as ``h:<base62 hash>``, which keeps every
+subject distinct in limiter keys.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import struct
+import uuid
+from typing import BinaryIO, Iterable, Iterator, NamedTuple, Optional
+
+from app.rl.keys import b62, resource_id
+
+MAGIC = b"LFTRACE1"
+RECORD = struct.Struct("<q16sQQIB")
+
+DENIED, ALLOWED, UNKNOWN = 0, 1, 255
+
+
+class TraceRecord(NamedTuple):
+    ts_ms: int
+    tenant: str
+    resource: str
+    subject: str
+    cost: int = 1
+    # Decision taken when the traffic was recorded, if known
+    allowed: Optional[bool] = None
+
+
+def subject_hash(subject: str) -> int:
+    digest = hashlib.blake2b(
+        subject.encode("utf-8"), digest_size=8, person=b"lf-subject"
+    ).digest()
+    return int.from_bytes(digest, "big")
+
+
+def _decision_byte(allowed: Optional[bool]) -> int:
+    if allowed is None:
+        return UNKNOWN
+    return ALLOWED if allowed else DENIED
+
+
+def encode(rec: TraceRecord) -> bytes:
+    return RECORD.pack(
+        rec.ts_ms,
+        uuid.UUID(str(rec.tenant)).bytes,
+        resource_id(rec.resource),
+        subject_hash(rec.subject),
+        rec.cost,
+        _decision_byte(rec.allowed),
+    )
+
+
+def decode(data: bytes, resources: Optional[dict[int, str]] = None) -> TraceRecord:
+    ts_ms, tenant, rid, sh, cost, decision = RECORD.unpack(data)
+    resource = (resources or {}).get(rid)
+    return TraceRecord(
+        ts_ms,
+        str(uuid.UUID(bytes=tenant)),
+        resource if resource is not None else f"#{b62(rid)}",
+        f"h:{b62(sh)}",
+        cost,
+        None if decision == UNKNOWN else decision == ALLOWED,
+    )
+
+
+def resource_names(resources: Iterable[str]) -> dict[int, str]:
+    return {resource_id(r): r for r in resources}
+
+
+def read_binary(
+    f: BinaryIO, resources: Optional[dict[int, str]] = None, chunk: int = 4096
+) -> Iterator[TraceRecord]:
+    """Records of a binary trace; ``f`` is positioned after ``MAGIC``. A
+    truncated last record (a writer that died mid-write) is ignored."""
+    size = RECORD.size
+    while True:
+        buf = f.read(size * chunk)
+        for off in range(0, len(buf) - size + 1, size):
+            yield decode(buf[off : off + size], resources)
+        if len(buf) < size * chunk:
+            return
+
+
+def read_jsonl(lines: Iterable[str]) -> Iterator[TraceRecord]:
+    for n, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line)
+            yield TraceRecord(
+                int(obj["ts_ms"]),
+                str(obj["tenant"]),
+                str(obj["resource"]),
+                str(obj["subject"]),
+                int(obj.get("cost", 1)),
+                obj.get("allowed"),
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"trace line {n}: {e!r}") from None
+
+
+def read_trace(
+    path: str, resources: Optional[dict[int, str]] = None
+) -> Iterator[TraceRecord]:
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) == MAGIC:
+            yield from read_binary(f, resources)
+            return
+    with open(path, encoding="utf-8") as f:
+        yield from read_jsonl(f)
+
+
+def write_binary(path: str, records: Iterable[TraceRecord]) -> int:
+    n = 0
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        for rec in records:
+            f.write(encode(rec))
+            n += 1
+    return n
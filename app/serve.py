@@ -0,0 +1,197 @@
+"""Production entry point: ``python -m app.serve``.
+
+Picks uvloop/httptools when installed, tunes backlog and keep-alive, and in
+multi-worker mode pre-forks workers that each bind their own SO_REUSEPORT
+socket so the kernel balances connections across them. Every worker runs the
+app's warm-up during lifespan startup, before its socket starts listening.
+Workers that crash are respawned with an exponential backoff while they keep
+dying at startup; the supervisor gives up after
+``SERVER_RESPAWN_MAX_FAILURES`` such crashes in a row.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import multiprocessing as mp
+import os
+import signal
+import socket
+import sys
+import time
+
+from app.core.config import settings
+
+
+def _has(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def pick_loop() -> str:
+    return "uvloop" if _has("uvloop") else "asyncio"
+
+
+def pick_http() -> str:
+    return "httptools" if _has("httptools") else "h11"
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m app.serve")
+    p.add_argument("--host", default=settings.SERVER_HOST)
+    p.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    p.add_argument("--workers", type=int, default=settings.WEB_CONCURRENCY)
+    p.add_argument("--backlog", type=int, default=settings.SERVER_BACKLOG)
+    p.add_argument("--keepalive", type=int, default=settings.SERVER_KEEPALIVE_SEC)
+    return p.parse_args(argv)
+
+
+def _uvicorn_config(args: argparse.Namespace):
+    import uvicorn
+
+    return uvicorn.Config(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        loop=pick_loop(),
+        http=pick_http(),
+        backlog=args.backlog,
+        timeout_keep_alive=args.keepalive,
+        lifespan="on",
+        access_log=False,
+        proxy_headers=True,
+    )
+
+
+def _reuseport_socket(host: str, port: int) -> socket.socket:
+    # Bound, not listening: until listen() the kernel sends this port's
+    # connections to the other workers of the SO_REUSEPORT group.
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def _worker(args: argparse.Namespace) -> None:
+    import uvicorn
+
+    # uvicorn runs lifespan startup (warm-up) before it serves on the socket;
+    # asyncio calls listen(backlog) only then, so a cold worker takes no
+    # connections.
+    config = _uvicorn_config(args)
+    sock = _reuseport_socket(args.host, args.port)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _respawn_delay(failures: int) -> float:
+    # 0 after a worker that ran for a while, then 0.5s, 1s, 2s, ... up to 30s
+    return min(0.5 * 2 ** (failures - 1), 30.0) if failures else 0.0
+
+
+def _supervise(args: argparse.Namespace) -> int:
+    from app.core.logging import get_logger
+    from app.observability.multiproc import cleanup_dead_workers
+
+    log = get_logger("serve")
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    ctx = mp.get_context("spawn")
+    procs: list = []
+    # Per worker slot: when it was started, how many times in a row it died
+    # within SERVER_RESPAWN_WINDOW_SEC, and when it is due to be respawned
+    started: list[float] = []
+    failures = [0] * args.workers
+    due: list = [None] * args.workers
+    stopping = False
+    code = 0
+
+    def _spawn():
+        p = ctx.Process(target=_worker, args=(args,), daemon=False)
+        p.start()
+        return p
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    procs.extend(_spawn() for _ in range(args.workers))
+    started.extend(time.monotonic() for _ in procs)
+    while not stopping:
+        time.sleep(0.5)
+        now = time.monotonic()
+        for i, p in enumerate(procs):
+            if stopping:
+                break
+            if due[i] is None:
+                if p.is_alive():
+                    continue
+                # Crashed; drop its live gauges first
+                cleanup_dead_workers(metrics_dir)
+                if now - started[i] < settings.SERVER_RESPAWN_WINDOW_SEC:
+                    failures[i] += 1
+                else:
+                    failures[i] = 0
+                if failures[i] >= settings.SERVER_RESPAWN_MAX_FAILURES:
+                    log.bind(exitcode=p.exitcode, failures=failures[i]).error(
+                        "serve.worker_keeps_failing"
+                    )
+                    code = 1
+                    _stop(None, None)
+                    break
+                due[i] = now + _respawn_delay(failures[i])
+            if now >= due[i]:
+                procs[i] = _spawn()
+                started[i], due[i] = now, None
+    for p in procs:
+        p.join(timeout=30)
+    return code
+
+
+def _export_multiproc_dir() -> str:
+    from app.observability.multiproc import reset_multiproc_dir
+
+    # Workers are spawned, so exporting here is early enough for them; the
+    # directory is emptied so a restart does not inherit old totals
+    path = os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR",
+        os.path.join("/tmp", f"limitforge-metrics-{os.getpid()}"),
+    )
+    reset_multiproc_dir(path)
+    return path
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    if args.workers <= 1:
+        import uvicorn
+
+        uvicorn.Server(_uvicorn_config(args)).run()
+        return 0
+    _export_multiproc_dir()
+    if not hasattr(socket, "SO_REUSEPORT"):
+        # No kernel load balancing here; let uvicorn share one socket
+        import uvicorn
+
+        uvicorn.run(
+            "app.main:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            loop=pick_loop(),
+            http=pick_http(),
+            backlog=args.backlog,
+            timeout_keep_alive=args.keepalive,
+        )
+        return 0
+    return _supervise(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
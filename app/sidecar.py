@@ -0,0 +1,306 @@
+"""Per-host sidecar: ``python -m app.sidecar``.
+
+Serves decisions over a Unix domain socket with a length-prefixed binary
+protocol instead of HTTP. Every frame is ``u32 length`` (bytes that follow)
+and ``u8 type``, then a fixed-layout body; integers are big-endian:
+
+    HELLO     0x01  api key (utf-8)                     -> HELLO_OK
+    DEFINE    0x02  u32 resource_id, resource (utf-8)      (no reply)
+    CHECK     0x03  u32 request_id, u32 resource_id, u32 cost, subject (utf-8)
+    HELLO_OK  0x81  u8 status (0 ok, 1 invalid key)
+    DECISION  0x83  u32 request_id, u8 status, u32 remaining, u32 limit,
+                    u32 reset_at, u32 retry_after_ms
+
+A connection authenticates with HELLO and names its resources with
+DEFINE, so each CHECK carries a 4-byte id instead of the resource string.
+The key is re-verified every ``API_KEY_CACHE_TTL_SEC``; once it is revoked
+the sidecar sends HELLO_OK with status 1 and closes the connection.
+Checks are answered as they complete (match on ``request_id``). At most
+``SIDECAR_MAX_IN_FLIGHT`` run per connection; past that the sidecar stops
+reading. Decisions come from the same DecisionEngine, Redis and plan
+caches as the HTTP API.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import signal
+import struct
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.logging import get_logger, setup_logging
+from app.core.security import hash_api_key, verify_api_key_and_plan
+from app.db import crud
+from app.db.models import SubjectType
+from app.db.session import LazySession
+from app.observability.metrics import DB_SESSIONS_PER_CHECK, REQUESTS_TOTAL
+from app.rl.engine import DecisionEngine
+
+log = get_logger("app.sidecar")
+
+HEADER = struct.Struct("!IB")
+CHECK_HEAD = struct.Struct("!III")
+DEFINE_HEAD = struct.Struct("!I")
+DECISION_BODY = struct.Struct("!IBIIII")
+
+HELLO, DEFINE, CHECK = 0x01, 0x02, 0x03
+HELLO_OK, DECISION = 0x81, 0x83
+
+ALLOWED, LIMITED, UNKNOWN_RESOURCE, NO_PLAN, ERROR, BAD_FRAME = range(6)
+_U32 = 0xFFFFFFFF
+
+
+def frame(kind: int, body: bytes) -> bytes:
+    return HEADER.pack(len(body) + 1, kind) + body
+
+
+def decision_frame(
+    request_id: int,
+    status: int,
+    remaining: int = 0,
+    limit: int = 0,
+    reset_at: int = 0,
+    retry_after_ms: int = 0,
+) -> bytes:
+    return frame(
+        DECISION,
+        DECISION_BODY.pack(
+            request_id,
+            status,
+            min(max(remaining, 0), _U32),
+            min(max(limit, 0), _U32),
+            min(max(reset_at, 0), _U32),
+            min(max(retry_after_ms, 0), _U32),
+        ),
+    )
+
+
+class SidecarServer:
+    def __init__(self, engine: DecisionEngine, redis, session_factory):
+        self.engine = engine
+        self.redis = redis
+        self.session_factory = session_factory
+
+    async def _read_frame(self, reader) -> Optional[tuple[int, bytes]]:
+        try:
+            (length,) = struct.unpack("!I", await reader.readexactly(4))
+            if not 1 <= length <= settings.SIDECAR_MAX_FRAME_BYTES:
+                return None
+            data = await reader.readexactly(length)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return None
+        return data[0], data[1:]
+
+    async def _hello(self, reader, writer):
+        got = await self._read_frame(reader)
+        if got is None or got[0] != HELLO:
+            return None
+        key_hash = hash_api_key(
+            got[1].decode("utf-8", "replace"), settings.APIKEY_HASH_SALT
+        )
+        try:
+            api_key_row = await self._authenticate(key_hash)
+        except HTTPException:
+            writer.write(frame(HELLO_OK, b"\x01"))
+            await writer.drain()
+            return None
+        writer.write(frame(HELLO_OK, b"\x00"))
+        await writer.drain()
+        return api_key_row.tenant_id, key_hash
+
+    async def _authenticate(self, key_hash: str):
+        async with self.session_factory() as db:
+            api_key_row, _ = await verify_api_key_and_plan(db, self.redis, key_hash)
+        return api_key_row
+
+    async def handle(self, reader, writer) -> None:
+        hello = await self._hello(reader, writer)
+        if hello is None:
+            writer.close()
+            return
+        tenant_id, key_hash = hello
+        # Revocations reach open connections once the key cache entry expires
+        reauth_at = time.monotonic() + settings.API_KEY_CACHE_TTL_SEC
+        resources: dict[int, str] = {}
+        slots = asyncio.Semaphore(settings.SIDECAR_MAX_IN_FLIGHT)
+        tasks: set[asyncio.Task] = set()
+
+        async def reply(data: bytes) -> None:
+            # write() is synchronous, so frames never interleave
+            writer.write(data)
+            await writer.drain()
+
+        async def check(request_id: int, resource: str, subject: str, cost: int):
+            try:
+                # Only opens a session if the plan is not cached
+                async with LazySession(self.session_factory) as db:
+                    plan = await self.engine.resolve_plan(
+                        db=db,
+                        tenant_id=tenant_id,
+                        resource=resource,
+                        subject_type=SubjectType.api_key,
+                    )
+                DB_SESSIONS_PER_CHECK.labels(route="sidecar").observe(int(db.opened))
+                d = await self.engine.check(
+                    tenant_id=tenant_id,
+                    subject=subject,
+                    resource=resource,
+                    cost=cost,
+                    plan=plan,
+                )
+                REQUESTS_TOTAL.labels(
+                    route="sidecar", outcome="allowed" if d.allowed else "blocked"
+                ).inc()
+                await reply(
+                    decision_frame(
+                        request_id,
+                        ALLOWED if d.allowed else LIMITED,
+                        d.remaining,
+                        d.limit,
+                        d.reset_at,
+                        d.retry_after_ms,
+                    )
+                )
+            except LookupError:
+                await reply(decision_frame(request_id, NO_PLAN))
+            except ConnectionError:
+                pass
+            except Exception as e:
+                log.bind(error=repr(e)).warning("sidecar.check_failed")
+                REQUESTS_TOTAL.labels(route="sidecar", outcome="error").inc()
+                try:
+                    await reply(decision_frame(request_id, ERROR))
+                except Exception:
+                    pass
+            finally:
+                slots.release()
+
+        try:
+            while True:
+                await slots.acquire()
+                got = await self._read_frame(reader)
+                if got is None:
+                    break
+                if time.monotonic() >= reauth_at:
+                    try:
+                        await self._authenticate(key_hash)
+                    except HTTPException:
+                        await reply(frame(HELLO_OK, b"\x01"))
+                        break
+                    reauth_at = time.monotonic() + settings.API_KEY_CACHE_TTL_SEC
+                kind, body = got
+                if kind == CHECK and len(body) >= CHECK_HEAD.size:
+                    request_id, resource_id, cost = CHECK_HEAD.unpack_from(body)
+                    resource = resources.get(resource_id)
+                    if resource is None or cost < 1:
+                        slots.release()
+                        status = UNKNOWN_RESOURCE if resource is None else BAD_FRAME
+                        await reply(decision_frame(request_id, status))
+                        continue
+                    subject = body[CHECK_HEAD.size :].decode("utf-8", "replace")
+                    task = asyncio.create_task(
+                        check(request_id, resource, subject, cost)
+                    )
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    continue
+                slots.release()
+                if kind == DEFINE and len(body) > DEFINE_HEAD.size:
+                    (resource_id,) = DEFINE_HEAD.unpack_from(body)
+                    if (
+                        resource_id in resources
+                        or len(resources) < settings.SIDECAR_MAX_RESOURCES
+                    ):
+                        resources[resource_id] = body[DEFINE_HEAD.size :].decode(
+                            "utf-8", "replace"
+                        )
+                    continue
+                # Unknown frame type: the stream cannot be trusted past here
+                break
+        finally:
+            for task in list(tasks):
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+
+async def serve(path: str, mode: int) -> None:
+    from app.core.capture import traffic_capture
+    from app.core.deps import _redis_client
+    from app.core.heavy_hitters import heavy_hitters
+    from app.core.period_counts import DbPeriodStore, period_counts
+    from app.core.usage import make_usage_sink, usage_aggregator
+    from app.core.warmup import start_warmup, stop_warmup
+    from app.db.session import AsyncSessionLocal
+    from app.rl.replication import peer_clients, replicator
+
+    redis = _redis_client()
+    await start_warmup(redis, AsyncSessionLocal)
+    await usage_aggregator.start(
+        make_usage_sink(settings.USAGE_SINK, redis, AsyncSessionLocal)
+    )
+    await heavy_hitters.start(redis)
+    await period_counts.start(DbPeriodStore(AsyncSessionLocal))
+    await replicator.start(redis, peer_clients(settings.REPLICATION_PEERS))
+    await traffic_capture.start()
+    sidecar = SidecarServer(
+        DecisionEngine(redis=redis, settings=settings, crud_module=crud),
+        redis,
+        AsyncSessionLocal,
+    )
+    if os.path.exists(path):
+        # Stale socket from a previous run
+        os.unlink(path)
+    server = await asyncio.start_unix_server(sidecar.handle, path=path)
+    os.chmod(path, mode)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    log.bind(path=path).info("sidecar.listening")
+    try:
+        await stop.wait()
+    finally:
+        server.close()
+        await server.wait_closed()
+        await stop_warmup()
+        await usage_aggregator.stop()
+        await period_counts.stop()
+        await replicator.stop()
+        await traffic_capture.stop()
+        await heavy_hitters.stop()
+        if os.path.exists(path):
+            os.unlink(path)
+        log.info("sidecar.stopped")
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(prog="python -m app.sidecar")
+    p.add_argument("--socket", default=settings.SIDECAR_SOCKET_PATH)
+    p.add_argument("--mode", default=settings.SIDECAR_SOCKET_MODE)
+    p.add_argument("--metrics-port", type=int, default=settings.SIDECAR_METRICS_PORT)
+    args = p.parse_args(argv)
+    setup_logging()
+    if args.metrics_port:
+        from prometheus_client import start_http_server
+
+        start_http_server(args.metrics_port)
+    from app.serve import pick_loop
+
+    if pick_loop() == "uvloop":
+        import uvloop
+
+        uvloop.install()
+    asyncio.run(serve(args.socket, int(str(args.mode), 8)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import time
+import uuid
+
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.db import crud
+from app.db.models import Plan, PlanAlgorithm
+from app.rl.backend import RedisBackend
+from app.rl.engine import DecisionEngine
+from app.rl.memory_backend import MemoryBackend
+
+PLANS = {
+    "token_bucket": Plan(
+        algorithm=PlanAlgorithm.token_bucket,
+        bucket_capacity=1000,
+        refill_rate_per_sec=100.0,
+    ),
+    "fixed_window": Plan(
+        algorithm=PlanAlgorithm.fixed_window, limit_per_window=1000, window_seconds=60
+    ),
+    "sliding_window": Plan(
+        algorithm=PlanAlgorithm.sliding_window,
+        limit_per_window=1000,
+        window_seconds=60,
+    ),
+}
+
+
+async def run(engine, plan, workers, requests_per_worker, subjects):
+    tenant = str(uuid.uuid4())
+
+    async def worker(idx):
+        for i in range(requests_per_worker):
+            await engine.check(
+                tenant_id=tenant,
+                subject=f"user:{(idx * requests_per_worker + i) % subjects}",
+                resource="GET:/bench",
+                cost=1,
+                plan=plan,
+            )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(workers)))
+    return workers * requests_per_worker / (time.perf_counter() - start)
+
+
+async def main():
+    workers = int(os.getenv("WORKERS", "16"))
+    requests_per_worker = int(os.getenv("REQUESTS", "2000"))
+    subjects = int(os.getenv("SUBJECTS", "1000"))
+    backends = os.getenv("BACKENDS", "memory,redis").split(",")
+
+    redis = Redis.from_url(os.getenv("REDIS_URL", settings.REDIS_URL))
+    if "redis" in backends:
+        try:
+            await redis.ping()
+        except Exception as e:
+            print(f"redis    skipped ({e.__class__.__name__}: {e})")
+            backends.remove("redis")
+
+    for name in backends:
+        backend = (
+            MemoryBackend()
+            if name == "memory"
+            else RedisBackend(redis, packed=settings.KEY_ENCODING == "compact")
+        )
+        engine = DecisionEngine(redis, settings, crud, backend=backend)
+        for alg, plan in PLANS.items():
+            rate = await run(engine, plan, workers, requests_per_worker, subjects)
+            print(f"{name:8s} {alg:15s} {rate:10.0f} decisions/s")
+    await redis.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+import asyncio
+import os
+import statistics
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.cache import api_key_cache, plan_cache
+from app.core.config import settings
+from app.core.security import verify_api_key_and_plan
+from app.db import crud
+from app.db.models import Base, PlanAlgorithm, SubjectType
+from app.db.session import _engine_kwargs, _engine_url, _to_async_dsn
+from app.rl.engine import DecisionEngine
+
+
+async def main():
+    dsn = _to_async_dsn(os.getenv("BENCH_DSN", "sqlite+aiosqlite:///./bench.db"))
+    keys_n = int(os.getenv("KEYS", "200"))
+    engine = create_async_engine(_engine_url(dsn), **_engine_kwargs(dsn))
+    queries = 0
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _count(*args, **kwargs):
+        nonlocal queries
+        queries += 1
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with Session() as db:
+        tenant = await crud.create_tenant(db, name="bench-cold")
+        plan = await crud.create_plan(
+            db,
+            tenant_id=tenant.id,
+            name="p",
+            algorithm=PlanAlgorithm.token_bucket,
+            bucket_capacity=100,
+            refill_rate_per_sec=10.0,
+        )
+        await crud.create_resource_policy(
+            db,
+            tenant_id=tenant.id,
+            resource="GET:/bench",
+            subject_type=SubjectType.api_key,
+            plan_id=plan.id,
+        )
+        hashes = [
+            (await crud.create_api_key(db, tenant_id=tenant.id, name=f"k{i}"))[1]
+            for i in range(keys_n)
+        ]
+
+    rl = DecisionEngine(redis=None, settings=settings, crud_module=crud)
+    lat, per_check = [], []
+    for h in hashes:
+        api_key_cache.clear()
+        plan_cache.clear()
+        before = queries
+        t0 = time.perf_counter()
+        async with Session() as db:
+            key, _ = await verify_api_key_and_plan(
+                db, None, h, "GET:/bench", SubjectType.api_key
+            )
+            await rl.resolve_plan(
+                db=db,
+                tenant_id=key.tenant_id,
+                resource="GET:/bench",
+                subject_type=SubjectType.api_key,
+            )
+        lat.append((time.perf_counter() - t0) * 1000.0)
+        per_check.append(queries - before)
+    await engine.dispose()
+
+    print(f"Cold checks: {len(lat)} ({engine.url.get_backend_name()})")
+    print(
+        f"Auth+plan latency p50 {statistics.median(lat):.2f} ms, "
+        f"p95 {statistics.quantiles(lat, n=100)[94]:.2f} ms"
+    )
+    print(f"DB round trips per cold check: {statistics.mean(per_check):.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
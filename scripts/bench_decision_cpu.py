@@ -0,0 +1,64 @@
+import asyncio
+import os
+import time
+import uuid
+
+from app.core.config import settings
+from app.db import crud
+from app.db.models import Plan, PlanAlgorithm
+from app.rl.engine import DecisionEngine
+from app.rl.executor import _ATTR, compile_plan
+from app.rl.memory_backend import MemoryBackend
+
+PLANS = {
+    "token_bucket": Plan(
+        algorithm=PlanAlgorithm.token_bucket,
+        bucket_capacity=10**9,
+        refill_rate_per_sec=1000.0,
+    ),
+    "fixed_window": Plan(
+        algorithm=PlanAlgorithm.fixed_window,
+        limit_per_window=10**9,
+        window_seconds=60,
+    ),
+    "concurrency": Plan(
+        algorithm=PlanAlgorithm.concurrency, concurrency_limit=10**9, window_seconds=60
+    ),
+}
+
+
+async def cpu_per_decision(engine, plan, n):
+    tenant = str(uuid.uuid4())
+    start = time.process_time()
+    for i in range(n):
+        await engine.check(
+            tenant_id=tenant,
+            subject=f"user:{i % 1000}",
+            resource="GET:/bench",
+            cost=1,
+            plan=plan,
+        )
+    return (time.process_time() - start) / n * 1e6
+
+
+def cpu_per_compile(plan, n):
+    start = time.process_time()
+    for _ in range(n):
+        setattr(plan, _ATTR, None)
+        compile_plan(plan, compact=False)
+    return (time.process_time() - start) / n * 1e6
+
+
+async def main():
+    n = int(os.getenv("REQUESTS", "50000"))
+    # In-memory state so the numbers are the engine's CPU, not Redis I/O
+    engine = DecisionEngine(None, settings, crud, backend=MemoryBackend())
+    print(f"{'algorithm':15s} {'decision':>12s} {'compile':>12s}")
+    for alg, plan in PLANS.items():
+        decision = await cpu_per_decision(engine, plan, n)
+        compile_ = cpu_per_compile(plan, n)
+        print(f"{alg:15s} {decision:9.1f} us {compile_:9.2f} us")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
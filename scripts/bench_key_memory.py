@@ -0,0 +1,90 @@
+import asyncio
+import os
+import uuid
+
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.rl.keys import (
+    rl_key_compact,
+    rl_key_conc,
+    rl_key_fixed_window,
+    rl_key_sliding,
+    rl_key_token_bucket,
+)
+from app.rl.strategies import (
+    concurrency,
+    fixed_window,
+    sliding_window,
+    token_bucket,
+    token_bucket_packed,
+)
+
+RESOURCE = "GET:/v1/orders/{id}/items"
+WINDOW = 1_700_000_040
+
+
+def plain_key(alg, tenant, subject):
+    if alg == "token_bucket":
+        return rl_key_token_bucket(tenant, subject, RESOURCE)
+    if alg == "fixed_window":
+        return rl_key_fixed_window(tenant, subject, RESOURCE, WINDOW)
+    if alg == "sliding_window":
+        return rl_key_sliding(tenant, subject, RESOURCE)
+    return rl_key_conc(tenant, subject, RESOURCE)
+
+
+def compact_key(alg, tenant, subject):
+    window = WINDOW if alg == "fixed_window" else None
+    return rl_key_compact(alg, tenant, subject, RESOURCE, window)
+
+
+async def write(redis, alg, encoding, key):
+    if alg == "token_bucket":
+        mod = token_bucket_packed if encoding == "compact" else token_bucket
+        await mod.check(redis, key, capacity=100, refill_rate_per_sec=1.0)
+    elif alg == "fixed_window":
+        await fixed_window.check(redis, key, limit=100, window_sec=3600)
+    elif alg == "sliding_window":
+        await sliding_window.check(redis, key, limit=100, window_sec=3600)
+    else:
+        await concurrency.acquire(redis, key, limit=100, ttl_sec=3600)
+
+
+async def main():
+    # Needs a real, otherwise idle Redis: measures INFO used_memory deltas
+    redis = Redis.from_url(
+        os.getenv("BENCH_REDIS_URL", settings.REDIS_URL), decode_responses=True
+    )
+    subjects = int(os.getenv("SUBJECTS", "100000"))
+    concurrency_n = int(os.getenv("CONCURRENCY", "64"))
+    tenant = str(uuid.uuid4())
+    print(f"{subjects} subjects per run; bytes extrapolated to 1M subjects")
+    print(f"{'algorithm':<16}{'plain MB/1M':>14}{'compact MB/1M':>16}{'saved':>8}")
+    for alg in ("token_bucket", "fixed_window", "sliding_window", "concurrency"):
+        per_million = {}
+        for encoding, make_key in (("plain", plain_key), ("compact", compact_key)):
+            await redis.flushdb()
+            before = (await redis.info("memory"))["used_memory"]
+            sem = asyncio.Semaphore(concurrency_n)
+
+            async def one(i):
+                async with sem:
+                    await write(
+                        redis, alg, encoding, make_key(alg, tenant, f"user:{i}")
+                    )
+
+            await asyncio.gather(*(one(i) for i in range(subjects)))
+            after = (await redis.info("memory"))["used_memory"]
+            per_million[encoding] = (after - before) / subjects * 1_000_000 / 2**20
+        saved = 1 - per_million["compact"] / per_million["plain"]
+        print(
+            f"{alg:<16}{per_million['plain']:>14.1f}"
+            f"{per_million['compact']:>16.1f}{saved:>8.0%}"
+        )
+    await redis.flushdb()
+    await redis.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
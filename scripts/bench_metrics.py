@@ -0,0 +1,74 @@
+import os
+import sys
+import tempfile
+import time
+import multiprocessing as mp
+
+# Must be exported before prometheus_client is imported anywhere
+MULTIPROC_DIR = tempfile.mkdtemp(prefix="lf-metrics-")
+os.environ["PROMETHEUS_MULTIPROC_DIR"] = MULTIPROC_DIR
+
+from prometheus_client import (  # noqa: E402
+    CollectorRegistry,
+    Counter,
+    generate_latest,
+)
+from prometheus_client import multiprocess  # noqa: E402
+
+
+def worker(idx: int, cardinality: int, incs: int, q) -> None:
+    registry = CollectorRegistry()
+    counter = Counter(
+        "bench_requests_total",
+        "Bench requests",
+        labelnames=("tenant", "outcome"),
+        registry=registry,
+    )
+    children = [
+        counter.labels(tenant=f"t{i}", outcome="allowed") for i in range(cardinality)
+    ]
+    t0 = time.perf_counter()
+    for n in range(incs):
+        children[n % cardinality].inc()
+    q.put((idx, (time.perf_counter() - t0) / incs * 1e9))
+
+
+def main():
+    workers = int(os.getenv("WORKERS", "4"))
+    cardinality = int(os.getenv("CARDINALITY", "5000"))
+    incs = int(os.getenv("INCS", "200000"))
+    scrapes = int(os.getenv("SCRAPES", "5"))
+
+    q = mp.Queue()
+    procs = [
+        mp.Process(target=worker, args=(i, cardinality, incs, q))
+        for i in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    write_ns = [q.get()[1] for _ in procs]
+    for p in procs:
+        p.join()
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=MULTIPROC_DIR)
+    durations = []
+    size = 0
+    for _ in range(scrapes):
+        t0 = time.perf_counter()
+        size = len(generate_latest(registry))
+        durations.append((time.perf_counter() - t0) * 1000.0)
+
+    print(
+        f"Workers: {workers}, label cardinality: {cardinality}, "
+        f"series: {workers * cardinality} (pre-merge)"
+    )
+    print(f"Write cost: {sum(write_ns) / len(write_ns):.0f} ns/inc (mmap value)")
+    print(
+        f"Scrape: min {min(durations):.1f} ms, max {max(durations):.1f} ms, "
+        f"payload {size / 1024:.0f} KiB"
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
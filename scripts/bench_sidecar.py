@@ -0,0 +1,78 @@
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "sdk", "python")
+)
+
+from limitforge_sdk import RateLimitedError  # noqa: E402
+from limitforge_sdk.sidecar import LimitforgeSidecarClient  # noqa: E402
+
+
+async def run(name, check, workers, requests_per_worker):
+    latencies = []
+
+    async def worker(idx):
+        for i in range(requests_per_worker):
+            t0 = time.perf_counter()
+            await check(f"bench:{name}:{idx}")
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(workers)))
+    total = time.perf_counter() - start
+    q = statistics.quantiles(latencies, n=100)
+    print(
+        f"{name:8s} {len(latencies) / total:10.0f} checks/s  "
+        f"p50 {statistics.median(latencies):6.3f} ms  p99 {q[98]:6.3f} ms"
+    )
+
+
+async def main():
+    base_url = os.getenv("BASE_URL", "http://127.0.0.1:8000")
+    socket_path = os.getenv("SOCKET", "/tmp/limitforge.sock")
+    api_key = os.getenv("API_KEY", "")
+    resource = os.getenv("RESOURCE", "orders")
+    workers = int(os.getenv("WORKERS", "32"))
+    requests_per_worker = int(os.getenv("REQUESTS", "500"))
+    modes = os.getenv("MODES", "http,sidecar").split(",")
+
+    if "http" in modes:
+        async with httpx.AsyncClient(
+            base_url=base_url,
+            headers={"X-API-Key": api_key},
+            limits=httpx.Limits(max_keepalive_connections=workers),
+        ) as client:
+
+            async def http_check(subject):
+                r = await client.post(
+                    "/v1/check",
+                    json={"resource": resource, "subject": subject, "cost": 1},
+                )
+                if r.status_code not in (200, 429):
+                    r.raise_for_status()
+
+            await run("http", http_check, workers, requests_per_worker)
+
+    if "sidecar" in modes:
+        # One connection; every worker's checks are multiplexed over it
+        async with LimitforgeSidecarClient(
+            socket_path, api_key, max_in_flight=workers
+        ) as sc:
+
+            async def sidecar_check(subject):
+                try:
+                    await sc.check(resource=resource, subject=subject)
+                except RateLimitedError:
+                    pass
+
+            await run("sidecar", sidecar_check, workers, requests_per_worker)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
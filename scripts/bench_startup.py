@@ -0,0 +1,67 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def wait_for(client: httpx.Client, path: str, timeout: float) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            if client.get(path).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.TransportError:
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(f"{path} not ready after {timeout}s")
+
+
+def main():
+    port = int(os.getenv("PORT", "8010"))
+    workers = os.getenv("WORKERS", "1")
+    api_key = os.getenv("API_KEY", "")
+    resource = os.getenv("RESOURCE", "orders")
+    warm_requests = int(os.getenv("REQUESTS", "200"))
+    base_url = f"http://127.0.0.1:{port}"
+
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.serve", "--port", str(port), "--workers", workers]
+    )
+    try:
+        with httpx.Client(base_url=base_url, timeout=5.0) as client:
+            wait_for(client, "/v1/health", 60)
+            listening = time.perf_counter() - t0
+            wait_for(client, "/v1/ready", 60)
+            ready = time.perf_counter() - t0
+            print(f"Workers: {workers}")
+            print(
+                f"Startup: listening {listening * 1000:.0f} ms, ready {ready * 1000:.0f} ms"
+            )
+            if not api_key:
+                print("Set API_KEY to measure cold vs warm /v1/check latency")
+                return
+            headers = {"X-API-Key": api_key}
+            payload = {"resource": resource, "subject": "bench:cold", "cost": 1}
+            t = time.perf_counter()
+            client.post("/v1/check", json=payload, headers=headers)
+            cold_ms = (time.perf_counter() - t) * 1000.0
+            lat = []
+            for _ in range(warm_requests):
+                t = time.perf_counter()
+                client.post("/v1/check", json=payload, headers=headers)
+                lat.append((time.perf_counter() - t) * 1000.0)
+            print(
+                f"First check: {cold_ms:.2f} ms, warm p50: {statistics.median(lat):.2f} ms, "
+                f"p95: {statistics.quantiles(lat, n=100)[94]:.2f} ms"
+            )
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
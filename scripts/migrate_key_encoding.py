@@ -0,0 +1,27 @@
+import asyncio
+import os
+
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.rl.key_migration import migrate_to_compact
+
+
+async def main():
+    # Deploy with KEY_ENCODING=compact first, then run this once; plain keys
+    # left behind (or skipped) expire on their own TTL.
+    redis = Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    report = await migrate_to_compact(
+        redis,
+        scan_count=int(os.getenv("SCAN_COUNT", "1000")),
+        delete_old=os.getenv("DELETE_OLD", "0") == "1",
+    )
+    await redis.aclose()
+    print(
+        f"scanned={report.scanned} migrated={report.migrated} "
+        f"skipped={report.skipped} deleted={report.deleted}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,28 @@
+"""Decode capture files (CAPTURE_ENABLED) to JSONL on stdout.
+
+    PYTHONPATH=. python scripts/read_capture.py [file-or-dir ...] > trace.jsonl
+
+Defaults to CAPTURE_DIR. Resources are recorded as ids; RESOURCES (comma
+separated names) decodes those back to names. The output is a trace for
+scripts/replay_trace.py, recorded decisions included.
+"""
+
+import json
+import os
+import sys
+
+from app.core.capture import read_captures
+from app.core.config import settings
+from app.rl.trace import resource_names
+
+
+def main():
+    paths = sys.argv[1:] or [settings.CAPTURE_DIR]
+    names = [r for r in os.getenv("RESOURCES", "").split(",") if r]
+    out = sys.stdout
+    for rec in read_captures(paths, resource_names(names)):
+        out.write(json.dumps(rec._asdict()) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Replay a recorded trace against a set of plans on a virtual clock.
+
+    TRACE=traffic.jsonl PLANS=plans.json PYTHONPATH=. python scripts/replay_trace.py
+
+TRACE is JSONL or binary (see app/rl/trace.py), or a directory of capture
+files (CAPTURE_DIR); PLANS is a PlanTable spec (app/rl/replay.py).
+BACKEND=memory (default) or redis, against REDIS_URL;
+FLUSH_DB=1 empties that database first so runs start from the same state.
+WRITE_BINARY=out.lft converts TRACE to the binary format instead.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import time
+
+from redis.asyncio import Redis
+
+from app.core.capture import read_captures
+from app.core.config import settings
+from app.rl.backend import RedisBackend
+from app.rl.memory_backend import MemoryBackend
+from app.rl.replay import PlanTable, VirtualClock, replay, replay_engine
+from app.rl.trace import read_trace, write_binary
+
+DAY_MS = 86_400_000
+
+
+async def main():
+    with open(os.environ["PLANS"], encoding="utf-8") as f:
+        table = PlanTable.from_spec(json.load(f))
+    trace = os.environ["TRACE"]
+    if os.path.isdir(trace):
+        records = read_captures([trace], table.resources())
+    else:
+        records = read_trace(trace, table.resources())
+
+    if os.getenv("WRITE_BINARY"):
+        n = write_binary(os.environ["WRITE_BINARY"], records)
+        print(f"wrote {n} records to {os.environ['WRITE_BINARY']}")
+        return
+
+    first = next(records, None)
+    if first is None:
+        print("empty trace")
+        return
+    records = itertools.chain([first], records)
+
+    redis = None
+    offset_ms = 0
+    if os.getenv("BACKEND", "memory") == "redis":
+        redis = Redis.from_url(os.getenv("REDIS_URL", settings.REDIS_URL))
+        if os.getenv("FLUSH_DB") == "1":
+            await redis.flushdb()
+        backend = RedisBackend(redis, packed=settings.KEY_ENCODING == "compact")
+        # Whole days, so windows and periods line up as they did; keeps
+        # absolute expiries (period quotas) in the future
+        offset_ms = (int(time.time() * 1000) // DAY_MS - first.ts_ms // DAY_MS) * DAY_MS
+    else:
+        backend = MemoryBackend()
+
+    clock = VirtualClock(first.ts_ms + offset_ms)
+    engine = replay_engine(backend, clock, redis)
+    report = await replay(engine, records, table, clock, offset_ms=offset_ms)
+    if redis is not None:
+        await redis.aclose()
+    print("\n".join(report.lines()))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""Two regions, two local Redis servers, one global limit.
+
+    redis-server --port 6379 & redis-server --port 6380 &
+    LAG_MS=200 python scripts/replication_demo.py
+
+Both regions check the same fixed window and token bucket for DURATION_SEC
+while their replicators exchange slots; prints how much each region admitted
+against the plan's limit. Raising LAG_MS (the artificial replication delay)
+raises the overshoot.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.db import crud
+from app.db.models import Plan, PlanAlgorithm
+from app.rl.backend import ReplicatedBackend
+from app.rl.engine import DecisionEngine
+from app.rl.replication import Replicator
+
+PLANS = {
+    "fixed_window": Plan(
+        algorithm=PlanAlgorithm.fixed_window, limit_per_window=1000, window_seconds=60
+    ),
+    "token_bucket": Plan(
+        algorithm=PlanAlgorithm.token_bucket,
+        bucket_capacity=1000,
+        refill_rate_per_sec=10.0,
+    ),
+}
+
+
+async def drive(engine, tenant, plan, until):
+    allowed = 0
+    while time.monotonic() < until:
+        decision = await engine.check(
+            tenant_id=tenant,
+            subject="user:1",
+            resource="GET:/demo",
+            cost=1,
+            plan=plan,
+        )
+        allowed += decision.allowed
+        # Let the replicator run between checks
+        await asyncio.sleep(0.001)
+    return allowed
+
+
+async def main():
+    urls = {
+        "eu": os.getenv("REDIS_A_URL", "redis://localhost:6379/0"),
+        "us": os.getenv("REDIS_B_URL", "redis://localhost:6380/0"),
+    }
+    lag_ms = int(os.getenv("LAG_MS", "0"))
+    interval_ms = int(os.getenv("INTERVAL_MS", "50"))
+    duration = float(os.getenv("DURATION_SEC", "3"))
+
+    clients = {r: Redis.from_url(url, decode_responses=True) for r, url in urls.items()}
+    engines, replicators = {}, []
+    for region, redis in clients.items():
+        await redis.ping()
+        replicator = Replicator(region, interval_ms, lag_ms=lag_ms)
+        await replicator.start(redis, clients)
+        replicators.append(replicator)
+        backend = ReplicatedBackend(redis, region, replicator)
+        engines[region] = DecisionEngine(redis, settings, crud, backend=backend)
+
+    print(f"lag {lag_ms} ms, sync every {interval_ms} ms, {duration:.0f}s")
+    for alg, plan in PLANS.items():
+        tenant = str(uuid.uuid4())
+        until = time.monotonic() + duration
+        counts = await asyncio.gather(
+            *(drive(engine, tenant, plan, until) for engine in engines.values())
+        )
+        limit = plan.limit_per_window or plan.bucket_capacity
+        if alg == "token_bucket":
+            limit += int(plan.refill_rate_per_sec * duration)
+        per_region = ", ".join(f"{r} {n}" for r, n in zip(engines, counts))
+        print(f"{alg:13s} admitted {sum(counts):6d} / {limit} ({per_region})")
+
+    for replicator in replicators:
+        await replicator.stop()
+    for redis in clients.values():
+        await redis.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
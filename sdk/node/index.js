@@ -17,6 +17,86 @@ export class LimitforgeClient {
     const data = await res.json();
     return data; // includes headers field from server
   }
+  // Waits server-side for a reserved slot up to maxWaitMs (token_bucket plans)
+  async acquire({ resource, subject, cost = 1, maxWaitMs = 1000, wait = true }) {
+    const res = await this.fetch(`${this.baseUrl}/v1/acquire`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json", "X-API-Key": this.apiKey },
+      body: JSON.stringify({ resource, subject, cost, max_wait_ms: maxWaitMs, wait }),
+    });
+    if (!(res.status === 200 || res.status === 429)) {
+      throw new Error(`HTTP ${res.status}`);
+    }
+    return res.json();
+  }
+  // Health of calls to an adaptive plan's resource; returns the new limit
+  async feedback({ resource, count = 1, errors = 0, latencyMs }) {
+    const body = { resource, count, errors };
+    if (latencyMs !== undefined) body.latency_ms = latencyMs;
+    const res = await this.fetch(`${this.baseUrl}/v1/feedback`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json", "X-API-Key": this.apiKey },
+      body: JSON.stringify(body),
+    });
+    if (res.status !== 200) throw new Error(`HTTP ${res.status}`);
+    return res.json();
+  }
+}
+
+// Concurrent checks multiplexed over one /v1/check/ws connection (JSON
+// frames). Pass a WebSocket class that accepts (url, protocols, { headers }),
+// e.g. the one from the `ws` package.
+export class LimitforgeWsClient {
+  constructor(baseUrl, apiKey, WebSocketImpl, { timeoutMs = 1000 } = {}) {
+    this.url = baseUrl.replace(/\/$/, "").replace(/^http/, "ws") + "/v1/check/ws";
+    this.apiKey = apiKey;
+    this.WebSocket = WebSocketImpl;
+    this.timeoutMs = timeoutMs;
+    this.pending = new Map();
+    this.nextId = 0;
+    this.ws = null;
+  }
+  connect() {
+    if (this.ready) return this.ready;
+    this.ws = new this.WebSocket(this.url, ["limitforge.json"], {
+      headers: { "X-API-Key": this.apiKey },
+    });
+    this.ws.onmessage = (ev) => {
+      const frame = JSON.parse(ev.data);
+      const p = this.pending.get(frame[0]);
+      if (!p) return;
+      this.pending.delete(frame[0]);
+      clearTimeout(p.timer);
+      if (frame.length === 3) return p.reject(Object.assign(new Error(frame[2]), { status: frame[1] }));
+      const [, , allowed, remaining, limit, reset_at, retry_after_ms] = frame;
+      p.resolve({ allowed: allowed === 1, remaining, limit, reset_at, retry_after_ms });
+    };
+    this.ws.onclose = () => {
+      for (const p of this.pending.values()) p.reject(new Error("check channel closed"));
+      this.pending.clear();
+      this.ready = null;
+    };
+    this.ready = new Promise((resolve, reject) => {
+      this.ws.onopen = () => resolve(this);
+      this.ws.onerror = (e) => reject(e);
+    });
+    return this.ready;
+  }
+  async check({ resource, subject, cost = 1 }) {
+    await this.connect();
+    const id = ++this.nextId;
+    return new Promise((resolve, reject) => {
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error("timeout"));
+      }, this.timeoutMs);
+      this.pending.set(id, { resolve, reject, timer });
+      this.ws.send(JSON.stringify([id, resource, subject, cost]));
+    });
+  }
+  close() {
+    if (this.ws) this.ws.close();
+  }
 }
 
 export function limitforgeExpress({ baseUrl, apiKey, mapper, cost = 1 }) {
@@ -1,3 +1,18 @@
 from .client import LimitforgeClient, RateLimitedError
+from .feedback import FeedbackReporter
+from .retry import RetryBudget, RetryPolicy, RetryStats, deadline
+from .sidecar import LimitforgeSidecarClient
+from .ws import ChannelError, LimitforgeWsClient
 
-__all__ = ["LimitforgeClient", "RateLimitedError"]
+__all__ = [
+    "LimitforgeClient",
+    "FeedbackReporter",
+    "LimitforgeWsClient",
+    "LimitforgeSidecarClient",
+    "RateLimitedError",
+    "RetryPolicy",
+    "RetryBudget",
+    "RetryStats",
+    "deadline",
+    "ChannelError",
+]
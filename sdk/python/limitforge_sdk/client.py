@@ -1,5 +1,10 @@
+import asyncio
+import time
+
 import httpx
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from .retry import RetryPolicy, RetryStats, current_deadline
 
 
 class RateLimitedError(Exception):
@@ -9,7 +14,7 @@ class RateLimitedError(Exception):
         *,
         retry_after_ms: int | None = None,
         headers: Dict[str, str] | None = None,
-        payload: Dict[str, Any] | None = None
+        payload: Dict[str, Any] | None = None,
     ):
         super().__init__(message)
         self.retry_after_ms = retry_after_ms
@@ -18,10 +23,21 @@ class RateLimitedError(Exception):
 
 
 class LimitforgeClient:
-    def __init__(self, base_url: str, api_key: str, timeout: float = 1.0):
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        timeout: float = 1.0,
+        *,
+        retry: Optional[RetryPolicy] = None,
+    ):
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key
         self.timeout = timeout
+        self.retry = retry or RetryPolicy()
+        self.retry_stats = RetryStats()
+        # One budget per client: retries stay a fraction of its requests
+        self._budget = self.retry.budget()
         self._client = httpx.AsyncClient(
             base_url=self.base_url,
             timeout=timeout,
@@ -31,11 +47,110 @@ class LimitforgeClient:
     async def close(self):
         await self._client.aclose()
 
+    def _timeout(self, deadline: Optional[float]) -> float:
+        # Per-attempt timeout, cut short by the caller's deadline
+        if deadline is None:
+            return self.timeout
+        left = deadline - time.monotonic()
+        if left <= 0:
+            self.retry_stats.deadline_exceeded += 1
+            raise TimeoutError("deadline exceeded")
+        return min(self.timeout, left)
+
     async def check(
-        self, *, resource: str, subject: str, cost: int = 1
+        self,
+        *,
+        resource: str,
+        subject: str,
+        cost: int = 1,
+        wait: bool = False,
+        deadline: Optional[float] = None,
     ) -> Dict[str, Any]:
+        """One decision; raises ``RateLimitedError`` when denied.
+
+        With ``wait=True`` a denial is retried per ``self.retry`` instead:
+        after ``retry_after_ms`` plus jitter, within the retry budget and
+        never past ``deadline`` (a ``time.monotonic()`` value, defaulting to
+        the enclosing ``limitforge_sdk.deadline`` block). The last denial is
+        raised when any of those runs out.
+        """
         payload = {"resource": resource, "subject": subject, "cost": cost}
-        r = await self._client.post("/v1/check", json=payload)
+        if deadline is None:
+            deadline = current_deadline()
+        self._budget.record_request()
+        jitter_ms = None
+        attempt = 1
+        while True:
+            r = await self._client.post(
+                "/v1/check", json=payload, timeout=self._timeout(deadline)
+            )
+            try:
+                return self._decision(r)
+            except RateLimitedError as e:
+                if not wait or attempt >= self.retry.max_attempts:
+                    raise
+                jitter_ms = self.retry.jitter_ms(jitter_ms)
+                delay_ms = (e.retry_after_ms or 0) + jitter_ms
+                if (
+                    deadline is not None
+                    and time.monotonic() + delay_ms / 1000 >= deadline
+                ):
+                    self.retry_stats.deadline_exceeded += 1
+                    raise
+                if not self._budget.try_spend():
+                    self.retry_stats.budget_exhausted += 1
+                    raise
+            self.retry_stats.retries += 1
+            self.retry_stats.waited_ms += delay_ms
+            await asyncio.sleep(delay_ms / 1000)
+            attempt += 1
+
+    async def acquire(
+        self,
+        *,
+        resource: str,
+        subject: str,
+        cost: int = 1,
+        max_wait_ms: int = 1000,
+        wait: bool = True,
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Take a permit, queueing up to ``max_wait_ms`` for it (token bucket
+        plans). With ``wait=False`` the server answers at once; a non-zero
+        ``wait_ms`` then says how long to sleep before using the permit."""
+        if deadline is None:
+            deadline = current_deadline()
+        timeout = self._timeout(deadline)
+        if deadline is not None:
+            # The server never holds the request past the caller's deadline
+            left_ms = (deadline - time.monotonic()) * 1000
+            max_wait_ms = max(0, min(max_wait_ms, int(left_ms - timeout * 1000)))
+        payload = {
+            "resource": resource,
+            "subject": subject,
+            "cost": cost,
+            "max_wait_ms": max_wait_ms,
+            "wait": wait,
+        }
+        if wait:
+            timeout += max_wait_ms / 1000
+        r = await self._client.post("/v1/acquire", json=payload, timeout=timeout)
+        return self._decision(r)
+
+    async def cancel_acquire(
+        self, *, resource: str, subject: str, reservation_id: str
+    ) -> bool:
+        payload = {
+            "resource": resource,
+            "subject": subject,
+            "reservation_id": reservation_id,
+        }
+        r = await self._client.post("/v1/acquire/cancel", json=payload)
+        r.raise_for_status()
+        return bool(r.json().get("cancelled"))
+
+    @staticmethod
+    def _decision(r: httpx.Response) -> Dict[str, Any]:
         # Accept 200 and 429 with body
         if r.status_code not in (200, 429):
             r.raise_for_status()
@@ -60,3 +175,24 @@ class LimitforgeClient:
                 payload=data,
             )
         return data
+
+    async def feedback(
+        self,
+        *,
+        resource: str,
+        count: int = 1,
+        errors: int = 0,
+        latency_ms: float | None = None,
+    ) -> Dict[str, Any]:
+        """Report how ``count`` calls to ``resource`` went, for adaptive
+        plans; returns the resource's new limit."""
+        payload: Dict[str, Any] = {
+            "resource": resource,
+            "count": count,
+            "errors": errors,
+        }
+        if latency_ms is not None:
+            payload["latency_ms"] = latency_ms
+        r = await self._client.post("/v1/feedback", json=payload)
+        r.raise_for_status()
+        return r.json()
@@ -0,0 +1,62 @@
+import asyncio
+import contextlib
+from typing import Dict, List, Optional
+
+from .client import LimitforgeClient
+
+
+class FeedbackReporter:
+    """Batches outcomes of calls to protected resources into one
+    ``/v1/feedback`` report per resource every ``interval`` seconds.
+
+    ``record`` is synchronous and never blocks the request path; a failed
+    report is dropped, since the next interval carries fresher signal.
+    """
+
+    def __init__(self, client: LimitforgeClient, *, interval: float = 1.0):
+        self.client = client
+        self.interval = interval
+        # resource -> [count, errors, latency_ms sum]
+        self._pending: Dict[str, List[float]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, resource: str, latency_ms: float, error: bool = False) -> None:
+        agg = self._pending.setdefault(resource, [0, 0, 0.0])
+        agg[0] += 1
+        agg[1] += int(error)
+        agg[2] += latency_ms
+
+    async def flush(self) -> None:
+        pending, self._pending = self._pending, {}
+        for resource, (count, errors, total_ms) in pending.items():
+            with contextlib.suppress(Exception):
+                await self.client.feedback(
+                    resource=resource,
+                    count=int(count),
+                    errors=int(errors),
+                    latency_ms=total_ms / count,
+                )
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.flush()
+
+    async def __aenter__(self) -> "FeedbackReporter":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
@@ -1,3 +1,4 @@
+import time
 from typing import Callable, Tuple
 
 from fastapi import Request
@@ -5,6 +6,7 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
 
 from .client import LimitforgeClient, RateLimitedError
+from .feedback import FeedbackReporter
 
 
 def default_mapper(request: Request) -> Tuple[str, str]:
@@ -27,16 +29,29 @@ class LimitforgeMiddleware(BaseHTTPMiddleware):
         mapper: Callable[[Request], Tuple[str, str]] = default_mapper,
         cost: int = 1,
         timeout: float = 1.0,
+        feedback: bool = False,
+        feedback_interval: float = 1.0,
+        wait: bool = False,
     ):
         super().__init__(app)
         self.client = LimitforgeClient(base_url, api_key, timeout=timeout)
         self.mapper = mapper
         self.cost = cost
+        # Wait out short denials (client.retry) instead of answering 429
+        self.wait = wait
+        # Latency and 5xx of admitted requests, for adaptive plans
+        self.reporter = (
+            FeedbackReporter(self.client, interval=feedback_interval)
+            if feedback
+            else None
+        )
 
     async def dispatch(self, request: Request, call_next):
         try:
             resource, subject = self.mapper(request)
-            await self.client.check(resource=resource, subject=subject, cost=self.cost)
+            await self.client.check(
+                resource=resource, subject=subject, cost=self.cost, wait=self.wait
+            )
         except RateLimitedError as e:
             headers = e.headers.copy()
             return JSONResponse(
@@ -48,4 +63,16 @@ class LimitforgeMiddleware(BaseHTTPMiddleware):
             return JSONResponse(
                 status_code=503, content={"detail": "rate limit service unavailable"}
             )
-        return await call_next(request)
+        if self.reporter is None:
+            return await call_next(request)
+        self.reporter.start()
+        start = time.perf_counter()
+        error = True
+        try:
+            response = await call_next(request)
+            error = response.status_code >= 500
+            return response
+        finally:
+            self.reporter.record(
+                resource, (time.perf_counter() - start) * 1000.0, error=error
+            )
@@ -0,0 +1,123 @@
+import contextlib
+import contextvars
+import random
+import time
+from typing import Iterator, Optional
+
+# Absolute time.monotonic() deadline of the current call tree, if any
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "limitforge_deadline", default=None
+)
+
+
+@contextlib.contextmanager
+def deadline(seconds: float) -> Iterator[float]:
+    """Bound every client call made inside the block, however deeply nested,
+    by one deadline ``seconds`` from now. An enclosing, earlier deadline
+    still wins."""
+    at = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(at if outer is None else min(outer, at))
+    try:
+        yield _deadline.get()
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+class RetryStats:
+    """Counters for a client's retries; read them or export them to your
+    metrics system."""
+
+    __slots__ = ("retries", "waited_ms", "budget_exhausted", "deadline_exceeded")
+
+    def __init__(self):
+        self.retries = 0
+        self.waited_ms = 0.0
+        self.budget_exhausted = 0
+        self.deadline_exceeded = 0
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class RetryBudget:
+    """Caps retries at ``ratio`` of requests, plus ``min_per_sec`` so a
+    quiet client can still retry.
+
+    Each request deposits ``ratio`` tokens and each retry spends one, so
+    a saturated limiter sees at most (1 + ratio) times the original load
+    from this client instead of a multiple of it. The budget starts with
+    ``reserve_sec`` worth of the ``min_per_sec`` allowance.
+    """
+
+    def __init__(
+        self,
+        ratio: float = 0.1,
+        min_per_sec: float = 1.0,
+        reserve_sec: float = 10.0,
+        max_tokens: float = 100.0,
+    ):
+        self.ratio = ratio
+        self.min_per_sec = min_per_sec
+        self.max_tokens = max_tokens
+        self._tokens = min(max_tokens, min_per_sec * reserve_sec)
+        self._ts = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.max_tokens, self._tokens + (now - self._ts) * self.min_per_sec
+        )
+        self._ts = now
+
+    def record_request(self) -> None:
+        self._refill()
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        self._refill()
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+
+class RetryPolicy:
+    """How ``check(wait=True)`` waits out a 429.
+
+    Each retry sleeps the server's ``retry_after_ms`` plus decorrelated
+    jitter: ``jitter = min(cap_ms, uniform(base_ms, 3 * previous jitter))``.
+    Callers denied together therefore come back spread out rather than in
+    lockstep. The jitter also keeps growing while denials continue.
+    ``max_attempts`` counts the first call.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_attempts: int = 5,
+        base_ms: float = 20.0,
+        cap_ms: float = 1000.0,
+        budget_ratio: float = 0.1,
+        budget_min_per_sec: float = 1.0,
+        rng: Optional[random.Random] = None,
+    ):
+        self.max_attempts = max_attempts
+        self.base_ms = base_ms
+        self.cap_ms = cap_ms
+        self.budget_ratio = budget_ratio
+        self.budget_min_per_sec = budget_min_per_sec
+        self._rng = rng or random.Random()
+
+    def budget(self) -> RetryBudget:
+        return RetryBudget(self.budget_ratio, self.budget_min_per_sec)
+
+    def jitter_ms(self, previous_ms: Optional[float]) -> float:
+        upper = 3 * (previous_ms if previous_ms is not None else self.base_ms)
+        return min(
+            self.cap_ms, self._rng.uniform(self.base_ms, max(upper, self.base_ms))
+        )
@@ -0,0 +1,151 @@
+import asyncio
+import struct
+from typing import Any, Dict
+
+from .client import RateLimitedError
+from .ws import ChannelError
+
+# Wire format shared with ``python -m app.sidecar``
+_HEADER = struct.Struct("!IB")
+_CHECK_HEAD = struct.Struct("!III")
+_DEFINE_HEAD = struct.Struct("!I")
+_DECISION_BODY = struct.Struct("!IBIIII")
+_HELLO, _DEFINE, _CHECK = 0x01, 0x02, 0x03
+_HELLO_OK, _DECISION = 0x81, 0x83
+_STATUS = {
+    2: "unknown_resource",
+    3: "plan_not_found",
+    4: "internal_error",
+    5: "bad_frame",
+}
+
+
+def _frame(kind: int, body: bytes) -> bytes:
+    return _HEADER.pack(len(body) + 1, kind) + body
+
+
+class LimitforgeSidecarClient:
+    """Checks against a local sidecar over its Unix domain socket.
+
+    Same ``check`` contract as ``LimitforgeClient``. Resources are sent once
+    per connection and referred to by a numeric id afterwards; concurrent
+    checks share the connection and are matched by request id.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        api_key: str,
+        *,
+        max_in_flight: int = 256,
+        timeout: float = 1.0,
+    ):
+        self.path = path
+        self.api_key = api_key
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._resources: Dict[str, int] = {}
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._writer = None
+        self._reader_task = None
+        self._connect_lock = asyncio.Lock()
+
+    async def connect(self):
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        writer.write(_frame(_HELLO, self.api_key.encode("utf-8")))
+        await writer.drain()
+        length, kind = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+        status = await reader.readexactly(length - 1)
+        if kind != _HELLO_OK or status != b"\x00":
+            writer.close()
+            raise PermissionError("invalid API key")
+        self._writer = writer
+        self._resources.clear()
+        self._reader_task = asyncio.create_task(self._read(reader))
+        return self
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._reader_task is not None:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _read(self, reader):
+        error, reason = ConnectionError, "sidecar connection closed"
+        try:
+            while True:
+                length, kind = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                body = await reader.readexactly(length - 1)
+                if kind == _HELLO_OK and body != b"\x00":
+                    # The key was revoked; the sidecar closes the connection
+                    error, reason = PermissionError, "invalid API key"
+                    continue
+                if kind != _DECISION:
+                    continue
+                decision = _DECISION_BODY.unpack(body)
+                fut = self._pending.pop(decision[0], None)
+                if fut is not None and not fut.done():
+                    fut.set_result(decision)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for fut in self._pending.values():
+                if not fut.done():
+                    fut.set_exception(error(reason))
+            self._pending.clear()
+            self._writer = None
+
+    async def check(
+        self, *, resource: str, subject: str, cost: int = 1
+    ) -> Dict[str, Any]:
+        if self._writer is None:
+            # Concurrent first checks must share a single connection
+            async with self._connect_lock:
+                if self._writer is None:
+                    await self.connect()
+        async with self._slots:
+            out = b""
+            resource_id = self._resources.get(resource)
+            if resource_id is None:
+                resource_id = self._resources[resource] = len(self._resources) + 1
+                out += _frame(
+                    _DEFINE, _DEFINE_HEAD.pack(resource_id) + resource.encode("utf-8")
+                )
+            self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+            rid = self._next_id
+            fut = asyncio.get_running_loop().create_future()
+            self._pending[rid] = fut
+            out += _frame(
+                _CHECK,
+                _CHECK_HEAD.pack(rid, resource_id, cost) + subject.encode("utf-8"),
+            )
+            self._writer.write(out)
+            try:
+                await self._writer.drain()
+                _, status, remaining, limit, reset_at, retry_after_ms = (
+                    await asyncio.wait_for(fut, self.timeout)
+                )
+            finally:
+                self._pending.pop(rid, None)
+        if status > 1:
+            raise ChannelError(_STATUS.get(status, "error"), status=status)
+        data = {
+            "allowed": status == 0,
+            "remaining": remaining,
+            "limit": limit,
+            "reset_at": reset_at,
+            "retry_after_ms": retry_after_ms,
+        }
+        if status == 1:
+            raise RateLimitedError(
+                "rate_limited", retry_after_ms=retry_after_ms, payload=data
+            )
+        return data
@@ -0,0 +1,118 @@
+import asyncio
+import json
+from typing import Any, Dict
+
+from .client import RateLimitedError
+
+
+class ChannelError(Exception):
+    def __init__(self, message: str, *, status: int):
+        super().__init__(message)
+        self.status = status
+
+
+class LimitforgeWsClient:
+    """Concurrent checks multiplexed over one ``/v1/check/ws`` connection.
+
+    Requires ``websockets`` (and ``msgpack`` for binary frames):
+    ``pip install limitforge-sdk[ws]``. ``check`` has the same contract as
+    ``LimitforgeClient.check``; at most ``max_in_flight`` checks are
+    outstanding at once, further callers wait for a slot.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        *,
+        binary: bool = True,
+        max_in_flight: int = 256,
+        timeout: float = 1.0,
+    ):
+        url = base_url.rstrip("/")
+        if url.startswith("http"):
+            url = "ws" + url[4:]
+        self.url = url + "/v1/check/ws"
+        self.api_key = api_key
+        self.binary = binary
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._ws = None
+        self._reader = None
+        self._packb = self._unpackb = None
+
+    async def connect(self):
+        from websockets.asyncio.client import connect
+
+        if self.binary:
+            import msgpack
+
+            self._packb, self._unpackb = msgpack.packb, msgpack.unpackb
+        self._ws = await connect(
+            self.url,
+            additional_headers={"X-API-Key": self.api_key},
+            subprotocols=["limitforge.msgpack" if self.binary else "limitforge.json"],
+        )
+        self._reader = asyncio.create_task(self._read())
+        return self
+
+    async def close(self):
+        if self._ws is not None:
+            await self._ws.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _read(self):
+        try:
+            async for data in self._ws:
+                frame = self._unpackb(data) if self.binary else json.loads(data)
+                fut = self._pending.pop(frame[0], None)
+                if fut is not None and not fut.done():
+                    fut.set_result(frame)
+        finally:
+            for fut in self._pending.values():
+                if not fut.done():
+                    fut.set_exception(ConnectionError("check channel closed"))
+            self._pending.clear()
+
+    async def check(
+        self, *, resource: str, subject: str, cost: int = 1
+    ) -> Dict[str, Any]:
+        if self._ws is None:
+            await self.connect()
+        async with self._slots:
+            self._next_id += 1
+            rid = self._next_id
+            fut = asyncio.get_running_loop().create_future()
+            self._pending[rid] = fut
+            frame = [rid, resource, subject, cost]
+            await self._ws.send(
+                self._packb(frame) if self.binary else json.dumps(frame)
+            )
+            try:
+                res = await asyncio.wait_for(fut, self.timeout)
+            finally:
+                self._pending.pop(rid, None)
+        if len(res) == 3:
+            raise ChannelError(res[2], status=res[1])
+        _, status, allowed, remaining, limit, reset_at, retry_after_ms = res
+        data = {
+            "allowed": bool(allowed),
+            "remaining": remaining,
+            "limit": limit,
+            "reset_at": reset_at,
+            "retry_after_ms": retry_after_ms,
+        }
+        if status == 429:
+            raise RateLimitedError(
+                "rate_limited", retry_after_ms=retry_after_ms, payload=data
+            )
+        return data
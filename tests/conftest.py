@@ -1,12 +1,15 @@
 import asyncio
 import os
 import sys
+import uuid
 import pytest
 import pytest_asyncio
-from typing import AsyncGenerator
+from typing import AsyncGenerator, NamedTuple
 
 # Ensure project root on path
 sys.path.insert(0, os.getcwd())
+# The Python SDK is not installed as a package in the test environment
+sys.path.insert(0, os.path.join(os.getcwd(), "sdk", "python"))
 
 import httpx
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
@@ -15,10 +18,13 @@ from sqlalchemy.orm import sessionmaker
 from app.main import app
 from app.core.deps import (
     get_redis as _get_redis_dep,
+    get_read_redis as _get_read_redis_dep,
     get_db as _get_db_dep,
     get_engine as _get_engine_dep,
+    get_sessionmaker as _get_sessionmaker_dep,
 )
-from app.db.models import Base
+from app.core.cache import api_key_cache, plan_cache
+from app.db.models import Base, SubjectType
 from app.db import crud
 from app.rl.engine import DecisionEngine
 
@@ -66,6 +72,55 @@ async def db(pg_dsn):
     await engine.dispose()
 
 
+@pytest.fixture()
+def admin_headers() -> dict:
+    token = os.getenv("ADMIN_BEARER_TOKEN", "change-me-admin-token")
+    return {"Authorization": f"Bearer {token}"}
+
+
+class Seeded(NamedTuple):
+    tenant_id: str
+    key: str
+    # resource -> Plan
+    plans: dict
+
+    @property
+    def headers(self) -> dict:
+        return {"X-API-Key": self.key}
+
+
+@pytest.fixture()
+def seed(db):
+    """Factory for the tenant -> plan -> policy -> API key chain behind a
+    check: ``await seed({resource: create_plan kwargs, ...})`` gives each
+    resource its own plan under an api_key policy, on one new tenant and key.
+    """
+
+    async def _seed(plans: dict, *, timezone: str = "UTC") -> Seeded:
+        tenant = await crud.create_tenant(
+            db, name=f"t-{uuid.uuid4().hex[:8]}", timezone=timezone
+        )
+        created = {}
+        for resource, kw in plans.items():
+            created[resource] = await crud.create_plan(
+                db, tenant_id=tenant.id, name=resource, **kw
+            )
+            await crud.create_resource_policy(
+                db,
+                tenant_id=tenant.id,
+                resource=resource,
+                subject_type=SubjectType.api_key,
+                plan_id=created[resource].id,
+            )
+        raw_key, _ = await crud.create_api_key(db, tenant_id=tenant.id, name="k")
+        # Lookups cached by earlier tests must not shadow the new rows
+        api_key_cache.clear()
+        plan_cache.clear()
+        return Seeded(str(tenant.id), raw_key, created)
+
+    return _seed
+
+
 @pytest_asyncio.fixture()
 async def async_client(fake_redis, pg_dsn):
 
@@ -83,16 +138,17 @@ async def async_client(fake_redis, pg_dsn):
     SessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
     # Override dependencies
-    from fastapi import Request
+    from starlette.requests import HTTPConnection
 
-    async def _override_get_redis(request: Request):
+    # HTTPConnection so the overrides also resolve for WebSocket routes
+    async def _override_get_redis(request: HTTPConnection):
         return request.app.state._test_redis
 
     async def _override_get_db() -> AsyncGenerator[AsyncSession, None]:
         async with SessionLocal() as session:
             yield session
 
-    def _override_get_engine(request: Request):
+    def _override_get_engine(request: HTTPConnection):
         from app.core.config import settings as s
 
         return DecisionEngine(
@@ -100,8 +156,10 @@ async def async_client(fake_redis, pg_dsn):
         )
 
     app.dependency_overrides[_get_redis_dep] = _override_get_redis
+    app.dependency_overrides[_get_read_redis_dep] = _override_get_redis
     app.dependency_overrides[_get_db_dep] = _override_get_db
     app.dependency_overrides[_get_engine_dep] = _override_get_engine
+    app.dependency_overrides[_get_sessionmaker_dep] = lambda: SessionLocal
 
     transport = httpx.ASGITransport(app=app)
     async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
@@ -0,0 +1,187 @@
+import time
+
+import pytest
+
+from app.db.models import PlanAlgorithm
+from app.rl.backend import RedisBackend
+from app.rl.memory_backend import MemoryBackend
+from app.rl.strategies import acquire
+from app.rl.strategies.acquire import GRANTED, QUEUE_FULL, QUEUED, TOO_LATE
+
+T0 = 1_700_000_000_000
+BUCKET = dict(capacity=2, refill_rate_per_sec=10.0)
+# (now_ms offset, cost, max_wait_ms): burst, queue behind the debt, a wait
+# past max_wait_ms, refill and a full queue (max_queue=3)
+STEPS = [
+    (0, 1, 0),
+    (0, 1, 0),
+    (0, 1, 500),
+    (10, 2, 500),
+    (20, 3, 100),
+    (250, 1, 0),
+    (300, 1, 1000),
+    (300, 1, 1000),
+    (300, 1, 1000),
+    (300, 1, 1000),
+]
+WANT = [GRANTED, GRANTED, QUEUED, QUEUED, TOO_LATE, TOO_LATE, QUEUED, QUEUED]
+
+
+async def _lua(redis, key, packed, now_ms, cost, max_wait_ms, rid):
+    res = await redis.eval(
+        acquire._get_script_text("acquire"),
+        2,
+        key,
+        f"{key}:q",
+        BUCKET["capacity"],
+        BUCKET["refill_rate_per_sec"],
+        now_ms,
+        cost,
+        max_wait_ms,
+        3,
+        rid,
+        int(packed),
+    )
+    return acquire.Reservation(*(int(v) for v in res))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("packed", [False, True], ids=["hash", "packed"])
+async def test_reservations_match_across_implementations(fake_redis, packed):
+    memory = MemoryBackend(shards=2)
+    python = RedisBackend(fake_redis, packed=packed)
+    statuses = []
+    for i, (offset, cost, max_wait_ms) in enumerate(STEPS):
+        now_ms, rid = T0 + offset, f"r{i}"
+        args = dict(
+            **BUCKET,
+            cost=cost,
+            max_wait_ms=max_wait_ms,
+            max_queue=3,
+            reservation_id=rid,
+            now_ms=now_ms,
+        )
+        lua = await _lua(fake_redis, "lua", packed, now_ms, cost, max_wait_ms, rid)
+        assert await python.reserve("py", "py:q", **args) == lua, i
+        assert await memory.reserve("mem", "mem:q", **args) == lua, i
+        statuses.append(lua.status)
+    assert statuses[: len(WANT)] == WANT
+    assert QUEUE_FULL in statuses[len(WANT) :]
+
+
+@pytest.mark.asyncio
+async def test_queued_slots_follow_the_debt(fake_redis):
+    memory = MemoryBackend(shards=1)
+    args = dict(**BUCKET, cost=2, max_wait_ms=1000, max_queue=8, now_ms=T0)
+    first = await memory.reserve("b", "b:q", reservation_id="a", **args)
+    assert first.status == GRANTED
+    second = await memory.reserve("b", "b:q", reservation_id="b", **args)
+    third = await memory.reserve("b", "b:q", reservation_id="c", **args)
+    # 2 tokens at 10/s: each reservation waits 200 ms behind the previous
+    assert (second.wait_ms, third.wait_ms) == (200, 400)
+    assert third.depth == 2 and third.remaining == 0
+    # A plain check sees the debt until refill pays it back
+    denied = await memory.token_bucket("b", **BUCKET, cost=1, now_ms=T0 + 300)
+    assert not denied.allowed and denied.retry_after_ms == 200
+    assert denied.remaining == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("packed", [False, True], ids=["hash", "packed"])
+async def test_cancel_refunds_pending_reservations(fake_redis, packed):
+    backends = [RedisBackend(fake_redis, packed=packed), MemoryBackend(shards=1)]
+    for backend in backends:
+        args = dict(**BUCKET, cost=2, max_wait_ms=1000, max_queue=8, now_ms=T0)
+        await backend.reserve("c", "c:q", reservation_id="a", **args)
+        queued = await backend.reserve("c", "c:q", reservation_id="b", **args)
+        assert queued.status == QUEUED
+        kw = dict(member="b:2", now_ms=T0 + 50)
+        assert await backend.cancel_reservation("c", "c:q", **kw)
+        assert not await backend.cancel_reservation("c", "c:q", **kw)
+        # Refunded: the bucket is back to empty, not in debt
+        decision = await backend.token_bucket("c", **BUCKET, cost=1, now_ms=T0 + 100)
+        assert decision.allowed
+        # A slot that has come is spent
+        await backend.reserve("c", "c:q", reservation_id="d", **args)
+        assert not await backend.cancel_reservation(
+            "c", "c:q", member="d:2", now_ms=T0 + 10_000
+        )
+
+
+@pytest.mark.asyncio
+async def test_lua_cancel_refunds(fake_redis):
+    for packed in (0, 1):
+        key = f"lc{packed}"
+        await _lua(fake_redis, key, packed, T0, 2, 1000, "a")
+        assert (await _lua(fake_redis, key, packed, T0, 2, 1000, "b")).status == QUEUED
+        lua = acquire._get_script_text("acquire_cancel")
+        assert await fake_redis.eval(lua, 2, key, f"{key}:q", T0 + 1, "b:2", packed)
+        assert not await fake_redis.eval(lua, 2, key, f"{key}:q", T0 + 1, "b:2", packed)
+        res = await _lua(fake_redis, key, packed, T0 + 100, 1, 0, "c")
+        assert res.status == GRANTED
+
+
+def _slow(algorithm=PlanAlgorithm.token_bucket):
+    return {
+        "GET:/slow": dict(
+            algorithm=algorithm,
+            bucket_capacity=1,
+            refill_rate_per_sec=10.0,
+            limit_per_window=1,
+            window_seconds=60,
+        )
+    }
+
+
+@pytest.mark.asyncio
+async def test_acquire_endpoint_waits_for_the_slot(async_client, seed):
+    headers = (await seed(_slow())).headers
+    body = {"resource": "GET:/slow", "subject": "u1", "max_wait_ms": 1000}
+    r = await async_client.post("/v1/acquire", json=body, headers=headers)
+    assert r.status_code == 200 and r.json()["wait_ms"] == 0
+
+    start = time.perf_counter()
+    r = await async_client.post("/v1/acquire", json=body, headers=headers)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    data = r.json()
+    assert r.status_code == 200 and data["allowed"]
+    assert 0 < data["wait_ms"] <= 100 and data["reservation_id"] is None
+    assert elapsed_ms >= data["wait_ms"] - 5
+
+    # Too short a max_wait_ms: 429 with the slot as the retry hint
+    r = await async_client.post(
+        "/v1/acquire", json={**body, "max_wait_ms": 0}, headers=headers
+    )
+    assert r.status_code == 429 and r.json()["retry_after_ms"] > 0
+
+
+@pytest.mark.asyncio
+async def test_acquire_without_waiting_returns_a_cancellable_slot(async_client, seed):
+    headers = (await seed(_slow())).headers
+    body = {"resource": "GET:/slow", "subject": "u1", "max_wait_ms": 1000}
+    await async_client.post("/v1/acquire", json=body, headers=headers)
+    r = await async_client.post(
+        "/v1/acquire", json={**body, "wait": False}, headers=headers
+    )
+    data = r.json()
+    assert r.status_code == 200 and data["wait_ms"] > 0
+    assert data["slot_at_ms"] >= int(time.time() * 1000) and data["queue_depth"] == 1
+
+    cancel = {
+        "resource": "GET:/slow",
+        "subject": "u1",
+        "reservation_id": data["reservation_id"],
+    }
+    r = await async_client.post("/v1/acquire/cancel", json=cancel, headers=headers)
+    assert r.json() == {"cancelled": True}
+    r = await async_client.post("/v1/acquire/cancel", json=cancel, headers=headers)
+    assert r.json() == {"cancelled": False}
+
+
+@pytest.mark.asyncio
+async def test_acquire_needs_a_token_bucket_plan(async_client, seed):
+    headers = (await seed(_slow(PlanAlgorithm.fixed_window))).headers
+    r = await async_client.post(
+        "/v1/acquire", json={"resource": "GET:/slow", "subject": "u1"}, headers=headers
+    )
+    assert r.status_code == 400
@@ -0,0 +1,250 @@
+import types
+import uuid
+
+import pytest
+
+from app.core.config import settings
+from app.db import crud
+from app.db.models import PlanAlgorithm
+from app.rl.backend import RedisBackend
+from app.rl.engine import DecisionEngine
+from app.rl.memory_backend import MemoryBackend
+from app.rl.strategies import adaptive, fixed_window, token_bucket_packed
+
+T0 = 1_700_000_000_000
+AIMD = dict(step=1.0, factor=0.5, cooldown_ms=1000, ttl_sec=60)
+
+
+def _plan(algorithm, **kw):
+    return types.SimpleNamespace(
+        algorithm=algorithm,
+        bucket_capacity=kw.get("bucket_capacity"),
+        refill_rate_per_sec=kw.get("refill_rate_per_sec"),
+        limit_per_window=kw.get("limit_per_window"),
+        window_seconds=kw.get("window_seconds"),
+        concurrency_limit=None,
+        adaptive=True,
+        adaptive_min_limit=kw.get("min"),
+        adaptive_max_limit=kw.get("max"),
+        adaptive_latency_ms=None,
+    )
+
+
+def test_additive_increase_multiplicative_decrease():
+    args = dict(min_limit=2, max_limit=20, count=1, **AIMD)
+    del args["ttl_sec"]
+    limit, cut_ms, cut = adaptive.next_limit(
+        10.0, 0, congested=False, now_ms=T0, **args
+    )
+    assert limit == pytest.approx(10.1) and not cut
+    # A limit's worth of healthy requests adds about one step
+    limit, _, _ = adaptive.next_limit(
+        10.0, 0, congested=False, now_ms=T0, **{**args, "count": 10}
+    )
+    assert limit == pytest.approx(11.0)
+    limit, cut_ms, cut = adaptive.next_limit(10.0, 0, congested=True, now_ms=T0, **args)
+    assert (limit, cut_ms, cut) == (5.0, T0, True)
+    # Within the cooldown a second congested report does not cut again
+    limit, cut_ms, cut = adaptive.next_limit(
+        limit, cut_ms, congested=True, now_ms=T0 + 999, **args
+    )
+    assert (limit, cut) == (5.0, False)
+    limit, _, _ = adaptive.next_limit(
+        limit, cut_ms, congested=True, now_ms=T0 + 1000, **args
+    )
+    assert limit == 2.5
+    limit, _, _ = adaptive.next_limit(limit, 0, congested=True, now_ms=T0, **args)
+    assert limit == 2  # clamped to the lower bound
+
+
+@pytest.mark.asyncio
+async def test_scripts_read_the_adaptive_limit(fake_redis):
+    # Lua paths through fakeredis' EVAL, bypassing the Python fallbacks
+    lua = adaptive._get_script_text()
+    res = await fake_redis.eval(lua, 1, "al", 10, 1, 20, 1, 1, 1.0, 0.5, 0, T0, 60)
+    assert float(res[0]) == 5.0 and int(res[1]) == 1
+    assert await fake_redis.ttl("al") == 60
+
+    fw = fixed_window._get_script_text()
+    res = await fake_redis.eval(fw, 2, "fw", "al", 10, 60, T0, 5)
+    assert res[:3] == [1, 0, 5]
+    assert (await fake_redis.eval(fw, 2, "fw", "al", 10, 60, T0, 1))[0] == 0
+    # Without KEYS[2] the configured limit applies
+    assert (await fake_redis.eval(fw, 1, "fw", 10, 60, T0, 1))[0] == 1
+
+    tb = token_bucket_packed._get_script_text()
+    res = await fake_redis.eval(tb, 2, "tb", "al", 10, 2.0, T0, 1)
+    assert res == [1, 4, 5, 0]
+    # Refill is scaled with capacity: 1 token/s at half the capacity
+    await fake_redis.eval(tb, 2, "tb", "al", 10, 2.0, T0, 4)
+    res = await fake_redis.eval(tb, 2, "tb", "al", 10, 2.0, T0, 1)
+    assert res[0] == 0 and res[3] == 1000
+
+
+class _ScriptedRedis:
+    """Hides fakeredis so the strategies take their EVALSHA path."""
+
+    def __init__(self, redis):
+        self._redis = redis
+
+    def __getattr__(self, name):
+        return getattr(self._redis, name)
+
+
+@pytest.mark.asyncio
+async def test_registered_scripts_match_the_python_mirrors(fake_redis):
+    scripted = _ScriptedRedis(fake_redis)
+    args = dict(base=10, min_limit=2, max_limit=20, count=1, **AIMD)
+    for redis, key in ((fake_redis, "py"), (scripted, "lua")):
+        assert await adaptive.update(
+            redis, f"al:{key}", congested=True, now_ms=T0, **args
+        ) == (5.0, True)
+        decisions = [
+            await token_bucket_packed.check(
+                redis,
+                f"tb:{key}",
+                capacity=10,
+                refill_rate_per_sec=2.0,
+                cost=2,
+                now_ms=T0,
+                adaptive_key=f"al:{key}",
+            )
+            for _ in range(3)
+        ]
+        assert [(d.allowed, d.remaining, d.limit) for d in decisions] == [
+            (True, 3, 5),
+            (True, 1, 5),
+            (False, 1, 5),
+        ]
+
+
+STEPS = [(False, 0, 1), (True, 1, 4), (True, 1500, 2), (False, 1600, 3)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "alg,params",
+    [
+        ("token_bucket", dict(capacity=8, refill_rate_per_sec=4.0)),
+        ("fixed_window", dict(limit=8, window_sec=60)),
+        ("sliding_window", dict(limit=8, window_sec=60)),
+    ],
+    ids=lambda a: str(a),
+)
+async def test_memory_backend_matches_redis(fake_redis, alg, params):
+    redis_backend = RedisBackend(fake_redis, packed=True)
+    memory = MemoryBackend(shards=4)
+    bounds = dict(base=8, min_limit=2, max_limit=16, count=1, **AIMD)
+    for congested, offset, checks in STEPS:
+        now_ms = T0 + offset
+        want = await redis_backend.adapt(
+            "al", congested=congested, now_ms=now_ms, **bounds
+        )
+        got = await memory.adapt("al", congested=congested, now_ms=now_ms, **bounds)
+        assert got == pytest.approx(want)
+        for _ in range(checks):
+            args = dict(**params, cost=1, now_ms=now_ms, adaptive_key="al")
+            want = await getattr(redis_backend, alg)("k", **args)
+            got = await getattr(memory, alg)("k", **args)
+            assert got == want, (congested, offset)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("memory", [False, True], ids=["redis", "memory"])
+async def test_quota_peek_reports_the_adaptive_limit(fake_redis, memory):
+    backend = MemoryBackend(shards=2) if memory else RedisBackend(fake_redis)
+    eng = DecisionEngine(fake_redis, settings, crud, backend=backend)
+    tid = str(uuid.uuid4())
+    plan = _plan("token_bucket", bucket_capacity=10, refill_rate_per_sec=1.0, min=2)
+    await eng.feedback(tenant_id=tid, resource="GET:/a", plan=plan, congested=True)
+    decision = await eng.check(
+        tenant_id=tid, subject="u1", resource="GET:/a", cost=2, plan=plan
+    )
+    now_ms = eng.clock()
+    spec = eng.quota_spec(
+        tenant_id=tid, subject="u1", resource="GET:/a", plan=plan, now_ms=now_ms
+    )
+    (state,) = await backend.peek_many([spec], now_ms)
+    # The peek agrees with the check: the cut limit, not the configured one
+    assert (state["limit"], state["remaining"]) == (decision.limit, 5)
+    assert decision.limit == 7
+
+
+@pytest.mark.asyncio
+async def test_engine_feedback_bounds_and_checks(fake_redis):
+    eng = DecisionEngine(fake_redis, settings, crud, backend=MemoryBackend(shards=2))
+    tid = str(uuid.uuid4())
+    plan = _plan("fixed_window", limit_per_window=4, window_seconds=3600, max=6)
+    for _ in range(20):
+        await eng.feedback(
+            tenant_id=tid, resource="GET:/a", plan=plan, congested=False, count=10
+        )
+    # Capped at adaptive_max_limit, and shared by every subject
+    for subject in ("u1", "u2"):
+        allowed = [
+            (
+                await eng.check(
+                    tenant_id=tid, subject=subject, resource="GET:/a", cost=1, plan=plan
+                )
+            ).allowed
+            for _ in range(7)
+        ]
+        assert allowed == [True] * 6 + [False]
+
+    plain = _plan("fixed_window", limit_per_window=4, window_seconds=3600)
+    plain.adaptive = False
+    with pytest.raises(ValueError):
+        await eng.feedback(tenant_id=tid, resource="GET:/a", plan=plain, congested=True)
+
+
+def _svc(**plan_kw):
+    return {
+        "GET:/svc": dict(
+            algorithm=PlanAlgorithm.fixed_window,
+            limit_per_window=10,
+            window_seconds=3600,
+            **plan_kw,
+        )
+    }
+
+
+@pytest.mark.asyncio
+async def test_feedback_endpoint_drives_check_limit(async_client, seed):
+    seeded = await seed(
+        _svc(adaptive=True, adaptive_min_limit=3, adaptive_latency_ms=200)
+    )
+    headers = seeded.headers
+    fb = {"resource": "GET:/svc", "count": 5, "latency_ms": 50}
+    r = await async_client.post("/v1/feedback", json=fb, headers=headers)
+    assert r.status_code == 200, r.text
+    assert r.json() == {
+        "resource": "GET:/svc",
+        "limit": 10,
+        "congested": False,
+        "decreased": False,
+    }
+
+    # Slow responses count as congestion
+    r = await async_client.post(
+        "/v1/feedback", json={**fb, "latency_ms": 900}, headers=headers
+    )
+    body = r.json()
+    assert body["congested"] and body["decreased"] and body["limit"] == 7
+
+    check = {"resource": "GET:/svc", "subject": "u1"}
+    codes = [
+        (await async_client.post("/v1/check", json=check, headers=headers)).status_code
+        for _ in range(8)
+    ]
+    assert codes == [200] * 7 + [429]
+    r = await async_client.get("/v1/quota", params=check, headers=headers)
+    assert (r.json()["limit"], r.json()["remaining"]) == (7, 0)
+
+
+@pytest.mark.asyncio
+async def test_feedback_rejects_fixed_plans(async_client, seed):
+    headers = (await seed(_svc())).headers
+    r = await async_client.post(
+        "/v1/feedback", json={"resource": "GET:/svc", "errors": 1}, headers=headers
+    )
+    assert r.status_code == 400
@@ -0,0 +1,185 @@
+import json
+import uuid
+
+import pytest
+
+from app.core.config import settings
+from app.api.admin import _bulk_error
+from app.db import crud
+
+
+def _lines(resp):
+    return [json.loads(line) for line in resp.text.splitlines() if line.strip()]
+
+
+@pytest.mark.asyncio
+async def test_bulk_provisioning_flow(async_client, admin_headers):
+    r = await async_client.post(
+        "/v1/admin/bulk/tenants", json=[{"name": "bulk-a"}], headers=admin_headers
+    )
+    assert r.status_code == 200
+    tenant, done = _lines(r)
+    assert done == {"done": True, "committed": True, "count": 1}
+    tid = tenant["id"]
+
+    r = await async_client.post(
+        "/v1/admin/bulk/plans",
+        json=[
+            {
+                "tenant_id": tid,
+                "name": "fw",
+                "algorithm": "fixed_window",
+                "limit_per_window": 1,
+                "window_seconds": 60,
+            }
+        ],
+        headers=admin_headers,
+    )
+    plan_id = _lines(r)[0]["id"]
+
+    # NDJSON input
+    ndjson = "\n".join(
+        json.dumps({"tenant_id": tid, "name": f"k{i}"}) for i in range(25)
+    )
+    r = await async_client.post(
+        "/v1/admin/bulk/keys",
+        content=ndjson,
+        headers={**admin_headers, "Content-Type": "application/x-ndjson"},
+    )
+    lines = _lines(r)
+    assert lines[-1]["committed"] and lines[-1]["count"] == 25
+    raw_key = lines[0]["key"]
+
+    r = await async_client.post(
+        "/v1/admin/bulk/policies",
+        json=[
+            {
+                "tenant_id": tid,
+                "resource": "GET:/bulk/*",
+                "subject_type": "api_key",
+                "plan_id": plan_id,
+            }
+        ],
+        headers=admin_headers,
+    )
+    assert _lines(r)[-1]["committed"]
+
+    r = await async_client.get(
+        f"/v1/admin/tenants/{tid}/summary", headers=admin_headers
+    )
+    assert r.json() == {"tenant_id": tid, "plans": 1, "keys": 25, "policies": 1}
+
+    r = await async_client.post(
+        "/v1/check",
+        json={"resource": "GET:/bulk/1", "subject": "u", "cost": 1},
+        headers={"X-API-Key": raw_key},
+    )
+    assert r.status_code == 200 and r.json()["allowed"]
+
+
+@pytest.mark.asyncio
+async def test_bulk_rejects_invalid_item_and_rolls_back_on_conflict(
+    async_client, admin_headers
+):
+    r = await async_client.post(
+        "/v1/admin/bulk/tenants",
+        json=[{"name": "ok"}, {"nom": 1}],
+        headers=admin_headers,
+    )
+    assert r.status_code == 422
+    assert r.json()["detail"]["index"] == 1
+
+    # Duplicate tenant name violates the unique constraint: nothing commits
+    r = await async_client.post(
+        "/v1/admin/bulk/tenants",
+        json=[{"name": "dup"}, {"name": "dup"}],
+        headers=admin_headers,
+    )
+    # The trailer names the error, never the SQL or its parameters
+    assert _lines(r)[-1] == {
+        "done": True,
+        "committed": False,
+        "count": 0,
+        "error": "IntegrityError",
+    }
+    r = await async_client.post(
+        "/v1/admin/bulk/tenants", json=[{"name": "dup"}], headers=admin_headers
+    )
+    assert _lines(r)[-1]["committed"] is True
+
+
+@pytest.mark.asyncio
+async def test_bulk_period_quota_plans_follow_the_tenant_timezone(
+    async_client, db, admin_headers
+):
+    r = await async_client.post(
+        "/v1/admin/bulk/tenants",
+        json=[{"name": "tokyo", "timezone": "Asia/Tokyo"}, {"name": "utc"}],
+        headers=admin_headers,
+    )
+    tokyo, utc = (line["id"] for line in _lines(r)[:2])
+
+    def quota(tid, **kw):
+        return {
+            "tenant_id": tid,
+            "name": "daily",
+            "algorithm": "period_quota",
+            "limit_per_window": 3,
+            "quota_period": "day",
+            **kw,
+        }
+
+    r = await async_client.post(
+        "/v1/admin/bulk/plans",
+        json=[quota(tokyo), quota(utc), quota(utc, quota_timezone="Europe/Athens")],
+        headers=admin_headers,
+    )
+    ids = [line["id"] for line in _lines(r)[:3]]
+    zones = [(await crud.get_plan_by_id(db, uuid.UUID(i))).quota_timezone for i in ids]
+    assert zones == ["Asia/Tokyo", "UTC", "Europe/Athens"]
+
+
+@pytest.mark.asyncio
+async def test_bulk_keys_are_only_sent_once_committed(
+    async_client, db, admin_headers, monkeypatch
+):
+    tenant = await crud.create_tenant(db, name="held")
+    insert_chunked = crud.insert_chunked
+
+    async def fails_after_first_chunk(*args, **kw):
+        async for chunk in insert_chunked(*args, **kw):
+            yield chunk
+            raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(crud, "insert_chunked", fails_after_first_chunk)
+    monkeypatch.setattr(settings, "BULK_CHUNK_SIZE", 2)
+    r = await async_client.post(
+        "/v1/admin/bulk/keys",
+        json=[{"tenant_id": str(tenant.id), "name": f"k{i}"} for i in range(4)],
+        headers=admin_headers,
+    )
+    assert _lines(r) == [
+        {"done": True, "committed": False, "count": 0, "error": "RuntimeError"}
+    ]
+
+
+def test_bulk_error_names_constraint_without_the_statement():
+    from sqlalchemy.exc import IntegrityError
+
+    class UniqueViolation(Exception):
+        constraint_name = "uq_api_keys_key_hash"
+
+    class Diag:
+        constraint_name = "fk_plans_tenant_id"
+
+    class PsycopgError(Exception):
+        diag = Diag()
+
+    wrapped = Exception("unique violation")
+    wrapped.__cause__ = UniqueViolation()
+    for orig, name in (
+        (wrapped, "uq_api_keys_key_hash"),
+        (PsycopgError(), "fk_plans_tenant_id"),
+    ):
+        e = IntegrityError("INSERT INTO ...", {"key_hash": "secret"}, orig)
+        assert _bulk_error(e) == {"error": "IntegrityError", "constraint": name}
@@ -0,0 +1,126 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import event, update
+
+from app.core.cache import api_key_cache, plan_cache
+from app.core.security import verify_api_key_and_plan
+from app.db import crud
+from app.db.models import Plan, PlanAlgorithm, ResourcePolicy, SubjectType
+from app.rl.engine import DecisionEngine
+from app.rl.policy_index import policy_index
+
+
+@pytest.mark.asyncio
+async def test_cold_auth_and_plan_is_one_round_trip(db, fake_redis):
+    from app.core.config import settings as s
+
+    tenant = await crud.create_tenant(db, name="oneq")
+    plan = await crud.create_plan(
+        db,
+        tenant_id=tenant.id,
+        name="p",
+        algorithm=PlanAlgorithm.fixed_window,
+        limit_per_window=5,
+        window_seconds=60,
+    )
+    await crud.create_resource_policy(
+        db,
+        tenant_id=tenant.id,
+        resource="GET:/one",
+        subject_type=SubjectType.api_key,
+        plan_id=plan.id,
+    )
+    _, key_hash = await crud.create_api_key(db, tenant_id=tenant.id, name="k")
+
+    statements = []
+    sync_engine = db.bind.sync_engine
+
+    def _count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(sync_engine, "before_cursor_execute", _count)
+    try:
+        key, got = await verify_api_key_and_plan(
+            db, fake_redis, key_hash, "GET:/one", SubjectType.api_key
+        )
+        assert len(statements) == 1
+        assert str(got.id) == str(plan.id)
+
+        eng = DecisionEngine(redis=fake_redis, settings=s, crud_module=crud)
+        resolved = await eng.resolve_plan(
+            db=db,
+            tenant_id=key.tenant_id,
+            resource="GET:/one",
+            subject_type=SubjectType.api_key,
+        )
+        assert str(resolved.id) == str(plan.id)
+        assert len(statements) == 1
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", _count)
+
+
+@pytest.mark.asyncio
+async def test_single_query_rejects_unknown_key(db, fake_redis):
+    with pytest.raises(Exception):
+        await verify_api_key_and_plan(
+            db, fake_redis, "nope", "GET:/one", SubjectType.api_key
+        )
+
+
+@pytest.mark.asyncio
+async def test_single_query_follows_the_newest_policy(db, fake_redis):
+    from app.core.config import settings as s
+
+    tenant = await crud.create_tenant(db, name="newest")
+
+    def at(year):
+        return datetime(year, 1, 1, tzinfo=timezone.utc)
+
+    async def attach(plan_year, policy_year):
+        plan = await crud.create_plan(
+            db,
+            tenant_id=tenant.id,
+            name=f"p{plan_year}",
+            algorithm=PlanAlgorithm.fixed_window,
+            limit_per_window=plan_year,
+            window_seconds=60,
+        )
+        rp = await crud.create_resource_policy(
+            db,
+            tenant_id=tenant.id,
+            resource="GET:/n",
+            subject_type=SubjectType.api_key,
+            plan_id=plan.id,
+        )
+        await db.execute(
+            update(Plan).where(Plan.id == plan.id).values(created_at=at(plan_year))
+        )
+        await db.execute(
+            update(ResourcePolicy)
+            .where(ResourcePolicy.id == rp.id)
+            .values(created_at=at(policy_year))
+        )
+        await db.commit()
+        return str(plan.id)
+
+    # An older plan attached by the newer policy
+    older = await attach(2020, 2025)
+    await attach(2024, 2021)
+    _, key_hash = await crud.create_api_key(db, tenant_id=tenant.id, name="k")
+    policy_index.invalidate(str(tenant.id))
+    api_key_cache.clear()
+    plan_cache.clear()
+
+    key, got = await verify_api_key_and_plan(
+        db, fake_redis, key_hash, "GET:/n", SubjectType.api_key
+    )
+    assert str(got.id) == older
+
+    # Once the cached plan expires the trie picks the same one
+    plan_cache.clear()
+    eng = DecisionEngine(redis=fake_redis, settings=s, crud_module=crud)
+    resolved = await eng.resolve_plan(
+        db=db, tenant_id=key.tenant_id, resource="GET:/n", subject_type="api_key"
+    )
+    assert str(resolved.id) == older
@@ -0,0 +1,118 @@
+import uuid
+
+import pytest
+
+from app.core.capture import (
+    TrafficCapture,
+    capture_files,
+    parse_tenants,
+    read_captures,
+)
+from app.db.models import Plan, PlanAlgorithm
+from app.rl.engine import DecisionEngine
+from app.rl.memory_backend import MemoryBackend
+from app.rl.trace import MAGIC, RECORD, resource_names
+
+TENANT = str(uuid.uuid4())
+OTHER = str(uuid.uuid4())
+T0 = 1_760_000_000_000
+
+
+def test_sampling_and_tenant_filters():
+    capture = TrafficCapture("", 0.0, max_queue=3)
+    for i in range(10):
+        capture.record(TENANT, "GET:/a", "u1", 1, True, T0 + i)
+    assert len(capture) == 0
+
+    capture = TrafficCapture("", 0.0, tenants=parse_tenants(f"{TENANT}=1, {OTHER}"))
+    capture.record(TENANT, "GET:/a", "u1", 1, True, T0)
+    capture.record(OTHER, "GET:/a", "u1", 1, True, T0)
+    capture.record(str(uuid.uuid4()), "GET:/a", "u1", 1, True, T0)
+    assert len(capture) == 1
+
+    capture = TrafficCapture("", 1.0, max_queue=3)
+    for i in range(5):
+        capture.record(TENANT, "GET:/a", "u1", 1, True, T0 + i)
+    capture.record("not-a-uuid", "GET:/a", "u1", 1, True, T0)
+    assert len(capture) == 3
+
+    # Costs a u32 cannot hold are dropped, not raised into the check path
+    capture = TrafficCapture("", 1.0)
+    for cost in (-1, 2**32):
+        capture.record(TENANT, "GET:/a", "u1", cost, True, T0)
+    assert len(capture) == 0
+    assert parse_tenants(" a, b=0.25,") == {"a": None, "b": 0.25}
+
+
+@pytest.mark.asyncio
+async def test_files_rotate_and_decode(tmp_path):
+    per_file = 4
+    capture = TrafficCapture(
+        str(tmp_path),
+        1.0,
+        max_file_bytes=len(MAGIC) + per_file * RECORD.size,
+        max_files=2,
+    )
+    written = 0
+    for i in range(12):
+        capture.record(TENANT, "GET:/a", f"u{i % 3}", 2, i % 2 == 0, T0 + i)
+        if i % 2:
+            written += await capture.flush()
+    assert written == 12
+    # 3 files of 4 records; the oldest was deleted
+    files = capture_files(tmp_path)
+    assert len(files) == 2
+    assert all(f.stat().st_size == len(MAGIC) + 4 * RECORD.size for f in files)
+
+    records = list(read_captures([tmp_path], resource_names(["GET:/a"])))
+    assert [r.ts_ms for r in records] == [T0 + i for i in range(4, 12)]
+    assert [r.allowed for r in records] == [i % 2 == 0 for i in range(4, 12)]
+    assert {(r.tenant, r.resource, r.cost) for r in records} == {(TENANT, "GET:/a", 2)}
+    assert len({r.subject for r in records}) == 3
+
+    (tmp_path / "junk.lft").write_bytes(b"nope")
+    with pytest.raises(ValueError):
+        list(read_captures([tmp_path / "junk.lft"]))
+
+
+@pytest.mark.asyncio
+async def test_engine_captures_checks_in_background(tmp_path):
+    capture = TrafficCapture(str(tmp_path), 1.0, interval_sec=60)
+    engine = DecisionEngine(
+        None, _Settings(), None, backend=MemoryBackend(shards=1), capture=capture
+    )
+    plan = Plan(algorithm=PlanAlgorithm.fixed_window, limit_per_window=1)
+    await capture.start()
+    for _ in range(3):
+        await engine.check(
+            tenant_id=TENANT, subject="u1", resource="GET:/a", cost=1, plan=plan
+        )
+    # Nothing is written on the check path
+    assert len(capture) == 3 and not capture_files(tmp_path)
+    await capture.stop()
+    records = list(read_captures([tmp_path]))
+    assert [r.allowed for r in records] == [True, False, False]
+
+
+@pytest.mark.asyncio
+async def test_failing_bookkeeping_does_not_fail_the_check():
+    class Broken(TrafficCapture):
+        def record(self, *args):
+            raise RuntimeError("boom")
+
+    engine = DecisionEngine(
+        None,
+        _Settings(),
+        None,
+        backend=MemoryBackend(shards=1),
+        capture=Broken("", 1.0),
+    )
+    plan = Plan(algorithm=PlanAlgorithm.fixed_window, limit_per_window=1)
+    decision = await engine.check(
+        tenant_id=TENANT, subject="u1", resource="GET:/a", cost=1, plan=plan
+    )
+    assert decision.allowed
+
+
+class _Settings:
+    KEY_ENCODING = "plain"
@@ -0,0 +1,140 @@
+import asyncio
+import json
+
+import pytest
+
+from app.api.ws import parse_frame, pick_subprotocol
+from app.core.config import settings
+from app.db.models import PlanAlgorithm
+from app.main import app
+from app.rl.engine import DecisionEngine
+
+msgpack = pytest.importorskip("msgpack")
+
+
+class _WS:
+    """Minimal in-process ASGI WebSocket client."""
+
+    def __init__(self, headers: dict, subprotocols: list[str]):
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.outbox: asyncio.Queue = asyncio.Queue()
+        self.scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "http_version": "1.1",
+            "path": "/v1/check/ws",
+            "raw_path": b"/v1/check/ws",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+            "client": ("test", 1234),
+            "server": ("test", 80),
+            "subprotocols": subprotocols,
+        }
+
+    async def connect(self) -> dict:
+        await self.inbox.put({"type": "websocket.connect"})
+        self.task = asyncio.create_task(
+            app(self.scope, self.inbox.get, self.outbox.put)
+        )
+        return await asyncio.wait_for(self.outbox.get(), 5)
+
+    async def send(self, data) -> None:
+        if isinstance(data, bytes):
+            await self.inbox.put({"type": "websocket.receive", "bytes": data})
+        else:
+            await self.inbox.put({"type": "websocket.receive", "text": data})
+
+    async def recv(self) -> dict:
+        return await asyncio.wait_for(self.outbox.get(), 5)
+
+    async def close(self) -> None:
+        await self.inbox.put({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.wait_for(self.task, 5)
+
+
+def _fixed(limit):
+    return {
+        "GET:/ws": dict(
+            algorithm=PlanAlgorithm.fixed_window,
+            limit_per_window=limit,
+            window_seconds=3600,
+        )
+    }
+
+
+def test_parse_frame_and_subprotocol():
+    assert parse_frame([1, "GET:/a", "u"]) == (1, "GET:/a", "u", 1, None)
+    assert parse_frame([2, "GET:/a", "u", 3])[3] == 3
+    for bad in ({"id": 1}, [1, "r"], ["x", "r", "s"], [1, "r", "s", 0]):
+        with pytest.raises(ValueError):
+            parse_frame(bad)
+    assert pick_subprotocol(["limitforge.json", "limitforge.msgpack"]) == (
+        "limitforge.msgpack"
+    )
+    assert pick_subprotocol(["other"]) is None
+
+
+@pytest.mark.asyncio
+async def test_ws_multiplexes_checks_over_msgpack(async_client, seed):
+    raw_key = (await seed(_fixed(3))).key
+    ws = _WS({"X-API-Key": raw_key}, ["limitforge.msgpack"])
+    accepted = await ws.connect()
+    assert accepted == {
+        "type": "websocket.accept",
+        "subprotocol": "limitforge.msgpack",
+        "headers": [],
+    }
+    for rid in range(10, 15):
+        await ws.send(msgpack.packb([rid, "GET:/ws", "u1", 1]))
+    await ws.send(msgpack.packb([99, "GET:/missing", "u1"]))
+    await ws.send(msgpack.packb(["nope"]))
+
+    frames = [msgpack.unpackb((await ws.recv())["bytes"]) for _ in range(7)]
+    await ws.close()
+    by_id = {f[0]: f for f in frames}
+    decisions = [by_id[rid] for rid in range(10, 15)]
+    assert sorted(f[1] for f in decisions) == [200, 200, 200, 429, 429]
+    assert all(f[4] == 3 for f in decisions)
+    assert by_id[99] == [99, 404, "plan_not_found"]
+    assert by_id[None] == [None, 400, "bad_frame"]
+
+
+@pytest.mark.asyncio
+async def test_ws_json_frames_and_flow_control(async_client, seed, monkeypatch):
+    monkeypatch.setattr(settings, "WS_MAX_IN_FLIGHT", 2)
+    running, peak = 0, 0
+    real_check = DecisionEngine.check
+
+    async def slow_check(self, **kw):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        try:
+            await asyncio.sleep(0.005)
+            return await real_check(self, **kw)
+        finally:
+            running -= 1
+
+    monkeypatch.setattr(DecisionEngine, "check", slow_check)
+    raw_key = (await seed(_fixed(100))).key
+    ws = _WS({"X-API-Key": raw_key}, [])
+    assert (await ws.connect())["subprotocol"] is None
+    for rid in range(20):
+        await ws.send(json.dumps([rid, "GET:/ws", "u2"]))
+    frames = [json.loads((await ws.recv())["text"]) for _ in range(20)]
+    await ws.close()
+    assert sorted(f[0] for f in frames) == list(range(20))
+    assert all(f[1] == 200 for f in frames)
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_ws_rejects_bad_keys(async_client, db):
+    ws = _WS({"X-API-Key": "not-a-key"}, ["limitforge.json"])
+    msg = await ws.connect()
+    assert msg["type"] == "websocket.close" and msg["code"] == 1008
+    ws = _WS({}, [])
+    msg = await ws.connect()
+    assert msg["type"] == "websocket.close" and msg["code"] == 1008
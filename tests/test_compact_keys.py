@@ -0,0 +1,139 @@
+import types
+import uuid
+
+import pytest
+
+from app.core.config import settings
+from app.db import crud
+from app.rl.engine import DecisionEngine
+from app.rl.inspect import scan_tenant_state
+from app.rl.key_migration import migrate_to_compact
+from app.rl.keys import (
+    compact_tenant,
+    rl_key_compact,
+    rl_key_fixed_window,
+    rl_key_token_bucket,
+    unb62,
+)
+from app.rl.reset import key_matches
+from app.rl.strategies import fixed_window, token_bucket, token_bucket_packed
+
+
+def _plan(algorithm, **kw):
+    return types.SimpleNamespace(
+        algorithm=algorithm,
+        bucket_capacity=kw.get("bucket_capacity"),
+        refill_rate_per_sec=kw.get("refill_rate_per_sec"),
+        limit_per_window=kw.get("limit_per_window"),
+        window_seconds=kw.get("window_seconds"),
+        concurrency_limit=kw.get("concurrency_limit"),
+    )
+
+
+def test_compact_key_layout():
+    tid = str(uuid.uuid4())
+    plain = rl_key_token_bucket(tid, "user:1", "GET:/v1/orders/{id}/items")
+    compact = rl_key_compact("token_bucket", tid, "user:1", "GET:/v1/orders/{id}/items")
+    assert compact.startswith("lf:t:") and len(compact) < len(plain) - 20
+    assert unb62(compact_tenant(tid)) == uuid.UUID(tid).int
+    fw = rl_key_compact("fixed_window", tid, "u", "GET:/a", 1700000040)
+    assert unb62(fw.rsplit(":", 1)[1]) == 1700000040
+
+
+@pytest.mark.asyncio
+async def test_packed_bucket_matches_plain_bucket(fake_redis):
+    now = 1_700_000_000_000
+    for step, cost in enumerate([3, 3, 3, 3, 1, 5, 2]):
+        t = now + step * 700
+        a = await token_bucket.check(
+            fake_redis,
+            "plain",
+            capacity=10,
+            refill_rate_per_sec=2.0,
+            cost=cost,
+            now_ms=t,
+        )
+        b = await token_bucket_packed.check(
+            fake_redis,
+            "packed",
+            capacity=10,
+            refill_rate_per_sec=2.0,
+            cost=cost,
+            now_ms=t,
+        )
+        assert (a.allowed, a.remaining) == (b.allowed, b.remaining)
+    assert isinstance(await fake_redis.get("packed"), str)
+
+
+@pytest.mark.asyncio
+async def test_packed_bucket_lua_script(fake_redis):
+    pytest.importorskip("lupa")
+    script = token_bucket_packed._get_script_text()
+    now = 1_700_000_000_000
+    res = await fake_redis.eval(script, 1, "k", 5, 1.5, now, 4)
+    assert res == [1, 1, 5, 0]
+    res = await fake_redis.eval(script, 1, "k", 5, 1.5, now + 1000, 4)
+    assert res[:3] == [0, 2, 5] and res[3] == 1000
+    assert await fake_redis.get("k") == f"2500000:{now + 1000}"
+
+
+@pytest.mark.asyncio
+async def test_compact_engine_inspect_and_reset(fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "KEY_ENCODING", "compact")
+    eng = DecisionEngine(redis=fake_redis, settings=settings, crud_module=crud)
+    tid = str(uuid.uuid4())
+    plan = _plan("token_bucket", bucket_capacity=3, refill_rate_per_sec=0.0)
+    for _ in range(2):
+        d = await eng.check(
+            tenant_id=tid, subject="user:1", resource="GET:/a", cost=1, plan=plan
+        )
+    assert d.allowed and d.remaining == 1
+    fw = _plan("fixed_window", limit_per_window=5, window_seconds=60)
+    await eng.check(tenant_id=tid, subject="user:1", resource="GET:/b", cost=2, plan=fw)
+
+    items = [i async for i in scan_tenant_state(fake_redis, tid)][:-1]
+    states = {i["algorithm"]: i for i in items}
+    assert states["token_bucket"]["state"]["tokens"] == 1.0
+    assert states["token_bucket"]["subject"] == "user:1"
+    assert states["fixed_window"]["state"] == {"count": 2}
+
+    tb_key = states["token_bucket"]["key"]
+    assert key_matches(tb_key, tid, "GET:/a", "user:1")
+    assert not key_matches(tb_key, tid, "GET:/b", None)
+    assert key_matches(states["fixed_window"]["key"], tid, "GET:/b", None)
+
+
+@pytest.mark.asyncio
+async def test_migration_preserves_live_state(fake_redis, monkeypatch):
+    tid = str(uuid.uuid4())
+    now = 1_700_000_000_000
+    await token_bucket.check(
+        fake_redis,
+        rl_key_token_bucket(tid, "user:1", "GET:/a"),
+        capacity=10,
+        refill_rate_per_sec=0.0,
+        cost=7,
+        now_ms=now,
+    )
+    fw_key = rl_key_fixed_window(tid, "user:1", "GET:/b", 1_700_000_040)
+    await fixed_window.check(fake_redis, fw_key, limit=5, window_sec=60, cost=4)
+    await fake_redis.hset(f"lf:tb:{tid}:opaque", mapping={"tokens": 1, "ts": now})
+
+    report = await migrate_to_compact(fake_redis, delete_old=True)
+    assert (report.scanned, report.migrated, report.skipped) == (3, 2, 1)
+    assert not await fake_redis.exists(fw_key)
+
+    new_fw = rl_key_compact("fixed_window", tid, "user:1", "GET:/b", 1_700_000_040)
+    assert await fake_redis.get(new_fw) == "4"
+    assert await fake_redis.ttl(new_fw) > 0
+
+    monkeypatch.setattr(settings, "KEY_ENCODING", "compact")
+    eng = DecisionEngine(redis=fake_redis, settings=settings, crud_module=crud)
+    d = await eng.check(
+        tenant_id=tid,
+        subject="user:1",
+        resource="GET:/a",
+        cost=3,
+        plan=_plan("token_bucket", bucket_capacity=10, refill_rate_per_sec=0.0),
+    )
+    assert d.allowed and d.remaining == 0
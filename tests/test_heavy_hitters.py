@@ -0,0 +1,173 @@
+import random
+
+import pytest
+
+from app.core.heavy_hitters import HeavyHitters, SpaceSaving
+
+
+def test_space_saving_keeps_heavy_items_in_fixed_memory():
+    rnd = random.Random(7)
+    ss = SpaceSaving(16)
+    truth: dict[str, int] = {}
+    for _ in range(20_000):
+        item = (
+            f"hot{rnd.randrange(3)}"
+            if rnd.random() < 0.5
+            else f"u{rnd.randrange(5000)}"
+        )
+        truth[item] = truth.get(item, 0) + 1
+        ss.add(item, blocked=item == "hot0")
+
+    assert len(ss) == 16
+    top = ss.top(3)
+    assert {s for s, *_ in top} == {"hot0", "hot1", "hot2"}
+    for subject, count, err, blocked in top:
+        assert count >= truth[subject] >= count - err
+    assert top[[s for s, *_ in top].index("hot0")][3] > 0
+
+
+def test_space_saving_evicts_the_smallest_counter():
+    # Reference: a linear scan for the smallest (count, item)
+    rnd = random.Random(11)
+    ss, ref = SpaceSaving(8), {}
+    for _ in range(5_000):
+        item, n = f"u{int(rnd.paretovariate(1.2)) % 40}", rnd.randint(1, 3)
+        ss.add(item, blocked=False, n=n)
+        if item in ref:
+            ref[item][0] += n
+        elif len(ref) < 8:
+            ref[item] = [n, 0]
+        else:
+            victim = min(ref, key=lambda k: (ref[k][0], k))
+            floor = ref.pop(victim)[0]
+            ref[item] = [floor + n, floor]
+        assert {k: c[:2] for k, c in ss.counters.items()} == ref
+    assert len(ss._heap) == 8
+
+
+@pytest.mark.asyncio
+async def test_nodes_merge_through_redis(fake_redis):
+    a = HeavyHitters(capacity=8, max_sketches=10, sync_sec=60, window_sec=300)
+    b = HeavyHitters(capacity=8, max_sketches=10, sync_sec=60, window_sec=300)
+    for _ in range(30):
+        a.record("t", "GET:/x", "alice", allowed=True)
+    for i in range(20):
+        b.record("t", "GET:/x", "alice", allowed=i % 2 == 0)
+        b.record("t", "GET:/y", "bob", allowed=False)
+    a.record("t2", "GET:/x", "other", allowed=True)
+
+    assert await a.sync(fake_redis) == 2
+    assert await b.sync(fake_redis) == 2
+
+    top = await a.top(fake_redis, "t", 5)
+    assert top[0] == {
+        "subject": "alice",
+        "requests": 50,
+        "blocked": 10,
+        "block_ratio": 0.2,
+    }
+    assert top[1]["subject"] == "bob" and top[1]["block_ratio"] == 1.0
+    only_y = await a.top(fake_redis, "t", 5, resource="GET:/y")
+    assert [s["subject"] for s in only_y] == ["bob"]
+
+
+@pytest.mark.asyncio
+async def test_failed_sync_keeps_the_deltas(fake_redis):
+    hh = HeavyHitters(capacity=8, max_sketches=2, sync_sec=60, window_sec=300)
+
+    class Down:
+        def pipeline(self, transaction=True):
+            pipe = fake_redis.pipeline(transaction=transaction)
+
+            async def execute():
+                # Checks keep recording while the write is in flight
+                hh.record("t", "GET:/x", "alice", allowed=False)
+                hh.record("t", "GET:/z", "carol", allowed=True)
+                raise ConnectionError("redis down")
+
+            pipe.execute = execute
+            return pipe
+
+    for i in range(4):
+        hh.record("t", "GET:/x", "alice", allowed=i % 2 == 0)
+    hh.record("t", "GET:/y", "bob", allowed=True)
+    assert await hh.sync(Down()) == 0
+    # The failed deltas are added back; the oldest sketch past the cap goes
+    assert set(hh.local("t")) == {"GET:/x", "GET:/z"}
+    assert hh.local("t")["GET:/x"].counters["alice"][::2] == [5, 3]
+
+    assert await hh.sync(fake_redis) == 2
+    top = await hh.top(fake_redis, "t", 5, resource="GET:/x")
+    assert top[0]["requests"] == 5 and top[0]["blocked"] == 3
+
+
+@pytest.mark.asyncio
+async def test_stop_syncs_what_is_left(fake_redis):
+    off = HeavyHitters(
+        capacity=8, max_sketches=2, sync_sec=60, window_sec=300, enabled=False
+    )
+    off.record("t", "GET:/x", "alice", allowed=True)
+    await off.start(fake_redis)
+    assert off.local("t") == {} and off._task is None
+
+    hh = HeavyHitters(capacity=8, max_sketches=2, sync_sec=60, window_sec=300)
+    await hh.start(fake_redis)
+    hh.record("t", "GET:/x", "alice", allowed=True)
+    await hh.stop()
+    await hh.stop()
+    assert hh.local("t") == {}
+    assert [s["subject"] for s in await hh.top(fake_redis, "t", 5)] == ["alice"]
+
+
+@pytest.mark.asyncio
+async def test_top_subjects_endpoint(async_client, admin_headers):
+    tid = (
+        await async_client.post(
+            "/v1/admin/tenants", json={"name": "hh"}, headers=admin_headers
+        )
+    ).json()["id"]
+    plan_id = (
+        await async_client.post(
+            "/v1/admin/plans",
+            json={
+                "tenant_id": tid,
+                "name": "tight",
+                "algorithm": "fixed_window",
+                "limit_per_window": 2,
+                "window_seconds": 60,
+            },
+            headers=admin_headers,
+        )
+    ).json()["id"]
+    await async_client.post(
+        "/v1/admin/policies",
+        json={
+            "tenant_id": tid,
+            "resource": "GET:/hh",
+            "subject_type": "api_key",
+            "plan_id": plan_id,
+        },
+        headers=admin_headers,
+    )
+    key = (
+        await async_client.post(
+            "/v1/admin/keys",
+            json={"tenant_id": tid, "name": "k"},
+            headers=admin_headers,
+        )
+    ).json()["key"]
+
+    for subject in ["noisy"] * 4 + ["quiet"]:
+        await async_client.post(
+            "/v1/check",
+            json={"resource": "GET:/hh", "subject": subject, "cost": 1},
+            headers={"X-API-Key": key},
+        )
+
+    r = await async_client.get(
+        f"/v1/admin/tenants/{tid}/top-subjects", params={"k": 1}, headers=admin_headers
+    )
+    assert r.status_code == 200
+    assert r.json()["subjects"] == [
+        {"subject": "noisy", "requests": 4, "blocked": 2, "block_ratio": 0.5}
+    ]
@@ -0,0 +1,126 @@
+import types
+import uuid
+
+import pytest
+
+from app.core.config import settings
+from app.db import crud
+from app.rl.engine import DecisionEngine
+from app.rl.hot_keys import HotKeys, shard_key, split_limit, split_shard
+from app.rl.inspect import parse_key
+from app.rl.keys import rl_key_fixed_window, rl_key_token_bucket
+from app.rl.reset import key_matches
+
+
+def _plan(algorithm, **kw):
+    return types.SimpleNamespace(
+        algorithm=algorithm,
+        bucket_capacity=kw.get("bucket_capacity"),
+        refill_rate_per_sec=kw.get("refill_rate_per_sec"),
+        limit_per_window=kw.get("limit_per_window"),
+        window_seconds=kw.get("window_seconds"),
+        concurrency_limit=kw.get("concurrency_limit"),
+    )
+
+
+def test_split_limit_sums_to_total_and_rotates():
+    for total in (1, 7, 20, 101):
+        assert sum(split_limit(total, 4, i) for i in range(4)) == total
+    assert [split_limit(7, 4, i) for i in range(4)] == [2, 2, 2, 1]
+    assert [split_limit(7, 4, i, rotate=1) for i in range(4)] == [1, 2, 2, 2]
+
+
+def test_route_detects_hot_keys_and_cools_down():
+    hk = HotKeys(threshold_per_sec=3, shards=4, hold_sec=10, max_tracked=100)
+    ident = ("t", "anon", "GET:/a", "token_bucket")
+    assert [hk.route(ident, now=0.1 * i) for i in range(3)] == [(1, 0)] * 3
+    n, first = hk.route(ident, now=0.4)
+    assert n == 4 and hk.is_hot(ident, now=0.4)
+    shards = [hk.route(ident, now=0.5)[1] for _ in range(4)]
+    assert sorted(shards) == [0, 1, 2, 3] and shards[-1] == first
+    # Quiet for longer than the hold: back to the plain key
+    assert hk.route(ident, now=20.0) == (1, 0)
+
+
+def test_route_pins_layout_per_epoch():
+    hk = HotKeys(threshold_per_sec=1, shards=2, hold_sec=10, max_tracked=100)
+    ident = ("t", "anon", "GET:/a", "fixed_window")
+    assert hk.route(ident, now=0.0, epoch=5) == (1, 0)
+    # Turns hot mid-window, but the window keeps its single key
+    assert hk.route(ident, now=0.1, epoch=5) == (1, 0)
+    assert hk.route(ident, now=0.2, epoch=6)[0] == 2
+
+
+def test_tracker_is_bounded():
+    hk = HotKeys(threshold_per_sec=1, shards=2, hold_sec=10, max_tracked=3)
+    for i in range(10):
+        hk.route(("t", str(i), "r", "token_bucket"), now=0.0)
+    assert len(hk) == 3
+
+
+def test_shard_keys_parse_and_match():
+    tid = str(uuid.uuid4())
+    key = shard_key(rl_key_fixed_window(tid, "anon", "GET:/a", 1700000040), 3)
+    assert split_shard(key)[1] == 3
+    item = parse_key(key)
+    assert item["shard"] == 3 and item["window_start"] == 1700000040
+    assert item["subject"] == "anon" and item["resource"] == "GET:/a"
+    assert key_matches(key, tid, "GET:/a", "anon")
+    assert "shard" not in parse_key(rl_key_token_bucket(tid, "anon", "GET:/a"))
+
+
+def _hot_engine(redis, tid, subject, resource, alg):
+    hk = HotKeys(threshold_per_sec=2, shards=4, hold_sec=60, max_tracked=100)
+    ident = (tid, subject, resource, alg)
+    for _ in range(3):
+        hk.route(ident, epoch=-1)
+    return DecisionEngine(redis, settings, crud, hot_keys=hk)
+
+
+@pytest.mark.asyncio
+async def test_hot_fixed_window_admits_exactly_the_limit(fake_redis):
+    tid = str(uuid.uuid4())
+    eng = _hot_engine(fake_redis, tid, "anon", "GET:/a", "fixed_window")
+    plan = _plan("fixed_window", limit_per_window=20, window_seconds=3600)
+    decisions = [
+        await eng.check(
+            tenant_id=tid, subject="anon", resource="GET:/a", cost=1, plan=plan
+        )
+        for _ in range(30)
+    ]
+    assert sum(d.allowed for d in decisions) == 20
+    assert all(d.limit == 20 for d in decisions)
+    assert decisions[0].headers["X-RateLimit-Limit"] == "20"
+    keys = await fake_redis.keys(f"lf:fw:{tid}:*")
+    assert len(keys) == 4 and all(split_shard(k)[1] is not None for k in keys)
+
+
+@pytest.mark.asyncio
+async def test_hot_token_bucket_splits_capacity(fake_redis):
+    tid = str(uuid.uuid4())
+    eng = _hot_engine(fake_redis, tid, "anon", "GET:/a", "token_bucket")
+    plan = _plan("token_bucket", bucket_capacity=10, refill_rate_per_sec=0.0)
+    allowed = 0
+    for _ in range(16):
+        d = await eng.check(
+            tenant_id=tid, subject="anon", resource="GET:/a", cost=1, plan=plan
+        )
+        allowed += d.allowed
+        assert d.limit == 10 and d.remaining <= 10
+    assert allowed == 10
+    assert len(await fake_redis.keys(f"lf:tb:{tid}:*")) == 4
+
+
+@pytest.mark.asyncio
+async def test_cold_keys_are_not_sharded(fake_redis):
+    tid = str(uuid.uuid4())
+    hk = HotKeys(threshold_per_sec=1000, shards=4, hold_sec=60, max_tracked=100)
+    eng = DecisionEngine(fake_redis, settings, crud, hot_keys=hk)
+    plan = _plan("token_bucket", bucket_capacity=5, refill_rate_per_sec=1.0)
+    for _ in range(3):
+        await eng.check(
+            tenant_id=tid, subject="u", resource="GET:/a", cost=1, plan=plan
+        )
+    assert await fake_redis.keys(f"lf:tb:{tid}:*") == [
+        rl_key_token_bucket(tid, "u", "GET:/a")
+    ]
@@ -0,0 +1,71 @@
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import event
+
+from app.core.deps import get_sessionmaker
+from app.db.models import PlanAlgorithm
+from app.db.session import LazySession
+from app.main import app
+
+
+def _sessions(stat):
+    return (
+        REGISTRY.get_sample_value(
+            f"db_sessions_per_check_{stat}", {"route": "/v1/check"}
+        )
+        or 0.0
+    )
+
+
+@pytest.mark.asyncio
+async def test_warm_checks_open_no_db_connection(async_client, seed):
+    seeded = await seed(
+        {
+            "GET:/lazy": dict(
+                algorithm=PlanAlgorithm.fixed_window,
+                limit_per_window=100,
+                window_seconds=60,
+            )
+        }
+    )
+    raw_key = seeded.key
+    sync_engine = app.dependency_overrides[get_sessionmaker]().kw["bind"].sync_engine
+    checkouts = []
+
+    def _checkout(*args):
+        checkouts.append(1)
+
+    event.listen(sync_engine, "checkout", _checkout)
+    try:
+        body = {"resource": "GET:/lazy", "subject": "u1"}
+        headers = {"X-API-Key": raw_key}
+        # Cold: auth and plan come from one query
+        r = await async_client.post("/v1/check", json=body, headers=headers)
+        assert r.status_code == 200
+        assert len(checkouts) == 1
+
+        count, total = _sessions("count"), _sessions("sum")
+        for _ in range(5):
+            r = await async_client.post("/v1/check", json=body, headers=headers)
+            assert r.status_code == 200
+        assert len(checkouts) == 1
+        assert _sessions("count") == count + 5
+        assert _sessions("sum") == total
+    finally:
+        event.remove(sync_engine, "checkout", _checkout)
+
+
+@pytest.mark.asyncio
+async def test_lazy_session_opens_on_first_use(db):
+    made = []
+
+    def factory():
+        made.append(1)
+        return db
+
+    lazy = LazySession(factory)
+    assert not lazy.opened and made == []
+    assert lazy.bind is db.bind
+    assert lazy.opened and made == [1]
+    lazy.in_transaction()
+    assert made == [1]
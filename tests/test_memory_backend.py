@@ -0,0 +1,112 @@
+import time
+import types
+import uuid
+
+import pytest
+
+from app.core.config import settings
+from app.db import crud
+from app.rl import memory_backend as mb
+from app.rl.backend import RedisBackend, make_backend
+from app.rl.engine import DecisionEngine
+from app.rl.memory_backend import MemoryBackend, TimingWheel
+
+
+def _plan(algorithm, **kw):
+    return types.SimpleNamespace(
+        algorithm=algorithm,
+        bucket_capacity=kw.get("bucket_capacity"),
+        refill_rate_per_sec=kw.get("refill_rate_per_sec"),
+        limit_per_window=kw.get("limit_per_window"),
+        window_seconds=kw.get("window_seconds"),
+        concurrency_limit=kw.get("concurrency_limit"),
+    )
+
+
+T0 = 1_700_000_000_000
+# (now_ms offset, cost): bursts, a refill/roll-over gap and an oversized cost
+STEPS = [(0, 1), (1, 2), (2, 1), (3, 1), (900, 1), (1500, 3), (2100, 1), (61_000, 9)]
+ALGORITHMS = [
+    ("token_bucket", dict(capacity=4, refill_rate_per_sec=2.0)),
+    ("fixed_window", dict(limit=4, window_sec=60)),
+    ("sliding_window", dict(limit=4, window_sec=2)),
+]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("alg,params", ALGORITHMS, ids=lambda a: str(a))
+async def test_memory_decisions_match_redis(fake_redis, alg, params):
+    redis_backend = RedisBackend(fake_redis, packed=True)
+    memory = MemoryBackend(shards=4)
+    for offset, cost in STEPS:
+        now_ms = T0 + offset
+        # fixed_window keys carry the window start, as the engine builds them
+        key = f"k:{now_ms // 60_000}" if alg == "fixed_window" else "k"
+        want = await getattr(redis_backend, alg)(
+            key, **params, cost=cost, now_ms=now_ms
+        )
+        got = await getattr(memory, alg)(key, **params, cost=cost, now_ms=now_ms)
+        assert got == want, (offset, cost)
+
+
+@pytest.mark.asyncio
+async def test_concurrency_slots_and_ttl():
+    memory = MemoryBackend(shards=1)
+    args = dict(limit=2, ttl_sec=10, cost=1)
+    assert (await memory.concurrency("c", **args, now_ms=T0)).remaining == 1
+    assert (await memory.concurrency("c", **args, now_ms=T0 + 1000)).allowed
+    denied = await memory.concurrency("c", **args, now_ms=T0 + 4000)
+    assert not denied.allowed and denied.retry_after_ms == 6000
+    # Slots come back when the key's TTL runs out
+    assert (await memory.concurrency("c", **args, now_ms=T0 + 10_000)).remaining == 1
+
+
+def test_timing_wheel_hands_back_due_buckets():
+    wheel = TimingWheel(slots=4, tick_ms=100)
+    assert wheel.advance(1000) == []
+    wheel.schedule("a", 1150)
+    wheel.schedule("b", 1350)
+    # Lands a turn early; the backend re-checks and reschedules it
+    wheel.schedule("far", 1000 + 4 * 100 + 250)
+    assert wheel.advance(1199) == []
+    assert wheel.advance(1200) == ["a"]
+    assert sorted(wheel.advance(1400)) == ["b", "far"]
+    assert wheel.advance(5000) == []
+
+
+@pytest.mark.asyncio
+async def test_expired_keys_are_swept():
+    memory = MemoryBackend(shards=1, wheel_slots=8, tick_ms=100)
+    for i in range(50):
+        await memory.fixed_window(f"fw:{i}", limit=1, window_sec=1, cost=1, now_ms=T0)
+    await memory.sliding_window("sw", limit=1, window_sec=30, cost=1, now_ms=T0)
+    assert len(memory) == 51
+    # Any operation on the shard advances its wheel
+    await memory.fixed_window("fw:new", limit=1, window_sec=1, cost=1, now_ms=T0 + 1100)
+    assert len(memory) == 2
+    # Deadlines beyond one wheel turn survive it
+    await memory.fixed_window("x", limit=1, window_sec=1, cost=1, now_ms=T0 + 9000)
+    assert len(memory) == 2
+
+
+@pytest.mark.asyncio
+async def test_engine_dispatches_through_memory_backend(fake_redis):
+    memory = MemoryBackend(shards=4)
+    eng = DecisionEngine(fake_redis, settings, crud, backend=memory)
+    tid = str(uuid.uuid4())
+    args = dict(tenant_id=tid, subject="u", resource="GET:/mem")
+    plan = _plan("fixed_window", limit_per_window=3, window_seconds=3600)
+    allowed = [(await eng.check(**args, cost=1, plan=plan)).allowed for _ in range(4)]
+    assert allowed == [True, True, True, False]
+    assert await fake_redis.dbsize() == 0
+
+    now_ms = int(time.time() * 1000)
+    spec = eng.quota_spec(**args, plan=plan, now_ms=now_ms)
+    (state,) = await eng.backend.peek_many([spec], now_ms)
+    assert state["remaining"] == 0 and state["limit"] == 3
+
+
+def test_make_backend_follows_settings(fake_redis, monkeypatch):
+    assert isinstance(make_backend(settings, fake_redis), RedisBackend)
+    monkeypatch.setattr(settings, "LIMITER_BACKEND", "memory")
+    assert make_backend(settings, fake_redis) is mb.memory_backend
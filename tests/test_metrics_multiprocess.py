@@ -0,0 +1,35 @@
+import glob
+import os
+import subprocess
+import sys
+
+from app.observability.metrics import multiprocess_registry
+from app.observability.multiproc import cleanup_dead_workers, reset_multiproc_dir
+
+_CHILD = """
+from app.observability.metrics import RL_ALLOWED, REDIS_POOL_IN_USE
+RL_ALLOWED.inc(3)
+REDIS_POOL_IN_USE.set(2)
+"""
+
+
+def _run_worker(path):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(path))
+    subprocess.run([sys.executable, "-c", _CHILD], env=env, cwd=os.getcwd(), check=True)
+
+
+def test_multiprocess_aggregates_workers_and_drops_dead_gauges(tmp_path):
+    reset_multiproc_dir(str(tmp_path))
+    _run_worker(tmp_path)
+    _run_worker(tmp_path)
+
+    registry = multiprocess_registry(str(tmp_path))
+    assert registry.get_sample_value("rl_allowed_total") == 6
+
+    # Both workers have exited, so their live gauge files must go away
+    assert glob.glob(str(tmp_path / "gauge_livesum_*.db"))
+    dead = cleanup_dead_workers(str(tmp_path))
+    assert len(dead) == 2
+    assert not glob.glob(str(tmp_path / "gauge_livesum_*.db"))
+    # ...while counters keep the dead workers' totals
+    assert registry.get_sample_value("rl_allowed_total") == 6
@@ -0,0 +1,231 @@
+import asyncio
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.core.cache import quota_cache
+from app.core.deps import get_sessionmaker
+from app.core.period_counts import DbPeriodStore, PeriodCounts, period_counts
+from app.db.models import PlanAlgorithm
+from app.main import app
+from app.rl.backend import RedisBackend
+from app.rl.memory_backend import MemoryBackend
+from app.rl.strategies import period_quota
+from app.rl.strategies.period_quota import period_bounds
+
+
+def _ms(tz: str, *args) -> int:
+    return int(datetime(*args, tzinfo=ZoneInfo(tz)).timestamp() * 1000)
+
+
+def test_periods_follow_the_local_calendar():
+    # 23:30 UTC on Oct 18 is already Oct 19 in Athens
+    now_ms = _ms("UTC", 2026, 10, 18, 23, 30)
+    day = period_bounds("day", "Europe/Athens", now_ms)
+    assert day.label == "2026-10-19"
+    assert day.start_ms == _ms("Europe/Athens", 2026, 10, 19)
+    assert day.end_ms == _ms("Europe/Athens", 2026, 10, 20)
+    assert period_bounds("day", "UTC", now_ms).label == "2026-10-18"
+
+    month = period_bounds("month", "Europe/Athens", now_ms)
+    assert month.label == "2026-10"
+    assert month.end_ms == _ms("Europe/Athens", 2026, 11, 1)
+    dec = period_bounds("month", "UTC", _ms("UTC", 2026, 12, 31, 12))
+    assert (dec.label, dec.end_ms) == ("2026-12", _ms("UTC", 2027, 1, 1))
+
+    # Spring forward: a 23 hour day
+    dst = period_bounds(
+        "day", "America/New_York", _ms("America/New_York", 2026, 3, 8, 12)
+    )
+    assert dst.end_ms - dst.start_ms == 23 * 3_600_000
+
+
+# (cost, allowed, remaining) with limit 5
+STEPS = [(2, True, 3), (2, True, 1), (2, False, 1), (1, True, 0)]
+
+
+@pytest.mark.asyncio
+async def test_counters_match_across_implementations(fake_redis):
+    now_ms = _ms("UTC", 2026, 10, 19, 12)
+    end_ms = _ms("UTC", 2026, 10, 20)
+    expire_at_ms = end_ms + period_quota.EXPIRE_GRACE_MS
+    lua = period_quota._get_script_text("period_quota")
+    backends = [RedisBackend(fake_redis), MemoryBackend(shards=2)]
+    for cost, allowed, remaining in STEPS:
+        res = await fake_redis.eval(lua, 1, "lua", 5, cost, expire_at_ms)
+        assert res == [int(allowed), remaining, 5, 0]
+        for i, backend in enumerate(backends):
+            decision, loaded = await backend.period_quota(
+                f"k{i}", limit=5, cost=cost, end_ms=end_ms, now_ms=now_ms
+            )
+            assert (decision.allowed, decision.remaining, loaded) == (
+                allowed,
+                remaining,
+                False,
+            )
+            assert decision.reset_at == end_ms // 1000
+            assert decision.retry_after_ms == (0 if allowed else end_ms - now_ms)
+    for key in ("lua", "k0"):
+        assert await fake_redis.pexpiretime(key) == expire_at_ms
+
+    seed = period_quota._get_script_text("period_quota_seed")
+    assert await fake_redis.eval(seed, 1, "lua", 7) == 1
+    assert await fake_redis.eval(seed, 1, "lua", 7) == 0
+    assert await fake_redis.eval(seed, 1, "missing", 7) == 0
+    assert await fake_redis.hgetall("lua") == {"n": "12", "h": "1"}
+    for i, backend in enumerate(backends):
+        assert await backend.seed_period(f"k{i}", 7)
+        assert not await backend.seed_period(f"k{i}", 7)
+        assert not await backend.seed_period("missing", 7)
+        decision, loaded = await backend.period_quota(
+            f"k{i}", limit=20, cost=1, end_ms=end_ms, now_ms=now_ms
+        )
+        assert loaded and decision.remaining == 7
+
+
+class _Store:
+    def __init__(self, counts=None, fail=False):
+        self.counts = dict(counts or {})
+        self.fail = fail
+        self.ops = []
+
+    async def load(self, idents):
+        self.ops.append("load")
+        if self.fail:
+            raise RuntimeError("db down")
+        return {i: self.counts[i] for i in idents if i in self.counts}
+
+    async def write(self, batch):
+        self.ops.append("write")
+        if self.fail:
+            raise RuntimeError("db down")
+        for ident, used in batch.items():
+            self.counts[ident] = self.counts.get(ident, 0) + used
+
+
+@pytest.mark.asyncio
+async def test_reloads_land_before_new_counts_are_written():
+    ident = ("t", "GET:/a", "u1", "2026-10")
+    backend = MemoryBackend(shards=1)
+    args = dict(limit=10, cost=1, end_ms=2_000_000_000_000, now_ms=1)
+    counts = PeriodCounts(max_keys=4, interval_sec=60)
+    # Redis lost the counter: it restarts from zero and asks for a reload
+    _, loaded = await backend.period_quota("k", **args)
+    assert not loaded
+    counts.reload(ident, "k", backend)
+    counts.reload(ident, "k", backend)
+    counts.record(ident, 1)
+
+    down = _Store({ident: 6}, fail=True)
+    assert await counts.flush(down) == 0
+    assert len(counts) == 1
+
+    store = _Store({ident: 6})
+    assert await counts.flush(store) == 1
+    assert store.ops == ["load", "write"]
+    # 6 stored before the loss + the debit since, counted once each
+    assert store.counts[ident] == 7
+    decision, loaded = await backend.period_quota("k", **args)
+    assert loaded and decision.remaining == 2
+
+    for i in range(6):
+        counts.record((*ident[:2], f"s{i}", ident[3]), 1)
+    assert len(counts) == 4
+
+
+@pytest.mark.asyncio
+async def test_background_flush_wakes_early_and_drains_on_stop():
+    idents = [("t", "GET:/a", f"u{i}", "2026-10") for i in range(5)]
+    off = PeriodCounts(max_keys=4, interval_sec=60, enabled=False)
+    off.record(idents[0], 1)
+    off.reload(idents[0], "k", MemoryBackend(shards=1))
+    assert len(off) == 0 and not off._reloads
+
+    counts = PeriodCounts(max_keys=4, interval_sec=60)
+    # Reloads are bounded like the batch
+    for i, ident in enumerate(idents):
+        counts.reload(ident, f"k{i}", MemoryBackend(shards=1))
+    assert len(counts._reloads) == 4
+    counts._reloads.clear()
+
+    store = _Store({})
+    await counts.start(store)
+    # Half of max_keys pending wakes the flush before the interval is up
+    counts.record(idents[0], 1)
+    counts.record(idents[1], 2)
+    for _ in range(100):
+        if store.counts:
+            break
+        await asyncio.sleep(0.01)
+    assert store.counts == {idents[0]: 1, idents[1]: 2}
+
+    counts.record(idents[0], 3)
+    await counts.stop()
+    await counts.stop()
+    assert store.counts[idents[0]] == 4 and len(counts) == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_write_requeues_into_the_bounded_batch():
+    idents = [("t", "GET:/a", f"u{i}", "2026-10") for i in range(4)]
+    counts = PeriodCounts(max_keys=2, interval_sec=60)
+
+    class Down(_Store):
+        async def write(self, batch):
+            # Debits keep arriving while the write is in flight
+            counts.record(idents[0], 5)
+            counts.record(idents[2], 1)
+            raise RuntimeError("db down")
+
+    counts.record(idents[0], 1)
+    counts.record(idents[1], 1)
+    assert await counts.flush(Down({})) == 0
+    # idents[1] no longer fits; idents[0] adds up
+    assert counts._pending == {idents[0]: 6, idents[2]: 1}
+    assert await counts.flush() == 0
+
+
+@pytest.mark.asyncio
+async def test_daily_quota_survives_losing_redis(async_client, fake_redis, seed):
+    seeded = await seed(
+        {
+            "GET:/reports": dict(
+                algorithm=PlanAlgorithm.period_quota,
+                limit_per_window=3,
+                quota_period="day",
+            )
+        },
+        timezone="Asia/Tokyo",
+    )
+    assert seeded.plans["GET:/reports"].quota_timezone == "Asia/Tokyo"
+    tid, headers = seeded.tenant_id, seeded.headers
+    store = DbPeriodStore(app.dependency_overrides[get_sessionmaker]())
+    body = {"resource": "GET:/reports", "subject": "u1"}
+
+    async def check():
+        return await async_client.post("/v1/check", json=body, headers=headers)
+
+    assert [(await check()).status_code for _ in range(2)] == [200, 200]
+    await period_counts.flush(store)
+    quota_cache.clear()
+    r = await async_client.get("/v1/quota", params=body, headers=headers)
+    assert (r.json()["algorithm"], r.json()["remaining"]) == ("period_quota", 1)
+
+    await fake_redis.flushall()
+    r = await check()
+    assert r.status_code == 200
+    await period_counts.flush(store)
+
+    r = await check()
+    assert r.status_code == 429
+    tokyo = ZoneInfo("Asia/Tokyo")
+    midnight = datetime.now(tokyo).replace(hour=0, minute=0, second=0, microsecond=0)
+    reset_at = int(midnight.timestamp()) + 86400
+    assert r.json()["reset_at"] == reset_at
+    assert int(r.headers["X-RateLimit-Reset"]) == reset_at
+
+    # The denied check was not counted
+    await period_counts.flush(store)
+    ident = (tid, "GET:/reports", "u1", datetime.now(tokyo).date().isoformat())
+    assert await store.load([ident]) == {ident: 3}
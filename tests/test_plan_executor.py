@@ -0,0 +1,88 @@
+import types
+
+import pytest
+
+from app.core.config import settings
+from app.db import crud
+from app.rl.engine import DecisionEngine
+from app.rl.executor import (
+    ConcurrencyExecutor,
+    FixedWindowExecutor,
+    TokenBucketExecutor,
+    compile_plan,
+)
+from app.rl.memory_backend import MemoryBackend
+from app.rl.strategies import token_bucket
+
+
+def _plan(algorithm, **kw):
+    return types.SimpleNamespace(
+        algorithm=algorithm,
+        bucket_capacity=kw.get("bucket_capacity"),
+        refill_rate_per_sec=kw.get("refill_rate_per_sec"),
+        limit_per_window=kw.get("limit_per_window"),
+        window_seconds=kw.get("window_seconds"),
+        concurrency_limit=kw.get("concurrency_limit"),
+    )
+
+
+def test_plan_compiles_once_with_coerced_parameters():
+    plan = _plan("token_bucket", bucket_capacity="10", refill_rate_per_sec=2)
+    ex = compile_plan(plan, compact=False)
+    assert isinstance(ex, TokenBucketExecutor)
+    assert (ex.limit, ex.refill_rate_per_sec, ex.window_sec) == (10, 2.0, 60)
+    assert compile_plan(plan, compact=False) is ex
+    assert not hasattr(ex, "__dict__")
+    # A different key encoding needs different keys
+    assert compile_plan(plan, compact=True) is not ex
+
+    cc = compile_plan(_plan("concurrency", window_seconds=5), compact=False)
+    assert isinstance(cc, ConcurrencyExecutor) and cc.limit == 1
+    assert not cc.shardable
+    assert isinstance(compile_plan(_plan("unknown"), False), TokenBucketExecutor)
+
+
+@pytest.mark.parametrize("encoding", ["plain", "compact"])
+@pytest.mark.parametrize(
+    "alg", ["token_bucket", "fixed_window", "sliding_window", "concurrency"]
+)
+def test_executor_keys_match_build_key(monkeypatch, encoding, alg):
+    monkeypatch.setattr(settings, "KEY_ENCODING", encoding)
+    eng = DecisionEngine(None, settings, crud, backend=MemoryBackend(shards=1))
+    plan = _plan(alg, window_seconds=60)
+    now_ms = 1_700_000_012_345
+    args = dict(tenant_id="8c1f7e0e-6a4b-4a8e-9d1e-1f2e3d4c5b6a", subject="u:1")
+    want = eng.build_key(
+        **args, resource="GET:/x", algorithm=alg, plan=plan, now_ms=now_ms
+    )
+    assert eng.executor(plan).key(args["tenant_id"], "u:1", "GET:/x", now_ms) == want
+
+
+def test_fixed_window_epoch():
+    ex = compile_plan(_plan("fixed_window", window_seconds=60), compact=False)
+    assert isinstance(ex, FixedWindowExecutor)
+    assert ex.epoch(120_500) == 2
+    assert ex.key("t", "s", "r", 120_500) == "lf:fw:t:s:r:120"
+
+
+@pytest.mark.asyncio
+async def test_script_is_registered_once(monkeypatch):
+    registered, calls = [], []
+
+    class Script:
+        async def __call__(self, keys, args, client=None):
+            calls.append(client)
+            return [1, 4, 5, 0]
+
+    class Client:
+        def register_script(self, text):
+            registered.append(text)
+            return Script()
+
+    monkeypatch.setattr(token_bucket, "_SCRIPT", None)
+    a, b = Client(), Client()
+    for client in (a, b, a):
+        d = await token_bucket.check(client, "k", capacity=5, refill_rate_per_sec=1)
+        assert d.allowed and d.remaining == 4
+    assert len(registered) == 1
+    assert calls == [a, b, a]
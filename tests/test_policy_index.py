@@ -0,0 +1,118 @@
+import pytest
+
+from app.core.config import settings
+from app.db import crud
+from app.db.models import PlanAlgorithm, SubjectType
+from app.rl.engine import DecisionEngine
+from app.rl.memory_backend import MemoryBackend
+from app.rl.policy_index import PolicyTrie, is_pattern
+
+
+def test_trie_longest_match_precedence():
+    t = PolicyTrie()
+    t.add("GET:/orders/*", "api_key", "star")
+    t.add("GET:/orders/**", "api_key", "dstar")
+    t.add("GET:/orders/123", "api_key", "exact")
+    t.add("*:/admin/**", "api_key", "admin")
+    t.add("GET:/**", "api_key", "get-any")
+
+    assert t.match("GET:/orders/123", "api_key") == "exact"
+    assert t.match("GET:/orders/456", "api_key") == "star"
+    assert t.match("GET:/orders/456/items", "api_key") == "dstar"
+    assert t.match("DELETE:/admin/users/1", "api_key") == "admin"
+    # literal method beats a wildcard method further left
+    assert t.match("GET:/admin/x", "api_key") == "get-any"
+    assert t.match("POST:/orders/1", "api_key") is None
+    assert t.match("GET:/orders/123", "ip") is None
+
+
+def test_trie_newest_policy_wins_and_patterns_detected():
+    t = PolicyTrie()
+    t.add("GET:/a", "api_key", "old", created_at=1)
+    t.add("GET:/a", "api_key", "new", created_at=2)
+    t.add("GET:/a", "api_key", "older", created_at=0)
+    assert t.match("GET:/a", "api_key") == "new"
+    assert t.size == 1
+    assert is_pattern("GET:/orders/*") and not is_pattern("GET:/orders/1")
+
+
+@pytest.mark.asyncio
+async def test_get_plan_for_wildcard_and_incremental_add(db):
+    tenant = await crud.create_tenant(db, name="wild")
+
+    async def plan(name):
+        return await crud.create_plan(
+            db,
+            tenant_id=tenant.id,
+            name=name,
+            algorithm=PlanAlgorithm.fixed_window,
+            limit_per_window=1,
+            window_seconds=60,
+        )
+
+    broad = await plan("broad")
+    await crud.create_resource_policy(
+        db,
+        tenant_id=tenant.id,
+        resource="GET:/orders/*",
+        subject_type=SubjectType.api_key,
+        plan_id=broad.id,
+    )
+    got = await crud.get_plan_for(db, tenant.id, "GET:/orders/9", SubjectType.api_key)
+    assert got is not None and got.name == "broad"
+
+    # Tenant trie is loaded now; a new, more specific policy lands in place
+    narrow = await plan("narrow")
+    await crud.create_resource_policy(
+        db,
+        tenant_id=tenant.id,
+        resource="GET:/orders/9",
+        subject_type=SubjectType.api_key,
+        plan_id=narrow.id,
+    )
+    got = await crud.get_plan_for(db, tenant.id, "GET:/orders/9", SubjectType.api_key)
+    assert got.name == "narrow"
+    got = await crud.get_plan_for(db, tenant.id, "GET:/orders/8", SubjectType.api_key)
+    assert got.name == "broad"
+
+
+@pytest.mark.asyncio
+async def test_new_policy_replaces_cached_resolutions(db):
+    engine = DecisionEngine(None, settings, crud, backend=MemoryBackend(shards=1))
+    tenant = await crud.create_tenant(db, name="cached")
+
+    async def policy(resource, limit):
+        plan = await crud.create_plan(
+            db,
+            tenant_id=tenant.id,
+            name=f"p{limit}",
+            algorithm=PlanAlgorithm.fixed_window,
+            limit_per_window=limit,
+            window_seconds=60,
+        )
+        await crud.create_resource_policy(
+            db,
+            tenant_id=tenant.id,
+            resource=resource,
+            subject_type=SubjectType.api_key,
+            plan_id=plan.id,
+        )
+
+    async def check():
+        plan = await engine.resolve_plan(
+            db, tenant.id, "GET:/orders/9", SubjectType.api_key
+        )
+        return await engine.check(
+            tenant_id=tenant.id,
+            subject="u1",
+            resource="GET:/orders/9",
+            cost=1,
+            plan=plan,
+        )
+
+    await policy("GET:/orders/*", 100)
+    assert (await check()).limit == 100
+    await policy("GET:/orders/9", 1)
+    # The cached broad resolution is gone: the narrow plan applies at once
+    decision = await check()
+    assert (decision.limit, decision.allowed) == (1, False)
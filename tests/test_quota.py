@@ -0,0 +1,170 @@
+import time
+import types
+import uuid
+
+import pytest
+
+from app.core.cache import quota_cache
+from app.core.config import settings
+from app.db import crud
+from app.db.models import PlanAlgorithm
+from app.rl.engine import DecisionEngine
+from app.rl.hot_keys import HotKeys
+from app.rl.quota import peek_many
+
+
+def _plan(algorithm, **kw):
+    return types.SimpleNamespace(
+        algorithm=algorithm,
+        bucket_capacity=kw.get("bucket_capacity"),
+        refill_rate_per_sec=kw.get("refill_rate_per_sec"),
+        limit_per_window=kw.get("limit_per_window"),
+        window_seconds=kw.get("window_seconds"),
+        concurrency_limit=kw.get("concurrency_limit"),
+    )
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+PLANS = [
+    _plan("token_bucket", bucket_capacity=5, refill_rate_per_sec=0.0),
+    _plan("fixed_window", limit_per_window=5, window_seconds=3600),
+    _plan("sliding_window", limit_per_window=5, window_seconds=3600),
+    _plan("concurrency", concurrency_limit=5, window_seconds=60),
+]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("plan", PLANS, ids=lambda p: p.algorithm)
+async def test_peek_matches_check_without_consuming(fake_redis, plan):
+    tid = str(uuid.uuid4())
+    eng = DecisionEngine(fake_redis, settings, crud)
+    args = dict(tenant_id=tid, subject="u", resource="GET:/a")
+
+    async def peek():
+        spec = eng.quota_spec(**args, plan=plan, now_ms=_now_ms())
+        return (await peek_many(fake_redis, [spec], _now_ms()))[0]
+
+    fresh = await peek()
+    assert fresh["remaining"] == 5 and fresh["limit"] == 5
+    assert await fake_redis.dbsize() == 0
+
+    for _ in range(2):
+        last = await eng.check(**args, cost=1, plan=plan)
+    for _ in range(3):
+        state = await peek()
+    assert state["algorithm"] == plan.algorithm
+    assert state["remaining"] == last.remaining == 3
+    # Peeking left the budget alone
+    decisions = [await eng.check(**args, cost=1, plan=plan) for _ in range(4)]
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+
+
+@pytest.mark.asyncio
+async def test_peek_sums_hot_key_shards(fake_redis):
+    tid = str(uuid.uuid4())
+    hk = HotKeys(threshold_per_sec=2, shards=4, hold_sec=60, max_tracked=100)
+    ident = (tid, "anon", "GET:/a", "fixed_window")
+    for _ in range(3):
+        hk.route(ident, epoch=-1)
+    eng = DecisionEngine(fake_redis, settings, crud, hot_keys=hk)
+    plan = _plan("fixed_window", limit_per_window=20, window_seconds=3600)
+    for _ in range(7):
+        await eng.check(
+            tenant_id=tid, subject="anon", resource="GET:/a", cost=1, plan=plan
+        )
+    now = _now_ms()
+    spec = eng.quota_spec(
+        tenant_id=tid, subject="anon", resource="GET:/a", plan=plan, now_ms=now
+    )
+    assert len(spec.keys) == 4
+    (state,) = await peek_many(fake_redis, [spec], now)
+    assert state["remaining"] == 13 and state["limit"] == 20
+
+
+@pytest.mark.asyncio
+async def test_quota_endpoint_is_non_consuming(async_client, seed):
+    quota_cache.clear()
+    seeded = await seed(
+        {
+            "GET:/q": dict(
+                algorithm=PlanAlgorithm.fixed_window,
+                limit_per_window=3,
+                window_seconds=3600,
+            )
+        }
+    )
+    headers = seeded.headers
+    await async_client.post(
+        "/v1/check",
+        json={"resource": "GET:/q", "subject": "u1", "cost": 1},
+        headers=headers,
+    )
+    for _ in range(5):
+        quota_cache.clear()
+        r = await async_client.get(
+            "/v1/quota", params={"resource": "GET:/q", "subject": "u1"}, headers=headers
+        )
+        assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["remaining"] == 2 and body["limit"] == 3
+    assert body["algorithm"] == "fixed_window" and body["subject"] == "u1"
+
+    r = await async_client.get(
+        "/v1/quota", params={"resource": "GET:/none", "subject": "u1"}, headers=headers
+    )
+    assert r.status_code == 404
+    r = await async_client.get(
+        "/v1/quota", params={"resource": "GET:/q", "subject": "u1"}
+    )
+    assert r.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_quota_batch_and_cache(async_client, seed):
+    quota_cache.clear()
+    seeded = await seed(
+        {
+            "GET:/b1": dict(
+                algorithm=PlanAlgorithm.token_bucket,
+                bucket_capacity=10,
+                refill_rate_per_sec=1.0,
+            ),
+            "GET:/b2": dict(
+                algorithm=PlanAlgorithm.sliding_window,
+                limit_per_window=4,
+                window_seconds=60,
+            ),
+        }
+    )
+    headers = seeded.headers
+    params = [("subject", "u"), ("resource", "GET:/b1"), ("resource", "GET:/b2")]
+    r = await async_client.get("/v1/quota/batch", params=params, headers=headers)
+    assert r.status_code == 200, r.text
+    items = r.json()["items"]
+    assert [(i["resource"], i["remaining"]) for i in items] == [
+        ("GET:/b1", 10),
+        ("GET:/b2", 4),
+    ]
+
+    # Within QUOTA_CACHE_MS the cached view is served
+    old_ttl, quota_cache.ttl_sec = quota_cache.ttl_sec, 60.0
+    quota_cache.clear()
+    try:
+        await async_client.get("/v1/quota/batch", params=params, headers=headers)
+        await async_client.post(
+            "/v1/check",
+            json={"resource": "GET:/b2", "subject": "u", "cost": 1},
+            headers=headers,
+        )
+        r = await async_client.get("/v1/quota/batch", params=params, headers=headers)
+        assert r.json()["items"][1]["remaining"] == 4
+    finally:
+        quota_cache.ttl_sec = old_ttl
+        quota_cache.clear()
+
+    bad = [("subject", "a"), ("subject", "b"), ("resource", "GET:/b1")]
+    r = await async_client.get("/v1/quota/batch", params=bad, headers=headers)
+    assert r.status_code == 422
@@ -0,0 +1,266 @@
+import time
+
+import pytest
+import pytest_asyncio
+from prometheus_client import REGISTRY
+
+from app.rl.backend import ReplicatedBackend
+from app.rl.replication import (
+    Replicator,
+    cursor_key,
+    lease_key,
+    parse_peers,
+    stream_key,
+)
+from app.rl.strategies import crdt
+
+# Ahead of the wall clock (fakeredis expires keys by it), on a minute boundary
+NOW = (int(time.time()) // 60 + 2) * 60_000
+
+
+@pytest_asyncio.fixture()
+async def regions():
+    # Two regions, each with its own Redis
+    try:
+        from fakeredis import FakeServer
+        from fakeredis.aioredis import FakeRedis
+    except Exception as e:
+        pytest.skip(f"fakeredis not available: {e}")
+    out = {}
+    for name in ("eu", "us"):
+        redis = FakeRedis(server=FakeServer(), decode_responses=True)
+        replicator = Replicator(name, interval_ms=100, enabled=False)
+        out[name] = (ReplicatedBackend(redis, name, replicator), replicator)
+    yield out
+    for backend, _ in out.values():
+        await backend.redis.aclose()
+
+
+async def _sync(regions, now_ms):
+    for _, replicator in regions.values():
+        await replicator.publish(regions[replicator.region][0].redis)
+    for name, (backend, replicator) in regions.items():
+        for peer, (peer_backend, _) in regions.items():
+            if peer != name:
+                await replicator.pull(
+                    backend.redis, peer, peer_backend.redis, now_ms=now_ms
+                )
+
+
+@pytest.mark.asyncio
+async def test_lua_matches_python_mirror(fake_redis):
+    fw = crdt._get_script_text("crdt_fixed_window")
+    tb = crdt._get_script_text("crdt_token_bucket")
+    merge = crdt._get_script_text("crdt_merge")
+    for cost in (2, 2, 2):
+        lua = await fake_redis.eval(fw, 1, "lua:fw", 5, 60, NOW, cost, "eu")
+        decision, slot = await crdt.fixed_window(
+            fake_redis,
+            "py:fw",
+            region="eu",
+            limit=5,
+            window_sec=60,
+            cost=cost,
+            now_ms=NOW,
+        )
+        assert lua[:2] == [int(decision.allowed), decision.remaining]
+        assert lua[5] == slot.value
+        lua = await fake_redis.eval(tb, 1, "lua:tb", 5, 1, NOW, cost, "eu")
+        py = await crdt._token_bucket_python(
+            fake_redis, "py:tb", "eu", 5, 1.0, cost, NOW
+        )
+        assert lua == py
+
+    args = ["tb", "us", 3, NOW - 10, 3, 5, 1.0, NOW + 5000, NOW]
+    assert await fake_redis.eval(merge, 1, "lua:tb", *args) == 3
+    assert await fake_redis.eval(merge, 1, "lua:tb", *args) == 0
+    slot = crdt.Slot("tb", 3, NOW - 10, 3, 5, 1.0, NOW + 5000)
+    assert await crdt.merge_many(fake_redis, "us", [("py:tb", slot)], NOW) == 3
+    assert await crdt.merge_many(fake_redis, "us", [("py:tb", slot)], NOW) == 0
+    lua, py = await fake_redis.hgetall("lua:tb"), await fake_redis.hgetall("py:tb")
+    assert {k: float(v) for k, v in lua.items()} == {k: float(v) for k, v in py.items()}
+
+
+@pytest.mark.asyncio
+async def test_fixed_window_limit_is_global_after_sync(regions):
+    eu, us = regions["eu"][0], regions["us"][0]
+    args = dict(limit=10, window_sec=60, cost=3, now_ms=NOW)
+    assert (await eu.fixed_window("k", **args)).allowed
+    assert (await eu.fixed_window("k", **args)).allowed
+    # Before replication each region only sees its own traffic
+    assert (await us.fixed_window("k", **args)).remaining == 7
+
+    await _sync(regions, NOW)
+    assert await eu.redis.hgetall("k") == {"eu": "6", "us": "3"}
+    assert await us.redis.hgetall("k") == {"eu": "6", "us": "3"}
+    decision = await us.fixed_window("k", **args)
+    assert not decision.allowed and decision.remaining == 0
+
+    # Replaying every entry again changes nothing
+    await us.redis.delete(cursor_key("us"))
+    await _sync(regions, NOW)
+    assert await us.redis.hgetall("k") == {"eu": "6", "us": "6"}
+    assert await eu.redis.hgetall("k") == {"eu": "6", "us": "6"}
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_consumption_is_merged(regions):
+    eu, us = regions["eu"][0], regions["us"][0]
+    args = dict(capacity=10, refill_rate_per_sec=1.0, now_ms=NOW)
+    assert (await eu.token_bucket("b", cost=4, **args)).remaining == 6
+    # Denials consume nothing and are not replicated
+    assert not (await eu.token_bucket("b", cost=20, **args)).allowed
+    assert len(regions["eu"][1]) == 1
+    assert (await us.token_bucket("b", cost=3, **args)).remaining == 7
+
+    await _sync(regions, NOW)
+    assert (await eu.token_bucket("b", cost=1, **args)).remaining == 2
+    assert (await us.token_bucket("b", cost=1, **args)).remaining == 2
+    await _sync(regions, NOW)
+    assert (await us.token_bucket("b", cost=0, **args)).remaining == 1
+
+    # A peer whose bucket expired starts a new generation; only what it
+    # consumed since is applied
+    later = NOW + 60_000
+    await eu.redis.delete("b")
+    args["now_ms"] = later
+    assert (await eu.token_bucket("b", cost=2, **args)).allowed
+    await _sync(regions, later)
+    fields = await us.redis.hgetall("b")
+    assert fields["g:eu"] == str(later) and fields["c:eu"] == "2"
+
+
+@pytest.mark.asyncio
+async def test_lag_holds_back_recent_entries(regions):
+    (eu, eu_repl), (us, us_repl) = regions["eu"], regions["us"]
+    us_repl.lag_ms = 500
+    await eu.fixed_window("k", limit=10, window_sec=60, cost=1, now_ms=NOW)
+    await eu_repl.publish(eu.redis)
+    [(_, [(entry_id, _)])] = await eu.redis.xread({stream_key("eu"): "0-0"})
+    sent_ms = int(entry_id.split("-")[0])
+
+    assert await us_repl.pull(us.redis, "eu", eu.redis, now_ms=sent_ms + 100) == 0
+    assert not await us.redis.exists("k")
+    assert await us_repl.pull(us.redis, "eu", eu.redis, now_ms=sent_ms + 500) == 1
+    assert await us.redis.hgetall("k") == {"eu": "1"}
+    assert await us.redis.hget(cursor_key("us"), "eu") == entry_id
+
+    # Slots whose window is over by the time they arrive are skipped
+    late = crdt.Slot("fw", 5, 0, 5, 10, 0.0, NOW)
+    assert await crdt.merge_many(us.redis, "eu", [("old", late)], NOW + 1) == 0
+
+
+def test_replicator_batches_and_peers():
+    replicator = Replicator("eu", interval_ms=100, max_keys=1, enabled=False)
+    slot = crdt.Slot("tb", 2, 7, 2, 10, 1.0, NOW)
+    replicator.record("a", slot)
+    replicator.record("a", slot._replace(value=5, delta=3))
+    replicator.record("b", slot)
+    assert replicator._dirty == {"a": slot._replace(value=5, delta=5)}
+
+    assert parse_peers(" eu=redis://eu:6379/0, us=redis://us:6379/0,") == {
+        "eu": "redis://eu:6379/0",
+        "us": "redis://us:6379/0",
+    }
+    with pytest.raises(ValueError):
+        parse_peers("redis://us:6379/0")
+
+
+def _failures(op):
+    return REGISTRY.get_sample_value("replication_failures_total", {"op": op}) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_failed_publish_requeues_slots():
+    replicator = Replicator("eu", interval_ms=100, max_keys=2, enabled=False)
+    slot = crdt.Slot("tb", 2, 7, 2, 10, 1.0, NOW)
+
+    class Down:
+        async def xadd(self, *args, **kw):
+            # Checks keep recording while the publish is in flight
+            replicator.record("a", slot._replace(value=3, delta=1))
+            replicator.record("c", slot)
+            raise ConnectionError("redis down")
+
+    replicator.record("a", slot)
+    replicator.record("b", slot)
+    before = _failures("publish")
+    assert await replicator.publish(Down()) == 0
+    assert _failures("publish") == before + 1
+    # The newer value wins and the deltas add up; "b" no longer fits
+    assert replicator._dirty == {"a": slot._replace(value=3, delta=3), "c": slot}
+
+    # A slot from a newer generation replaces the failed one outright
+    replicator._dirty = {"a": slot}
+
+    class DownAgain:
+        async def xadd(self, *args, **kw):
+            replicator.record("a", slot._replace(gen=8))
+            raise ConnectionError("redis down")
+
+    await replicator.publish(DownAgain())
+    assert replicator._dirty == {"a": slot._replace(gen=8)}
+
+
+@pytest.mark.asyncio
+async def test_stop_publishes_what_is_left(regions):
+    eu, _ = regions["eu"]
+    replicator = Replicator("eu", interval_ms=60_000)
+    await replicator.start(eu.redis, {"eu": eu.redis})
+    assert replicator._peers == {}
+    replicator.record("k", crdt.Slot("fw", 1, 0, 1, 10, 0.0, NOW))
+    await replicator.stop()
+    assert await eu.redis.xlen(stream_key("eu")) == 1
+    assert len(replicator) == 0
+    # Stopping twice, or without starting, is a no-op
+    await replicator.stop()
+
+
+@pytest.mark.asyncio
+async def test_sync_skips_a_failing_peer(regions):
+    (eu, eu_repl), (us, us_repl) = regions["eu"], regions["us"]
+    await us.fixed_window("k", limit=10, window_sec=60, cost=2, now_ms=NOW)
+    await us_repl.publish(us.redis)
+
+    class Unreachable:
+        async def xread(self, *args, **kw):
+            raise ConnectionError("peer down")
+
+    await eu_repl.start(eu.redis, {"ap": Unreachable(), "us": us.redis})
+    before = _failures("pull")
+    await eu_repl.sync()
+    assert _failures("pull") == before + 1
+    assert await eu.redis.hgetall("k") == {"us": "2"}
+
+
+@pytest.mark.asyncio
+async def test_one_worker_per_region_pulls(regions):
+    (eu, _), (us, us_repl) = regions["eu"], regions["us"]
+    await us.fixed_window("k", limit=10, window_sec=60, cost=2, now_ms=NOW)
+    await us_repl.publish(us.redis)
+
+    # Two pre-forked workers of the same region share its Redis
+    workers = [Replicator("eu", interval_ms=100, enabled=False) for _ in range(2)]
+    pulls = []
+    for worker in workers:
+        await worker.start(eu.redis, {"us": us.redis})
+        pull = worker.pull
+
+        async def counted(*args, _pull=pull, _worker=worker, **kw):
+            merged = await _pull(*args, **kw)
+            pulls.append((_worker, merged))
+            return merged
+
+        worker.pull = counted
+
+    await workers[0].sync()
+    await workers[1].sync()
+    await workers[0].sync()
+    assert pulls == [(workers[0], 1), (workers[0], 0)]
+    assert 0 < await eu.redis.pttl(lease_key("eu")) <= workers[0].lease_ms
+
+    # Once the lease lapses another worker resumes from the stored cursor
+    await eu.redis.delete(lease_key("eu"))
+    await workers[1].sync()
+    assert pulls[-1] == (workers[1], 0)
+    assert await eu.redis.hgetall("k") == {"us": "2"}
@@ -13,3 +13,42 @@ async def test_sliding_window_allows_then_blocks(fake_redis):
     d3 = await sw.check(fake_redis, key, limit=2, window_sec=1, cost=1, now_ms=20)
     assert not d3.allowed
     assert "X-RateLimit-Remaining" in d3.headers
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_weighted_entry_per_request(fake_redis):
+    key = "test:sw:weighted"
+    d = await sw.check(fake_redis, key, limit=1000, window_sec=1, cost=500, now_ms=0)
+    assert d.allowed and d.remaining == 500
+    # One member for the request plus the cost-sum member
+    assert await fake_redis.zcard(key) == 2
+
+    await sw.check(fake_redis, key, limit=1000, window_sec=1, cost=400, now_ms=500)
+    d = await sw.check(fake_redis, key, limit=1000, window_sec=1, cost=200, now_ms=600)
+    assert not d.allowed and d.retry_after_ms == 400
+    # The cost-500 entry expires; its whole weight is released at once
+    d = await sw.check(fake_redis, key, limit=1000, window_sec=1, cost=600, now_ms=1001)
+    assert d.allowed and d.remaining == 0
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_reads_legacy_unit_members(fake_redis):
+    key = "test:sw:legacy"
+    await fake_redis.zadd(key, {f"evt:{t}": t for t in (100, 101, 102)})
+    d = await sw.check(fake_redis, key, limit=4, window_sec=1, cost=2, now_ms=200)
+    assert not d.allowed and d.remaining == 1
+    d = await sw.check(fake_redis, key, limit=4, window_sec=1, cost=2, now_ms=1102)
+    assert d.allowed and d.remaining == 2
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_script_matches_python_path(fake_redis):
+    pytest.importorskip("lupa")
+    steps = [(0, 3), (100, 2), (200, 1), (900, 4), (1050, 2), (1150, 3), (2500, 5)]
+    for now, cost in steps:
+        lua = await sw._eval_script(
+            fake_redis, keys=["lua"], args=[5, 1000, now, cost, "n"]
+        )
+        py = await sw._check_python(fake_redis, "py", 5, 1000, cost, now, "n")
+        assert [int(x) for x in lua] == py
+    assert await fake_redis.zscore("lua", "#") == await fake_redis.zscore("py", "#")
@@ -0,0 +1,165 @@
+import json
+import random
+import time
+
+import httpx
+import pytest
+
+from limitforge_sdk import LimitforgeClient, RateLimitedError, RetryPolicy, deadline
+from limitforge_sdk.retry import current_deadline
+
+ALLOWED = {"allowed": True, "remaining": 1, "limit": 2, "retry_after_ms": 0}
+
+
+def _denied(retry_after_ms=0):
+    return {
+        "allowed": False,
+        "remaining": 0,
+        "limit": 2,
+        "retry_after_ms": retry_after_ms,
+    }
+
+
+def _client(responses, timeout=1.0, **policy):
+    """Client whose transport answers from ``responses`` (status, body) in
+    order, repeating the last one; returns it and the requests it sent."""
+    sent = []
+
+    def handler(request):
+        sent.append(request)
+        status, body = responses[min(len(sent), len(responses)) - 1]
+        return httpx.Response(status, json=body)
+
+    policy.setdefault("rng", random.Random(42))
+    client = LimitforgeClient(
+        "http://lf", "key", timeout=timeout, retry=RetryPolicy(**policy)
+    )
+    client._client = httpx.AsyncClient(
+        base_url="http://lf", transport=httpx.MockTransport(handler)
+    )
+    return client, sent
+
+
+def test_jitter_is_decorrelated_and_bounded():
+    policy = RetryPolicy(base_ms=10, cap_ms=100, rng=random.Random(7))
+    same = RetryPolicy(base_ms=10, cap_ms=100, rng=random.Random(7))
+    prev, seen = None, []
+    for _ in range(50):
+        j = policy.jitter_ms(prev)
+        assert 10 <= j <= min(100, 3 * (prev or 10))
+        assert j == same.jitter_ms(prev)
+        prev = j
+        seen.append(j)
+    # Keeps growing under repeated denials until the cap
+    assert max(seen) > 90 and len(set(seen)) > 10
+
+
+@pytest.mark.asyncio
+async def test_wait_retries_denials_and_counts_them():
+    client, sent = _client(
+        [(429, _denied(2)), (429, _denied(3)), (200, ALLOWED)], base_ms=1, cap_ms=2
+    )
+    expected = RetryPolicy(base_ms=1, cap_ms=2, rng=random.Random(42))
+    j1 = expected.jitter_ms(None)
+    j2 = expected.jitter_ms(j1)
+    assert await client.check(resource="GET:/a", subject="u1", wait=True) == ALLOWED
+    assert len(sent) == 3
+    assert json.loads(sent[0].content) == {
+        "resource": "GET:/a",
+        "subject": "u1",
+        "cost": 1,
+    }
+    stats = client.retry_stats.as_dict()
+    assert stats["retries"] == 2
+    assert stats["waited_ms"] == pytest.approx(2 + j1 + 3 + j2)
+    assert stats["budget_exhausted"] == stats["deadline_exceeded"] == 0
+
+    # Without wait the first denial is raised; with it, max_attempts caps calls
+    client, sent = _client([(429, _denied())], base_ms=1, cap_ms=1, max_attempts=3)
+    with pytest.raises(RateLimitedError):
+        await client.check(resource="GET:/a", subject="u1")
+    assert len(sent) == 1
+    with pytest.raises(RateLimitedError) as err:
+        await client.check(resource="GET:/a", subject="u1", wait=True)
+    assert len(sent) == 4 and client.retry_stats.retries == 2
+    assert err.value.payload["allowed"] is False
+
+
+@pytest.mark.asyncio
+async def test_retry_budget_runs_out():
+    # No per-second allowance: half a retry per request
+    client, sent = _client(
+        [(429, _denied())],
+        base_ms=1,
+        cap_ms=1,
+        max_attempts=10,
+        budget_ratio=0.5,
+        budget_min_per_sec=0,
+    )
+    with pytest.raises(RateLimitedError):
+        await client.check(resource="GET:/a", subject="u1", wait=True)
+    assert len(sent) == 1
+    assert client.retry_stats.budget_exhausted == 1
+    # The second request's deposit pays for exactly one retry
+    with pytest.raises(RateLimitedError):
+        await client.check(resource="GET:/a", subject="u1", wait=True)
+    assert len(sent) == 3
+    stats = client.retry_stats
+    assert (stats.retries, stats.budget_exhausted, stats.deadline_exceeded) == (
+        1,
+        2,
+        0,
+    )
+    assert stats.waited_ms == pytest.approx(1.0)
+
+
+@pytest.mark.asyncio
+async def test_deadlines_stop_retries_and_requests():
+    client, sent = _client([(429, _denied(5000))], base_ms=1, cap_ms=1)
+    # The next retry would land past the deadline: the denial is raised
+    with pytest.raises(RateLimitedError):
+        await client.check(
+            resource="GET:/a", subject="u1", wait=True, deadline=time.monotonic() + 1
+        )
+    assert len(sent) == 1 and client.retry_stats.deadline_exceeded == 1
+
+    # An expired deadline never reaches the server
+    with deadline(0):
+        with pytest.raises(TimeoutError):
+            await client.check(resource="GET:/a", subject="u1")
+        with pytest.raises(TimeoutError):
+            await client.acquire(resource="GET:/a", subject="u1")
+    assert len(sent) == 1 and client.retry_stats.deadline_exceeded == 3
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_within_the_deadline():
+    client, sent = _client([(200, {**ALLOWED, "wait_ms": 0})], timeout=1.0)
+    await client.acquire(resource="GET:/a", subject="u1", max_wait_ms=5000)
+    assert json.loads(sent[0].content)["max_wait_ms"] == 5000
+    assert sent[0].extensions["timeout"]["read"] == pytest.approx(6.0)
+
+    with deadline(3.0):
+        await client.acquire(resource="GET:/a", subject="u1", max_wait_ms=5000)
+    max_wait_ms = json.loads(sent[1].content)["max_wait_ms"]
+    assert 1900 <= max_wait_ms <= 2000
+    # Connect + server wait never outlast the deadline
+    assert sent[1].extensions["timeout"]["read"] <= 3.0
+
+    with deadline(0.5):
+        await client.acquire(resource="GET:/a", subject="u1", max_wait_ms=5000)
+    assert json.loads(sent[2].content)["max_wait_ms"] == 0
+    assert sent[2].extensions["timeout"]["read"] <= 0.5
+
+
+def test_deadline_blocks_nest():
+    assert current_deadline() is None
+    with deadline(10) as outer:
+        assert current_deadline() == outer
+        with deadline(1) as inner:
+            assert inner < outer and current_deadline() == inner
+            # An inner block cannot extend the enclosing deadline
+            with deadline(100) as innermost:
+                assert innermost == inner
+        assert current_deadline() == outer
+    assert current_deadline() is None
@@ -1,7 +1,12 @@
 import pytest
+from fastapi import HTTPException
+from sqlalchemy import update
 
+from app.core import cache
+from app.core.config import settings
 from app.core.security import verify_api_key
 from app.db import crud
+from app.db.models import ApiKey
 
 
 @pytest.mark.asyncio
@@ -14,3 +19,24 @@ async def test_verify_api_key_db_and_cache(db, fake_redis):
     # Second call should use cache fast path
     obj2 = await verify_api_key(db, fake_redis, h)
     assert obj2 is not None and obj2.active
+
+
+@pytest.mark.asyncio
+async def test_revoked_key_stops_working_once_its_cache_entry_expires(
+    db, fake_redis, monkeypatch
+):
+    tenant = await crud.create_tenant(db, name="Trevoke")
+    _, h = await crud.create_api_key(db, tenant_id=tenant.id, name="k")
+    await verify_api_key(db, fake_redis, h)
+    await db.execute(update(ApiKey).where(ApiKey.key_hash == h).values(active=False))
+    await db.commit()
+    # Still served from the cache...
+    assert await verify_api_key(db, fake_redis, h) is not None
+
+    # ...until API_KEY_CACHE_TTL_SEC, well before plans expire
+    assert settings.API_KEY_CACHE_TTL_SEC < settings.LOCAL_CACHE_TTL_SEC
+    later = cache.time.monotonic() + settings.API_KEY_CACHE_TTL_SEC + 0.1
+    monkeypatch.setattr(cache.time, "monotonic", lambda: later)
+    with pytest.raises(HTTPException) as err:
+        await verify_api_key(db, fake_redis, h)
+    assert err.value.status_code == 403
@@ -0,0 +1,189 @@
+import argparse
+import shutil
+import signal
+from types import SimpleNamespace
+
+import pytest
+
+from app import serve
+from app.core.config import settings
+from app.observability import multiproc
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+        self.on_tick = lambda now: None
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, sec):
+        self.now += sec
+        self.on_tick(self.now)
+
+
+@pytest.fixture()
+def supervisor(monkeypatch):
+    """Runs ``_supervise`` against fake processes, signals and a fake clock."""
+    clock = Clock()
+    spawned = []
+    handlers = {}
+
+    class Process:
+        def __init__(self, target, args, daemon):
+            assert target is serve._worker and not daemon
+            self.alive = False
+            self.exitcode = None
+            self.joined = False
+
+        def start(self):
+            self.alive = True
+            self.started_at = clock.now
+            spawned.append(self)
+
+        def is_alive(self):
+            return self.alive
+
+        def terminate(self):
+            self.alive = False
+
+        def join(self, timeout=None):
+            self.joined = True
+
+    monkeypatch.setattr(serve, "time", clock)
+    monkeypatch.setattr(
+        serve,
+        "mp",
+        SimpleNamespace(get_context=lambda method: SimpleNamespace(Process=Process)),
+    )
+    monkeypatch.setattr(
+        serve,
+        "signal",
+        SimpleNamespace(
+            signal=lambda sig, handler: handlers.__setitem__(sig, handler),
+            SIGTERM=signal.SIGTERM,
+            SIGINT=signal.SIGINT,
+        ),
+    )
+    monkeypatch.setattr(multiproc, "cleanup_dead_workers", lambda path: [])
+
+    def run(workers, on_tick):
+        clock.on_tick = lambda now: on_tick(now, spawned, handlers)
+        return serve._supervise(argparse.Namespace(workers=workers))
+
+    return run
+
+
+def test_workers_that_keep_crashing_back_off_then_stop_the_server(supervisor):
+    def on_tick(now, spawned, handlers):
+        # Worker 1 dies as soon as it starts; worker 0 stays up
+        for p in spawned[1:]:
+            p.alive, p.exitcode = False, 3
+        on_tick.spawned = spawned
+
+    assert supervisor(2, on_tick) == 1
+    spawned = on_tick.spawned
+    starts = [p.started_at for p in spawned[1:]]
+    # Each gap is the 0.5s poll plus a backoff of 0.5s, 1s, 2s, then 4s
+    assert len(starts) == settings.SERVER_RESPAWN_MAX_FAILURES
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert gaps == [1.0, 1.5, 2.5, 4.5]
+    # The healthy worker is stopped and every worker is joined
+    assert not spawned[0].alive
+    assert all(p.joined for p in (spawned[0], spawned[-1]))
+
+
+def test_long_lived_worker_is_respawned_at_once_until_stopped(supervisor):
+    def on_tick(now, spawned, handlers):
+        if now == settings.SERVER_RESPAWN_WINDOW_SEC + 1:
+            spawned[0].alive = False
+        elif now == settings.SERVER_RESPAWN_WINDOW_SEC + 3:
+            handlers[signal.SIGTERM](signal.SIGTERM, None)
+        on_tick.spawned = spawned
+
+    assert supervisor(1, on_tick) == 0
+    first, second = on_tick.spawned
+    assert second.started_at == settings.SERVER_RESPAWN_WINDOW_SEC + 1
+    assert not second.alive and second.joined
+
+
+def test_respawn_delay_doubles_up_to_a_cap():
+    assert [serve._respawn_delay(n) for n in range(5)] == [0.0, 0.5, 1.0, 2.0, 4.0]
+    assert serve._respawn_delay(20) == 30.0
+
+
+@pytest.fixture()
+def fake_uvicorn(monkeypatch):
+    import uvicorn
+
+    calls = []
+
+    class Server:
+        def __init__(self, config):
+            self.config = config
+
+        def run(self, sockets=None):
+            calls.append(("server", self.config, sockets))
+
+    monkeypatch.setattr(uvicorn, "Server", Server)
+    monkeypatch.setattr(
+        uvicorn, "run", lambda app, **kw: calls.append(("run", app, kw))
+    )
+    return calls
+
+
+def test_single_worker_serves_in_process(fake_uvicorn):
+    assert serve.main(["--workers", "1", "--port", "9001", "--backlog", "64"]) == 0
+    [(kind, config, sockets)] = fake_uvicorn
+    assert kind == "server" and sockets is None
+    assert (config.port, config.backlog, config.lifespan) == (9001, 64, "on")
+
+
+def test_worker_binds_its_own_reuseport_socket(fake_uvicorn):
+    args = serve._parse_args(["--host", "127.0.0.1", "--port", "0"])
+    serve._worker(args)
+    [(_, config, [sock])] = fake_uvicorn
+    try:
+        assert sock.getsockopt(serve.socket.SOL_SOCKET, serve.socket.SO_REUSEPORT)
+        assert sock.get_inheritable()
+        assert config.host == "127.0.0.1"
+    finally:
+        sock.close()
+
+
+@pytest.mark.parametrize("reuseport", [True, False])
+def test_multi_worker_paths_export_a_fresh_metrics_dir(
+    fake_uvicorn, monkeypatch, tmp_path, reuseport
+):
+    stale = tmp_path / "counter_123.db"
+    stale.write_bytes(b"old")
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    seen = []
+    monkeypatch.setattr(
+        serve,
+        "_supervise",
+        lambda args: seen.append(serve.os.environ["PROMETHEUS_MULTIPROC_DIR"]) or 0,
+    )
+    if not reuseport:
+        monkeypatch.delattr(serve.socket, "SO_REUSEPORT", raising=False)
+
+    assert serve.main(["--workers", "3"]) == 0
+    assert not stale.exists()
+    if reuseport:
+        assert seen == [str(tmp_path)] and not fake_uvicorn
+    else:
+        [(kind, app, kw)] = fake_uvicorn
+        assert (kind, app, kw["workers"]) == ("run", "app.main:app", 3)
+
+
+def test_metrics_dir_defaults_to_one_per_server(monkeypatch):
+    # setenv first so the variable is removed again after the test
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", "")
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR")
+    path = serve._export_multiproc_dir()
+    try:
+        assert path == f"/tmp/limitforge-metrics-{serve.os.getpid()}"
+        assert serve.os.path.isdir(path)
+    finally:
+        shutil.rmtree(path)
@@ -9,3 +9,14 @@ def test_to_async_dsn_converts_psycopg_to_asyncpg():
 
 def test_to_async_dsn_no_change_for_other_schemes():
     assert _to_async_dsn("sqlite+aiosqlite:///x.db").startswith("sqlite+aiosqlite:///")
+
+
+def test_engine_kwargs_pool_and_statement_cache():
+    from app.db.session import _engine_kwargs, _engine_url
+
+    assert _engine_kwargs("sqlite+aiosqlite:///x.db") == {}
+    kw = _engine_kwargs("postgresql+asyncpg://u:p@h/db")
+    assert kw["pool_pre_ping"] is True and kw["pool_size"] > 0
+    assert "statement_cache_size" in kw["connect_args"]
+    url = _engine_url("postgresql+asyncpg://u:p@h/db")
+    assert "prepared_statement_cache_size" in url.query
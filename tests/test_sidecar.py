@@ -0,0 +1,297 @@
+import asyncio
+import os
+import signal
+import struct
+
+import pytest
+import pytest_asyncio
+from limitforge_sdk import sidecar as sdk_sidecar
+from sqlalchemy import update
+
+from app.core.cache import api_key_cache
+from app.core.config import settings
+from app import sidecar as sidecar_module
+from app.core import deps
+from app.core.deps import get_sessionmaker
+from app.db import crud, session as db_session
+from app.db.models import ApiKey, PlanAlgorithm
+from app.main import app
+from app.rl.engine import DecisionEngine
+from app.sidecar import (
+    ALLOWED,
+    BAD_FRAME,
+    CHECK,
+    CHECK_HEAD,
+    DECISION,
+    DECISION_BODY,
+    DEFINE,
+    DEFINE_HEAD,
+    ERROR,
+    HEADER,
+    HELLO,
+    HELLO_OK,
+    LIMITED,
+    NO_PLAN,
+    UNKNOWN_RESOURCE,
+    SidecarServer,
+    frame,
+)
+
+
+def _fixed(limit):
+    return {
+        "GET:/sc": dict(
+            algorithm=PlanAlgorithm.fixed_window,
+            limit_per_window=limit,
+            window_seconds=3600,
+        )
+    }
+
+
+@pytest_asyncio.fixture()
+async def sidecar(async_client, fake_redis, tmp_path):
+    session_factory = app.dependency_overrides[get_sessionmaker]()
+    server = SidecarServer(
+        DecisionEngine(fake_redis, settings, crud), fake_redis, session_factory
+    )
+    path = str(tmp_path / "rls.sock")
+    srv = await asyncio.start_unix_server(server.handle, path=path)
+    yield path
+    srv.close()
+    await srv.wait_closed()
+
+
+async def _read(reader):
+    length, kind = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return kind, await reader.readexactly(length - 1)
+
+
+async def _hello(path, key):
+    reader, writer = await asyncio.open_unix_connection(path)
+    writer.write(frame(HELLO, key.encode()))
+    await writer.drain()
+    return reader, writer, await _read(reader)
+
+
+def test_frame_layout():
+    data = frame(CHECK, CHECK_HEAD.pack(7, 1, 2) + b"user:1")
+    assert struct.unpack("!IB", data[:5]) == (1 + 12 + 6, CHECK)
+    assert DECISION_BODY.size == 21 and len(frame(DECISION, b"x" * 21)) == 26
+
+
+@pytest.mark.asyncio
+async def test_sidecar_checks_over_unix_socket(sidecar, seed):
+    raw_key = (await seed(_fixed(3))).key
+    reader, writer, hello = await _hello(sidecar, raw_key)
+    assert hello == (HELLO_OK, b"\x00")
+
+    out = frame(DEFINE, DEFINE_HEAD.pack(1) + b"GET:/sc")
+    out += frame(DEFINE, DEFINE_HEAD.pack(2) + b"GET:/missing")
+    for rid in range(100, 105):
+        out += frame(CHECK, CHECK_HEAD.pack(rid, 1, 1) + b"user:1")
+    out += frame(CHECK, CHECK_HEAD.pack(200, 2, 1) + b"user:1")
+    out += frame(CHECK, CHECK_HEAD.pack(201, 9, 1) + b"user:1")
+    writer.write(out)
+    await writer.drain()
+
+    got = {}
+    for _ in range(7):
+        kind, body = await asyncio.wait_for(_read(reader), 5)
+        assert kind == DECISION
+        d = DECISION_BODY.unpack(body)
+        got[d[0]] = d
+    writer.close()
+
+    statuses = sorted(got[rid][1] for rid in range(100, 105))
+    assert statuses == [ALLOWED] * 3 + [LIMITED] * 2
+    assert all(got[rid][3] == 3 for rid in range(100, 105))
+    assert got[200][1] == NO_PLAN
+    assert got[201][1] == UNKNOWN_RESOURCE
+
+
+@pytest.mark.asyncio
+async def test_sidecar_rejects_invalid_key(sidecar, db):
+    reader, writer, hello = await _hello(sidecar, "nope")
+    assert hello == (HELLO_OK, b"\x01")
+    assert await reader.read() == b""
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_sidecar_drops_connection_once_key_is_revoked(
+    sidecar, seed, db, monkeypatch
+):
+    monkeypatch.setattr(settings, "API_KEY_CACHE_TTL_SEC", 0.0)
+    seeded = await seed(_fixed(10))
+    reader, writer, hello = await _hello(sidecar, seeded.key)
+    assert hello == (HELLO_OK, b"\x00")
+
+    await db.execute(
+        update(ApiKey).where(ApiKey.tenant_id == seeded.tenant_id).values(active=False)
+    )
+    await db.commit()
+    api_key_cache.clear()
+
+    writer.write(frame(CHECK, CHECK_HEAD.pack(1, 1, 1) + b"user:1"))
+    await writer.drain()
+    assert await asyncio.wait_for(_read(reader), 5) == (HELLO_OK, b"\x01")
+    assert await reader.read() == b""
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_sdk_client_opens_one_connection_for_concurrent_checks(
+    sidecar, seed, monkeypatch
+):
+    raw_key = (await seed(_fixed(10))).key
+    opened = []
+    open_unix_connection = asyncio.open_unix_connection
+
+    async def counting(path):
+        opened.append(path)
+        return await open_unix_connection(path)
+
+    monkeypatch.setattr(sdk_sidecar.asyncio, "open_unix_connection", counting)
+    client = sdk_sidecar.LimitforgeSidecarClient(sidecar, raw_key, timeout=5)
+    try:
+        results = await asyncio.gather(
+            *(client.check(resource="GET:/sc", subject="user:1") for _ in range(5))
+        )
+    finally:
+        await client.close()
+    assert opened == [sidecar]
+    assert sorted(r["remaining"] for r in results) == [5, 6, 7, 8, 9]
+
+
+@pytest.mark.asyncio
+async def test_sidecar_ignores_defines_past_the_resource_cap(
+    sidecar, seed, monkeypatch
+):
+    monkeypatch.setattr(settings, "SIDECAR_MAX_RESOURCES", 1)
+    raw_key = (await seed(_fixed(3))).key
+    reader, writer, _ = await _hello(sidecar, raw_key)
+    out = frame(DEFINE, DEFINE_HEAD.pack(1) + b"GET:/sc")
+    out += frame(DEFINE, DEFINE_HEAD.pack(2) + b"GET:/sc")
+    # Redefining a known id is still allowed at the cap
+    out += frame(DEFINE, DEFINE_HEAD.pack(1) + b"GET:/sc")
+    out += frame(CHECK, CHECK_HEAD.pack(10, 1, 1) + b"user:1")
+    out += frame(CHECK, CHECK_HEAD.pack(11, 2, 1) + b"user:1")
+    writer.write(out)
+    await writer.drain()
+    got = {}
+    for _ in range(2):
+        d = DECISION_BODY.unpack((await asyncio.wait_for(_read(reader), 5))[1])
+        got[d[0]] = d[1]
+    writer.close()
+    assert got == {10: ALLOWED, 11: UNKNOWN_RESOURCE}
+
+
+@pytest.mark.asyncio
+async def test_sidecar_answers_bad_cost_with_bad_frame(sidecar, seed):
+    raw_key = (await seed(_fixed(3))).key
+    reader, writer, _ = await _hello(sidecar, raw_key)
+    writer.write(
+        frame(DEFINE, DEFINE_HEAD.pack(1) + b"GET:/sc")
+        + frame(CHECK, CHECK_HEAD.pack(5, 1, 0) + b"user:1")
+    )
+    await writer.drain()
+    kind, body = await asyncio.wait_for(_read(reader), 5)
+    writer.close()
+    assert kind == DECISION and DECISION_BODY.unpack(body)[:2] == (5, BAD_FRAME)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "data",
+    [
+        frame(0x7F, b"?"),
+        HEADER.pack(settings.SIDECAR_MAX_FRAME_BYTES + 1, CHECK),
+        HEADER.pack(0, CHECK),
+    ],
+    ids=["unknown-type", "oversized", "empty"],
+)
+async def test_sidecar_closes_connection_on_bad_frame(sidecar, seed, data):
+    raw_key = (await seed(_fixed(3))).key
+    reader, writer, _ = await _hello(sidecar, raw_key)
+    writer.write(data)
+    await writer.drain()
+    assert await asyncio.wait_for(reader.read(), 5) == b""
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_sidecar_requires_hello_first(sidecar, db):
+    reader, writer = await asyncio.open_unix_connection(sidecar)
+    writer.write(frame(CHECK, CHECK_HEAD.pack(1, 1, 1)))
+    await writer.drain()
+    assert await asyncio.wait_for(reader.read(), 5) == b""
+    writer.close()
+
+
+@pytest.mark.asyncio
+async def test_serve_listens_until_signalled(
+    async_client, fake_redis, seed, tmp_path, monkeypatch
+):
+    raw_key = (await seed(_fixed(3))).key
+    session_factory = app.dependency_overrides[get_sessionmaker]()
+    monkeypatch.setattr(deps, "_redis_client", lambda: fake_redis)
+    monkeypatch.setattr(db_session, "AsyncSessionLocal", session_factory)
+    loop = asyncio.get_running_loop()
+    handlers = {}
+    monkeypatch.setattr(
+        loop, "add_signal_handler", lambda sig, cb: handlers.__setitem__(sig, cb)
+    )
+    path = str(tmp_path / "serve.sock")
+    # A stale socket from an earlier run is replaced
+    open(path, "w").close()
+
+    task = asyncio.create_task(sidecar_module.serve(path, 0o660))
+    for _ in range(200):
+        if handlers:
+            break
+        await asyncio.sleep(0.01)
+    assert set(handlers) == {signal.SIGTERM, signal.SIGINT}
+    assert os.stat(path).st_mode & 0o777 == 0o660
+    reader, writer, hello = await _hello(path, raw_key)
+    assert hello == (HELLO_OK, b"\x00")
+    writer.close()
+
+    handlers[signal.SIGTERM]()
+    await asyncio.wait_for(task, 5)
+    assert not os.path.exists(path)
+
+
+def test_main_parses_socket_options(monkeypatch):
+    served = []
+
+    async def fake_serve(path, mode):
+        served.append((path, mode))
+
+    monkeypatch.setattr(sidecar_module, "serve", fake_serve)
+    monkeypatch.setattr(sidecar_module, "setup_logging", lambda: None)
+    monkeypatch.setattr("app.serve.pick_loop", lambda: "asyncio")
+    assert (
+        sidecar_module.main(
+            ["--socket", "/tmp/x.sock", "--mode", "600", "--metrics-port", "0"]
+        )
+        == 0
+    )
+    assert served == [("/tmp/x.sock", 0o600)]
+
+
+@pytest.mark.asyncio
+async def test_sidecar_reports_engine_failures(sidecar, seed, monkeypatch):
+    async def broken(self, **kw):
+        raise RuntimeError("redis down")
+
+    monkeypatch.setattr(DecisionEngine, "check", broken)
+    raw_key = (await seed(_fixed(3))).key
+    reader, writer, _ = await _hello(sidecar, raw_key)
+    writer.write(
+        frame(DEFINE, DEFINE_HEAD.pack(1) + b"GET:/sc")
+        + frame(CHECK, CHECK_HEAD.pack(8, 1, 1) + b"user:1")
+    )
+    await writer.drain()
+    kind, body = await asyncio.wait_for(_read(reader), 5)
+    writer.close()
+    assert kind == DECISION and DECISION_BODY.unpack(body)[:2] == (8, ERROR)
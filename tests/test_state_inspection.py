@@ -0,0 +1,99 @@
+import json
+import uuid
+
+import pytest
+
+from app.core.config import settings
+from app.rl.inspect import encode_cursor, parse_key
+from app.rl.keys import rl_key_conc, rl_key_sliding, rl_key_token_bucket
+from app.rl.strategies import concurrency, fixed_window, sliding_window, token_bucket
+
+
+def _lines(resp):
+    return [json.loads(line) for line in resp.text.splitlines() if line.strip()]
+
+
+def test_parse_key_splits_subject_and_resource():
+    item = parse_key("lf:fw:t1:user:1:GET:/orders/7:1700000040")
+    assert item["algorithm"] == "fixed_window"
+    assert (item["subject"], item["resource"]) == ("user:1", "GET:/orders/7")
+    assert item["window_start"] == 1700000040
+    assert parse_key("lf:hh:t1:123:GET:/x") is None
+
+
+@pytest.mark.asyncio
+async def test_state_walk_pages_through_tenant_keys(
+    async_client, fake_redis, monkeypatch, admin_headers
+):
+    tid, other = str(uuid.uuid4()), str(uuid.uuid4())
+    for i in range(12):
+        await token_bucket.check(
+            fake_redis,
+            rl_key_token_bucket(tid, f"u{i}", "GET:/a"),
+            capacity=10,
+            refill_rate_per_sec=1.0,
+            cost=3,
+        )
+    await fixed_window.check(
+        fake_redis, f"lf:fw:{tid}:user:1:GET:/b:1700000000", limit=5, window_sec=60
+    )
+    await sliding_window.check(
+        fake_redis, rl_key_sliding(tid, "u0", "GET:/c"), limit=5, window_sec=60, cost=2
+    )
+    await concurrency.acquire(fake_redis, rl_key_conc(tid, "u0", "GET:/d"), limit=3)
+    await token_bucket.check(
+        fake_redis,
+        rl_key_token_bucket(other, "u0", "GET:/a"),
+        capacity=10,
+        refill_rate_per_sec=1.0,
+    )
+    await fake_redis.set(f"lf:hh:{tid}:1:GET:/a", 1)
+
+    monkeypatch.setattr(settings, "INSPECT_SCAN_COUNT", 2)
+    monkeypatch.setattr(settings, "INSPECT_MAX_SCAN_CALLS", 2)
+    items, cursor, pages = [], None, 0
+    while True:
+        r = await async_client.get(
+            f"/v1/admin/tenants/{tid}/state",
+            params={"cursor": cursor} if cursor else {},
+            headers=admin_headers,
+        )
+        assert r.status_code == 200
+        *page, done = _lines(r)
+        assert done["done"] and done["scanned"] <= 2 * 2 + 2
+        items += page
+        pages += 1
+        cursor = done["cursor"]
+        if cursor is None:
+            break
+    assert pages > 1
+    assert len(items) == 15 and len({i["key"] for i in items}) == 15
+
+    by_alg = {}
+    for i in items:
+        by_alg.setdefault(i["algorithm"], []).append(i)
+    assert by_alg["token_bucket"][0]["state"]["tokens"] == 7.0
+    assert by_alg["fixed_window"][0]["state"] == {"count": 1}
+    assert by_alg["sliding_window"][0]["state"]["events"] == 1
+    assert by_alg["sliding_window"][0]["state"]["cost_sum"] == 2
+    assert by_alg["concurrency"][0]["state"] == {"in_flight": 1}
+    assert all(i["ttl_ms"] > 0 for i in items)
+
+    r = await async_client.get(
+        f"/v1/admin/tenants/{tid}/state",
+        params={"subject": "user:1"},
+        headers=admin_headers,
+    )
+    assert [i["subject"] for i in _lines(r)[:-1]] == ["user:1"]
+
+
+@pytest.mark.asyncio
+async def test_state_rejects_foreign_or_garbled_cursor(async_client, admin_headers):
+    tid = str(uuid.uuid4())
+    for cursor in ("not-a-cursor", encode_cursor(str(uuid.uuid4()), 5)):
+        r = await async_client.get(
+            f"/v1/admin/tenants/{tid}/state",
+            params={"cursor": cursor},
+            headers=admin_headers,
+        )
+        assert r.status_code == 400
@@ -0,0 +1,90 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.core.config import settings
+from app.rl.reset import key_matches
+
+
+async def _wait(client, job_id, headers, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        job = (
+            await client.get(f"/v1/admin/reset-jobs/{job_id}", headers=headers)
+        ).json()
+        if job["status"] != "running":
+            return job
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+def test_key_matches_is_exact_and_limited_to_limiter_state():
+    t = "t1"
+    assert key_matches("lf:tb:t1:u:GET:/a", t, "GET:/a", None)
+    assert key_matches("lf:fw:t1:u:GET:/a:1700000000", t, "GET:/a", "u")
+    assert not key_matches("lf:tb:t1:u:GET:/ab", t, "GET:/a", None)
+    assert not key_matches("lf:tb:t1:uu:GET:/a", t, None, "u")
+    assert not key_matches("lf:usage:t1:20000", t, None, None)
+    assert not key_matches("lf:tb:t2:u:GET:/a", t, None, None)
+
+
+@pytest.mark.asyncio
+async def test_reset_job_scopes_and_progress(
+    async_client, fake_redis, monkeypatch, admin_headers
+):
+    monkeypatch.setattr(settings, "RESET_SCAN_COUNT", 7)
+    monkeypatch.setattr(settings, "RESET_CHUNK_SIZE", 4)
+    tid, other = str(uuid.uuid4()), str(uuid.uuid4())
+    for i in range(10):
+        await fake_redis.hset(f"lf:tb:{tid}:u{i}:GET:/a", "tokens", 1)
+        await fake_redis.set(f"lf:fw:{tid}:u{i}:GET:/a:1700000000", 1)
+        await fake_redis.hset(f"lf:tb:{tid}:u{i}:GET:/ab", "tokens", 1)
+    await fake_redis.hset(f"lf:tb:{other}:u0:GET:/a", "tokens", 1)
+    await fake_redis.hset(f"lf:usage:{tid}:20000", "n:1:allowed:GET:/a", 1)
+
+    r = await async_client.post(
+        f"/v1/admin/tenants/{tid}/reset",
+        json={"resource": "GET:/a"},
+        headers=admin_headers,
+    )
+    assert r.status_code == 202
+    job = await _wait(async_client, r.json()["id"], admin_headers)
+    assert job["status"] == "done" and job["deleted"] == 20
+    assert job["scanned"] >= 30
+    assert await fake_redis.exists(f"lf:tb:{tid}:u0:GET:/ab")
+
+    r = await async_client.post(f"/v1/admin/tenants/{tid}/reset", headers=admin_headers)
+    job = await _wait(async_client, r.json()["id"], admin_headers)
+    assert job["deleted"] == 10
+    assert await fake_redis.keys(f"lf:??:{tid}:*") == []
+    assert (
+        await fake_redis.exists(f"lf:tb:{other}:u0:GET:/a", f"lf:usage:{tid}:20000")
+        == 2
+    )
+
+
+@pytest.mark.asyncio
+async def test_reset_job_can_be_cancelled(
+    async_client, fake_redis, monkeypatch, admin_headers
+):
+    monkeypatch.setattr(settings, "RESET_CHUNK_SIZE", 5)
+    monkeypatch.setattr(settings, "RESET_MAX_KEYS_PER_SEC", 100)
+    tid = str(uuid.uuid4())
+    for i in range(200):
+        await fake_redis.set(f"lf:cc:{tid}:u{i}:GET:/a", 1)
+
+    job_id = (
+        await async_client.post(f"/v1/admin/tenants/{tid}/reset", headers=admin_headers)
+    ).json()["id"]
+    await asyncio.sleep(0.1)
+    r = await async_client.delete(
+        f"/v1/admin/reset-jobs/{job_id}", headers=admin_headers
+    )
+    assert r.status_code == 202
+    job = await _wait(async_client, job_id, admin_headers)
+    assert job["status"] == "cancelled"
+    assert 0 < job["deleted"] < 200
+
+    r = await async_client.get("/v1/admin/reset-jobs/nope", headers=admin_headers)
+    assert r.status_code == 404
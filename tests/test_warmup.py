@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+import uvicorn
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core import warmup
+from app.core.cache import api_key_cache, plan_cache
+from app.core.config import settings
+from app.db import crud
+from app.db.models import PlanAlgorithm, SubjectType
+from app.rl.policy_index import policy_index
+from app.serve import _reuseport_socket, pick_http, pick_loop
+
+
+@pytest.mark.asyncio
+async def test_warm_up_prefetches_keys_and_plans(db, fake_redis, pg_dsn):
+    tenant = await crud.create_tenant(db, name="warm")
+    plan = await crud.create_plan(
+        db,
+        tenant_id=tenant.id,
+        name="wp",
+        algorithm=PlanAlgorithm.token_bucket,
+        bucket_capacity=5,
+        refill_rate_per_sec=1.0,
+    )
+    await crud.create_resource_policy(
+        db,
+        tenant_id=tenant.id,
+        resource="GET:/warm",
+        subject_type=SubjectType.api_key,
+        plan_id=plan.id,
+    )
+    _, key_hash = await crud.create_api_key(db, tenant_id=tenant.id, name="k")
+
+    engine = create_async_engine(pg_dsn, future=True)
+    factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        await warmup.warm_up(fake_redis, factory)
+    finally:
+        await engine.dispose()
+
+    try:
+        assert warmup.state.ready
+        assert api_key_cache.get(key_hash) is not None
+        cached = plan_cache.get(("id", str(plan.id)))
+        assert cached is not None and cached.name == "wp"
+        trie = await policy_index.for_tenant(None, tenant.id)
+        assert str(trie.match("GET:/warm", "api_key")) == str(plan.id)
+    finally:
+        warmup.state.ready = False
+
+
+@pytest.mark.asyncio
+async def test_ready_endpoint_reflects_warmup_state(async_client):
+    warmup.state.ready = False
+    r = await async_client.get("/v1/ready")
+    assert r.status_code == 503
+
+    warmup.state.ready = True
+    warmup.state.duration_ms = 12.0
+    try:
+        r = await async_client.get("/v1/ready")
+        assert r.status_code == 200
+        assert r.json()["status"] == "ready"
+    finally:
+        warmup.state.ready = False
+
+
+def test_serve_prefers_fast_loop_and_parser():
+    assert pick_loop() in ("uvloop", "asyncio")
+    assert pick_http() in ("httptools", "h11")
+
+
+@pytest.mark.asyncio
+async def test_worker_socket_listens_only_after_startup():
+    sock = _reuseport_socket("127.0.0.1", 0)
+    port = sock.getsockname()[1]
+    refused = []
+
+    async def app(scope, receive, send):
+        # Lifespan only: the warm-up stand-in probes the worker's own port
+        await receive()
+        try:
+            _, w = await asyncio.open_connection("127.0.0.1", port)
+            w.close()
+        except ConnectionRefusedError:
+            refused.append(True)
+        await send({"type": "lifespan.startup.complete"})
+        await receive()
+        await send({"type": "lifespan.shutdown.complete"})
+
+    server = uvicorn.Server(uvicorn.Config(app, lifespan="on", log_level="error"))
+    task = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        assert refused == [True]
+        _, w = await asyncio.open_connection("127.0.0.1", port)
+        w.close()
+    finally:
+        server.should_exit = True
+        await task
+
+
+@pytest.mark.asyncio
+async def test_failed_warm_up_keeps_retrying_in_background(
+    db, fake_redis, pg_dsn, monkeypatch
+):
+    monkeypatch.setattr(settings, "WARMUP_RETRY_SEC", 0.01)
+    pings = []
+    ping = fake_redis.ping
+
+    async def flaky_ping():
+        pings.append(True)
+        if len(pings) < 3:
+            raise ConnectionError("redis not up yet")
+        return await ping()
+
+    monkeypatch.setattr(fake_redis, "ping", flaky_ping)
+    engine = create_async_engine(pg_dsn, future=True)
+    factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        await warmup.start_warmup(fake_redis, factory)
+        assert not warmup.state.ready
+        assert "redis not up yet" in warmup.state.last_error
+        for _ in range(200):
+            if warmup.state.ready:
+                break
+            await asyncio.sleep(0.01)
+        assert warmup.state.ready and warmup.state.last_error is None
+        assert len(pings) == 3
+    finally:
+        await warmup.stop_warmup()
+        warmup.state.ready = False
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_app_lifespan_warms_up_and_stops_background_workers(
+    db, fake_redis, pg_dsn, monkeypatch
+):
+    from app import main
+    from app.core.usage import usage_aggregator
+
+    engine = create_async_engine(pg_dsn, future=True)
+    factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(main, "_redis_client", lambda: fake_redis)
+    monkeypatch.setattr(main, "AsyncSessionLocal", factory)
+    # No span exporter or app instrumentation leaking into later tests
+    monkeypatch.setattr(settings, "OTEL_EXPORTER_OTLP_ENDPOINT", "")
+    try:
+        await main.on_startup()
+        assert warmup.state.ready
+        assert usage_aggregator._task is not None
+        await main.on_shutdown()
+        assert usage_aggregator._task is None
+    finally:
+        warmup.state.ready = False
+        await engine.dispose()